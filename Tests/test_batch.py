@@ -0,0 +1,80 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.batch import CellEdit, read_cells, write_cells  # noqa: E402
+from visiopy.fakes import FakePage  # noqa: E402
+
+
+def make_page(n=100):
+    page = FakePage()
+    for i in range(n):
+        shp = page.add_shape(PinX=i * 0.1, PinY=1.0)
+        if i % 2 == 0:
+            shp.add_row('prop', 'Type', '"Valve"')
+    page.calls.clear()
+    return page
+
+
+def test_write_formulas_is_one_call():
+    page = make_page(1000)
+    edits = [CellEdit(i, 'FillForegnd', formula=3) for i in range(1, 1001)]
+    result = write_cells(page, edits)
+    assert result.ok
+    assert page.calls['SetFormulas'] == 1
+    assert sum(page.calls.values()) == 1
+    assert page._shapes[500]._cells[(1, 3, 0)] == ['3', 3.0]
+
+
+def test_chunking():
+    page = make_page(10)
+    edits = [(i, 'PinY', '2 in') for i in range(1, 11)]
+    result = write_cells(page, edits, chunk_size=4)
+    assert result.ok
+    assert page.calls['SetFormulas'] == 3
+
+
+def test_values_with_units():
+    page = make_page(3)
+    result = write_cells(page, [(1, 'Width', 25.4, 'mm'),
+                                (2, 'Width', 2.0, None)])
+    assert result.ok and result.calls == 1
+    values = read_cells(page, [(1, 'Width'), (2, 'Width')], unit='mm').values
+    assert values == [25.4, 50.8]
+
+
+def test_prop_edits_call_count():
+    page = make_page(200)
+    ids = range(1, 201, 2)         # the shapes with a Type row
+    edits = [CellEdit(i, 'Prop.Type', formula='"Pump"') for i in ids]
+    result = write_cells(page, edits)
+    assert result.ok
+    # Page.Shapes once, ItemFromID and CellsRowIndexU per shape, one write
+    assert page.calls['Page.Shapes'] == 1
+    assert sum(page.calls.values()) == 2 * 100 + 2
+    page.calls.clear()
+    edits = [CellEdit(i, (243, 0, 0), formula='"Valve"') for i in ids]
+    assert write_cells(page, edits).ok
+    assert sum(page.calls.values()) == 1
+
+
+def test_per_item_errors():
+    page = make_page(6)
+    edits = [CellEdit(i, 'prop.Type.Value', formula='"Pump"')
+             for i in range(1, 7)] + [CellEdit(99, 'PinX', formula='1')]
+    result = write_cells(page, edits)
+    # odd shapes have no Type row, shape 99 does not exist
+    assert sorted(result.errors) == [1, 3, 5, 6]
+    assert page._shapes[1]._cells[(243, 0, 0)][1] == 'Pump'
+    assert page._shapes[5]._cells[(243, 0, 0)][1] == 'Pump'
+
+
+def test_read_formulas_and_strings():
+    page = make_page(4)
+    res = read_cells(page, [(1, 'prop.Type'), (3, 'prop.Type')], strings=True)
+    assert res.values == ['Valve', 'Valve']
+    assert page.calls['GetResults'] == 1
+    res = read_cells(page, [(2, 'PinX')], formulas=True)
+    assert res.values == ['0.1']
@@ -0,0 +1,135 @@
+import gc
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+np = pytest.importorskip('numpy')
+
+from visiopy import cache as cache_module  # noqa: E402
+from visiopy.cache import SnapshotCache  # noqa: E402
+from visiopy.fakes import write_vsdx  # noqa: E402
+from visiopy.patch import apply_edits  # noqa: E402
+from visiopy.vsdx import VsdxFile  # noqa: E402
+
+
+def make_drawing(path, n=50):
+    master = {'id': 1, 'name': 'Pump', 'shapes': [
+        {'id': 1, 'cells': {'Width': 0.5, 'Height': 0.25},
+         'props': {'Type': {'Value': 'Pump', 'Label': 'Kind'}}}]}
+    shapes = [{'id': i, 'name': f'Pump.{i}', 'master': 1,
+               'cells': {'PinX': i / 25.4},
+               'user': {'Row': i}, 'text': f'P{i}'} for i in range(1, n + 1)]
+    shapes.append({'id': n + 1, 'name': 'Pipe',
+                   'cells': {'BeginX': 0.0, 'EndX': 1.0},
+                   'shapes': [{'id': n + 2, 'cells': {'PinX': 0.1}}]})
+    return write_vsdx(path, [
+        {'name': 'Plan', 'width': 11.0, 'shapes': shapes,
+         'connects': [(n + 1, 'BeginX', 1, 'PinX'),
+                      (n + 1, 'EndX', 2, 'PinX')]},
+        {'name': 'Empty'}], masters=[master])
+
+
+def test_snapshot_matches_the_file(tmp_path):
+    src = make_drawing(str(tmp_path / 'a.vsdx'))
+    cache = SnapshotCache(str(tmp_path / 'cache'))
+    page = cache.open(src).page('Plan')
+    with VsdxFile(src) as vsdx:
+        shapes = list(vsdx.iter_shapes('Plan'))
+        connects = list(vsdx.connects('Plan'))
+    assert list(page.ids) == [s.id for s in shapes]
+    assert page.parent[-1] == 51 and page.parent[0] == -1
+    assert page.names[:2] == ['Pump.1', 'Pump.2']
+    assert page.text[3] == 'P4' and page.type[50] == 'Group'
+    assert np.allclose(page.column('PinX', unit='mm')[:50], range(1, 51))
+    assert np.isnan(page.column('PinX')[50])
+    assert page.column('Width')[7] == 0.5            # from the master
+    assert page.prop('Type')[0] == 'Pump'
+    assert page.prop('Type', 'Label')[0] == 'Kind'
+    assert page.prop('Type')[50] is None
+    assert page.user('Row')[9] == 10.0
+    assert page.connects == connects
+    assert len(cache.open(src).page(1)) == 0
+    assert cache.stats['misses'] == 1 and cache.stats['hits'] == 1
+
+
+def test_stale_entries_and_eviction(tmp_path):
+    src = make_drawing(str(tmp_path / 'a.vsdx'))
+    cache = SnapshotCache(str(tmp_path / 'cache'))
+    cache.open(src)
+
+    stat = os.stat(src)
+    os.utime(src, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    cache.open(src)                   # touched, same content
+    assert cache.stats['revalidated'] == 1
+    cache.open(src)
+    assert cache.stats['hits'] == 1
+
+    apply_edits(src, {0: [(1, 'PinX', '5 mm')]})
+    assert cache.open(src).page(0).column('PinX', 'mm')[0] == \
+        pytest.approx(5)
+    assert cache.stats['stale'] == 1
+
+    other = make_drawing(str(tmp_path / 'b.vsdx'), n=10)
+    size = cache.size
+    small = SnapshotCache(cache.root, max_bytes=size)
+    small.open(other)                 # over budget: a.vsdx goes
+    assert small.stats['evicted'] == 1
+    assert other in small and src not in small
+    assert small.invalidate(other) and other not in small
+
+
+def test_rebuild_while_the_old_snapshot_is_mapped(tmp_path, monkeypatch):
+    src = make_drawing(str(tmp_path / 'a.vsdx'))
+    cache = SnapshotCache(str(tmp_path / 'cache'))
+    old = cache.open(src).page(0)
+    assert old.column('PinX', 'mm')[0] == pytest.approx(1)
+    apply_edits(src, {0: [(1, 'PinX', '5 mm')]})
+
+    def mapped(path, *args, **kwargs):      # what Windows does
+        raise PermissionError(f"{path} is in use")
+
+    with monkeypatch.context() as m:
+        m.setattr(cache_module.shutil, 'rmtree', mapped)
+        new = cache.open(src).page(0)
+    assert new.column('PinX', 'mm')[0] == pytest.approx(5)
+    assert old.column('PinX', 'mm')[0] == pytest.approx(1)
+    folder = cache._folder(src)
+    assert len(os.listdir(folder)) == 3     # manifest, old and new data
+    assert cache.open(src).page(0).column('PinX', 'mm')[0] == \
+        pytest.approx(5)
+    # the next rebuild deletes the data nobody maps any more
+    del old, new
+    gc.collect()
+    apply_edits(src, {0: [(1, 'PinX', '6 mm')]})
+    assert cache.open(src).page(0).column('PinX', 'mm')[0] == \
+        pytest.approx(6)
+    assert len(os.listdir(folder)) == 2
+
+
+def test_old_snapshots_survive_a_rebuild(tmp_path):
+    src = make_drawing(str(tmp_path / 'a.vsdx'))
+    cache = SnapshotCache(str(tmp_path / 'cache'))
+    old = cache.open(src)           # no page read yet, nothing mapped
+    apply_edits(src, {0: [(1, 'PinX', '5 mm')]})
+    new = cache.open(src)
+    assert cache.stats['stale'] == 1
+    page = old.page('Plan')
+    assert page.column('PinX', 'mm')[0] == pytest.approx(1)
+    assert page.names[0] == 'Pump.1'
+    assert new.page('Plan').column('PinX', 'mm')[0] == pytest.approx(5)
+
+    # a manifest pointing at a deleted data folder is a miss, not a hit
+    del old, page, new
+    gc.collect()
+    folder = cache._folder(src)
+    for entry in os.listdir(folder):
+        if entry != 'manifest.json':
+            shutil.rmtree(os.path.join(folder, entry))
+    assert cache.open(src).page(0).column('PinX', 'mm')[0] == \
+        pytest.approx(5)
+    assert cache.stats['misses'] == 2
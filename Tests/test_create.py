@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+np = pytest.importorskip('numpy')
+
+from visiopy.create import create_shapes, drop_many, grid, \
+    wrap_grid  # noqa: E402
+from visiopy.fakes import FakeMaster, FakePage  # noqa: E402
+
+
+def test_grid_layouts():
+    x, y = grid(5, columns=2, spacing=(10, -5), origin=(1, 2))
+    assert x.tolist() == [1, 11, 1, 11, 1]
+    assert y.tolist() == [2, 2, -3, -3, -8]
+    x, y = grid(4, spacing='1 in', unit='mm')
+    assert x.tolist() == pytest.approx([0, 25.4, 0, 25.4])
+    x, y = wrap_grid(200, 420, '20 mm', '20 mm')
+    assert x.max() <= 400 and len(set(x.tolist())) == 20
+
+
+def test_primitives_with_cells_in_few_calls():
+    page = FakePage()
+    x, y = grid(2000, columns=50, spacing=20)
+    created = create_shapes(page, 'rectangle', x, y, size=(5, 5),
+                            cells={'FillForegnd': '3', 'Angle': 45},
+                            chunk_size=1000)
+    assert len(created.ids) == 2000 and created.cells.ok
+    # one template drawn and deleted, two drops, two writes per kind
+    assert page.calls['Page.DrawRectangle'] == 1
+    assert page.calls['Shape.Delete'] == 1
+    assert page.calls['Page.DropMany'] == 2
+    assert page.calls['SetFormulas'] + page.calls['SetResults'] == 4
+    assert len(page._shapes) == 2000
+    shape = page._shapes[int(created.ids[51])]
+    assert shape._cells[(1, 1, 0)][1] == pytest.approx(20 / 25.4)
+    assert shape._cells[(1, 1, 1)][1] == pytest.approx(20 / 25.4)
+    assert shape._cells[(1, 1, 2)][1] == pytest.approx(5 / 25.4)
+    assert shape._cells[(1, 3, 0)][1] == 3.0
+    assert shape._cells[(1, 1, 6)][1] == pytest.approx(np.pi / 4)
+
+
+def test_masters_per_position():
+    page = FakePage()
+    pump, valve = FakeMaster('Pump', Width=2.0), FakeMaster('Valve')
+    ids = drop_many(page, [pump, valve, pump], [0, 1, 2], [0, 0, 0],
+                    unit='in')
+    assert ids.tolist() == [1, 2, 3]
+    assert page._shapes[3]._cells[(1, 1, 2)][1] == 2.0
+    assert page._shapes[2]._name.startswith('Valve')
+    with pytest.raises(ValueError):
+        drop_many(page, [pump], [0, 1], [0, 0])
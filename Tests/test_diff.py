@@ -0,0 +1,105 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.batch import visSectionProp  # noqa: E402
+from visiopy.diff import apply_changes, diff, fingerprint  # noqa: E402
+from visiopy.fakes import FakeDocument, synthetic_shapes, \
+    write_vsdx  # noqa: E402
+from visiopy.vsdx import VsdxFile  # noqa: E402
+
+
+def make_revision(path, edit=False):
+    shapes = list(synthetic_shapes(300))
+    if edit:
+        shapes[4]['cells']['PinX'] = 7.0
+        shapes[4]['props']['Tag']['Value'] = 'P-CHANGED'
+        shapes[5]['text'] = 'renamed'
+        del shapes[6]
+        shapes.extend(synthetic_shapes(1, start_id=1000))
+    return write_vsdx(path, [{'name': 'Unchanged',
+                              'shapes': synthetic_shapes(300)},
+                             {'name': 'Edited', 'shapes': shapes}])
+
+
+def test_diff_two_revisions(tmp_path):
+    v1 = make_revision(str(tmp_path / 'v1.vsdx'))
+    v2 = make_revision(str(tmp_path / 'v2.vsdx'), edit=True)
+    old = fingerprint(v1)
+    new = fingerprint(v2, previous=old)
+    # byte-identical page part: reused without parsing
+    assert new['Unchanged'] is old['Unchanged']
+    changes = diff(old, new)
+    assert changes.pages_skipped == ['Unchanged']
+    assert [c.shape_id for c in changes.added] == [1000]
+    assert [c.shape_id for c in changes.removed] == [7]
+    modified = {c.shape_id: c for c in changes.modified}
+    assert sorted(modified) == [5, 6]
+    assert modified[5].cells == {
+        'PinX': ('2.5', '7.0'),
+        (visSectionProp, 'Tag', 0): ('"P-00005"', '"P-CHANGED"')}
+    assert modified[6].cells == {}
+    assert modified[6].text == ('P-00006', 'renamed')
+
+    # replay the cell changes on v1: only text, added and removed remain
+    out = str(tmp_path / 'out.vsdx')
+    results = apply_changes(v1, changes, out)
+    assert results['Edited'].ok
+    rest = diff(fingerprint(out), new)
+    assert {(c.shape_id, c.kind) for c in rest.shapes} == {
+        (1000, 'added'), (7, 'removed'), (6, 'modified')}
+    assert {(c.shape_id, c.kind) for c in changes.unreplayable()} == {
+        (1000, 'added'), (7, 'removed'), (6, 'modified')}
+
+
+def test_live_page_against_saved_file(tmp_path):
+    doc = FakeDocument()
+    page = doc._pages[0]
+    specs = []
+    for i in range(1, 51):
+        shape = page.add_shape(PinX=i * 0.5, PinY=1.0)
+        shape.add_row('prop', 'Tag', f'"T{i}"', Label='"Tag"')
+        specs.append({'id': i, 'cells': {
+            'PinX': (i * 0.5, 'MM'), 'PinY': 1.0, 'Width': 1.0,
+            'Height': 1.0, 'LocPinX': 0.5, 'LocPinY': 0.5, 'Angle': 0.0},
+            'props': {'Tag': {'Value': f'T{i}', 'Label': 'Tag'}}})
+    saved = write_vsdx(str(tmp_path / 'saved.vsdx'),
+                       [{'name': 'Page-1', 'shapes': specs}])
+    assert not diff(fingerprint(saved), fingerprint(doc))
+
+    page._shapes[3]._set_formula((1, 1, 0), '40 mm')
+    page._shapes[4]._set_formula((visSectionProp, 0, 0), '"new"')
+    page.calls.clear()
+    live = fingerprint(doc)
+    assert page.calls['GetFormulasU'] == 1
+    changes = diff(fingerprint(saved), live)
+    assert [c.shape_id for c in changes.modified] == [3, 4]
+    # write the unsaved changes into the file
+    apply_changes(saved, changes)
+    assert not diff(fingerprint(saved), live)
+
+
+def test_rows_inherited_from_master(tmp_path):
+    master = {'id': 1, 'name': 'Pump', 'shapes': [
+        {'id': 1, 'props': {'A': 'a', 'B': 'b'}}]}
+
+    def revision(name, b):
+        return write_vsdx(str(tmp_path / name), [{'name': 'Plan', 'shapes': [
+            {'id': 1, 'master': 1, 'props': {'B': b, 'C': 'c'}}]}],
+            masters=[master])
+
+    v1, v2 = revision('v1.vsdx', 'b1'), revision('v2.vsdx', 'b2')
+    changes = diff(fingerprint(v1), fingerprint(v2))
+    assert changes.modified[0].cells == {
+        (visSectionProp, 'B', 0): ('"b1"', '"b2"')}
+    assert changes.edits() == {'Plan': [(1, 'Prop.B.Value', '"b2"', None,
+                                         None)]}
+    out = str(tmp_path / 'out.vsdx')
+    assert apply_changes(v1, changes, out)['Plan'].ok
+    assert not diff(fingerprint(out), fingerprint(v2))
+    with VsdxFile(out) as vsdx:
+        shape = vsdx.shapes(0)[0]
+        assert {k: r.value for k, r in shape.props.items()} == {
+            'A': 'a', 'B': 'b2', 'C': 'c'}
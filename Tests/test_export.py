@@ -0,0 +1,125 @@
+import json
+import math
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.export import export_geojson, export_svg, export_tiles, \
+    flatten  # noqa: E402
+from visiopy.fakes import rectangle_geometry, write_vsdx  # noqa: E402
+
+
+def make_drawing(path):
+    """A rotated rectangle, a group with a flipped child, an arc without
+    fill and a circle."""
+    arc = {'cells': {'NoFill': 1},
+           'rows': [('MoveTo', {'X': 0.0, 'Y': 0.0}),
+                    ('ArcTo', {'X': 1.0, 'Y': 0.0, 'A': -0.5})]}
+    shapes = [
+        {'id': 1, 'name': 'Box', 'text': 'A & B',
+         'cells': {'PinX': 2.0, 'PinY': 2.0, 'Width': 2.0, 'Height': 1.0,
+                   'Angle': math.pi / 2, 'LineColor': '#FF0000',
+                   'FillForegnd': 4},
+         'props': {'Tag': 'T-1'},
+         'geometry': rectangle_geometry(2.0, 1.0)},
+        {'id': 2, 'name': 'Group',
+         'cells': {'PinX': 5.0, 'PinY': 5.0, 'Width': 2.0, 'Height': 2.0},
+         'shapes': [
+             {'id': 3, 'name': 'Child',
+              'cells': {'PinX': 0.5, 'PinY': 0.5, 'Width': 1.0,
+                        'Height': 1.0, 'FlipX': 1},
+              'geometry': [[('MoveTo', {'X': 0.0, 'Y': 0.0}),
+                            ('LineTo', {'X': 1.0, 'Y': 0.0}),
+                            ('LineTo', {'X': 1.0, 'Y': 0.5})]]}]},
+        {'id': 4, 'name': 'Arc',
+         'cells': {'PinX': 1.5, 'PinY': 8.0, 'Width': 1.0, 'Height': 0.5,
+                   'LocPinX': 0.0, 'LocPinY': 0.0},
+         'geometry': [arc]},
+        {'id': 5, 'name': 'Circle',
+         'cells': {'PinX': 7.0, 'PinY': 9.0, 'Width': 1.0, 'Height': 1.0},
+         'geometry': [[('Ellipse', {'X': 0.5, 'Y': 0.5, 'A': 1.0, 'B': 0.5,
+                                    'C': 0.5, 'D': 1.0})]]},
+    ]
+    return write_vsdx(path, [{'name': 'Plan', 'width': 10.0, 'height': 10.0,
+                              'shapes': shapes}])
+
+
+def features(path, **options):
+    data = json.loads(export_geojson(path, unit='in', **options))
+    return {f['id']: f for f in data['features']}
+
+
+def test_geojson_places_shapes(tmp_path):
+    feats = features(make_drawing(str(tmp_path / 'plan.vsdx')))
+    assert sorted(feats) == [1, 3, 4, 5]
+    box = feats[1]
+    assert box['geometry']['type'] == 'MultiPolygon'
+    ring = box['geometry']['coordinates'][0][0]
+    # 2 x 1 rotated by 90 degrees around its centre (2, 2)
+    assert sorted(map(tuple, ring[:4])) == [(1.5, 1.0), (1.5, 3.0),
+                                            (2.5, 1.0), (2.5, 3.0)]
+    assert box['properties']['Prop.Tag'] == 'T-1'
+    assert box['properties']['text'] == 'A & B'
+
+    child = feats[3]
+    assert child['properties']['parent'] == 2
+    # group origin (4, 4); the child is mirrored around its own pin
+    assert child['geometry'] == {'type': 'MultiLineString', 'coordinates': [
+        [[5.0, 4.0], [4.0, 4.0], [4.0, 4.5]]]}
+
+    arc = feats[4]['geometry']
+    assert arc['type'] == 'MultiLineString'
+    points = arc['coordinates'][0]
+    assert points[0] == [1.5, 8.0] and points[-1] == [2.5, 8.0]
+    # a bow of -0.5 on a chord of 1: clockwise half circle over the chord
+    assert max(p[1] for p in points) == pytest.approx(8.5, abs=1e-3)
+    assert min(p[1] for p in points) == pytest.approx(8.0)
+
+    circle = feats[5]['geometry']['coordinates'][0][0]
+    assert all(math.hypot(x - 7.0, y - 9.0) == pytest.approx(0.5, abs=1e-3)
+               for x, y in circle)
+
+
+def test_svg_styles_and_viewport(tmp_path):
+    src = make_drawing(str(tmp_path / 'plan.vsdx'))
+    svg = export_svg(src, unit='in')
+    assert 'viewBox="0 0 10 10"' in svg
+    box = re.search(r'<g id="shape-1"[^>]*>(.*?)</g>', svg).group(1)
+    assert 'fill="#0000FF"' in box and 'stroke="#FF0000"' in box
+    assert 'A &amp; B</text>' in box
+    # y axis points down: the arc ends at svg y = 10 - 8
+    arc = re.search(r'<g id="shape-4"[^>]*><path d="([^"]*)" '
+                    r'fill="none"', svg).group(1)
+    assert arc == 'M1.5 2A0.5 0.5 0 0 1 2.5 2'
+    # the child sits inside its group
+    assert re.search(r'<g id="shape-2"[^>]*>\n<g id="shape-3"', svg)
+
+    part = export_svg(src, unit='in', viewport=(0, 0, 3, 3))
+    assert 'viewBox="0 7 3 3"' in part
+    assert 'shape-1' in part and 'shape-4' not in part
+    assert 'shape-5' not in part
+
+
+def test_tiles(tmp_path):
+    src = make_drawing(str(tmp_path / 'plan.vsdx'))
+    tiles = export_tiles(src, str(tmp_path / 'tiles'), tile_size=5,
+                         unit='in', fmt='geojson', workers=2)
+    names = [os.path.basename(p) for p, _ in tiles]
+    assert names == ['Plan_r0_c0.geojson', 'Plan_r0_c1.geojson',
+                     'Plan_r1_c0.geojson', 'Plan_r1_c1.geojson']
+    # the group child touches both bottom tiles
+    assert [n for _, n in tiles] == [1, 1, 2, 1]
+    with open(tiles[0][0], encoding='utf-8') as f:
+        assert [f['id'] for f in json.load(f)['features']] == [4]
+
+
+def test_flatten_cubic():
+    lines = flatten([('M', 0.0, 0.0), ('C', 0.0, 1.0, 1.0, 1.0, 1.0, 0.0)],
+                    samples=4)
+    assert lines[0][0] == (0.0, 0.0) and lines[0][-1] == (1.0, 0.0)
+    assert lines[0][2] == (0.5, 0.75)
@@ -0,0 +1,104 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import rectangle_geometry, write_vsdx  # noqa: E402
+from visiopy.formula import FormulaError, Recalc, evaluate, \
+    recalc_vsdx  # noqa: E402
+from visiopy.vsdx import VsdxFile  # noqa: E402
+
+with open(os.path.join(os.path.dirname(__file__), 'data',
+                       'formulas.json')) as f:
+    CASES = json.load(f)['cases']
+
+
+@pytest.mark.parametrize('case', CASES, ids=[c['formula'] for c in CASES])
+def test_known_results(case):
+    if 'error' in case:
+        with pytest.raises(FormulaError, match=case['error']):
+            evaluate(case['formula'], case.get('cells'))
+        return
+    result = evaluate(case['formula'], case.get('cells'))
+    if isinstance(case['result'], float):
+        assert result == pytest.approx(case['result'], rel=1e-12)
+    else:
+        assert result == case['result']
+
+
+def make_drawing(path):
+    """A master whose Height and geometry follow Width, an instance with a
+    local Width, a label that follows the page and a User cell chain."""
+    master = {'id': 2, 'name': 'Box', 'shapes': [{
+        'id': 5, 'cells': {'Width': 1.0,
+                           'Height': (0.5, None, 'Width*0.5'),
+                           'LocPinX': (0.5, None, 'Width*0.5')},
+        'geometry': rectangle_geometry(1.0, 0.5)}]}
+    shapes = [{'id': 1, 'master': 2,
+               'cells': {'Width': 2.0, 'Height': (1.0, None, 'Inh')},
+               'user': {'Half': {'Value': (1.0, None, 'Width/2')},
+                        'Quarter': {'Value': (0.5, None, 'User.Half/2')}}},
+              {'id': 2, 'name': 'Label',
+               'cells': {'Width': (7.48, 'MM', 'ThePage!PageWidth-20 mm'),
+                         'PinX': (1.0, None, 'Sheet.1!Width/2')},
+               'props': {'Text': {'Value': ('', 'STR',
+                                            '"W="&Sheet.1!Width')}}},
+              {'id': 3, 'cells': {'Width': (1.0, None, 'Height'),
+                                  'Height': (1.0, None, 'Width')}}]
+    return write_vsdx(path, [{'name': 'A', 'width': 8.5, 'shapes': shapes}],
+                      masters=[master])
+
+
+def test_recalc_only_downstream(tmp_path):
+    src = make_drawing(str(tmp_path / 'in.vsdx'))
+    calc = Recalc(src)
+    assert calc.formula(0, 1, 'Height') == 'Width*0.5'
+    calc.set(0, 1, 'Width', '4 in')
+    changed = calc.recalc()
+    assert set(changed) == {
+        (0, 1, 'Width'), (0, 1, 'Height'), (0, 1, 'LocPinX'),
+        (0, 1, 'Geometry1.X2'), (0, 1, 'Geometry1.X3'),
+        (0, 1, 'Geometry1.Y3'), (0, 1, 'Geometry1.Y4'),
+        (0, 1, 'User.Half'), (0, 1, 'User.Quarter'),
+        (0, 2, 'PinX'), (0, 2, 'Prop.Text')}
+    # also the geometry cells that stay 0; not the circular shape 3
+    assert calc.evaluated == 16
+    assert calc.value(0, 1, 'User.Quarter') == 1.0
+    assert calc.value(0, 2, 'Prop.Text') == 'W=4'
+
+    calc.recalc(full=True)
+    assert set(calc.errors) == {(0, 3, 'Width'), (0, 3, 'Height')}
+    assert calc.value(0, 2, 'Width') == pytest.approx(8.5 - 20 / 25.4)
+
+    dst = str(tmp_path / 'out.vsdx')
+    calc.save(dst)
+    with VsdxFile(dst) as vsdx:
+        shapes = {s.id: s for s in vsdx.iter_shapes(0)}
+    box = shapes[1]
+    assert box.cell('Width').result == 4.0
+    assert box.cell('Height').result == 2.0
+    assert box.cell('Height').formula_attr == 'Inh'
+    assert box.cell('LocPinX').result == 2.0
+    assert box.cell('User.Quarter').result == 1.0
+    assert box.geometry[0].rows[2].cells['Y'].result == 2.0
+    assert box.geometry[0].rows[2].cells['Y'].formula_attr == 'Inh'
+    assert shapes[2].cell('PinX').result == 2.0
+    assert shapes[2].cell('Prop.Text').result == 'W=4'
+    assert shapes[2].cell('Width').result == pytest.approx(8.5 - 20 / 25.4)
+
+
+def test_recalc_vsdx_page_sheet_edit(tmp_path):
+    src = make_drawing(str(tmp_path / 'in.vsdx'))
+    calc = recalc_vsdx(src, edits={'A': [(0, 'PageWidth', 420, 'mm'),
+                                         (9, 'Width', '1'),
+                                         (1, 'Prop.Missing', '2')]})
+    assert sorted(calc.failed['A']) == [1, 2]
+    with VsdxFile(src) as vsdx:
+        assert vsdx.page(0).width == 420 / 25.4
+        label = vsdx.shapes(0)[1]
+        assert label.cell('Width').result == pytest.approx(400 / 25.4)
+        assert label.cell('Width').formula == 'ThePage!PageWidth-20 mm'
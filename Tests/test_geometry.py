@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+np = pytest.importorskip('numpy')
+
+from visiopy.batch import CHUNK_SIZE  # noqa: E402
+from visiopy.fakes import FakePage, FakeWindow  # noqa: E402
+from visiopy.geometry import apply_geometry, page_geometry  # noqa: E402
+
+
+def make_page(n=10000):
+    page = FakePage()
+    for i in range(n):
+        page.add_shape(PinX=(i % 100) * 0.5 + 0.013, PinY=(i // 100) * 0.5,
+                       Angle=0.5)
+    page.calls.clear()
+    return page
+
+
+def test_snapshot_is_one_call_per_chunk():
+    page = make_page()
+    geo = page_geometry(page, unit='mm')
+    assert len(geo) == 10000
+    # 70000 cells in chunks of CHUNK_SIZE, no per-shape calls
+    assert page.calls['GetResults'] == -(-70000 // CHUNK_SIZE)
+    assert set(page.calls) <= {'GetResults', 'Page.CreateSelection',
+                               'Selection.GetIDs'}
+    assert geo['PinX'][1] == pytest.approx(0.513 * 25.4)
+    assert geo['Angle'][0] == pytest.approx(np.degrees(0.5))
+    records = geo.to_records()
+    assert records['ID'][-1] == 10000
+
+
+def test_snap_and_write_back_changed_rows():
+    page = make_page()
+    geo = page_geometry(page, cells=['PinX', 'PinY'], unit='mm')
+    geo['PinX'] = np.round(geo['PinX'] / 5) * 5
+    page.calls.clear()
+    result = apply_geometry(geo)
+    assert result.ok
+    # PinY did not change, so only PinX of every shape is written
+    assert len(result.values) == 10000
+    assert page.calls['SetResults'] == -(-10000 // CHUNK_SIZE)
+    assert len(page.calls) == 1
+    assert page._shapes[2]._cells[(1, 1, 0)][1] == pytest.approx(15 / 25.4)
+    assert apply_geometry(geo) is None
+
+
+def test_selection_and_partial_changes():
+    page = make_page(50)
+    win = FakeWindow(page, selected=[3, 7, 9])
+    geo = page_geometry(win.Selection, cells=['Width'], unit='in')
+    assert list(geo.ids) == [3, 7, 9]
+    geo['Width'][1] = 2.5
+    result = apply_geometry(geo)
+    assert len(result.values) == 1
+    assert page._shapes[7]._cells[(1, 1, 2)][1] == 2.5
@@ -0,0 +1,104 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakePage, write_vsdx  # noqa: E402
+from visiopy.graph import ConnectionGraph  # noqa: E402
+
+
+def make_chain(page, n):
+    """Shapes 1..n joined in a chain by connectors n+1..2n-1."""
+    for _ in range(2 * n - 1):
+        page.add_shape()
+    for i in range(1, n):
+        page.glue(n + i, 'BeginX', i)
+        page.glue(n + i, 'EndX', i + 1)
+    page.calls.clear()
+
+
+def test_live_page_queries_and_refresh():
+    page = FakePage()
+    make_chain(page, 5)               # 1 -> 2 -> 3 -> 4 -> 5
+    page.add_shape()                  # 10: a connector glued at one end
+    page.glue(10, 'BeginX', 5)
+    graph = ConnectionGraph.from_page(page)
+    assert page.calls == {'Page.CreateSelection': 1, 'Selection.GetIDs': 1,
+                          'GetFormulasU': 1}
+    assert sorted(graph.edges) == sorted(
+        ConnectionGraph.from_page(page, connects=True).edges)
+    assert graph.neighbours(3) == [2, 4]
+    assert graph.neighbours(3, 'out') == [4]
+    assert graph.downstream(2) == [3, 4, 5]
+    assert graph.upstream(3) == [2, 1]
+    assert graph.shortest_path(5, 1) == [5, 4, 3, 2, 1]
+    assert graph.shortest_path(5, 1, directed=True) is None
+    assert graph.connectors(5) == [9, 10]
+    assert graph.ends(10) == (5, None)
+    assert [len(c) for c in graph.components()] == [5]
+
+    # break the chain in the middle and reconnect 5 -> 1
+    page.unglue(8)
+    page.glue(9, 'EndX', 1)
+    graph.refresh([8, 9])
+    assert graph.ends(8) == (None, None)
+    assert graph.ends(9) == (4, 1)
+    assert graph.components() == [{1, 2, 3, 4}, {5}]
+    assert graph.downstream(4) == [1, 2, 3]
+    assert graph.shortest_path(3, 4) == [3, 2, 1, 4]
+
+    page._shapes[2].Delete()
+    page.calls.clear()
+    graph.refresh([6, 7])
+    assert page.calls == {'GetFormulasU': 1}
+    assert 2 not in graph
+    assert graph.neighbours(1) == [4]
+    graph.remove_shape(4)
+    assert graph.edges == []
+
+
+def test_renamed_targets_are_looked_up_once():
+    page = FakePage()
+    pump = page.add_shape()
+    pump._name = 'Pump.7'
+    valve = page.add_shape()
+    valve._name = "Valve 'A'"
+    for _ in range(3):
+        connector = page.add_shape().ID
+        page.glue(connector, 'BeginX', pump.ID)
+        page.glue(connector, 'EndX', valve.ID)
+    page.calls.clear()
+    graph = ConnectionGraph.from_page(page)
+    assert graph.neighbours(pump.ID, 'out') == [valve.ID]
+    assert graph.connectors(valve.ID) == [3, 4, 5]
+    assert page.calls['Shapes.ItemU'] == 2
+
+
+def test_vsdx_pages_and_csr(tmp_path):
+    np = pytest.importorskip('numpy')
+    connects = [(10, 'BeginX', 1, 'PinX'), (10, 'EndX', 2, 'PinX'),
+                (11, 'BeginX', 2, 'PinX'), (11, 'EndX', 3, 'PinX'),
+                (12, 'BeginX', 1, 'PinX'), (12, 'EndX', 3, 'PinX'),
+                (13, 'BeginX', 4, 'PinX')]
+    path = write_vsdx(str(tmp_path / 'net.vsdx'), [
+        {'name': 'A', 'shapes': [{'id': i} for i in range(1, 14)],
+         'connects': connects},
+        {'name': 'B', 'shapes': [{'id': 1}, {'id': 2}, {'id': 3}],
+         'connects': [(3, 'BeginX', 1, 'PinX'), (3, 'EndX', 2, 'PinX')]}])
+
+    graph = ConnectionGraph.from_vsdx(path)
+    assert graph.neighbours(1, 'out') == [2, 3]
+    assert graph.shortest_path(1, 3, directed=True) == [1, 3]
+    csr = graph.to_csr()
+    assert csr.nodes.tolist() == [1, 2, 3, 4]
+    assert csr.indptr.tolist() == [0, 2, 3, 3, 3]
+    assert csr.indices.tolist() == [1, 2, 2]
+    assert csr.connectors.tolist() == [10, 12, 11]
+
+    every = ConnectionGraph.from_vsdx(path, page=None)
+    assert every.neighbours(('B', 1)) == [('B', 2)]
+    assert len(every.components()) == 3
+    assert every.to_csr().nodes.dtype == np.dtype(object)
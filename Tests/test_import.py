@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY = ('tkinter', 'win32com', 'pythoncom', 'numpy')
+
+
+def run(code):
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+
+
+def test_import_is_headless():
+    out = run("import sys, visiopy; "
+              f"print([m for m in {HEAVY!r} if m in sys.modules])").stdout
+    assert out.strip() == '[]'
+
+
+def test_lazy_attributes():
+    out = run("import sys, visiopy; visiopy.VsdxFile; visiopy.write_cells; "
+              "print('visiopy.vsdx' in sys.modules, 'tkinter' in sys.modules)"
+              ).stdout
+    assert out.split() == ['True', 'False']
+
+
+def test_import_time():
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+    from bench_import import import_time_us
+    # generous bound, the point is that no GUI/COM module is loaded
+    assert import_time_us() < 200000
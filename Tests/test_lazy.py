@@ -0,0 +1,60 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakeDocument, FakePage, FakeWindow  # noqa: E402
+from visiopy.lazy import pages, shapes  # noqa: E402
+
+
+def make_page(n=10000):
+    page = FakePage()
+    for i in range(n):
+        page.add_shape(PinX=i / 25.4)
+    page._shapes[7]._text = 'seven'
+    page.calls.clear()
+    return page
+
+
+def test_iteration_reads_only_what_is_used():
+    page = make_page()
+    found = []
+    for shp in shapes(page, cells=['PinX'], unit='mm', chunk_size=100):
+        if shp['PinX'] >= 250:
+            break
+        if shp.ID == 7:
+            found.append(shp.Text)
+    assert found == ['seven']
+    assert shp.ID == 251
+    # one GetIDs for all 10000 IDs, one read per chunk of 100 shapes
+    assert page.calls == {'Page.CreateSelection': 1, 'Selection.GetIDs': 1,
+                          'GetResults': 3, 'Page.Shapes': 1,
+                          'Shapes.ItemFromID': 1,
+                          'Shape.Text': 1}
+
+    page.calls.clear()
+    tail = shapes(page)[-3:]
+    assert [s.ID for s in tail] == [9998, 9999, 10000]
+    assert tail[0]['PinX'] == 9997 / 25.4
+    assert page.calls['GetResults'] == 1
+
+
+def test_selection_and_pages():
+    page = make_page(20)
+    win = FakeWindow(page, selected=[3, 5, 8])
+    sel = shapes(win.Selection, cells=['PinX'])
+    assert len(sel) == 3 and 5 in sel and 6 not in sel
+    assert [round(s['PinX'] * 25.4) for s in sel] == [2, 4, 7]
+
+    doc = FakeDocument(pages=50)
+    doc.calls.clear()
+    assert pages(doc)[0]._name == 'Page-1'
+    assert doc.calls == {'Document.Pages': 1, 'Pages.Item': 1}
+    lazy = pages(doc)
+    assert lazy['Page-7']._name == 'Page-7'
+    assert lazy[-1]._name == 'Page-50'
+    for page in lazy:
+        if page._name == 'Page-3':
+            break
+    assert doc.calls['Pages.Item'] == 1 + 1 + 3
@@ -0,0 +1,89 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakeApplication, FakeDocument, \
+    FakeMaster  # noqa: E402
+from visiopy.masters import DOCKED_FLAGS, HIDDEN_FLAGS, \
+    MasterRegistry  # noqa: E402
+
+
+def make_app():
+    app = FakeApplication()
+    app.files['/stencils/Pumps.vssx'] = FakeDocument(
+        '/stencils/Pumps.vssx', calls=app.calls, masters=[
+            FakeMaster('Pump', '{PUMP}'), FakeMaster('Valve', '{VALVE}')])
+    app.files['/stencils/Basic.vssx'] = FakeDocument(
+        '/stencils/Basic.vssx', calls=app.calls, masters=[
+            FakeMaster('Valve', '{BASIC-VALVE}'), FakeMaster('Box')])
+    return app
+
+
+def test_open_once_and_lookup_from_index():
+    app = make_app()
+    masters = MasterRegistry(app, event_source=app.document_events)
+    pumps = app.files['/stencils/Pumps.vssx']
+    assert masters.prewarm(['/stencils/Pumps.vssx', '/stencils/Basic.vssx'])\
+        == [pumps, app.files['/stencils/Basic.vssx']]
+    assert pumps.open_flags == DOCKED_FLAGS
+    app.calls.clear()
+    for _ in range(1000):
+        assert masters.get('pump') is pumps._masters[0]
+    # first stencil wins, unless another one is asked for
+    assert masters.get('Valve')._unique_id == '{VALVE}'
+    assert masters.get('Valve', stencil='Basic.vssx')._unique_id == \
+        '{BASIC-VALVE}'
+    assert masters.get('{basic-valve}')._name == 'Valve'
+    assert masters.get_many(['Box', 'Pump', 'Box']) == [
+        app.files['/stencils/Basic.vssx']._masters[1], pumps._masters[0],
+        app.files['/stencils/Basic.vssx']._masters[1]]
+    assert sum(app.calls.values()) == 0
+    assert masters.stats['hits'] == 1005 and masters.stats['opened'] == 2
+
+    pumps._masters.append(FakeMaster('Motor'))
+    assert masters.get('Motor')._name == 'Motor'
+    assert app.calls['Masters.ItemU'] == 1
+    assert masters.stats['misses'] == 1
+    with pytest.raises(KeyError):
+        masters.get('Tank')
+
+
+def test_reuse_open_stencil_and_close():
+    app = make_app()
+    pumps = app.Documents.Open('/stencils/Pumps.vssx')
+    masters = MasterRegistry(app, hidden=True,
+                             event_source=app.document_events)
+    masters.get('Pump', stencil='Pumps.vssx')
+    assert app.calls['Documents.OpenEx'] == 0
+    assert masters.stats['reused'] == 1 and masters.stats['misses'] == 1
+
+    pumps.Close()
+    assert masters.stencils == [] and masters.stats['invalidated'] == 1
+    masters.get('Pump', stencil='/stencils/Pumps.vssx')
+    assert app.calls['Documents.OpenEx'] == 1
+    assert pumps.open_flags == HIDDEN_FLAGS
+    masters.close()
+    pumps.Close()
+    assert len(masters.stencils) == 1
+    assert masters.invalidate() == 1
+
+
+def test_same_file_name_in_two_folders():
+    app = make_app()
+    app.files['/other/Pumps.vssx'] = FakeDocument(
+        '/other/Pumps.vssx', calls=app.calls,
+        masters=[FakeMaster('Valve', '{OTHER-VALVE}')])
+    masters = MasterRegistry(app)
+    first = masters.open('/stencils/Pumps.vssx')
+    other = masters.open('/other/Pumps.vssx')
+    assert other is app.files['/other/Pumps.vssx'] and other is not first
+    assert app.calls['Documents.OpenEx'] == 2
+    assert masters.get('Valve', stencil='/other/Pumps.vssx')._unique_id == \
+        '{OTHER-VALVE}'
+    assert masters.get('Valve', stencil='Pumps.vssx')._unique_id == '{VALVE}'
+    with pytest.raises(KeyError):
+        masters.get('Pump', stencil='/other/Pumps.vssx')
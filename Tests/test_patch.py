@@ -0,0 +1,121 @@
+import os
+import struct
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.batch import CellEdit, PAGE_SHEET_ID  # noqa: E402
+from visiopy.fakes import FakePage, write_vsdx  # noqa: E402
+from visiopy import patch  # noqa: E402
+from visiopy.patch import apply_edits  # noqa: E402
+from visiopy.vsdx import VsdxFile  # noqa: E402
+
+
+def make_drawing(path):
+    shapes = [{'id': 1, 'cells': {'PinX': 1.0}, 'props': {'Type': 'Valve'}},
+              {'id': 2, 'cells': {'PinX': 2.0},
+               'shapes': [{'id': 3, 'cells': {'PinX': 0.5}}]}]
+    return write_vsdx(path, [{'name': 'A', 'shapes': shapes},
+                             {'name': 'B', 'shapes': [{'id': 1}]}])
+
+
+def raw_bytes(path, info):
+    with open(path, 'rb') as f:
+        f.seek(info.header_offset + 26)
+        name_len, extra_len = struct.unpack('<HH', f.read(4))
+        f.seek(name_len + extra_len, os.SEEK_CUR)
+        return f.read(info.compress_size)
+
+
+def test_patch_file(tmp_path):
+    src = make_drawing(str(tmp_path / 'in.vsdx'))
+    dst = str(tmp_path / 'out.vsdx')
+    edits = {'A': [(1, 'PinX', '25.4 mm'),
+                   CellEdit(1, 'prop.Type', formula='"Pump"'),
+                   (3, 'Width', 10, 'mm'),
+                   (2, 'PinY', 'Width*0.5'),
+                   (9, 'PinX', '1'),
+                   (2, 'prop.Missing', '"x"'),
+                   (PAGE_SHEET_ID, 'PageWidth', 420, 'mm')]}
+    results = apply_edits(src, edits, dst)
+    assert sorted(results['A'].errors) == [4, 5]
+    with VsdxFile(dst) as vsdx:
+        assert vsdx.page('A').width == 420 / 25.4
+        shapes = {s.id: s for s in vsdx.iter_shapes('A')}
+        assert shapes[1].cell('PinX').result == 1.0
+        assert shapes[1].cell('PinX').formula == '25.4 mm'
+        assert shapes[1].props['Type'].value == 'Pump'
+        assert shapes[3].cell('Width').result_in('mm') == 10
+        assert shapes[2].cell('PinY').formula == 'Width*0.5'
+
+
+def test_unchanged_members_are_copied(tmp_path):
+    plain = make_drawing(str(tmp_path / 'plain.vsdx'))
+    src = str(tmp_path / 'in.vsdx')
+    # a compression level the writer would not pick when recompressing
+    with zipfile.ZipFile(plain) as a, \
+            zipfile.ZipFile(src, 'w', zipfile.ZIP_DEFLATED,
+                            compresslevel=1) as b:
+        for n in a.namelist():
+            b.writestr(n, a.read(n))
+    apply_edits(src, {1: [(1, 'PinX', '2')]}, str(tmp_path / 'out.vsdx'))
+    with zipfile.ZipFile(src) as a, \
+            zipfile.ZipFile(str(tmp_path / 'out.vsdx')) as b:
+        assert a.namelist() == b.namelist()
+        changed = [n for n in a.namelist() if a.read(n) != b.read(n)]
+        # untouched parts keep their compressed bytes, not just content
+        for n in a.namelist():
+            if n in changed:
+                continue
+            x, y = a.getinfo(n), b.getinfo(n)
+            assert (x.CRC, x.compress_size, x.compress_type) == \
+                (y.CRC, y.compress_size, y.compress_type)
+            assert raw_bytes(src, x) == \
+                raw_bytes(str(tmp_path / 'out.vsdx'), y)
+        assert b.testzip() is None
+    assert changed == ['visio/pages/page2.xml']
+
+
+def test_copy_without_zipfile_internals(tmp_path, monkeypatch):
+    # a zipfile without the attributes _copy_raw uses: recompress instead
+    monkeypatch.setattr(patch, '_RAW_ATTRS', ('fp', '_no_such_attribute'))
+    monkeypatch.setattr(patch, '_copy_raw', None)     # must not be called
+    src = make_drawing(str(tmp_path / 'in.vsdx'))
+    apply_edits(src, {1: [(1, 'PinX', '2')]}, str(tmp_path / 'out.vsdx'))
+    with zipfile.ZipFile(src) as a, \
+            zipfile.ZipFile(str(tmp_path / 'out.vsdx')) as b:
+        assert a.namelist() == b.namelist()
+        assert [n for n in a.namelist() if a.read(n) != b.read(n)] == \
+            ['visio/pages/page2.xml']
+        assert b.testzip() is None
+
+
+def test_in_place(tmp_path):
+    src = make_drawing(str(tmp_path / 'in.vsdx'))
+    apply_edits(src, {0: [(2, 'PinX', '3')]})
+    with VsdxFile(src) as vsdx:
+        assert vsdx.shapes(0)[1].cell('PinX').result == 3.0
+
+
+def test_same_edits_through_com():
+    class Pages:
+        def __init__(self, page):
+            self.page = page
+
+        def ItemU(self, name):
+            return self.page
+
+    class Doc:
+        pass
+
+    page = FakePage()
+    page.add_shape().add_row('prop', 'Type', '"Valve"')
+    doc = Doc()
+    doc.Pages = Pages(page)
+    results = apply_edits(doc, {'A': [(1, 'PinX', '25.4 mm'),
+                                      (1, 'prop.Type', '"Pump"')]})
+    assert results['A'].ok
+    assert page._shapes[1]._cells[(243, 0, 0)][1] == 'Pump'
+    assert page._shapes[1]._cells[(1, 1, 0)][1] == 1.0
@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy import batch  # noqa: E402
+from visiopy.batch import read_cells, write_cells  # noqa: E402
+from visiopy.fakes import FakeApplication, FakeEventSource, FakePage, \
+    FakeScheduler, FakeWindow  # noqa: E402
+from visiopy.perf import fast  # noqa: E402
+from visiopy.select_assign import SelectedShapeUpdater  # noqa: E402
+
+
+def state(app):
+    return dict(app._state)
+
+
+def test_switches_and_restores():
+    app = FakeApplication()
+    before = state(app)
+    page = FakePage()
+    page.add_shape()
+    with fast(app, events=False, undo='Bulk') as scope:
+        assert state(app) == {'ScreenUpdating': 0, 'DeferRecalc': 1,
+                              'EventsEnabled': 0}
+        write_cells(page, [(1, 'PinX', '2')])
+    assert state(app) == before
+    assert app.undo_scopes == [('Bulk', True)]
+    assert scope.stats.calls == {'set_formulas': 1}
+    assert scope.stats.elapsed > 0
+
+
+def test_restores_on_exception_and_rolls_back():
+    app = FakeApplication()
+    app.DeferRecalc = 1     # already deferred: left alone
+    before = state(app)
+    with pytest.raises(ZeroDivisionError):
+        with fast(app, rollback=True):
+            1 / 0
+    assert state(app) == before
+    assert app.undo_scopes == [('visiopy', False)]
+    assert app.history[-1] == ('ScreenUpdating', 1)
+    assert ('DeferRecalc', 1) not in app.history[1:]
+
+
+def test_nested_blocks_share_one_undo_scope():
+    app = FakeApplication()
+    with fast(app):
+        with fast(app, screen_updating=True, undo='inner'):
+            assert state(app)['ScreenUpdating'] == 1
+        assert state(app)['ScreenUpdating'] == 0
+        assert not app.undo_scopes
+    assert app.undo_scopes == [('visiopy', True)]
+    assert state(app)['ScreenUpdating'] == 1
+
+
+def test_stats_count_this_block_and_thread_only():
+    app = FakeApplication()
+    page = FakePage()
+    page.add_shape()
+    other = threading.Thread(target=write_cells,
+                             args=(page, [(1, 'PinY', '1')]))
+    with fast(app) as outer:
+        write_cells(page, [(1, 'PinX', '2')])
+        with fast(app) as inner:
+            read_cells(page, [(1, 'PinX')])
+        other.start()
+        other.join()
+    assert inner.stats.calls == {'get_results': 1}
+    assert outer.stats.calls == {'set_formulas': 1, 'get_results': 1}
+    assert batch.COM_CALLS['set_formulas'] >= 2
+
+
+def test_selected_shape_updater_uses_fast():
+    page = FakePage()
+    for _ in range(10):
+        page.add_shape().add_row('prop', 'Status', '""')
+    app = FakeApplication()
+    win = FakeWindow(page, selected=[1, 2], app=app)
+    updater = SelectedShapeUpdater(win, event_source=FakeEventSource(),
+                                   root=FakeScheduler())
+    updater.selected_field, updater.selected_value = 'Status', 'ok'
+    updater.check_active = True
+    assert updater.batch_modify_shapes().ok
+    assert app.undo_scopes == [('SelectedShapeUpdater', True)]
+    assert updater.last_stats.total_calls == 1
+    assert state(app)['ScreenUpdating'] == 1
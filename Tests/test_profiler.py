@@ -0,0 +1,71 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.batch import CellEdit, write_cells  # noqa: E402
+from visiopy.fakes import FakePage, FakeWindow, SlowCalls  # noqa: E402
+from visiopy.profiler import ComProxy, Profiler, unwrap  # noqa: E402
+
+LATENCY = 0.002
+
+
+def make_window(n=20):
+    page = FakePage(calls=SlowCalls({'Shape.Cells': LATENCY,
+                                     'SetFormulas': 5 * LATENCY}))
+    for _ in range(n):
+        page.add_shape()
+    return FakeWindow(page, selected=range(1, n + 1))
+
+
+def colorize(window):
+    for shp in window.Selection:
+        shp.Cells('FillForegnd').Formula = 3
+
+
+def test_counts_and_times_by_member_and_site():
+    profiler = Profiler(enabled=True)
+    window = profiler.wrap(make_window())
+    colorize(window)
+    stats = {s.member: s for s in profiler.member_stats()}
+    assert stats['Window.Selection'].count == 1
+    assert stats['Selection.__next__'].count == 20
+    assert stats['Shape.Cells'].count == 20
+    assert stats['Cell.Formula='].count == 20
+    assert stats['Shape.Cells'].p50 >= LATENCY
+    assert profiler.member_stats()[0].member == 'Shape.Cells'
+    site = profiler.site_stats()[0]
+    assert site.site.startswith('test_profiler.py:') and \
+        site.site.endswith(' colorize')
+    report = profiler.report(3)
+    assert len(report.members) == 3
+    assert '61 COM round trips' in str(report)
+    assert '<table>' in report._repr_html_()
+
+
+def test_batched_write_is_one_round_trip():
+    profiler = Profiler(enabled=True)
+    window = profiler.wrap(make_window())
+    page = window.PageActive
+    assert isinstance(page, ComProxy)
+    write_cells(page, [(i, 'FillForegnd', '3') for i in range(1, 21)])
+    stats = {s.member: s for s in profiler.member_stats()}
+    assert stats['Page.SetFormulas'].count == 1
+    assert stats['Page.SetFormulas'].p99 >= 5 * LATENCY
+    assert unwrap(page)._shapes[20]._cells[(1, 3, 0)][0] == '3'
+    # namedtuples keep their type, lists and tuples theirs
+    edit = unwrap(CellEdit(1, 'PinX', value=page))
+    assert type(edit) is CellEdit and edit.value is unwrap(page)
+    assert unwrap([page, (page,)]) == [unwrap(page), (unwrap(page),)]
+
+
+def test_disabled_profiler_does_not_wrap():
+    profiler = Profiler()
+    window = make_window()
+    assert profiler.wrap(window) is window
+    profiler.enable()
+    proxy = profiler.wrap(window)
+    profiler.disable()
+    colorize(proxy)
+    assert profiler.total_calls == 0
@@ -0,0 +1,103 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+np = pytest.importorskip('numpy')
+
+from visiopy.fakes import FakeDocument, FakeEventSource, FakeMaster, \
+    FakeScheduler, FakeWindow  # noqa: E402
+from visiopy.query import Q, Snapshot, parse  # noqa: E402
+from visiopy.select_assign import SelectedShapeUpdater  # noqa: E402
+
+
+def make_page(n=60):
+    """Pumps (every 3rd shape, Width growing by 1 mm) and valves; the
+    even shapes are on layer 'Wet', every 5th on 'Dry'."""
+    pump, valve = FakeMaster('Pump'), FakeMaster('Valve')
+    doc = FakeDocument(masters=[pump, valve])
+    page = doc._pages[0]
+    masters = [pump if i % 3 == 0 else valve for i in range(n)]
+    page.DropMany(masters, [0.0] * (2 * n))
+    for i, shape in enumerate(page._shapes.values()):
+        shape.set(Width=(10 + i) / 25.4)
+        shape.add_row('prop', 'Type', '"Pump"' if i % 3 == 0 else '"Valve"')
+        shape.add_row('prop', 'Status', '"done"' if i % 4 == 0 else '""')
+    page.add_layer('Wet', [i for i in page._shapes if i % 2 == 0])
+    page.add_layer('Dry', [i for i in page._shapes if i % 5 == 0])
+    page.calls.clear()
+    return doc, page
+
+
+def test_queries_reuse_the_snapshot():
+    doc, page = make_page()
+    snap = Snapshot(page)
+    expected = [sid for sid in range(1, 61)
+                if (sid - 1) % 3 == 0 and sid % 2 == 0 and 9 + sid > 20]
+    by_dsl = snap.query((Q.layer == 'Wet') & (Q.prop.Type == 'Pump')
+                        & (Q.Width > 20))
+    assert by_dsl == expected
+    reads = page.calls['GetResults']
+    assert reads == 3          # Width, Shape Data, LayerMember
+    by_text = snap.query("layer == 'wet' and prop.Type == 'Pump' "
+                         "and Width > '2 cm'")
+    assert by_text == expected
+    assert snap.query("master == 'pump' and not layer == 'Wet'") == \
+        [sid for sid in range(1, 61) if (sid - 1) % 3 == 0 and sid % 2]
+    assert snap.count((Q.layer == 'Dry') | (Q.layer == 'Wet')) == 36
+    assert snap.query(Q.prop.Status.isin(['done']) & (Q.id < 10)) == [1, 5, 9]
+    assert snap.query("20 <= Width < 23 or prop.Type.startswith('X')") == \
+        [11, 12, 13]
+    assert page.calls['GetResults'] == reads + 1     # prop.Status
+
+    page._shapes[2]._set_formula((243, 1, 0), '"late"')
+    assert snap.query(Q.prop.Status.contains('LATE')) == []
+    snap.invalidate(['prop.Status'])
+    assert snap.query(Q.prop.Status.contains('LATE')) == [2]
+    assert page.calls['GetResults'] == reads + 2
+
+
+def test_selection_and_text_syntax():
+    doc, page = make_page(12)
+    snap = Snapshot(page)
+    win = FakeWindow(page)
+    page.calls.clear()
+    assert snap.select(win, "master == 'Valve'") == \
+        [2, 3, 5, 6, 8, 9, 11, 12]
+    assert page.calls['Page.CreateSelection'] == 3    # 2 masters + result
+    assert page.calls['Selection.Select'] == 0
+    members = {i: s.Cells('LayerMember').FormulaU
+               for i, s in page._shapes.items()}
+    page.calls.clear()
+    assert snap.select(win, "master == 'Valve' and Width < 15") == [2, 3, 5]
+    assert win._selected == [2, 3, 5]
+    # through a temporary layer: no call per shape
+    assert page.calls['Selection.Select'] == 0
+    assert page.calls['Shapes.ItemFromID'] == 0
+    assert page.calls['GetResults'] == 2      # Width + LayerMember
+    assert page.calls['SetFormulas'] == 1
+    assert page.calls['Layers.Add'] == 1 and page.calls['Layer.Delete'] == 1
+    assert page.calls['Page.CreateSelection'] == 1
+    assert [layer.NameU for layer in page.Layers] == ['Wet', 'Dry']
+    assert {i: s.Cells('LayerMember').FormulaU
+            for i, s in page._shapes.items()} == members
+
+    for bad in ("__import__('os')", "Width + 1 > 2", "Width >", "layer"):
+        with pytest.raises(ValueError):
+            parse(bad)
+
+
+def test_selected_shape_updater_targets_a_query():
+    doc, page = make_page(30)
+    updater = SelectedShapeUpdater(FakeWindow(page), root=FakeScheduler(),
+                                   event_source=FakeEventSource())
+    updater.selected_field = 'Status'
+    updater.selected_value = 'checked'
+    page.calls.clear()
+    result = updater.modify_query("master == 'Pump' and prop.Status == ''")
+    assert result.ok and page.calls['SetFormulas'] == 1
+    assert updater.snapshot.query(Q.prop.Status == 'checked') == \
+        [4, 7, 10, 16, 19, 22, 28]
@@ -0,0 +1,119 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakeApplication, FakeDocument, \
+    FakeRunningObjectTable  # noqa: E402
+from visiopy.visio_connect import CLSID_UNSAVED, DocumentRegistry, \
+    get_or_open_visio_file, use_backend, vDocs, vInit  # noqa: E402
+
+
+def make_registry(n=300, ttl=60):
+    docs = [FakeDocument(f'/drawings/site{i}/plan{i}.vsdx')
+            for i in range(n)]
+    rot = FakeRunningObjectTable(docs)
+    rot.add('!{UNRELATED-OBJECT}')
+    rot.add(f'!{CLSID_UNSAVED}!Drawing1')
+    return docs, rot, DocumentRegistry(rot, clsids=['{VISIO}', CLSID_UNSAVED],
+                                       ttl=ttl)
+
+
+def test_lookup_and_binds_once():
+    docs, rot, registry = make_registry()
+    assert registry.documents() == docs
+    assert registry.find('/drawings/site7/plan7.vsdx') is docs[7]
+    # other path, same file name
+    assert registry.find('/mnt/share/plan9.vsdx') is docs[9]
+    assert registry.find('/mnt/share/plan9.vsdx', by_name=False) is None
+    assert registry.find('/nowhere/missing.vsdx') is None
+    assert len(registry.unsaved) == 1
+    assert rot.calls['ROT.bind'] == 301
+    assert rot.calls['ROT.entries'] == 1
+    for _ in range(100):
+        registry.find('/drawings/site1/plan1.vsdx')
+    assert rot.calls['ROT.entries'] == 1
+
+
+def test_refresh_binds_only_new_entries():
+    docs, rot, registry = make_registry(ttl=0)
+    registry.documents()
+    new = FakeDocument('/drawings/new.vsdx')
+    rot.add(new._full_name, new)
+    rot.remove(docs[0]._full_name)
+    rot.calls.clear()
+    assert registry.find('/drawings/new.vsdx') is new
+    # the new document, plus another try for the unsaved one
+    assert rot.calls['ROT.bind'] == 2
+    assert registry.find('/drawings/site0/plan0.vsdx') is None
+    rot.calls.clear()
+    registry.refresh()
+    assert rot.calls['ROT.bind'] == 1
+    assert len(registry.unsaved) == 1
+
+
+def test_refresh_rebinds_failed_and_stale_entries():
+    docs, rot, registry = make_registry(n=3, ttl=0)
+    registry.documents()
+    # saved under its name: the entry that failed to bind now works
+    saved = FakeDocument('/drawings/saved.vsdx')
+    name = f'!{CLSID_UNSAVED}!Drawing1'
+    rot.add(name, saved)
+    assert saved in registry.documents()
+    assert registry.unsaved == []
+    # closed and reopened under the same display name
+    docs[1].closed = True
+    again = FakeDocument(docs[1]._full_name)
+    rot.add(again._full_name, again)
+    rot.calls.clear()
+    assert registry.find(again._full_name) is again
+    assert rot.calls['ROT.bind'] == 1
+    # a forced refresh binds everything again
+    registry.ttl = 3600
+    rot.calls.clear()
+    registry.refresh(force=True)
+    assert rot.calls['ROT.bind'] == 4
+    rot.add(name)
+    registry.refresh(force=True)
+    assert registry.unsaved == [name] and saved not in registry.documents()
+
+
+def test_ttl_and_forced_refresh():
+    docs, rot, registry = make_registry(n=3, ttl=3600)
+    registry.documents()
+    new = FakeDocument('/drawings/new.vsdx')
+    rot.add(new._full_name, new)
+    assert registry.find('/drawings/new.vsdx') is None
+    registry.refresh(force=True)
+    assert registry.find('/drawings/new.vsdx') is new
+    registry.invalidate()
+    rot.remove(new._full_name)
+    assert new not in registry.documents()
+
+
+def test_simulated_backend():
+    app = FakeApplication()
+    for i in range(3):
+        app.files[f'/drawings/plan{i}.vsdx'] = FakeDocument(
+            f'/drawings/plan{i}.vsdx', calls=app.calls)
+    use_backend(app, app.rot)
+    try:
+        assert vDocs(silent=True) == []
+        first = get_or_open_visio_file('/drawings/plan0.vsdx')
+        assert app.calls['Documents.Open'] == 1
+        # already open: found in the registry, not opened again
+        assert get_or_open_visio_file('/drawings/plan0.vsdx') is first
+        assert app.calls['Documents.Open'] == 1
+        vApp, vDoc, vPg, vWin, _ = vInit(filename='/drawings/plan2.vsdx')
+        assert vDoc is app.files['/drawings/plan2.vsdx']
+        assert vPg is vDoc._pages[0] and vWin.PageActive is vPg
+        assert vDocs(silent=True, refresh=True) == [first, vDoc]
+        # closed within the registry's ttl: opened again, not returned
+        first.Close()
+        app.calls.clear()
+        assert get_or_open_visio_file('/drawings/plan0.vsdx') is first
+        assert not first.closed and app.calls['Documents.Open'] == 1
+        assert app.calls['ROT.entries'] == 1       # one forced refresh
+    finally:
+        use_backend()
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import synthetic_shapes, write_vsdx  # noqa: E402
+from visiopy.runner import run_batch  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SCRIPT = '''
+from visiopy.vsdx import VsdxFile
+
+
+def process(path):
+    with VsdxFile(path) as vsdx:
+        return len(vsdx.shapes(0))
+'''
+
+
+def make_files(folder, n=4):
+    for i in range(n):
+        write_vsdx(str(folder / f'd{i}.vsdx'),
+                   [{'shapes': synthetic_shapes(10 * (i + 1))}])
+    (folder / 'broken.vsdx').write_bytes(b'not a zip')
+    script = folder / 'count.py'
+    script.write_text(SCRIPT)
+    return str(script)
+
+
+def test_failures_do_not_stop_the_batch(tmp_path):
+    script = make_files(tmp_path)
+    results = list(run_batch(script, str(tmp_path / '*.vsdx'), workers=2))
+    assert len(results) == 5
+    by_name = {os.path.basename(r.path): r for r in results}
+    assert not by_name['broken.vsdx'].ok
+    assert 'BadZipFile' in by_name['broken.vsdx'].error
+    assert [by_name[f'd{i}.vsdx'].result for i in range(4)] == \
+        [10, 20, 30, 40]
+    assert all(r.seconds > 0 for r in results)
+
+
+def test_in_process_mode(tmp_path):
+    script = make_files(tmp_path, 1)
+    results = list(run_batch(script, [str(tmp_path / 'd0.vsdx')], workers=0))
+    assert results[0].result == 10 and results[0].pid == os.getpid()
+
+
+def test_command_line(tmp_path):
+    script = make_files(tmp_path, 2)
+    report = tmp_path / 'report.json'
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.run(
+        [sys.executable, '-m', 'visiopy', 'batch', script,
+         str(tmp_path / '*.vsdx'), '-j', '2', '-q', '--json', str(report)],
+        capture_output=True, text=True, env=env, cwd=ROOT)
+    assert proc.returncode == 1, proc.stderr
+    assert '3 files' in proc.stdout and '1 failed' in proc.stdout
+    summary = json.loads(report.read_text())['summary']
+    assert summary['failed_files'] == [str(tmp_path / 'broken.vsdx')]
@@ -0,0 +1,165 @@
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakeDocument, FakeMaster, FakeScheduler, \
+    write_vsdx  # noqa: E402
+from visiopy.search import TextIndex, replace_runs, tokens  # noqa: E402
+
+
+def make_doc(n=50):
+    doc = FakeDocument('C:\\Drawings\\plant.vsdx', pages=2)
+    for page in doc._pages:
+        for i in range(n):
+            shape = page.add_shape()
+            shape.set_text(('Tag ', 'regular'), (f'P-{100 + i}', 'bold'),
+                           (' pump', 'italic'))
+            shape.add_row('prop', 'Tag', f'"P-{100 + i}"')
+            shape.add_row('prop', 'Count', str(i))
+            shape.add_row('user', 'Note', '"feeds P-101"' if i == 5 else '""')
+    doc.calls.clear()
+    return doc
+
+
+def test_tokens_and_runs():
+    assert tokens('Pump P-101, 3.5 kW') == ['pump', 'p-101', 'p', '101',
+                                            '3.5', '3', '5', 'kw']
+    # a match across runs keeps the format of its first character
+    assert replace_runs(['Tag ', 'P-101', ' pump'], [(4, 9, 'P-2001')]) == \
+        ['Tag ', 'P-2001', ' pump']
+    assert replace_runs(['ab', '', 'cd', 'ef'], [(1, 5, 'XY')]) == \
+        ['aXY', '', '', 'f']
+
+
+def test_live_search_replace_and_events():
+    doc = make_doc()
+    index = TextIndex.from_document(doc)
+    assert len(index) == 100
+    assert doc.calls['GetResults'] == 2    # values: one read per page
+    doc.calls.clear()
+    hits = index.search('p-101')
+    assert [(h.page, h.shape_id, h.field) for h in hits] == [
+        ('Page-1', 2, 'Prop.Tag'), ('Page-1', 2, 'Text'),
+        ('Page-1', 6, 'User.Note'), ('Page-2', 2, 'Prop.Tag'),
+        ('Page-2', 2, 'Text'), ('Page-2', 6, 'User.Note')]
+    assert index.search('101 pump', page='Page-2')[0].text == \
+        'Tag P-101 pump'
+    assert len(index.search('P-10', substring=True, fields=['Prop'])) == 20
+    assert len(index.search(r'^P-1[0-4]\d$', regex=True)) == 100
+    assert sum(doc.calls.values()) == 0
+
+    changed = index.replace(doc, 'P-101', 'P-2001')
+    assert len(changed) == 6
+    assert doc.calls['SetFormulas'] == 2
+    shape = doc._pages[0]._shapes[2]
+    assert shape.text_runs() == [('Tag ', 'regular'), ('P-2001', 'bold'),
+                                 (' pump', 'italic')]
+    assert shape._cells[(243, 0, 0)] == ['"P-2001"', 'P-2001']
+    assert index.search('p-101') == []
+    assert len(index.search('P-2001')) == 6
+    # numbers stay numbers
+    index.replace(doc._pages[1], '7', '70', fields=['Prop.Count'])
+    assert doc._pages[1]._shapes[8]._cells[(243, 1, 0)][0] == '70'
+
+    page = doc._pages[0]
+    shape = page._shapes[10]
+    shape.Text = 'Spare'
+    doc.calls.clear()
+    index.on_event('text', shape)
+    assert index.search('spare')[0].key == ('C:\\Drawings\\plant.vsdx',
+                                             'Page-1', 10)
+    shape.Cells('Prop.Tag').FormulaU = '"X-1"'
+    index.on_event('cell', shape.Cells('Prop.Tag'))
+    assert index.search('x-1')[0].field == 'Prop.Tag'
+    index.on_event('delete', shape)
+    assert index.search('spare') == [] and len(index) == 99
+
+
+def test_events_are_filtered_and_debounced():
+    doc = make_doc(n=20)
+    index = TextIndex.from_document(doc)
+    root = FakeScheduler()
+    assert index.debounce(root.after, root.after_cancel, delay=100) is index
+    shapes = doc._pages[0]._shapes
+    cell = shapes[3].Cells('PinX')
+    doc.calls.clear()
+    index.on_event('cell', cell)
+    assert sum(doc.calls.values()) == 0
+    for i in (3, 4, 3):
+        shapes[i].Text = f'Changed {i}'
+        index.on_event('text', shapes[i])
+    shapes[4].Cells('User.Note').FormulaU = '"late"'
+    index.on_event('cell', shapes[4].Cells('User.Note'))
+    assert index.search('changed') == [] and root.pending == 1
+    doc.calls.clear()
+    root.advance(100)
+    assert [h.shape_id for h in index.search('changed')] == [3, 4]
+    assert index.search('late')[0].field == 'User.Note'
+    # one batched read for both shapes, no Page.Shapes walk for IDs
+    assert doc.calls['GetResults'] == 1
+    assert doc.calls['Page.CreateSelection'] == 0
+    # a shape deleted before the flush is not read
+    shapes[5].Text = 'Gone soon'
+    index.on_event('text', shapes[5])
+    index.on_event('delete', shapes[5])
+    assert index.flush() == 0 and index.search('gone') == []
+
+
+def test_row_names_are_read_once_per_master():
+    master = FakeMaster('Pump')
+    master.add_row('prop', 'Tag', '""')
+    master.add_row('user', 'Note', '""')
+    doc = FakeDocument(masters=[master])
+    page = doc._pages[0]
+    page.DropMany([master] * 30, [0.0] * 60)
+    for i, shape in enumerate(page._shapes.values(), 1):
+        shape.Cells('Prop.Tag').FormulaU = f'"P-{100 + i}"'
+    page._shapes[7].add_row('prop', 'Size', '"DN50"')
+    doc.calls.clear()
+    index = TextIndex.from_document(doc)
+    assert index.search('P-107')[0].field == 'Prop.Tag'
+    assert index.search('DN50')[0].field == 'Prop.Size'
+    # the master's two rows and the extra row of shape 7
+    assert doc.calls['Cell.RowNameU'] == 3
+    assert doc.calls['GetResults'] == 1
+    # re-reading an instance uses the names found for the page
+    root = FakeScheduler()
+    index.debounce(root.after, root.after_cancel, delay=100)
+    page._shapes[3].Text = 'Changed'
+    index.on_event('text', page._shapes[3])
+    doc.calls.clear()
+    root.advance(100)
+    assert index.search('changed')[0].shape_id == 3
+    assert doc.calls['Cell.RowNameU'] == 0
+    assert doc.calls['Page.CreateSelection'] == 0
+
+
+def test_vsdx_search_and_replace(tmp_path):
+    src = str(tmp_path / 'plant.vsdx')
+    write_vsdx(src, [
+        {'name': 'Plan', 'shapes': [
+            {'id': 1, 'text': ['Tag ', 'P-101', ' pump'],
+             'props': {'Tag': 'P-101'}, 'user': {'Note': 'see P-101'}},
+            {'id': 2, 'text': 'Group', 'shapes': [
+                {'id': 3, 'text': 'inner P-101'}]}]},
+        {'name': 'Legend', 'shapes': [{'id': 1, 'text': 'P-101 legend'}]}])
+    index = TextIndex.from_vsdx(src)
+    assert {(h.page, h.shape_id) for h in index.search('P-101')} == {
+        ('Plan', 1), ('Plan', 3), ('Legend', 1)}
+
+    dst = str(tmp_path / 'copy.vsdx')
+    assert len(index.replace(src, 'P-101', 'P-2001', fields=['Text'],
+                             dst=dst)) == 3
+    assert len(index.search('P-101')) == 5     # src and index unchanged
+    assert TextIndex.from_vsdx(dst).search('P-101')[0].field == 'Prop.Tag'
+
+    assert len(index.replace(src, 'P-101', 'P-2001')) == 5
+    xml = zipfile.ZipFile(src).read('visio/pages/page1.xml').decode()
+    assert '<cp IX="1" />P-2001<cp IX="2" /> pump' in xml
+    assert index.search('p-101') == []
+    assert index.search('legend')[0].text == 'P-2001 legend'
+    # both pages changed, nothing left to read when indexed again
+    assert index.add_vsdx(src) == 0
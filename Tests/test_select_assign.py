@@ -0,0 +1,67 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakeEventSource, FakePage, FakeScheduler, \
+    FakeWindow  # noqa: E402
+from visiopy.select_assign import PollingSelectionSource, \
+    SelectedShapeUpdater  # noqa: E402
+
+
+def make_updater(n=5000):
+    page = FakePage()
+    for _ in range(n):
+        page.add_shape().add_row('prop', 'Status', '""')
+    win = FakeWindow(page)
+    source = FakeEventSource()
+    root = FakeScheduler()
+    updater = SelectedShapeUpdater(win, event_source=source, root=root)
+    updater.selected_field = 'Status'
+    updater.selected_value = 'done'
+    return page, win, source, root, updater
+
+
+def test_burst_of_events_is_one_update():
+    page, win, source, root, updater = make_updater()
+    updater.start()
+    ids = list(range(1, 5001))
+    for i in range(1, len(ids) + 1, 50):
+        win.select_ids(ids[:i])
+        source.emit('selection')
+        root.advance(10)
+    win.select_ids(ids)
+    source.emit('selection')
+    page.calls.clear()
+    root.advance(1000)
+    assert page.calls['SetFormulas'] == 1
+    assert page._shapes[5000]._cells[(243, 0, 0)][1] == 'done'
+    assert updater.previous_selection == ids
+
+
+def test_stop_cancels_pending_update():
+    page, win, source, root, updater = make_updater(3)
+    updater.start()
+    win.select_ids([1])
+    source.emit('selection')
+    updater.stop()
+    assert root.pending == 0 and source.callback is None
+    root.advance(1000)
+    assert page._shapes[1]._cells[(243, 0, 0)][1] == ''
+
+
+def test_polling_fallback_stops():
+    page = FakePage()
+    page.add_shape()
+    win = FakeWindow(page)
+    root = FakeScheduler()
+    events = []
+    source = PollingSelectionSource(win, root.after, root.after_cancel)
+    source.subscribe(lambda kind, payload: events.append(kind))
+    root.advance(3000)
+    win.select_ids([1])
+    root.advance(1000)
+    assert events == ['selection']
+    source.unsubscribe()
+    assert root.pending == 0
@@ -0,0 +1,109 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakePage  # noqa: E402
+from visiopy.shadow import ShadowSheet  # noqa: E402
+
+
+def make_page(n=200):
+    page = FakePage()
+    for i in range(n):
+        page.add_shape(PinX=i * 0.513, PinY=1.0)
+    page.calls.clear()
+    return page
+
+
+def test_rounding_loop_is_two_reads_and_one_write():
+    page = make_page()
+    ids = list(range(1, 201))
+    with ShadowSheet(page) as sheet:
+        sheet.prefetch(ids, ['PinX', 'PinY'])
+        for sid in ids:
+            for cell in ('PinX', 'PinY'):
+                value = sheet.get(sid, cell, 'mm')
+                sheet.set(sid, cell, round(value), 'mm')
+                # read your own write without a round trip
+                assert sheet.get(sid, cell, 'mm') == pytest.approx(
+                    round(value))
+        assert page.calls['SetFormulas'] == 0
+    assert page.calls == {'GetResults': 1, 'GetFormulasU': 1,
+                          'SetFormulas': 1}
+    assert sheet.stats.misses == 0
+    assert sheet.stats.hits == 800
+    assert page._shapes[3]._cells[(1, 1, 0)][0] == '26.0 mm'
+
+
+def test_last_write_wins():
+    page = make_page(3)
+    with ShadowSheet(page) as sheet:
+        for x in range(5):
+            sheet.set(1, 'PinX', x, 'mm')
+        sheet.set(2, 'PinX', '10 mm')
+        assert sheet.pending == 2
+    assert sheet.stats.coalesced == 4
+    assert sheet.stats.flushed == 2
+    assert page.calls['SetFormulas'] == 1
+    assert page._shapes[1]._cells[(1, 1, 0)][0] == '4.0 mm'
+
+
+def test_rollback_on_exception():
+    page = make_page(3)
+    with pytest.raises(RuntimeError):
+        with ShadowSheet(page) as sheet:
+            sheet.set(1, 'PinX', 5, 'mm')
+            raise RuntimeError
+    assert page.calls['SetFormulas'] == 0
+    assert sheet.pending == 0
+
+
+def test_derived_cells_are_invalidated_after_commit():
+    page = make_page(2)
+    page._shapes[2]._cells[(1, 1, 4)] = ['Width*0.5', 0.5]
+    sheet = ShadowSheet(page, invalidate='none')
+    sheet.prefetch([1, 2], ['Width', 'LocPinX'])
+    sheet.set(1, 'Width', 2.0)
+    sheet.commit()
+    # constant cells stay cached, the derived LocPinX of shape 2 is dropped
+    page.calls.clear()
+    sheet.get(2, 'Width')
+    sheet.get(1, 'LocPinX')
+    assert page.calls['GetResults'] == 0
+    sheet.get(2, 'LocPinX')
+    assert page.calls['GetResults'] == 1
+
+
+def test_shape_rule_and_pending_expression():
+    page = make_page(2)
+    sheet = ShadowSheet(page)
+    sheet.prefetch([1, 2], ['Width', 'Height'])
+    sheet.set(1, 'Height', 'Width*2')
+    page.calls.clear()
+    # the expression needs Visio: commit, then read it back (the fake
+    # keeps the old result for formulas it cannot evaluate)
+    assert sheet.get(1, 'Height') == pytest.approx(1.0)
+    assert page.calls['SetFormulas'] == 1
+    assert page.calls['GetResults'] == 1
+    # shape 1 was written, so its other cells are read again
+    sheet.get(1, 'Width')
+    sheet.get(2, 'Width')
+    assert page.calls['GetResults'] == 2
+
+
+def test_lru_bound_and_misses():
+    page = make_page(10)
+    sheet = ShadowSheet(page, max_cells=5)
+    sheet.prefetch(range(1, 11), ['PinX'], formulas=False)
+    assert len(sheet) == 5
+    assert sheet.stats.evictions == 5
+    page.calls.clear()
+    assert sheet.get_many([(1, 'PinX'), (2, 'PinX'), (10, 'PinX')]) == \
+        pytest.approx([0.0, 0.513, 9 * 0.513])
+    assert page.calls['GetResults'] == 1
+    assert sheet.stats.misses == 2
+    with pytest.raises(KeyError):
+        sheet.get(99, 'PinX')
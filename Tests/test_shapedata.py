@@ -0,0 +1,117 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.batch import visSectionProp  # noqa: E402
+from visiopy.fakes import FakeDocument, FakeMaster, synthetic_shapes, \
+    write_vsdx  # noqa: E402
+from visiopy.shapedata import ShapeData, export_shape_data, \
+    import_shape_data, value_formula  # noqa: E402
+from visiopy.patch import apply_edits  # noqa: E402
+from visiopy.vsdx import VsdxFile  # noqa: E402
+
+
+def make_doc(n=200):
+    doc = FakeDocument(pages=2)
+    for page in doc._pages:
+        for i in range(n):
+            shape = page.add_shape()
+            shape.add_row('prop', 'Tag', f'"T-{i}"', Label='"Tag"')
+            shape.add_row('prop', 'Count', str(i), Label='"Count"', Type='2',
+                          Format='"0"')
+    doc.calls.clear()
+    return doc
+
+
+def test_live_round_trip_writes_only_changes(tmp_path):
+    doc = make_doc()
+    data = export_shape_data(doc)
+    assert len(data) == 800
+    assert doc.calls['GetResults'] == 2    # one batched read per page
+    entry = next(e for e in data.rows() if e[1] == 5 and e[3] == 'Count')
+    assert entry == ('Page-1', 5, 1, 'Count', 'Count', 2, '4', '0')
+
+    path = str(tmp_path / 'data.csv')
+    data.to_csv(path)
+    data = ShapeData.from_csv(path)
+    values = data['value']
+    for i, (page, sid, row, name) in enumerate(zip(
+            data['page'], data['shape_id'], data['row'], data['name'])):
+        if page == 'Page-1' and name == 'Tag' and sid % 10 == 0:
+            values[i] = 'changed'
+    doc.calls.clear()
+    results = import_shape_data(doc, data)
+    assert len(results['Page-1'].values) == 20
+    assert len(results['Page-2'].values) == 0
+    assert doc.calls['SetFormulas'] == 1
+    shape = doc._pages[0]._shapes[10]
+    assert shape._cells[(243, 0, 0)] == ['"changed"', 'changed']
+    assert shape._cells[(243, 1, 0)][0] == '9'
+    assert import_shape_data(doc, data)['Page-1'].values == []
+
+
+def test_row_names_are_read_once_per_master():
+    master = FakeMaster('Pump')
+    master.add_row('prop', 'Tag', '""')
+    master.add_row('prop', 'Size', '""')
+    doc = FakeDocument(masters=[master])
+    page = doc._pages[0]
+    page.DropMany([master] * 100, [0.0] * 200)
+    page._shapes[7].add_row('prop', 'Note', '"extra"')
+    page.add_shape().add_row('prop', 'Loose', '"x"')
+    doc.calls.clear()
+    data = export_shape_data(doc)
+    assert len(data) == 202
+    assert data['name'][12:15] == ['Tag', 'Size', 'Note']
+    assert data['name'][-1] == 'Loose'
+    # master rows (2), the extra row of shape 7 and the loose shape's row
+    assert doc.calls['Cell.RowNameU'] == 4
+    assert doc.calls['Page.CreateSelection'] == 2   # all IDs, one master
+    assert doc.calls['Shape.RowCount'] == 101 + 1   # + the master shape
+    assert doc.calls['GetResults'] == 1
+
+
+def test_vsdx_round_trip(tmp_path):
+    src, dst = str(tmp_path / 'in.vsdx'), str(tmp_path / 'out.vsdx')
+    write_vsdx(src, [{'name': 'Plan', 'shapes': synthetic_shapes(300)}])
+    data = export_shape_data(src)
+    assert len(data) == 600
+    assert data['name'][:2] == ['Type', 'Tag'] and data['label'][1] == 'Tag'
+    data['value'][1] = 'P-NEW'
+    results = import_shape_data(src, data, dst)
+    assert results['Plan'].ok
+    again = export_shape_data(dst)
+    assert again['value'][1] == 'P-NEW'
+    assert again['value'][2:] == data['value'][2:]
+
+
+def test_vsdx_rows_inherited_from_master(tmp_path):
+    src, dst = str(tmp_path / 'in.vsdx'), str(tmp_path / 'out.vsdx')
+    master = {'id': 1, 'name': 'Pump', 'shapes': [
+        {'id': 1, 'props': {'Tag': 'P-0', 'Size': 'DN50'}}]}
+    write_vsdx(src, [{'name': 'Plan', 'shapes': [
+        {'id': 1, 'master': 1, 'props': {'Size': 'DN80', 'Note': 'x'}}]}],
+        masters=[master])
+    data = export_shape_data(src)
+    assert data['name'] == ['Tag', 'Size', 'Note']
+    data['value'][:] = ['P-101', 'DN100', 'y']
+    assert import_shape_data(src, data, dst)['Plan'].ok
+    assert export_shape_data(dst)['value'] == ['P-101', 'DN100', 'y']
+    # the master keeps its value, the shape got a local override row
+    with VsdxFile(dst) as vsdx:
+        assert vsdx.master_shapes(1)[1].props['Tag'].value == 'P-0'
+        local = vsdx.shapes(0, inherit=False)[0]
+        assert [r.name for r in local.section('Property').rows] == [
+            'Size', 'Note', 'Tag']
+    # positions count the master rows first, like in Visio
+    apply_edits(dst, {0: [(1, (visSectionProp, 0, 0), '"P-102"')]})
+    assert export_shape_data(dst)['value'][0] == 'P-102'
+
+
+def test_value_formulas():
+    assert value_formula('12.5', 2) == '12.5'
+    assert value_formula('n/a', 2) == '"n/a"'
+    assert value_formula('1', 3) == 'TRUE'
+    assert value_formula('say "hi"', 0) == '"say ""hi"""'
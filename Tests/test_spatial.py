@@ -0,0 +1,102 @@
+import math
+import os
+import random
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.batch import write_cells  # noqa: E402
+from visiopy.fakes import FakePage, synthetic_shapes, \
+    write_vsdx  # noqa: E402
+from visiopy.spatial import SpatialIndex, bounding_box, \
+    _intersects  # noqa: E402
+from visiopy.vsdx import VsdxFile  # noqa: E402
+
+
+def random_page(n=2000, seed=1):
+    rng = random.Random(seed)
+    page = FakePage()
+    for _ in range(n):
+        w, h = rng.uniform(0.1, 1.0), rng.uniform(0.1, 1.0)
+        page.add_shape(PinX=rng.uniform(0, 40), PinY=rng.uniform(0, 40),
+                       Width=w, Height=h, LocPinX=w / 2, LocPinY=h / 2,
+                       Angle=rng.choice([0.0, 0.3]))
+    page.calls.clear()
+    return page
+
+
+def test_bounding_box_rotation():
+    assert bounding_box(1, 1, 2, 1, 1, 0.5) == (0, 0.5, 2, 1.5)
+    box = bounding_box(0, 0, 2, 2, 1, 1, math.pi / 4)
+    assert box == pytest.approx((-math.sqrt(2), -math.sqrt(2),
+                                 math.sqrt(2), math.sqrt(2)))
+    # a flip mirrors about the pin before the rotation
+    assert bounding_box(5, 5, 10, 4, 0, 0) == (5, 5, 15, 9)
+    assert bounding_box(5, 5, 10, 4, 0, 0, 0, 1) == (-5, 5, 5, 9)
+    assert bounding_box(5, 5, 10, 4, 0, 0, 0, 0, 1) == (5, 1, 15, 5)
+    box = bounding_box(5, 5, 10, 4, 0, 0, math.pi / 2, 1)
+    assert box == pytest.approx((1, -5, 5, 5))
+
+
+def test_queries_match_brute_force():
+    page = random_page()
+    index = SpatialIndex.from_page(page, unit='in')
+    assert len(index) == 2000
+    assert page.calls['GetResults'] == 4    # 18000 cells in 4 chunks
+    boxes = index.boxes
+    rect = (10, 10, 14, 12)
+    assert index.query(*rect) == sorted(
+        i for i, b in boxes.items() if _intersects(b, rect))
+    assert index.query(-100, -100, 100, 100) == sorted(boxes)
+    assert index.hit(20, 20) == sorted(
+        i for i, b in boxes.items() if _intersects(b, (20, 20, 20, 20)))
+    brute = sorted(i for i in boxes for j in boxes if i < j and
+                   _intersects(boxes[i], boxes[j]))
+    assert [a for a, _ in index.overlaps()] == brute
+    for x, y in ((5, 5), (39, 1), (80, -20)):
+        expected = sorted((max(b[0] - x, 0, x - b[2]) ** 2 +
+                           max(b[1] - y, 0, y - b[3]) ** 2, i)
+                          for i, b in boxes.items())[:5]
+        assert [i for _, i in index.nearest(x, y, k=5)] == \
+            [i for _, i in expected]
+
+
+def test_incremental_refresh():
+    page = random_page(500)
+    index = SpatialIndex.from_page(page, unit='in')
+    write_cells(page, [(7, 'PinX', '100 in'), (7, 'PinY', '100 in')])
+    page._shapes[9].Delete()
+    new = page.add_shape(PinX=50.0, PinY=50.0)
+    page.calls.clear()
+    assert index.refresh([7, 9]) == 2
+    assert page.calls['GetResults'] == 1
+    assert index.hit(100, 100) == [7] and 9 not in index
+    assert index.refresh() == 1
+    assert index.hit(50, 50) == [new._id]
+    assert index.refresh() == 0
+
+
+def test_offline_vsdx(tmp_path):
+    path = str(tmp_path / 'grid.vsdx')
+    write_vsdx(path, [{'shapes': synthetic_shapes(400, columns=20)}])
+    with VsdxFile(path) as vsdx:
+        index = SpatialIndex.from_vsdx(vsdx, unit='in')
+    assert len(index) == 400
+    # spacing 0.5, size 0.25: neighbours do not touch
+    assert index.overlaps() == []
+    assert index.hit(0.5, 0.5) == [1]
+    assert index.nearest(0.5, 0.75, k=2) == [(0.125, 1), (0.125, 21)]
+    assert index.query(0, 0, 1.2, 0.7, contained=True) == [1, 2]
+
+
+def test_nearest_far_away_point():
+    index = SpatialIndex({1: (0, 0, 10, 10), 2: (20, 20, 30, 30)})
+    start = time.perf_counter()
+    assert index.nearest(200000, 0, k=2) == [
+        (math.hypot(199970, 20), 2), (199990.0, 1)]
+    assert index.nearest(-1e9, -1e9)[0][1] == 1
+    assert time.perf_counter() - start < 1.0
@@ -0,0 +1,73 @@
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import synthetic_shapes, write_vsdx  # noqa: E402
+from visiopy.vsdx import VsdxFile  # noqa: E402
+
+
+def make_drawing(path):
+    master = {'id': 2, 'name': 'Pump', 'unique_id': '{0001}', 'shapes': [{
+        'id': 5, 'cells': {'Width': (0.5, 'MM'), 'Height': 0.5},
+        'props': {'Type': {'Value': 'Pump', 'Label': 'Type'},
+                  'Rating': {'Value': 10.0, 'Label': 'Rating'}},
+        'text': 'P'}]}
+    page = {'name': 'Plan', 'width': 16.5, 'height': 11.7, 'shapes': [
+        {'id': 1, 'name': 'Box', 'cells': {'PinX': (1.0, 'MM', '25.4 mm'),
+                                           'PinY': 2.0},
+         'user': {'Flag': 1}},
+        {'id': 2, 'master': 2, 'cells': {'PinX': 3.0},
+         'props': {'Rating': {'Value': 20.0}}},
+        {'id': 3, 'name': 'Group', 'cells': {'PinX': 4.0},
+         'shapes': [{'id': 4, 'cells': {'PinX': 0.1}}]},
+    ], 'connects': [(6, 'BeginX', 1, 'PinX')]}
+    return write_vsdx(path, [page, {'name': 'Empty'}], [master])
+
+
+def test_pages_and_shapes(tmp_path):
+    with VsdxFile(make_drawing(str(tmp_path / 'a.vsdx'))) as vsdx:
+        assert [p.name for p in vsdx.pages] == ['Plan', 'Empty']
+        assert vsdx.page('Plan').width == 16.5
+        shapes = list(vsdx.iter_shapes('Plan'))
+        assert [s.id for s in shapes] == [1, 2, 3, 4]
+        assert shapes[3].parent == 3
+        assert [s.id for s in vsdx.shapes(0)] == [1, 2, 3]
+        box = shapes[0]
+        assert box.cell('pinx').result == 1.0
+        assert box.cell('PinX').formula == '25.4 mm'
+        assert box.cell('PinY').formula == '2.0'
+        assert box.cell('User.Flag').result == 1.0
+        assert list(vsdx.iter_shapes('Empty')) == []
+        assert list(vsdx.connects(0)) == [(6, 'BeginX', 1, 'PinX')]
+
+
+def test_master_inheritance(tmp_path):
+    with VsdxFile(make_drawing(str(tmp_path / 'a.vsdx'))) as vsdx:
+        assert vsdx.master('Pump').unique_id == '{0001}'
+        pump = list(vsdx.iter_shapes(0))[1]
+        assert pump.cell('PinX').result == 3.0
+        assert pump.cell('Width').result_in('mm') == 12.7
+        assert pump.text == 'P'
+        assert pump.props['Type'].value == 'Pump'
+        assert pump.props['Rating'].value == 20.0
+        assert pump.cell('Prop.Rating.Label').result == 'Rating'
+        raw = list(vsdx.iter_shapes(0, inherit=False))[1]
+        assert raw.cell('Width') is None
+
+
+def test_memory_stays_flat(tmp_path):
+    def peak(n):
+        path = str(tmp_path / f'{n}.vsdx')
+        write_vsdx(path, [{'shapes': synthetic_shapes(n)}])
+        with VsdxFile(path) as vsdx:
+            tracemalloc.start()
+            count = sum(1 for _ in vsdx.iter_shapes(0))
+            size = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        assert count == n
+        return size
+
+    assert peak(5000) < 2 * peak(500)
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakeDocument, FakeEventSource, FakePage, \
+    FakeRunningObjectTable, FakeScheduler, FakeWindow, \
+    SlowCalls  # noqa: E402
+from visiopy.select_assign import SelectedShapeUpdater  # noqa: E402
+from visiopy.visio_connect import DocumentRegistry, \
+    list_documents  # noqa: E402
+from visiopy.worker import ComWorker  # noqa: E402
+
+
+def test_tasks_run_in_order_on_one_thread():
+    with ComWorker(lambda: 'app', com=False) as worker:
+        assert worker.app == 'app'
+        futures = [worker.submit(lambda i=i: (i, threading.get_ident()))
+                   for i in range(20)]
+        results = [f.result() for f in futures]
+    assert [i for i, _ in results] == list(range(20))
+    assert len({t for _, t in results}) == 1
+    assert results[0][1] != threading.get_ident()
+    assert not worker.alive
+
+
+def test_errors_batches_and_nested_submit():
+    with ComWorker(com=False) as worker:
+        with pytest.raises(ZeroDivisionError):
+            worker.submit(lambda: 1 / 0).result()
+        assert worker.batch([(max, (1, 2)), (min, (1, 2)),
+                             (len, ('abc',))]).result() == [2, 1, 3]
+        # a task submitting more work must not deadlock
+        nested = worker.submit(lambda: worker.submit(lambda: 42).result())
+        assert nested.result(timeout=1) == 42
+
+
+def test_cancel_pending():
+    gate = threading.Event()
+    with ComWorker(com=False) as worker:
+        first = worker.submit(gate.wait)
+        queued = [worker.submit(lambda: 1) for _ in range(5)]
+        time.sleep(0.05)
+        assert worker.cancel_pending() == 5
+        gate.set()
+        assert first.result() is True
+        assert all(f.cancelled() for f in queued)
+        assert worker.submit(lambda: 2).result() == 2
+
+
+def test_awaitable():
+    async def main(worker):
+        return await asyncio.gather(worker.run(sum, [1, 2]),
+                                    worker.run(len, 'abcd'))
+
+    with ComWorker(com=False) as worker:
+        assert asyncio.run(main(worker)) == [3, 4]
+
+
+def test_updater_does_not_block_on_slow_visio():
+    page = FakePage(calls=SlowCalls(0.05))
+    for _ in range(3):
+        page.add_shape().add_row('prop', 'Status', '""')
+    win = FakeWindow(page)
+    root = FakeScheduler()
+    with ComWorker(com=False) as worker:
+        updater = SelectedShapeUpdater(win, event_source=FakeEventSource(),
+                                       root=root, worker=worker)
+        updater.selected_field = 'Status'
+        updater.selected_value = 'done'
+        updater.start()
+        win.select_ids([1, 2])
+        start = time.perf_counter()
+        updater.on_selection_settled()
+        assert time.perf_counter() - start < 0.05
+        assert updater.pending.result(timeout=5).ok
+    assert page._shapes[2]._cells[(243, 0, 0)][1] == 'done'
+    assert updater.previous_selection == [1, 2]
+
+
+def test_list_documents_on_worker():
+    docs = [FakeDocument(f'/drawings/plan{i}.vsdx') for i in range(3)]
+    rot = FakeRunningObjectTable(docs, bind_latency=0.01)
+    registry = DocumentRegistry(rot, clsids=['{VISIO}'])
+    with ComWorker(com=False) as worker:
+        future = worker.submit(list_documents, registry)
+        assert future.result(timeout=5) == [
+            (f'plan{i}.vsdx', f'/drawings/plan{i}.vsdx') for i in range(3)]
@@ -0,0 +1,22 @@
+"""Example batch script: snap all shapes of the first page to a 5 mm grid.
+
+    python -m visiopy batch benchmarks/batch_snap.py "drawings/*.vsdx"
+"""
+from visiopy.patch import patch_vsdx
+from visiopy.vsdx import VsdxFile
+
+GRID = 5.0   # mm
+
+
+def process(path):
+    edits = []
+    with VsdxFile(path) as vsdx:
+        for shape in vsdx.shapes(0):
+            for cell in ('PinX', 'PinY'):
+                value = shape.cell(cell).result_in('mm')
+                snapped = round(value / GRID) * GRID
+                if snapped != value:
+                    edits.append((shape.id, cell, snapped, 'mm'))
+    if edits:
+        patch_vsdx(path, path, {0: edits})
+    return len(edits)
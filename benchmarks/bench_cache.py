@@ -0,0 +1,70 @@
+"""Re-reading a reference drawing: parsing the .vsdx vs. the snapshot cache.
+
+Writes a drawing with ``n_shapes`` shapes (master instances with Shape
+Data), then compares parsing it with :class:`~visiopy.vsdx.VsdxFile` to
+the first (building) and a later (mapped) open of the snapshot cache; each
+run reads the PinX column and one Shape Data column:
+
+    python benchmarks/bench_cache.py [n_shapes]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.cache import SnapshotCache  # noqa: E402
+from visiopy.fakes import write_vsdx  # noqa: E402
+from visiopy.vsdx import VsdxFile  # noqa: E402
+
+
+def shapes(n):
+    for i in range(1, n + 1):
+        yield {'id': i, 'name': f'Pump.{i}', 'master': 1,
+               'cells': {'PinX': i / 25.4, 'PinY': 1.0},
+               'props': {'Tag': f'P-{i}', 'Flow': float(i % 40)}}
+
+
+def parse(path):
+    with VsdxFile(path) as vsdx:
+        shps = list(vsdx.iter_shapes(0))
+        return ([s.cell('PinX').result for s in shps],
+                [s.props['Tag'].value for s in shps])
+
+
+def cached(cache, path):
+    page = cache.open(path).page(0)
+    return page.column('PinX'), page.prop('Tag')
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    fn()
+    print(f"  {label:22s} {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+
+def main(n=20000):
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, 'reference.vsdx')
+        master = {'id': 1, 'name': 'Pump', 'shapes': [
+            {'id': 1, 'cells': {'Width': 0.5, 'Height': 0.5},
+             'props': {'Tag': '', 'Flow': 0.0}}]}
+        write_vsdx(path, [{'name': 'Plan', 'shapes': shapes(n)}],
+                   masters=[master])
+        cache = SnapshotCache(os.path.join(folder, 'cache'))
+        print(f"{n} shapes, {os.path.getsize(path) / 1e6:.1f} MB .vsdx")
+        timed('parse .vsdx', lambda: parse(path))
+        timed('cache: first open', lambda: cached(cache, path))
+        timed('cache: reopen', lambda: cached(cache, path))
+        timed('cache: manifest only', lambda: cache.open(path))
+        print(f"  cache size: {cache.size / 1e6:.1f} MB, {cache.stats}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,61 @@
+"""Diff two revisions of a large drawing (.vsdx, no Visio).
+
+Ten pages of ``n`` shapes each; the second revision moves a few shapes on
+one page.  Measures a full fingerprint of both files, a fingerprint that
+reuses unchanged pages (``previous=``) and the comparison itself:
+
+    python benchmarks/bench_diff.py [n_shapes_per_page]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.diff import diff, fingerprint  # noqa: E402
+from visiopy.fakes import synthetic_shapes, write_vsdx  # noqa: E402
+
+PAGES = 10
+
+
+def moved(n):
+    for i, spec in enumerate(synthetic_shapes(n)):
+        if i % 1000 == 0:
+            spec['cells']['PinX'] += 1.0
+        yield spec
+
+
+def make_revisions(folder, n):
+    pages = [{'name': f'Page-{i}', 'shapes': synthetic_shapes(n)}
+             for i in range(PAGES)]
+    v1 = write_vsdx(os.path.join(folder, 'v1.vsdx'), pages)
+    pages = [{'name': f'Page-{i}', 'shapes': synthetic_shapes(n)}
+             for i in range(PAGES)]
+    pages[3]['shapes'] = moved(n)
+    v2 = write_vsdx(os.path.join(folder, 'v2.vsdx'), pages)
+    return v1, v2
+
+
+def main(n=10000):
+    with tempfile.TemporaryDirectory() as folder:
+        v1, v2 = make_revisions(folder, n)
+        start = time.perf_counter()
+        old = fingerprint(v1)
+        full = time.perf_counter() - start
+        start = time.perf_counter()
+        new = fingerprint(v2, previous=old)
+        reused = time.perf_counter() - start
+        start = time.perf_counter()
+        changes = diff(old, new)
+        compare = time.perf_counter() - start
+    print(f"{PAGES} pages x {n} shapes")
+    print(f"  fingerprint (full):           {full:7.2f} s")
+    print(f"  fingerprint (reusing pages):  {reused:7.2f} s")
+    print(f"  diff:                         {compare * 1000:7.1f} ms, "
+          f"{changes}")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
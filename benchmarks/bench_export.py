@@ -0,0 +1,61 @@
+"""Rendering a large page to SVG and GeoJSON without Visio.
+
+Writes a page with ``n_shapes`` rectangles (with text and Shape Data),
+times the SVG and GeoJSON export and cutting the page into tiles in this
+process and with four worker processes (every worker reads the whole page,
+so the tiles only gain with free cores):
+
+    python benchmarks/bench_export.py [n_shapes]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.export import export_geojson, export_svg, \
+    export_tiles  # noqa: E402
+from visiopy.fakes import synthetic_shapes, write_vsdx  # noqa: E402
+
+
+def timed(label, fn, n):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:22s} {elapsed * 1000:9.1f} ms  "
+          f"{n / elapsed:10.0f} shapes/s")
+    return result
+
+
+def main(n=20000):
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, 'plan.vsdx')
+        columns = 200
+        side = (columns + 1) * 0.5
+        write_vsdx(path, [{'name': 'Plan', 'width': side,
+                           'height': (n // columns + 2) * 0.5,
+                           'shapes': synthetic_shapes(n, columns)}])
+        print(f"{n} shapes, {os.path.getsize(path) / 1e6:.1f} MB .vsdx, "
+              f"{os.cpu_count()} CPUs")
+        timed('svg', lambda: export_svg(
+            path, os.path.join(folder, 'plan.svg')), n)
+        timed('geojson', lambda: export_geojson(
+            path, os.path.join(folder, 'plan.geojson')), n)
+        for workers in (0, 4):
+            tiles = timed(f'svg tiles, {workers} workers',
+                          lambda: export_tiles(
+                              path, os.path.join(folder, f'tiles{workers}'),
+                              tile_size=500, workers=workers), n)
+        print(f"  {len(tiles)} tiles, "
+              f"{os.path.getsize(os.path.join(folder, 'plan.svg')) / 1e6:.1f}"
+              " MB svg")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
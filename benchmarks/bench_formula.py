@@ -0,0 +1,59 @@
+"""Offline recalculation of a .vsdx file with many formula cells.
+
+Writes a drawing with ``n_shapes`` shapes of five formula cells each
+(Height, LocPinX, LocPinY, PinY and a User cell chained to the previous
+shape), then times loading the dependency graph, a full recalculation, an
+edit of one shape and saving:
+
+    python benchmarks/bench_formula.py [n_shapes]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import write_vsdx  # noqa: E402
+from visiopy.formula import Recalc, parse  # noqa: E402
+
+
+def shapes(n):
+    for i in range(1, n + 1):
+        chain = f'Sheet.{i - 1}!User.Total+Width' if i > 1 else 'Width'
+        yield {'id': i, 'cells': {
+            'Width': 1.0,
+            'Height': (0.5, None, 'Width*0.5'),
+            'LocPinX': (0.5, None, 'Width*0.5'),
+            'LocPinY': (0.25, None, 'Height*0.5'),
+            'PinY': (0.0, None, 'ThePage!PageHeight-Height-10 mm')},
+            'user': {'Total': {'Value': (float(i), None, chain)}}}
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"  {label:22s} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+def main(n=20000):
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'formulas.vsdx')
+    write_vsdx(path, [{'name': 'A', 'shapes': shapes(n)}])
+    print(f"{n} shapes, {5 * n} formula cells")
+    calc = timed('load + graph', lambda: Recalc(path))
+    timed('full recalc', lambda: calc.recalc(full=True))
+    print(f"    {calc.evaluated} evaluated, {len(calc.errors)} errors")
+    calc.set(0, n // 2, 'Width', '2 in')
+    changed = timed('edit one shape', calc.recalc)
+    print(f"    {calc.evaluated} evaluated, {len(changed)} changed")
+    timed('save', lambda: calc.save(os.path.join(folder, 'out.vsdx')))
+    info = parse.cache_info()
+    print(f"  parse cache: {info.currsize} formulas, {info.hits} hits, "
+          f"{info.misses} misses")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
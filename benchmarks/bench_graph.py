@@ -0,0 +1,84 @@
+"""Tracing connectors: per-shape ``Shape.Connects`` vs. ConnectionGraph.
+
+Uses a fake page whose COM calls cost ``LATENCY`` seconds each; the page
+is a grid of ``n`` shapes with a connector to the right and one below each:
+
+    python benchmarks/bench_graph.py [n_shapes]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakePage, SlowCalls  # noqa: E402
+from visiopy.graph import ConnectionGraph  # noqa: E402
+
+LATENCY = 0.00005   # 50 us per cross-process call, optimistic
+WIDTH = 100
+
+
+def make_page(n):
+    page = FakePage(calls=SlowCalls(LATENCY))
+    for _ in range(n):
+        page.add_shape()
+    for i in range(1, n + 1):
+        for j in (i + 1 if i % WIDTH else None, i + WIDTH):
+            if j is not None and j <= n:
+                connector = page.add_shape().ID
+                page.glue(connector, 'BeginX', i)
+                page.glue(connector, 'EndX', j)
+    page.calls.clear()
+    return page
+
+
+def per_shape(page):
+    """What scripts do today: ask every shape for its glue."""
+    out = {}
+    for shape in page.Shapes:
+        ends = {}
+        for connect in shape.Connects:
+            ends[connect.FromPart] = connect.ToSheet.ID
+        if len(ends) == 2:
+            out.setdefault(ends[9], []).append(ends[12])
+    return out
+
+
+def main(n=5000):
+    page = make_page(n)
+    start = time.perf_counter()
+    per_shape(page)
+    naive = time.perf_counter() - start
+    calls = sum(page.calls.values())
+
+    page.calls.clear()
+    start = time.perf_counter()
+    ConnectionGraph.from_page(page, connects=True)
+    connects = time.perf_counter() - start
+    connects_calls = sum(page.calls.values())
+
+    page.calls.clear()
+    start = time.perf_counter()
+    graph = ConnectionGraph.from_page(page)
+    triggers = time.perf_counter() - start
+    trigger_calls = sum(page.calls.values())
+
+    start = time.perf_counter()
+    reached = len(graph.downstream(1))
+    components = len(graph.components())
+    query = time.perf_counter() - start
+
+    print(f"{n} shapes, {len(graph.edges)} connectors, "
+          f"{LATENCY * 1e6:.0f} us per COM call")
+    print(f"  Shape.Connects walk: {naive * 1000:9.1f} ms ({calls} calls)")
+    print(f"  Page.Connects pass:  {connects * 1000:9.1f} ms "
+          f"({connects_calls} calls)")
+    print(f"  trigger cells:       {triggers * 1000:9.1f} ms "
+          f"({trigger_calls} calls)")
+    print(f"  downstream(1) = {reached} shapes, {components} component(s): "
+          f"{query * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
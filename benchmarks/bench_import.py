@@ -0,0 +1,33 @@
+"""Import cost of `import visiopy`, measured with `python -X importtime`.
+
+    python benchmarks/bench_import.py [repeats]
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def import_time_us(module='visiopy'):
+    """Cumulative import time of ``module`` in a fresh interpreter (µs)."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = [p.strip() for p in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise RuntimeError(f"{module} not found in -X importtime output")
+
+
+def main(repeats=5):
+    times = sorted(import_time_us() for _ in range(repeats))
+    print(f"import visiopy: best {times[0] / 1000:.1f} ms, "
+          f"median {times[len(times) // 2] / 1000:.1f} ms "
+          f"({repeats} runs)")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
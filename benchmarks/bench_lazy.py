@@ -0,0 +1,60 @@
+"""Iterating shapes: ``[shp for shp in vPg.Shapes]`` vs. lazy shapes.
+
+Uses a fake page whose COM calls cost ``LATENCY`` seconds each.  Both
+loops look for the first shape right of 100 mm, then both scan all shapes:
+
+    python benchmarks/bench_lazy.py [n_shapes]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakePage, SlowCalls  # noqa: E402
+from visiopy.lazy import shapes  # noqa: E402
+
+LATENCY = 0.00005   # 50 us per cross-process call, optimistic
+
+
+def make_page(n):
+    page = FakePage(calls=SlowCalls(LATENCY))
+    for i in range(n):
+        page.add_shape(PinX=i / 25.4)
+    page.calls.clear()
+    return page
+
+
+def eager(page, limit):
+    for shp in [shp for shp in page.Shapes]:
+        if shp.Cells('PinX').Result('mm') > limit:
+            return shp.ID
+
+
+def lazy(page, limit):
+    for shp in shapes(page, cells=['PinX'], unit='mm'):
+        if shp['PinX'] > limit:
+            return shp.ID
+
+
+def measure(label, fn, page, limit):
+    page.calls.clear()
+    start = time.perf_counter()
+    fn(page, limit)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:18s} {elapsed * 1000:9.1f} ms "
+          f"({sum(page.calls.values())} calls)")
+
+
+def main(n=5000):
+    page = make_page(n)
+    print(f"{n} shapes, {LATENCY * 1e6:.0f} us per COM call")
+    for limit, what in ((100, 'first match'), (n + 1, 'full scan')):
+        print(f" {what}:")
+        measure('list(vPg.Shapes)', eager, page, limit)
+        measure('lazy shapes', lazy, page, limit)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
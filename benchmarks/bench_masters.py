@@ -0,0 +1,73 @@
+"""Looking up masters for many drops: OpenEx + ItemU per drop vs. the
+MasterRegistry.
+
+Three stencils with 40 masters each; ``n_drops`` lookups of random master
+names (fixed seed) against the fake object model.  COM time is modelled as
+calls x 200 us:
+
+    python benchmarks/bench_masters.py [n_drops]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakeApplication, FakeDocument, \
+    FakeMaster  # noqa: E402
+from visiopy.masters import DOCKED_FLAGS, MasterRegistry  # noqa: E402
+
+LATENCY = 0.0002
+
+
+def make_app():
+    app = FakeApplication()
+    for s in range(3):
+        path = f'/stencils/stencil{s}.vssx'
+        app.files[path] = FakeDocument(path, calls=app.calls, masters=[
+            FakeMaster(f'M{s}-{i}') for i in range(40)])
+    return app
+
+
+def naive(app, drops):
+    for path, name in drops:
+        app.Documents.OpenEx(path, DOCKED_FLAGS).Masters.ItemU(name)
+
+
+def registry(app, drops):
+    masters = MasterRegistry(app)
+    for path, name in drops:
+        masters.get(name, stencil=path)
+    return masters
+
+
+def timed(label, fn, app):
+    app.calls.clear()
+    start = time.perf_counter()
+    result = fn()
+    wall = time.perf_counter() - start
+    calls = sum(app.calls.values())
+    print(f"  {label:16} {wall * 1000:8.1f} ms {calls:7d} calls "
+          f"{(wall + calls * LATENCY) * 1000:9.1f} ms with COM latency")
+    return result
+
+
+def main(n=10000):
+    rng = random.Random(1)
+    drops = []
+    for _ in range(n):
+        s = rng.randrange(3)
+        drops.append((f'/stencils/stencil{s}.vssx',
+                      f'M{s}-{rng.randrange(40)}'))
+    print(f"{n} drops from 3 stencils")
+    app = make_app()
+    timed('OpenEx + ItemU', lambda: naive(app, drops), app)
+    app = make_app()
+    masters = timed('MasterRegistry', lambda: registry(app, drops), app)
+    print(f"  {dict(masters.stats)}")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,43 @@
+"""Overhead of the COM profiler proxies per call.
+
+Runs against the fake object model (no COM latency), so the numbers are
+the pure Python cost of the instrumentation:
+
+    python benchmarks/bench_profiler.py [calls]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakePage  # noqa: E402
+from visiopy.profiler import Profiler  # noqa: E402
+
+
+def loop(page, n):
+    start = time.perf_counter()
+    shapes = page.Shapes
+    for _ in range(n):
+        shapes.ItemFromID(1).Cells('PinX').ResultIU
+    return (time.perf_counter() - start) / n
+
+
+def main(n=20000):
+    page = FakePage()
+    page.add_shape()
+    plain = loop(page, n)
+    disabled = loop(Profiler().wrap(page), n)
+    profiler = Profiler(enabled=True, sites=False)
+    enabled = loop(profiler.wrap(page), n)
+    profiler = Profiler(enabled=True)
+    sites = loop(profiler.wrap(page), n)
+    print(f"{n} x ItemFromID + Cells + ResultIU (3 calls)")
+    for label, t in (('not wrapped', plain), ('profiler disabled', disabled),
+                     ('enabled', enabled), ('enabled, call sites', sites)):
+        print(f"  {label:20} {t * 1e6:7.2f} us per iteration")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
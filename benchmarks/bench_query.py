@@ -0,0 +1,76 @@
+"""Selecting shapes by criteria: per-shape reads vs. a query Snapshot.
+
+Uses a fake page whose COM calls cost ``LATENCY`` seconds each:
+
+    python benchmarks/bench_query.py [n_shapes]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakeDocument, FakeMaster, SlowCalls  # noqa: E402
+from visiopy.query import Q, Snapshot  # noqa: E402
+
+LATENCY = 0.00005   # 50 us per cross-process call, optimistic
+
+
+def make_page(n):
+    pump, valve = FakeMaster('Pump'), FakeMaster('Valve')
+    doc = FakeDocument(masters=[pump, valve], calls=SlowCalls(LATENCY))
+    page = doc._pages[0]
+    page.DropMany([pump if i % 3 == 0 else valve for i in range(n)],
+                  [0.0] * (2 * n))
+    for i, shape in enumerate(page._shapes.values()):
+        shape.set(Width=(10 + i % 30) / 25.4)
+        shape.add_row('prop', 'Type', '"Pump"' if i % 3 == 0 else '"Valve"')
+    page.add_layer('Wet', [i for i in page._shapes if i % 2 == 0])
+    page.calls.clear()
+    return page
+
+
+def per_shape(page):
+    """What scripts do today: read every shape's cells one by one."""
+    found = []
+    for shape in page.Shapes:
+        if shape.Cells('LayerMember').ResultStr('').split(';')[0] != '0':
+            continue
+        if shape.Cells('Prop.Type').ResultStr('') != 'Pump':
+            continue
+        if shape.Cells('Width').Result('mm') > 20:
+            found.append(shape.ID)
+    return found
+
+
+def main(n=5000):
+    page = make_page(n)
+    start = time.perf_counter()
+    expected = per_shape(page)
+    naive = time.perf_counter() - start
+    calls = sum(page.calls.values())
+
+    query = (Q.layer == 'Wet') & (Q.prop.Type == 'Pump') & (Q.Width > 20)
+    page.calls.clear()
+    start = time.perf_counter()
+    snap = Snapshot(page)
+    assert snap.query(query) == expected
+    first = time.perf_counter() - start
+    first_calls = sum(page.calls.values())
+
+    page.calls.clear()
+    start = time.perf_counter()
+    snap.query("layer == 'Wet' and prop.Type == 'Valve' and Width <= 20")
+    again = time.perf_counter() - start
+
+    print(f"{n} shapes, {len(expected)} matches, "
+          f"{LATENCY * 1e6:.0f} us per COM call")
+    print(f"  per-shape reads: {naive * 1000:9.1f} ms ({calls} calls)")
+    print(f"  Snapshot:        {first * 1000:9.1f} ms ({first_calls} calls)")
+    print(f"  next query:      {again * 1000:9.1f} ms "
+          f"({sum(page.calls.values())} calls)")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
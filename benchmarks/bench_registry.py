@@ -0,0 +1,58 @@
+"""Document lookup: full ROT scan per call vs. DocumentRegistry.
+
+Runs on any platform against a fake Running Object Table:
+
+    python benchmarks/bench_registry.py [n_documents] [lookups]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakeDocument, FakeRunningObjectTable  # noqa: E402
+from visiopy.visio_connect import DocumentRegistry, \
+    _normalize_path  # noqa: E402
+
+BIND_LATENCY = 0.0002   # a cross-process BindToObject is far from free
+
+
+def scan_lookup(rot, filename):
+    """What get_or_open_visio_file did before: bind everything, compare."""
+    requested = _normalize_path(filename)
+    for name, moniker in rot.entries():
+        doc = rot.bind(moniker)
+        if _normalize_path(doc.FullName) == requested:
+            return doc
+    return None
+
+
+def main(n=300, lookups=200):
+    docs = [FakeDocument(f'/drawings/d{i}/plan{i}.vsdx') for i in range(n)]
+    rot = FakeRunningObjectTable(docs, bind_latency=BIND_LATENCY)
+    targets = [docs[(i * 7919) % n]._full_name for i in range(lookups)]
+
+    start = time.perf_counter()
+    for name in targets:
+        scan_lookup(rot, name)
+    scan = time.perf_counter() - start
+    scan_binds = rot.calls['ROT.bind']
+
+    rot.calls.clear()
+    registry = DocumentRegistry(rot, clsids=[], ttl=2.0)
+    start = time.perf_counter()
+    for name in targets:
+        registry.find(name)
+    cached = time.perf_counter() - start
+
+    print(f"{n} documents, {lookups} lookups")
+    print(f"  ROT scan per lookup: {scan * 1000:9.1f} ms "
+          f"({scan_binds} binds)")
+    print(f"  DocumentRegistry:    {cached * 1000:9.1f} ms "
+          f"({rot.calls['ROT.bind']} binds, "
+          f"{rot.calls['ROT.entries']} ROT reads)")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,55 @@
+"""Scaling of the batch runner with the number of worker processes.
+
+Generates drawings with synthetic shapes and runs benchmarks/batch_snap.py
+over them with 1, 2, 4, ... workers (up to the CPU count):
+
+    python benchmarks/bench_runner.py [n_files] [shapes_per_file]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import synthetic_shapes, write_vsdx  # noqa: E402
+from visiopy.runner import run_batch  # noqa: E402
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      'batch_snap.py')
+
+
+def main(n_files=32, shapes=3000):
+    folder = tempfile.mkdtemp()
+    try:
+        template = os.path.join(folder, 'template.vsdx')
+        write_vsdx(template, [{'shapes': synthetic_shapes(shapes,
+                                                          spacing=0.41)}])
+        workers, counts = 1, []
+        while workers <= (os.cpu_count() or 1):
+            counts.append(workers)
+            workers *= 2
+        print(f"{n_files} files x {shapes} shapes, "
+              f"{os.cpu_count()} CPUs")
+        base = None
+        for workers in counts:
+            files = []
+            for i in range(n_files):
+                files.append(os.path.join(folder, f'd{i}.vsdx'))
+                shutil.copy(template, files[-1])
+            start = time.perf_counter()
+            results = list(run_batch(SCRIPT, files, workers))
+            wall = time.perf_counter() - start
+            base = base or wall
+            failed = sum(not r.ok for r in results)
+            print(f"  {workers:3} workers: {wall:7.2f} s, "
+                  f"{n_files / wall:6.1f} files/s, speedup "
+                  f"{base / wall:4.1f}x, {failed} failed")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,96 @@
+"""Text search over shapes: a COM loop per search vs. TextIndex.
+
+Uses a fake document whose COM calls cost ``LATENCY`` seconds each, and a
+.vsdx file with the same shapes for the streaming build:
+
+    python benchmarks/bench_search.py [n_shapes]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakeDocument, SlowCalls, synthetic_shapes, \
+    write_vsdx  # noqa: E402
+from visiopy.search import TextIndex  # noqa: E402
+
+LATENCY = 0.00005   # 50 us per cross-process call, optimistic
+QUERIES = 100
+
+
+def make_doc(n):
+    doc = FakeDocument(calls=SlowCalls(LATENCY))
+    page = doc._pages[0]
+    for i in range(n):
+        shape = page.add_shape()
+        shape.set_text(('Tag ', 'regular'), (f'P-{i:05d}', 'bold'))
+        shape.add_row('prop', 'Type', '"Pump"' if i % 3 == 0 else '"Valve"')
+        shape.add_row('prop', 'Tag', f'"P-{i:05d}"')
+    doc.calls.clear()
+    return doc
+
+
+def loop_search(doc, word):
+    """What scripts do today: read text and data of every shape."""
+    found = []
+    for page in doc.Pages:
+        for shape in page.Shapes:
+            if word in shape.Text or \
+                    word in shape.Cells('Prop.Tag').ResultStr(''):
+                found.append(shape.ID)
+    return found
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(n=5000):
+    doc = make_doc(n)
+    _, loop = timed(loop_search, doc, f'P-{n // 2:05d}')
+    loop_calls = sum(doc.calls.values())
+
+    doc.calls.clear()
+    index, build = timed(TextIndex.from_document, doc)
+    build_calls = sum(doc.calls.values())
+    start = time.perf_counter()
+    for i in range(QUERIES):
+        index.search(f'P-{i * 37 % n:05d}')
+    words = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(QUERIES // 10):
+        index.search(f'-{i:03d}', substring=True)
+    scans = time.perf_counter() - start
+
+    doc.calls.clear()
+    changed, replace = timed(index.replace, doc, 'P-000', 'Q-000')
+    replace_calls = sum(doc.calls.values())
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'plan.vsdx')
+        write_vsdx(path, [{'name': 'Plan', 'shapes': synthetic_shapes(n)}])
+        vsdx_index, vsdx_build = timed(TextIndex.from_vsdx, path)
+        _, vsdx_again = timed(vsdx_index.add_vsdx, path)
+        _, vsdx_replace = timed(vsdx_index.replace, path, 'P-000', 'Q-000')
+
+    print(f"{n} shapes, {LATENCY * 1e6:.0f} us per COM call")
+    print(f"  COM loop, one search:     {loop * 1000:9.1f} ms "
+          f"({loop_calls} calls)")
+    print(f"  TextIndex build (live):   {build * 1000:9.1f} ms "
+          f"({build_calls} calls)")
+    print(f"  {QUERIES} word searches:       {words * 1000:9.1f} ms")
+    print(f"  {QUERIES // 10} substring scans:      {scans * 1000:9.1f} ms")
+    print(f"  replace (live):           {replace * 1000:9.1f} ms "
+          f"({len(changed)} fields, {replace_calls} calls)")
+    print(f"  TextIndex build (.vsdx):  {vsdx_build * 1000:9.1f} ms")
+    print(f"  re-index unchanged file:  {vsdx_again * 1000:9.1f} ms")
+    print(f"  replace (.vsdx):          {vsdx_replace * 1000:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,67 @@
+"""The notebook rounding loop: cell by cell vs. ShadowSheet.
+
+Uses a fake page whose COM calls cost ``LATENCY`` seconds each:
+
+    python benchmarks/bench_shadow.py [n_shapes]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy import units  # noqa: E402
+from visiopy.fakes import FakePage, SlowCalls  # noqa: E402
+from visiopy.shadow import ShadowSheet  # noqa: E402
+
+LATENCY = 0.00005   # 50 us per cross-process call, optimistic
+CELLS = ('PinX', 'PinY')
+
+
+def make_page(n):
+    page = FakePage(calls=SlowCalls(LATENCY))
+    for i in range(n):
+        page.add_shape(PinX=(i % 100) * 0.513, PinY=(i // 100) * 0.487)
+    page.calls.clear()
+    return page
+
+
+def per_cell(page):
+    """What scripts do today: read and write every cell through COM."""
+    for shape in page.Shapes:
+        for name in CELLS:
+            cell = shape.Cells(name)
+            mm = units.from_internal(cell.ResultIU, 'mm')
+            cell.Formula = f"{round(mm)} mm"
+
+
+def shadowed(page, ids):
+    with ShadowSheet(page) as sheet:
+        sheet.prefetch(ids, CELLS)
+        for sid in ids:
+            for name in CELLS:
+                sheet.set(sid, name, round(sheet.get(sid, name, 'mm')), 'mm')
+    return sheet.stats
+
+
+def main(n=5000):
+    page = make_page(n)
+    start = time.perf_counter()
+    per_cell(page)
+    naive = time.perf_counter() - start
+    calls = sum(page.calls.values())
+
+    page = make_page(n)
+    start = time.perf_counter()
+    stats = shadowed(page, list(range(1, n + 1)))
+    shadow = time.perf_counter() - start
+
+    print(f"{n} shapes, {LATENCY * 1e6:.0f} us per COM call")
+    print(f"  cell by cell: {naive * 1000:9.1f} ms ({calls} calls)")
+    print(f"  ShadowSheet:  {shadow * 1000:9.1f} ms "
+          f"({sum(page.calls.values())} calls, {stats})")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
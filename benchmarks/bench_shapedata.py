@@ -0,0 +1,110 @@
+"""Shape Data round trip (export, edit 10 %, import) for 50k rows.
+
+Compares per-shape ``CellExists`` + ``Cells(...)`` access with the
+batched export/import, on a fake document and on a .vsdx file.  The
+shapes are instances of one master, every tenth with a row of its own.
+COM time is modelled like ``benchmarks/suite.py`` does: the calls are
+counted and each costs ``LATENCY`` seconds on top of the measured time.
+
+    python benchmarks/bench_shapedata.py [n_shapes] [rows_per_shape]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakeDocument, FakeMaster, \
+    write_vsdx  # noqa: E402
+from visiopy.shapedata import export_shape_data, \
+    import_shape_data  # noqa: E402
+
+FIELDS = ('Tag', 'Type', 'Status', 'Owner', 'Weight')
+LATENCY = 0.0002    # the default of benchmarks/suite.py
+
+
+def make_doc(n):
+    master = FakeMaster('Equipment')
+    for field in FIELDS:
+        master.add_row('prop', field, '""', Label=f'"{field}"')
+    doc = FakeDocument(masters=[master])
+    page = doc._pages[0]
+    _, ids = page.DropMany([master] * n, [0.0] * (2 * n))
+    for i, sid in enumerate(ids):
+        shape = page._shapes[sid]
+        for field in FIELDS:
+            shape.Cells(f'Prop.{field}').FormulaU = f'"{field}-{i}"'
+        if i % 10 == 0:
+            shape.add_row('prop', 'Note', f'"note {i}"', Label='"Note"')
+    doc.calls.clear()
+    return doc
+
+
+def modelled(seconds, calls):
+    return seconds + sum(calls.values()) * LATENCY
+
+
+def per_shape(doc):
+    """What scripts do today: one lookup and one read per shape and field."""
+    rows = []
+    for page in doc.Pages:
+        for shape in page.Shapes:
+            for field in FIELDS:
+                if shape.CellExists(f'Prop.{field}', False):
+                    rows.append(shape.Cells(f'Prop.{field}').ResultStr(''))
+    return rows
+
+
+def edit(data):
+    values = data['value']
+    for i in range(0, len(values), 10):
+        values[i] = values[i] + '*'
+
+
+def round_trip(target, names=True):
+    start = time.perf_counter()
+    data = export_shape_data(target, names=names)
+    exported = time.perf_counter() - start
+    edit(data)
+    start = time.perf_counter()
+    results = import_shape_data(target, data)
+    imported = time.perf_counter() - start
+    written = sum(len(r.values) for r in results.values())
+    return len(data), exported, imported, written
+
+
+def main(n=10000, rows=5):
+    global FIELDS
+    FIELDS = FIELDS[:rows]
+    doc = make_doc(n)
+    start = time.perf_counter()
+    per_shape(doc)
+    naive = modelled(time.perf_counter() - start, doc.calls)
+    naive_calls = sum(doc.calls.values())
+    print(f"{n * rows + n // 10} Shape Data rows ({n} shapes x {rows}, "
+          f"+1 on every tenth), {LATENCY * 1e6:.0f} us per COM call")
+    print(f"  per shape read:            {naive:7.2f} s, "
+          f"{naive_calls} calls")
+    for names in (True, False):
+        doc.calls.clear()
+        count, exported, imported, written = round_trip(doc, names)
+        calls = dict(doc.calls)
+        print(f"  live round trip (names={names!s:5}): "
+              f"{modelled(exported + imported, calls):7.2f} s, "
+              f"{written} cells written, {sum(calls.values())} calls")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'data.vsdx')
+        write_vsdx(path, [{'shapes': (
+            {'id': i, 'props': {f: {'Value': f'{f}-{i}', 'Label': f}
+                                for f in FIELDS}}
+            for i in range(1, n + 1))}])
+        count, exported, imported, written = round_trip(path)
+    print(f"  .vsdx export:              {exported:7.2f} s")
+    print(f"  .vsdx import ({written} cells): {imported:7.2f} s")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
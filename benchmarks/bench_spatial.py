@@ -0,0 +1,74 @@
+"""Region and overlap queries: per-shape COM reads vs. SpatialIndex.
+
+Uses a fake page whose COM calls cost ``LATENCY`` seconds each:
+
+    python benchmarks/bench_spatial.py [n_shapes]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy.fakes import FakePage, SlowCalls  # noqa: E402
+from visiopy.spatial import SpatialIndex, TRANSFORM_CELLS, \
+    bounding_box  # noqa: E402
+
+LATENCY = 0.00005   # 50 us per cross-process call, optimistic
+
+
+def make_page(n):
+    rng = random.Random(0)
+    page = FakePage(calls=SlowCalls(LATENCY))
+    side = (n ** 0.5) * 0.6
+    for _ in range(n):
+        page.add_shape(PinX=rng.uniform(0, side), PinY=rng.uniform(0, side),
+                       Width=0.4, Height=0.4, LocPinX=0.2, LocPinY=0.2)
+    page.calls.clear()
+    return page
+
+
+def per_shape_boxes(page):
+    """What scripts do today: Cells(...).ResultIU shape by shape."""
+    boxes = {}
+    for shape in page.Shapes:
+        boxes[shape.ID] = bounding_box(
+            *[shape.Cells(c).ResultIU for c in TRANSFORM_CELLS])
+    return boxes
+
+
+def main(n=5000):
+    page = make_page(n)
+    start = time.perf_counter()
+    boxes = per_shape_boxes(page)
+    per_shape = time.perf_counter() - start
+    calls = sum(page.calls.values())
+
+    page.calls.clear()
+    start = time.perf_counter()
+    index = SpatialIndex.from_page(page, unit='in')
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(1000):
+        x = (i * 7.3) % (n ** 0.5 * 0.6)
+        index.query(x, x, x + 2, x + 2)
+    queries = time.perf_counter() - start
+    start = time.perf_counter()
+    pairs = index.overlaps()
+    overlaps = time.perf_counter() - start
+
+    print(f"{n} shapes, {LATENCY * 1e6:.0f} us per COM call")
+    print(f"  read boxes per shape: {per_shape * 1000:9.1f} ms "
+          f"({calls} calls)")
+    print(f"  SpatialIndex build:   {build * 1000:9.1f} ms "
+          f"({sum(page.calls.values())} calls)")
+    print(f"  1000 region queries:  {queries * 1000:9.1f} ms")
+    print(f"  overlap pairs:        {overlaps * 1000:9.1f} ms "
+          f"({len(pairs)} pairs of {len(boxes)} shapes)")
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
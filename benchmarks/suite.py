@@ -0,0 +1,281 @@
+"""Benchmark suite against the simulated Visio object model.
+
+Builds synthetic drawings of several sizes in :mod:`visiopy.fakes`
+(Application, Documents, ROT, Pages, Shapes, Cells, Selection) and runs
+the everyday operations on them: ``vDocs``, ``get_or_open_visio_file``,
+``SelectedShapeUpdater.batch_modify_shapes`` and the notebook-style
+``for shp in vPg.Shapes: shp.Cells(...)`` loops next to their batched
+counterparts.  Every scenario records wall time (best of ``--repeat``),
+COM calls by member, the COM time those calls cost at ``--latency``
+seconds each and the peak Python memory (``tracemalloc``, separate run).
+
+Nothing sleeps unless ``--sleep`` is given, so call counts, modelled COM
+time and memory are the same on every run; wall time is the Python cost
+and the total adds the modelled COM time to it.  With ``--sleep`` every
+call waits ``--latency`` seconds and the total is the measured wall time.
+Results go to a JSON file, and ``--compare`` checks a run against an
+earlier one (exit code 1 on more COM calls, or more than ``--threshold``
+extra modelled time and at least 5 ms):
+
+    python benchmarks/suite.py --sizes 1000,10000,100000 --out base.json
+    python benchmarks/suite.py --compare base.json
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..')))
+
+from visiopy import visio_connect  # noqa: E402
+from visiopy.batch import read_cells  # noqa: E402
+from visiopy.fakes import FakeApplication, FakeDocument, FakeEventSource, \
+    FakeScheduler, SlowCalls  # noqa: E402
+from visiopy.select_assign import SelectedShapeUpdater  # noqa: E402
+from visiopy.visio_connect import get_or_open_visio_file, \
+    vDocs  # noqa: E402
+
+FORMAT = 1
+PLAN = '/drawings/plan.vsdx'
+
+
+class Drawing:
+    """A simulated Visio with ``documents`` open drawings; the plan has
+    ``shapes`` shapes with a ``Status`` Shape Data row, all selected."""
+
+    def __init__(self, shapes, documents=50, latency=0.0, sleep=False):
+        self.calls = SlowCalls(latency) if sleep else Counter()
+        self.app = FakeApplication(self.calls)
+        self.paths = []
+        for i in range(documents):
+            path = f'/drawings/site{i}/drawing{i}.vsdx'
+            self.app.files[path] = FakeDocument(path, calls=self.calls)
+            self.app.Documents.Open(path)
+            self.paths.append(path)
+        self.app.files[PLAN] = FakeDocument(PLAN, calls=self.calls)
+        self.page = self.app.files[PLAN]._pages[0]
+        for i in range(shapes):
+            shape = self.page.add_shape(PinX=(i % 100) * 0.5,
+                                        PinY=(i // 100) * 0.5)
+            shape.add_row('prop', 'Status', '""')
+        self.doc = self.app.Documents.Open(PLAN)
+        self.window = self.app.ActiveWindow
+        self.window.select_ids(list(self.page._shapes))
+        self.ids = list(self.page._shapes)
+        visio_connect.use_backend(self.app, self.app.rot)
+        self.calls.clear()
+
+
+# -- scenarios: setup(drawing) -> run() ------------------------------------
+
+def vdocs_cold(drawing):
+    visio_connect.use_backend(drawing.app, drawing.app.rot)
+    return lambda: vDocs(silent=True)
+
+
+def vdocs_warm(drawing):
+    vDocs(silent=True, refresh=True)
+    return lambda: vDocs(silent=True)
+
+
+def open_already_open(drawing):
+    # an open drawing asked for by another path (found by its file name)
+    paths = drawing.paths or [PLAN]
+    name = os.path.basename(paths[len(paths) // 2])
+    visio_connect.use_backend(drawing.app, drawing.app.rot)
+    return lambda: get_or_open_visio_file(f'/mnt/share/{name}')
+
+
+def open_closed(drawing):
+    path = '/drawings/closed.vsdx'
+    drawing.app.files[path] = FakeDocument(path, calls=drawing.calls)
+
+    try:
+        drawing.app.rot.remove(path)    # opened by the previous repeat
+    except KeyError:
+        pass
+    visio_connect.document_registry().refresh(force=True)
+    return lambda: get_or_open_visio_file(path)
+
+
+def batch_modify_shapes(drawing):
+    with contextlib.redirect_stdout(io.StringIO()):
+        updater = SelectedShapeUpdater(drawing.window,
+                                       event_source=FakeEventSource(),
+                                       root=FakeScheduler())
+    updater.selected_field = 'Status'
+    updater.selected_value = 'done'
+    updater.check_active = True
+    return updater.batch_modify_shapes
+
+
+def loop_read(drawing):
+    def run():
+        return [shp.Cells('PinX').ResultIU for shp in drawing.page.Shapes]
+    return run
+
+
+def loop_write(drawing):
+    def run():
+        for shp in drawing.page.Shapes:
+            shp.Cells('Prop.Status').FormulaU = '"done"'
+    return run
+
+
+def batched_read(drawing):
+    refs = [(i, 'PinX') for i in drawing.ids]
+    return lambda: read_cells(drawing.page, refs)
+
+
+# (name, setup, depends on the number of shapes)
+SCENARIOS = [
+    ('vDocs cold', vdocs_cold, False),
+    ('vDocs warm', vdocs_warm, False),
+    ('get_or_open open', open_already_open, False),
+    ('get_or_open closed', open_closed, False),
+    ('batch_modify_shapes', batch_modify_shapes, True),
+    ('loop read PinX', loop_read, True),
+    ('loop write Prop', loop_write, True),
+    ('read_cells PinX', batched_read, True),
+]
+
+
+def measure(drawing, setup, latency, repeat, sleep=False):
+    walls = []
+    for _ in range(repeat):
+        run = setup(drawing)
+        drawing.calls.clear()
+        start = time.perf_counter()
+        run()
+        walls.append(time.perf_counter() - start)
+    calls = dict(drawing.calls)
+    run = setup(drawing)
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    wall = min(walls)
+    count = sum(calls.values())
+    # with sleep the wall time already contains the COM time
+    total = wall if sleep else wall + count * latency
+    return {'wall_ms': wall * 1000, 'com_calls': count,
+            'com_ms': count * latency * 1000,
+            'total_ms': total * 1000,
+            'peak_kb': peak / 1024, 'calls': calls}
+
+
+def run_suite(sizes, documents=50, latency=0.0002, repeat=3, sleep=False,
+              only=None):
+    """Run all scenarios; returns the result document (see FORMAT)."""
+    results = []
+    for index, size in enumerate(sizes):
+        drawing = Drawing(size, documents, latency, sleep)
+        try:
+            for name, setup, scales in SCENARIOS:
+                if only and name not in only:
+                    continue
+                if not scales and index:
+                    continue        # the same for every size
+                row = {'name': name, 'shapes': size if scales else None,
+                       'documents': documents}
+                row.update(measure(drawing, setup, latency, repeat, sleep))
+                results.append(row)
+                print(f"  {name:22} {row['shapes'] or '':>7} "
+                      f"{row['wall_ms']:10.1f} ms {row['com_calls']:9d} calls "
+                      f"{row['total_ms']:11.1f} ms total "
+                      f"{row['peak_kb']:9.0f} KiB")
+        finally:
+            visio_connect.use_backend()
+    return {'format': FORMAT, 'date': datetime.datetime.now().isoformat(
+                timespec='seconds'),
+            'commit': _commit(), 'python': platform.python_version(),
+            'platform': platform.platform(), 'latency': latency,
+            'repeat': repeat, 'sleep': sleep, 'results': results}
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base, current, threshold=0.25, slack_ms=5.0):
+    """Print the changes against ``base``; returns the regressions.
+
+    A scenario regresses if it makes more COM calls, or if its modelled
+    time grows by more than ``threshold`` and more than ``slack_ms`` (so
+    timer noise on sub-millisecond scenarios does not count).
+    """
+    old = {(r['name'], r['shapes']): r for r in base['results']}
+    regressions = []
+    print(f"against {base.get('commit')} ({base.get('date')}):")
+    for row in current['results']:
+        key = (row['name'], row['shapes'])
+        if key not in old:
+            continue
+        before = old[key]
+        ratio = row['total_ms'] / before['total_ms'] \
+            if before['total_ms'] else 1.0
+        worse = row['com_calls'] > before['com_calls'] or (
+            ratio > 1 + threshold and
+            row['total_ms'] - before['total_ms'] > slack_ms)
+        if worse:
+            regressions.append(key)
+        print(f"  {row['name']:22} {row['shapes'] or '':>7} "
+              f"calls {before['com_calls']:>9} -> {row['com_calls']:<9} "
+              f"total x{ratio:5.2f}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='visiopy benchmarks on the simulated Visio backend')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='shape counts, comma separated')
+    parser.add_argument('--documents', type=int, default=50,
+                        help='open documents in the ROT')
+    parser.add_argument('--latency', type=float, default=0.0002,
+                        help='seconds per COM call')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--sleep', action='store_true',
+                        help='really spend the latency in every call')
+    parser.add_argument('--only', action='append',
+                        help='run only this scenario (repeatable)')
+    parser.add_argument('--out', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed extra modelled time (fraction)')
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    print(f"sizes {sizes}, {args.documents} documents, "
+          f"{args.latency * 1e6:.0f} us per COM call")
+    result = run_suite(sizes, args.documents, args.latency, args.repeat,
+                       args.sleep, args.only)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=1)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            base = json.load(f)
+        if compare(base, result, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
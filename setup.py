@@ -4,7 +4,8 @@ setup(
     name='visiopy',
     version='0.2.1',
     packages=find_packages(),
-    install_requires=['pywin32'],
+    install_requires=['pywin32; platform_system == "Windows"'],
+    extras_require={'numpy': ['numpy'], 'pandas': ['pandas']},
     description='A library to automate Visio operations.',
     long_description=open('README.md').read(),
     long_description_content_type='text/markdown',
@@ -15,5 +16,5 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )
\ No newline at end of file
@@ -1 +1,55 @@
 from .visio_connect import vDocs, vInit
+
+# Everything else is imported on first access (PEP 562), so that
+# `import visiopy` only costs a few milliseconds and does not pull in
+# tkinter or pywin32.
+_LAZY = {
+    'SelectedShapeUpdater': 'select_assign',
+    'document_manager': 'visio_connect',
+    'ask_for_visio_file': 'visio_connect',
+    'get_or_open_visio_file': 'visio_connect',
+    'DocumentRegistry': 'visio_connect',
+    'CellEdit': 'batch',
+    'read_cells': 'batch',
+    'write_cells': 'batch',
+    'VsdxFile': 'vsdx',
+    'apply_edits': 'patch',
+    'patch_vsdx': 'patch',
+    'page_geometry': 'geometry',
+    'apply_geometry': 'geometry',
+    'create_shapes': 'create',
+    'fast': 'perf',
+    'SpatialIndex': 'spatial',
+    'export_shape_data': 'shapedata',
+    'import_shape_data': 'shapedata',
+    'ShadowSheet': 'shadow',
+    'ComWorker': 'worker',
+    'fingerprint': 'diff',
+    'ConnectionGraph': 'graph',
+    'Snapshot': 'query',
+    'Q': 'query',
+    'LazyShapes': 'lazy',
+    'LazyPages': 'lazy',
+    'Recalc': 'formula',
+    'recalc_vsdx': 'formula',
+    'SnapshotCache': 'cache',
+    'export_svg': 'export',
+    'export_geojson': 'export',
+    'export_tiles': 'export',
+    'MasterRegistry': 'masters',
+    'TextIndex': 'search',
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module 'visiopy' has no attribute '{name}'")
+    from importlib import import_module
+    value = getattr(import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
@@ -0,0 +1,22 @@
+"""Command line entry point: ``python -m visiopy <command>``."""
+import argparse
+import sys
+
+from . import runner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m visiopy')
+    commands = parser.add_subparsers(dest='command')
+    batch = commands.add_parser(
+        'batch', help="run a script over many drawings in parallel")
+    runner.add_arguments(batch)
+    args = parser.parse_args(argv)
+    if args.command == 'batch':
+        return runner.batch_main(args)
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
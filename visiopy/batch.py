@@ -0,0 +1,459 @@
+"""Batched ShapeSheet access.
+
+Every ``shape.Cells(name).Formula = ...`` is one COM round trip (or more,
+counting the ``Cells`` lookup itself).  Visio offers array versions of these
+accessors on the Page object (``SetFormulas``, ``GetFormulasU``,
+``GetResults`` and ``SetResults``) that take a flat SID_SRC stream of
+``(shape ID, section, row, cell)`` quadruples.  This module compiles cell
+edits into such streams and sends them in chunks, so that N edits cost a
+handful of COM calls instead of N.
+
+Usage:
+------
+    from visiopy.batch import CellEdit, write_cells, read_cells
+
+    edits = [CellEdit(sid, 'FillForegnd', formula='3') for sid in ids]
+    result = write_cells(vPg, edits)
+    result.errors       # {index_in_edits: message}
+
+    res = read_cells(vPg, [(sid, 'PinX') for sid in ids], unit='mm')
+    res.values          # one value per requested cell
+"""
+import threading
+from collections import Counter, namedtuple
+
+# Visio constants used below (see VisSectionIndices / VisRowIndices /
+# VisCellIndices / VisGetSetArgs in the Visio type library).
+visSectionObject = 1
+visSectionUser = 242
+visSectionProp = 243
+
+visSetUniversalSyntax = 8
+visGetFloats = 0
+visGetStrings = 3
+visNoCast = 252    # unit code: result in internal units
+visSelTypeByMaster = 5
+visSelModeSkipSub = 0x400
+
+CHUNK_SIZE = 5000
+
+# Sheet ID of the PageSheet in SID_SRC streams
+PAGE_SHEET_ID = 0
+
+# COM calls issued by this module in this process, by kind
+# (``set_formulas``, ``get_results``, ...); see visiopy.perf.fast
+COM_CALLS = Counter()
+# extra counters of the current thread, see track_calls
+_tracking = threading.local()
+
+# Single-row cells whose SRC address is the same for every shape.  Names are
+# matched case-insensitively, like Visio does.  Anything not listed here is
+# looked up per shape, see CellResolver.
+CELL_SRC = {
+    # visRowXFormOut
+    'pinx': (visSectionObject, 1, 0),
+    'piny': (visSectionObject, 1, 1),
+    'width': (visSectionObject, 1, 2),
+    'height': (visSectionObject, 1, 3),
+    'locpinx': (visSectionObject, 1, 4),
+    'locpiny': (visSectionObject, 1, 5),
+    'angle': (visSectionObject, 1, 6),
+    'flipx': (visSectionObject, 1, 7),
+    'flipy': (visSectionObject, 1, 8),
+    'resizemode': (visSectionObject, 1, 9),
+    # visRowLine
+    'lineweight': (visSectionObject, 2, 0),
+    'linecolor': (visSectionObject, 2, 1),
+    'linepattern': (visSectionObject, 2, 2),
+    'rounding': (visSectionObject, 2, 3),
+    # visRowFill
+    'fillforegnd': (visSectionObject, 3, 0),
+    'fillbkgnd': (visSectionObject, 3, 1),
+    'fillpattern': (visSectionObject, 3, 2),
+    # visRowXForm1D
+    'beginx': (visSectionObject, 4, 0),
+    'beginy': (visSectionObject, 4, 1),
+    'endx': (visSectionObject, 4, 2),
+    'endy': (visSectionObject, 4, 3),
+    # visRowLayerMem
+    'layermember': (visSectionObject, 6, 0),
+    # visRowMisc
+    'begtrigger': (visSectionObject, 17, 9),
+    'endtrigger': (visSectionObject, 17, 10),
+    # visRowPage (PageSheet)
+    'pagewidth': (visSectionObject, 10, 0),
+    'pageheight': (visSectionObject, 10, 1),
+    'shdwoffsetx': (visSectionObject, 10, 2),
+    'shdwoffsety': (visSectionObject, 10, 3),
+    'pagescale': (visSectionObject, 10, 4),
+    'drawingscale': (visSectionObject, 10, 5),
+}
+
+# Cell columns of the rows in the Shape Data and User-defined sections
+PROP_CELLS = {'value': 0, 'prompt': 1, 'label': 2, 'format': 3,
+              'sortkey': 4, 'type': 5, 'invisible': 6, 'ask': 7}
+USER_CELLS = {'value': 0, 'prompt': 1}
+ROW_SECTIONS = {'prop': (visSectionProp, PROP_CELLS),
+                'user': (visSectionUser, USER_CELLS)}
+
+
+class CellEdit(namedtuple('CellEdit', 'shape_id cell formula value unit')):
+    """One cell write.
+
+    ``cell`` is either a cell name (``'PinX'``, ``'prop.Type.Value'``) or a
+    ``(section, row, cell)`` tuple.  Give either ``formula`` (written like
+    ``Cell.FormulaU``) or ``value`` plus an optional ``unit`` (written like
+    ``Cell.Result(unit)``).
+    """
+    __slots__ = ()
+
+    def __new__(cls, shape_id, cell, formula=None, value=None, unit=None):
+        return super().__new__(cls, shape_id, cell, formula, value, unit)
+
+
+class BatchResult:
+    """Outcome of a batched read or write.
+
+    Attributes:
+    -----------
+    - values : list
+        One entry per requested item (``None`` for writes and failed items).
+    - errors : dict
+        Maps the index of a failed item to its error message.
+    - calls : int
+        Number of COM calls that were issued.
+    """
+
+    def __init__(self, n):
+        self.values = [None] * n
+        self.errors = {}
+        self.calls = 0
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __repr__(self):
+        return (f"<BatchResult items={len(self.values)} "
+                f"errors={len(self.errors)} calls={self.calls}>")
+
+
+def as_edit(item):
+    """Coerce a tuple into a :class:`CellEdit`.
+
+    ``(id, cell, formula)`` is a formula write, ``(id, cell, value, unit)`` a
+    result write.
+    """
+    if isinstance(item, CellEdit):
+        return item
+    if len(item) == 3:
+        return CellEdit(item[0], item[1], formula=item[2])
+    if len(item) == 4:
+        return CellEdit(item[0], item[1], value=item[2], unit=item[3])
+    raise ValueError(f"Cannot interpret cell edit: {item!r}")
+
+
+def shape_ids(target):
+    """Return the shape IDs of a Selection or of all shapes on a Page.
+
+    Uses ``Selection.GetIDs`` so the IDs come back in one call; for a page
+    a selection of all its shapes is created first.
+    """
+    if hasattr(target, 'GetIDs'):
+        return list(target.GetIDs() or ())
+    # visSelTypeAll = 1
+    return list(target.CreateSelection(1).GetIDs() or ())
+
+
+class CellResolver:
+    """Maps ``(shape ID, cell name)`` to SRC triples.
+
+    Well known cells come from :data:`CELL_SRC` without any COM call.
+    Shape Data and User cells (``prop.Name[.Cell]``, ``user.Name[.Cell]``)
+    need their row index, which differs per shape; it is looked up once per
+    shape and row through ``Shape.CellsRowIndexU`` and cached.  Any other
+    name goes through ``Shape.Cells(name)``.
+
+    Visio has no batched way to find row indexes, so named row cells cost
+    two COM calls per shape and row (``Shapes.ItemFromID`` and the
+    lookup; ``Page.Shapes`` is fetched once per resolver).  Writing
+    ``Prop.Status`` on N shapes is therefore about 2N calls plus the
+    batched write.  Pass ``(section, row, cell)`` tuples (e.g. the rows
+    found by :func:`visiopy.shapedata.export_shape_data`) to avoid lookups
+    altogether, and reuse a resolver across calls on the same page.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self._cache = {}
+        self._shapes = None
+
+    @property
+    def shapes(self):
+        """``Page.Shapes``, fetched on first use."""
+        if self._shapes is None:
+            self._shapes = self.page.Shapes
+        return self._shapes
+
+    def resolve(self, shape_id, cell):
+        if isinstance(cell, tuple):
+            return cell
+        src = CELL_SRC.get(cell.lower())
+        if src is not None:
+            return src
+        key = (shape_id, cell.lower())
+        src = self._cache.get(key)
+        if src is None:
+            src = self._lookup(shape_id, cell)
+            self._cache[key] = src
+        return src
+
+    def _lookup(self, shape_id, cell):
+        shape = self.shapes.ItemFromID(shape_id)
+        parts = cell.split('.')
+        kind = parts[0].lower()
+        if kind in ROW_SECTIONS and len(parts) in (2, 3):
+            section, columns = ROW_SECTIONS[kind]
+            column = columns.get(parts[2].lower() if len(parts) == 3
+                                 else 'value')
+            if column is not None:
+                row = shape.CellsRowIndexU('.'.join(parts[:2]))
+                return (section, row, column)
+        c = shape.Cells(cell)
+        return (c.Section, c.Row, c.Column)
+
+
+class RowNames:
+    """Row names of the Shape Data and User sections of live shapes.
+
+    ``RowNameU`` has no batched form, so reading the names of every row
+    costs two calls per row.  Instances list the rows of their master
+    first (rows added locally follow), so the names are read once per
+    master from its shape; a shape costs one ``RowCount`` per section,
+    and ``RowNameU`` calls only for rows past the master's.  Shapes
+    without a master, or with fewer rows than their master (rows deleted
+    locally), are read row by row.
+
+    Which master a shape belongs to comes from one ``CreateSelection`` per
+    master of the document, made on the first call.
+
+    Parameters:
+    ----------
+    - page : Visio Page
+    - masters : iterable of Visio Master, optional
+        Masters to look for; ``page.Document.Masters`` if omitted.  Pass
+        ``()`` to read every shape row by row (cheaper for a few shapes).
+    """
+
+    def __init__(self, page, masters=None):
+        self.page = page
+        self.masters = masters
+        self._by_shape = None     # shape ID -> master position
+        self._objects = []
+        self._names = {}          # (master position, section) -> names
+
+    def _load(self):
+        masters = self.masters
+        if masters is None:
+            document = getattr(self.page, 'Document', None)
+            masters = document.Masters if document is not None else ()
+        self._by_shape = {}
+        for i, master in enumerate(masters):
+            self._objects.append(master)
+            selection = self.page.CreateSelection(
+                visSelTypeByMaster, visSelModeSkipSub, master)
+            for sid in selection.GetIDs() or ():
+                self._by_shape.setdefault(sid, i)
+
+    @staticmethod
+    def _read(shape, section, start, count):
+        return [shape.CellsSRC(section, row, 0).RowNameU
+                for row in range(start, count)]
+
+    def names(self, shape, shape_id, section):
+        """Row names of ``section`` (Prop or User) of a shape, in order."""
+        count = shape.RowCount(section)
+        if self._by_shape is None:
+            self._load()
+        inherited = []
+        position = self._by_shape.get(shape_id)
+        if position is not None and count:
+            key = (position, section)
+            if key not in self._names:
+                base = self._objects[position].Shapes.Item(1)
+                self._names[key] = self._read(base, section, 0,
+                                              base.RowCount(section))
+            inherited = self._names[key]
+            if len(inherited) > count:
+                inherited = []
+        return inherited[:count] + self._read(shape, section,
+                                               len(inherited), count)
+
+
+def _stream(items):
+    stream = []
+    for sid, src in items:
+        stream.extend((sid, src[0], src[1], src[2]))
+    return tuple(stream)
+
+
+def track_calls(counter):
+    """Also count the calls this thread issues from now on in ``counter``.
+
+    Unlike :data:`COM_CALLS`, the counter does not see calls of other
+    threads.  Stop with :func:`untrack_calls`.
+    """
+    if not hasattr(_tracking, 'counters'):
+        _tracking.counters = []
+    _tracking.counters.append(counter)
+
+
+def untrack_calls(counter):
+    """Stop counting in a counter passed to :func:`track_calls`."""
+    counters = getattr(_tracking, 'counters', [])
+    for i in range(len(counters) - 1, -1, -1):
+        if counters[i] is counter:
+            del counters[i]
+            break
+
+
+def _chunks(seq, size):
+    for start in range(0, len(seq), size):
+        yield seq[start:start + size]
+
+
+def _run(result, items, call):
+    """Send ``items`` in one call, bisecting on failure to isolate bad items.
+
+    ``items`` is a list of ``(index, payload)``.  ``call`` receives the list
+    of payloads and returns a sequence of values (or ``None`` for writes).
+    """
+    result.calls += 1
+    COM_CALLS[call.__name__] += 1
+    for counter in getattr(_tracking, 'counters', ()):
+        counter[call.__name__] += 1
+    try:
+        values = call([payload for _, payload in items])
+    except Exception as e:
+        if len(items) == 1:
+            result.errors[items[0][0]] = str(e)
+            return
+        half = len(items) // 2
+        _run(result, items[:half], call)
+        _run(result, items[half:], call)
+        return
+    if values is not None:
+        for (index, _), value in zip(items, values):
+            result.values[index] = value
+
+
+def _resolve_all(resolver, entries, result):
+    resolved = []
+    for index, (shape_id, cell), extra in entries:
+        try:
+            src = resolver.resolve(shape_id, cell)
+        except Exception as e:
+            result.errors[index] = f"Cannot resolve cell '{cell}' on shape " \
+                f"{shape_id}: {e}"
+            continue
+        resolved.append((index, ((shape_id, src), extra)))
+    return resolved
+
+
+def write_cells(page, edits, chunk_size=CHUNK_SIZE, resolver=None):
+    """Write many cells with ``Page.SetFormulas`` / ``Page.SetResults``.
+
+    Parameters:
+    ----------
+    - page : Visio Page
+    - edits : iterable of CellEdit or tuples (see :func:`as_edit`)
+    - chunk_size : int, optional
+        Maximum number of cells per COM call.
+    - resolver : CellResolver, optional
+        Reuse a resolver (and its cache) across calls.
+
+    Returns:
+    --------
+    - BatchResult with per-item errors.
+    """
+    edits = [as_edit(e) for e in edits]
+    result = BatchResult(len(edits))
+    resolver = resolver or CellResolver(page)
+
+    formulas, results = [], []
+    for i, e in enumerate(edits):
+        if e.formula is not None:
+            formulas.append((i, (e.shape_id, e.cell), str(e.formula)))
+        elif e.value is not None:
+            results.append((i, (e.shape_id, e.cell), (e.value, e.unit)))
+        else:
+            result.errors[i] = "Edit has neither a formula nor a value."
+
+    def set_formulas(payloads):
+        page.SetFormulas(_stream([p[0] for p in payloads]),
+                         tuple(p[1] for p in payloads),
+                         visSetUniversalSyntax)
+
+    def set_results(payloads):
+        page.SetResults(_stream([p[0] for p in payloads]),
+                        tuple(p[1][1] or '' for p in payloads),
+                        tuple(p[1][0] for p in payloads),
+                        0)
+
+    for items, call in ((_resolve_all(resolver, formulas, result),
+                         set_formulas),
+                        (_resolve_all(resolver, results, result),
+                         set_results)):
+        for chunk in _chunks(items, chunk_size):
+            _run(result, chunk, call)
+    return result
+
+
+def read_cells(page, refs, unit=None, formulas=False, strings=False,
+               chunk_size=CHUNK_SIZE, resolver=None):
+    """Read many cells with ``Page.GetResults`` / ``Page.GetFormulasU``.
+
+    Parameters:
+    ----------
+    - page : Visio Page
+    - refs : iterable of ``(shape_id, cell)``
+        ``cell`` is a name or a ``(section, row, cell)`` tuple.
+    - unit : str or list, optional
+        Unit for the results (e.g. ``'mm'``); internal units if omitted.
+        A list gives one unit per entry of ``refs``.
+    - formulas : bool, optional
+        Return the universal formulas instead of results.
+    - strings : bool, optional
+        Return results as strings (needed for text Shape Data).
+
+    Returns:
+    --------
+    - BatchResult whose ``values`` line up with ``refs``.
+    """
+    refs = list(refs)
+    result = BatchResult(len(refs))
+    resolver = resolver or CellResolver(page)
+    if isinstance(unit, (list, tuple)):
+        per_ref = list(unit)
+    else:
+        per_ref = [unit] * len(refs)
+    items = _resolve_all(
+        resolver, [(i, tuple(r), u) for i, (r, u) in
+                   enumerate(zip(refs, per_ref))], result)
+
+    def get_formulas(payloads):
+        return page.GetFormulasU(_stream([p[0] for p in payloads]))
+
+    def get_results(payloads):
+        flags = visGetStrings if strings else visGetFloats
+        units = tuple(p[1] if p[1] is not None else visNoCast
+                      for p in payloads)
+        if all(u == visNoCast for u in units):
+            units = ()
+        return page.GetResults(_stream([p[0] for p in payloads]), flags,
+                               units)
+
+    call = get_formulas if formulas else get_results
+    for chunk in _chunks(items, chunk_size):
+        _run(result, chunk, call)
+    return result
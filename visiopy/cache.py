@@ -0,0 +1,684 @@
+"""Persistent snapshot cache of parsed drawings (memory-mapped NumPy).
+
+Jobs that read the same reference drawings over and over pay for unzipping
+and parsing the XML (or binding through COM) every time.
+:class:`SnapshotCache` parses a drawing once into a compact columnar
+snapshot on disk:
+
+- the shape table (ID, parent, master, type, name, text) of every page;
+- all single-row cell results (inherited from masters like
+  :mod:`visiopy.vsdx` does);
+- the Shape Data (``Prop``) and ``User`` rows;
+- the glue records (``<Connects>``).
+
+Every column is a ``.npy`` file opened with ``mmap_mode='r'``, so reopening
+a cached drawing reads a small JSON manifest and nothing else; the arrays of
+a page are mapped when the page is first used, and the OS reads only the
+parts that are touched.
+
+Entries are keyed by the normalized path and checked against the file's
+size and modification time.  If those changed, the CRC-32 values in the zip
+directory (a content hash that needs no decompression) decide whether the
+content changed too; a file that was only copied or touched is not parsed
+again.  The cache keeps at most ``max_bytes`` on disk and drops the least
+recently used drawings first.
+
+A drawing's cache folder holds the manifest and one data folder per
+build.  A rebuild writes a new data folder and then switches the manifest
+over to it, so snapshots that still map the old arrays keep working (on
+Windows a mapped file cannot be deleted).  Old data folders are deleted
+at a later rebuild of the drawing, once no snapshot of this process uses
+them any more; folders newer than that build (another process may still
+be writing one) are left alone.
+
+Usage:
+------
+    from visiopy.cache import SnapshotCache
+
+    cache = SnapshotCache()                    # ~/.cache/visiopy/snapshots
+    drawing = cache.open(r'C:/ref/plant.vsdx') # parsed once, then mapped
+    page = drawing.page('Plan')
+    page.ids, page.column('PinX', unit='mm'), page.prop('Type')
+    page.connects
+    cache.stats                                # hits, misses, stale, ...
+
+NumPy is required (``pip install visiopy[numpy]``).
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import weakref
+import zipfile
+
+from . import units
+from .vsdx import Connect, VsdxFile
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+FORMAT = 2
+MAX_BYTES = 1 << 30
+
+_MANIFEST = 'manifest.json'
+# snapshots handed out by this process; their data folders stay on disk
+_LIVE = weakref.WeakSet()
+_TYPES = ('Shape', 'Group', 'Guide', 'Foreign')
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("visiopy.cache needs numpy "
+                          "(pip install visiopy[numpy])")
+
+
+def default_root():
+    """``%LOCALAPPDATA%/visiopy/snapshots`` or ``~/.cache/visiopy/snapshots``
+    (``VISIOPY_CACHE`` overrides both)."""
+    if os.environ.get('VISIOPY_CACHE'):
+        return os.environ['VISIOPY_CACHE']
+    base = os.environ.get('LOCALAPPDATA') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'visiopy', 'snapshots')
+
+
+def content_hash(path):
+    """Hash of the part names, sizes and CRC-32s in the zip directory."""
+    digest = hashlib.sha1()
+    with zipfile.ZipFile(path) as zf:
+        for info in sorted(zf.infolist(), key=lambda i: i.filename):
+            digest.update(f"{info.filename}\0{info.CRC}\0{info.file_size}\n"
+                          .encode('utf-8'))
+    return digest.hexdigest()
+
+
+class _Strings:
+    """Read-only string table: one UTF-8 blob plus offsets, both mapped."""
+
+    def __init__(self, folder):
+        self._blob = np.load(os.path.join(folder, 'strings.npy'),
+                             mmap_mode='r')
+        self._offsets = np.load(os.path.join(folder, 'offsets.npy'),
+                                mmap_mode='r')
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            return None
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return bytes(self._blob[start:end]).decode('utf-8')
+
+    def many(self, ids):
+        """Decode a whole column of string IDs (-1 gives ``None``)."""
+        ids = np.asarray(ids)
+        safe = np.maximum(ids, 0)
+        starts = self._offsets[safe].tolist()
+        ends = self._offsets[safe + 1].tolist()
+        blob = memoryview(self._blob)
+        return [str(blob[a:b], 'utf-8') if i >= 0 else None
+                for i, a, b in zip(ids.tolist(), starts, ends)]
+
+    def find(self, text):
+        """Index of ``text`` or -1 (linear, used for a few names only)."""
+        data = text.encode('utf-8')
+        size = len(data)
+        starts, ends = self._offsets[:-1], self._offsets[1:]
+        for i in np.nonzero(ends - starts == size)[0]:
+            if bytes(self._blob[starts[i]:ends[i]]) == data:
+                return int(i)
+        return -1
+
+
+class _StringTable:
+    """Collects strings while a snapshot is written."""
+
+    def __init__(self):
+        self.ids = {}
+
+    def __call__(self, text):
+        if text is None:
+            return -1
+        index = self.ids.get(text)
+        if index is None:
+            index = self.ids[text] = len(self.ids)
+        return index
+
+    def save(self, folder):
+        blobs = [s.encode('utf-8') for s in self.ids]
+        offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in blobs], out=offsets[1:])
+        np.save(os.path.join(folder, 'strings.npy'),
+                np.frombuffer(b''.join(blobs), dtype=np.uint8))
+        np.save(os.path.join(folder, 'offsets.npy'), offsets)
+
+
+def _value(cell):
+    """``(float or NaN, string id source)`` of a vsdx cell."""
+    result = cell.result
+    if isinstance(result, float):
+        return result, None
+    return float('nan'), result
+
+
+def _write_page(vsdx, page, folder, prefix, strings):
+    shapes = {'id': [], 'parent': [], 'master': [], 'type': [], 'name': [],
+              'name_u': [], 'text': []}
+    cells = {'shape': [], 'name': [], 'value': [], 'text': []}
+    rows = {'shape': [], 'section': [], 'name': [], 'label': [],
+            'value': [], 'text': []}
+    for shape in vsdx.iter_shapes(page):
+        i = len(shapes['id'])
+        shapes['id'].append(shape.id)
+        shapes['parent'].append(-1 if shape.parent is None else shape.parent)
+        shapes['master'].append(-1 if shape.master is None else shape.master)
+        shapes['type'].append(_TYPES.index(shape.type)
+                              if shape.type in _TYPES else -1)
+        shapes['name'].append(strings(shape.name))
+        shapes['name_u'].append(strings(shape.name_u))
+        shapes['text'].append(strings(shape.text))
+        for name, cell in shape.cells.items():
+            value, text = _value(cell)
+            cells['shape'].append(i)
+            cells['name'].append(strings(name))
+            cells['value'].append(value)
+            cells['text'].append(strings(text))
+        for s, section_rows in enumerate((shape.props, shape.user)):
+            for row in section_rows.values():
+                value_cell = row.cells.get('Value')
+                value, text = _value(value_cell) if value_cell is not None \
+                    else (float('nan'), None)
+                label = row.cells.get('Label')
+                rows['shape'].append(i)
+                rows['section'].append(s)
+                rows['name'].append(strings(row.name))
+                rows['label'].append(strings(label.value if label is not None
+                                             else None))
+                rows['value'].append(value)
+                rows['text'].append(strings(text))
+    links = {'from_sheet': [], 'from_cell': [], 'to_sheet': [],
+             'to_cell': []}
+    for c in vsdx.connects(page):
+        links['from_sheet'].append(-1 if c.from_sheet is None
+                                   else c.from_sheet)
+        links['from_cell'].append(strings(c.from_cell))
+        links['to_sheet'].append(-1 if c.to_sheet is None else c.to_sheet)
+        links['to_cell'].append(strings(c.to_cell))
+
+    # cells sorted by name: a column is one contiguous slice
+    order = np.argsort(np.asarray(cells['name'], dtype=np.int32),
+                       kind='stable')
+    names = np.asarray(cells['name'], dtype=np.int32)[order]
+    unique, starts = np.unique(names, return_index=True)
+    arrays = {
+        'cell_names': unique.astype(np.int32),
+        'cell_starts': np.append(starts, len(names)).astype(np.int64),
+        'cell_shape': np.asarray(cells['shape'], dtype=np.int32)[order],
+        'cell_value': np.asarray(cells['value'], dtype=np.float64)[order],
+        'cell_text': np.asarray(cells['text'], dtype=np.int32)[order],
+    }
+    for key, values in shapes.items():
+        arrays[key] = np.asarray(values, dtype=np.int8 if key == 'type'
+                                 else np.int32)
+    for key, values in rows.items():
+        arrays['row_' + key] = np.asarray(
+            values, dtype=np.float64 if key == 'value' else
+            np.int8 if key == 'section' else np.int32)
+    for key, values in links.items():
+        arrays['connect_' + key] = np.asarray(values, dtype=np.int32)
+    for key, array in arrays.items():
+        np.save(os.path.join(folder, f'{prefix}{key}.npy'), array)
+    return len(shapes['id'])
+
+
+def _folder_size(folder):
+    return sum(e.stat().st_size for e in os.scandir(folder) if e.is_file())
+
+
+class PageSnapshot:
+    """Columns of one cached page; arrays are mapped on first use.
+
+    Attributes:
+    -----------
+    - index, name, name_u : page index and names
+    - ids : int32 array of shape IDs (sub-shapes follow their group)
+    """
+
+    def __init__(self, drawing, entry):
+        self._drawing = drawing
+        self._prefix = entry['prefix']
+        self.index = entry['index']
+        self.name = entry['name']
+        self.name_u = entry['name_u']
+        self.width = entry['width']
+        self.height = entry['height']
+        self._count = entry['shapes']
+        self._arrays = {}
+        self._columns = {}
+        self._positions = None
+
+    def _array(self, key):
+        array = self._arrays.get(key)
+        if array is None:
+            array = self._arrays[key] = np.load(
+                os.path.join(self._drawing.folder,
+                             f'{self._prefix}{key}.npy'), mmap_mode='r')
+        return array
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def ids(self):
+        return self._array('id')
+
+    @property
+    def parent(self):
+        """Group ID of each shape, -1 for top level shapes."""
+        return self._array('parent')
+
+    @property
+    def master(self):
+        """Master ID of each shape, -1 if it has none."""
+        return self._array('master')
+
+    @property
+    def type(self):
+        """Shape type (``'Shape'``, ``'Group'``, ...) of each shape."""
+        return [_TYPES[t] if t >= 0 else None for t in self._array('type')]
+
+    def _strings(self, key):
+        return self._drawing.strings.many(self._array(key))
+
+    @property
+    def names(self):
+        return self._strings('name')
+
+    @property
+    def names_u(self):
+        return self._strings('name_u')
+
+    @property
+    def text(self):
+        return self._strings('text')
+
+    def position(self, shape_id):
+        """Row of ``shape_id`` in the columns."""
+        if self._positions is None:
+            self._positions = {int(sid): i for i, sid in enumerate(self.ids)}
+        return self._positions[shape_id]
+
+    @property
+    def cells(self):
+        """Names of the cells stored for at least one shape."""
+        strings = self._drawing.strings
+        return [strings[i] for i in self._array('cell_names')]
+
+    def _cell_slice(self, cell):
+        names = self._array('cell_names')
+        index = self._drawing.string_id(cell)
+        found = np.searchsorted(names, index)
+        if index < 0 or found >= len(names) or names[found] != index:
+            return None
+        starts = self._array('cell_starts')
+        return slice(int(starts[found]), int(starts[found + 1]))
+
+    def column(self, cell, unit=None):
+        """Results of ``cell`` for all shapes (NaN where missing or text).
+
+        ``unit`` converts from internal units (inches/radians).
+        """
+        key = (cell, unit)
+        if key not in self._columns:
+            values = np.full(self._count, np.nan)
+            span = self._cell_slice(cell)
+            if span is not None:
+                values[self._array('cell_shape')[span]] = \
+                    self._array('cell_value')[span]
+            if unit is not None:
+                values *= units.from_internal(1.0, unit)
+            values.flags.writeable = False
+            self._columns[key] = values
+        return self._columns[key]
+
+    def cell_text(self, cell):
+        """String results of ``cell`` (``None`` where numeric or missing)."""
+        out = [None] * self._count
+        span = self._cell_slice(cell)
+        if span is not None:
+            texts = self._drawing.strings.many(self._array('cell_text')[span])
+            for i, text in zip(self._array('cell_shape')[span].tolist(),
+                               texts):
+                out[i] = text
+        return out
+
+    def _rows(self, section, name, cell):
+        """Cells of the rows ``name``; ``section`` 0 is Prop, 1 User."""
+        index = self._drawing.string_id(name)
+        out = [None] * self._count
+        if index < 0:
+            return out
+        found = np.nonzero((self._array('row_section') == section) &
+                           (self._array('row_name') == index))[0]
+        shapes = self._array('row_shape')[found].tolist()
+        strings = self._drawing.strings
+        if cell == 'Label':
+            values = strings.many(self._array('row_label')[found])
+        else:
+            texts = strings.many(self._array('row_text')[found])
+            numbers = self._array('row_value')[found].tolist()
+            values = [n if t is None else t for t, n in zip(texts, numbers)]
+        for i, value in zip(shapes, values):
+            out[i] = value
+        return out
+
+    def prop(self, name, cell='Value'):
+        """``Prop.<name>`` (``Value`` or ``Label``) of every shape, ``None``
+        for shapes without the row."""
+        return self._rows(0, name, cell)
+
+    def user(self, name):
+        """``User.<name>`` of every shape."""
+        return self._rows(1, name, 'Value')
+
+    @property
+    def connects(self):
+        """Glue records as :class:`~visiopy.vsdx.Connect` tuples."""
+        strings = self._drawing.strings
+        return [Connect(fs if fs >= 0 else None, fc,
+                        ts if ts >= 0 else None, tc)
+                for fs, fc, ts, tc in zip(
+                    self._array('connect_from_sheet').tolist(),
+                    strings.many(self._array('connect_from_cell')),
+                    self._array('connect_to_sheet').tolist(),
+                    strings.many(self._array('connect_to_cell')))]
+
+    def __repr__(self):
+        return f"<PageSnapshot {self.index}: {self.name} " \
+               f"({self._count} shapes)>"
+
+
+class DrawingSnapshot:
+    """A cached drawing: page list from the manifest, pages on demand.
+
+    Attributes:
+    -----------
+    - source : str
+        Path of the drawing the snapshot was made from.
+    - folder : str
+        Data folder holding the arrays.
+    """
+
+    def __init__(self, folder, manifest):
+        self.folder = folder
+        self.source = manifest['source']
+        self._manifest = manifest
+        self._strings = None
+        self._string_ids = {}
+        self._pages = [PageSnapshot(self, e) for e in manifest['pages']]
+        _LIVE.add(self)
+
+    @property
+    def strings(self):
+        if self._strings is None:
+            self._strings = _Strings(self.folder)
+        return self._strings
+
+    def string_id(self, text):
+        if text not in self._string_ids:
+            self._string_ids[text] = self.strings.find(text)
+        return self._string_ids[text]
+
+    @property
+    def pages(self):
+        return list(self._pages)
+
+    def page(self, key=0):
+        """A page by index, ``Name`` or ``NameU``."""
+        if isinstance(key, int):
+            return self._pages[key]
+        for page in self._pages:
+            if key in (page.name, page.name_u):
+                return page
+        raise KeyError(f"No page named {key!r}")
+
+    def __iter__(self):
+        return iter(self._pages)
+
+    def __len__(self):
+        return len(self._pages)
+
+    def __repr__(self):
+        return f"<DrawingSnapshot {os.path.basename(self.source)} " \
+               f"({len(self._pages)} pages)>"
+
+
+class SnapshotCache:
+    """On-disk cache of drawing snapshots with LRU eviction.
+
+    Parameters:
+    ----------
+    - root : str, optional
+        Cache folder (:func:`default_root` if omitted).
+    - max_bytes : int
+        Upper bound of the cache size; least recently used drawings are
+        removed after a new snapshot was written.
+    - verify : str
+        ``'hash'`` (default) re-checks the zip CRCs when size or mtime
+        changed and keeps the snapshot if the content is the same;
+        ``'mtime'`` rebuilds on any size or mtime change.
+
+    Attributes:
+    -----------
+    - stats : dict
+        ``hits``, ``misses`` (no entry), ``stale`` (rebuilt after a change),
+        ``revalidated`` (touched but unchanged) and ``evicted``.
+    """
+
+    def __init__(self, root=None, max_bytes=MAX_BYTES, verify='hash'):
+        _require_numpy()
+        if verify not in ('hash', 'mtime'):
+            raise ValueError("verify must be 'hash' or 'mtime'")
+        self.root = root or default_root()
+        self.max_bytes = max_bytes
+        self.verify = verify
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'revalidated': 0,
+                      'evicted': 0}
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def key(path):
+        """Cache key of a path (the name of its folder in the cache)."""
+        norm = os.path.normcase(os.path.abspath(os.fspath(path)))
+        return hashlib.sha1(norm.encode('utf-8')).hexdigest()[:24]
+
+    def _folder(self, path):
+        return os.path.join(self.root, self.key(path))
+
+    @staticmethod
+    def _read_manifest(folder):
+        try:
+            with open(os.path.join(folder, _MANIFEST), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_manifest(folder, manifest):
+        tmp = os.path.join(folder, _MANIFEST + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(folder, _MANIFEST))
+
+    def open(self, target):
+        """The snapshot of a drawing, parsed only if not cached or stale.
+
+        Parameters:
+        ----------
+        - target : str or Visio Document
+            A .vsdx path, or a saved document (its ``FullName`` is used;
+            unsaved changes are not in the file and raise ``ValueError``).
+
+        Returns:
+        --------
+        - DrawingSnapshot
+        """
+        path = target
+        if not isinstance(target, (str, os.PathLike)):
+            if not target.Saved:
+                raise ValueError(f"{target.FullName} has unsaved changes")
+            path = target.FullName
+        path = os.path.abspath(os.fspath(path))
+        stat = os.stat(path)
+        folder = self._folder(path)
+        manifest = self._read_manifest(folder)
+        if manifest is not None and manifest.get('format') == FORMAT and \
+                os.path.isdir(os.path.join(folder, manifest['data'])):
+            if (manifest['size'], manifest['mtime_ns']) == \
+                    (stat.st_size, stat.st_mtime_ns):
+                self.stats['hits'] += 1
+                self._touch(folder)
+                return self._snapshot(folder, manifest)
+            if self.verify == 'hash' and \
+                    manifest['content'] == content_hash(path):
+                self.stats['revalidated'] += 1
+                manifest.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                self._write_manifest(folder, manifest)
+                return self._snapshot(folder, manifest)
+            self.stats['stale'] += 1
+        else:
+            self.stats['misses'] += 1
+        manifest = self._build(path, stat, folder)
+        self._evict(keep=folder)
+        return self._snapshot(folder, manifest)
+
+    @staticmethod
+    def _snapshot(folder, manifest):
+        return DrawingSnapshot(os.path.join(folder, manifest['data']),
+                               manifest)
+
+    def _build(self, path, stat, folder):
+        """Parse ``path`` into a new data folder of ``folder`` and switch
+        the manifest over to it; older data folders are deleted unless
+        they are still mapped."""
+        os.makedirs(folder, exist_ok=True)
+        started = time.time()
+        data = tempfile.mkdtemp(prefix='v', dir=folder)
+        try:
+            strings = _StringTable()
+            pages = []
+            with VsdxFile(path) as vsdx:
+                for page in vsdx.pages:
+                    prefix = f'p{page.index}_'
+                    count = _write_page(vsdx, page, data, prefix, strings)
+                    pages.append({'index': page.index, 'name': page.name,
+                                  'name_u': page.name_u, 'prefix': prefix,
+                                  'width': page.width,
+                                  'height': page.height, 'shapes': count})
+            strings.save(data)
+            manifest = {'format': FORMAT, 'source': path,
+                        'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                        'content': content_hash(path), 'pages': pages,
+                        'data': os.path.basename(data),
+                        'created': time.time()}
+            manifest['bytes'] = _folder_size(data)
+            self._write_manifest(folder, manifest)
+        except BaseException:
+            shutil.rmtree(data, ignore_errors=True)
+            raise
+        self._prune(folder, manifest['data'], started)
+        return manifest
+
+    @classmethod
+    def _prune(cls, folder, keep, before):
+        """Delete the data folders of ``folder`` other than ``keep`` that
+        were last written before ``before`` (a timestamp) and that no live
+        snapshot uses; what is still mapped stays for the next time."""
+        live = {os.path.normcase(os.path.abspath(s.folder))
+                for s in list(_LIVE)}
+        for entry in os.scandir(folder):
+            if entry.name in (_MANIFEST, keep) or \
+                    not entry.name.endswith('.npy') and not entry.is_dir():
+                continue
+            try:
+                if entry.stat().st_mtime >= before:
+                    continue
+            except OSError:
+                continue
+            if not entry.is_dir():
+                # arrays of the flat format 1 layout
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+            elif os.path.normcase(os.path.abspath(entry.path)) not in live:
+                cls._remove(entry.path)
+
+    @staticmethod
+    def _touch(folder):
+        try:
+            os.utime(os.path.join(folder, _MANIFEST))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(folder):
+        """Delete a cache folder; False if it is still mapped (Windows)."""
+        if not os.path.exists(folder):
+            return True
+        try:
+            shutil.rmtree(folder)
+        except OSError:
+            return False
+        return True
+
+    def entries(self):
+        """``[(last_used, bytes, folder, source)]``, least recent first."""
+        out = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            manifest = self._read_manifest(entry.path)
+            if manifest is None:
+                continue
+            used = os.stat(os.path.join(entry.path, _MANIFEST)).st_mtime
+            out.append((used, manifest.get('bytes', 0), entry.path,
+                        manifest.get('source')))
+        return sorted(out)
+
+    @property
+    def size(self):
+        """Bytes used by all cached drawings."""
+        return sum(e[1] for e in self.entries())
+
+    def _evict(self, keep=None):
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for _, size, folder, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if folder == keep:
+                continue
+            if self._remove(folder):
+                total -= size
+                self.stats['evicted'] += 1
+
+    def invalidate(self, path):
+        """Drop the snapshot of ``path``."""
+        return self._remove(self._folder(os.path.abspath(os.fspath(path))))
+
+    def clear(self):
+        for _, _, folder, _ in self.entries():
+            self._remove(folder)
+
+    def __contains__(self, path):
+        folder = self._folder(os.path.abspath(os.fspath(path)))
+        return self._read_manifest(folder) is not None
+
+    def __repr__(self):
+        return f"<SnapshotCache {self.root}>"
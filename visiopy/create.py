@@ -0,0 +1,228 @@
+"""Create many shapes at once with ``Page.DropMany``.
+
+Drawing shapes one by one (``vPg.DrawRectangle`` in a loop, then a few
+``Cells(...).Formula`` per shape) costs several COM round trips per shape.
+:func:`create_shapes` drops all of them with ``DropMany`` (one call per
+chunk) and sets their initial cells with one batched write.  The layout
+helpers build the position arrays with NumPy.
+
+Usage:
+------
+    from visiopy.create import create_shapes, grid
+
+    x, y = grid(200, columns=20, spacing='20 mm', origin=(20, 20))
+    created = create_shapes(vPg, 'rectangle', x, y, size=(5, 5),
+                            cells={'FillForegnd': 3})
+    created.ids          # numpy array with the new shape IDs
+
+NumPy is an optional dependency (``pip install visiopy[numpy]``).
+"""
+from collections import namedtuple
+import math
+
+from . import units
+from .batch import CHUNK_SIZE, CellEdit, write_cells
+from .geometry import cell_unit
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+# geometry primitives understood by create_shapes and the Page method that
+# draws the template for them
+PRIMITIVES = {'rectangle': 'DrawRectangle', 'ellipse': 'DrawOval'}
+
+Created = namedtuple('Created', 'ids cells')
+Created.__doc__ = """Result of :func:`create_shapes`.
+
+``ids`` is a numpy array with the new shape IDs (in input order), ``cells``
+the BatchResult of the initial cell write or ``None``."""
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("visiopy.create needs numpy "
+                          "(pip install visiopy[numpy])")
+
+
+def _length(value, unit):
+    """``value`` in ``unit``; strings like ``'20 mm'`` carry their own."""
+    if isinstance(value, str):
+        quantity = units.parse_quantity(value)
+        if quantity is None:
+            raise ValueError(f"Not a length: {value!r}")
+        return units.from_internal(units.to_internal(*quantity), unit)
+    return float(value)
+
+
+def _pair(value, unit):
+    if isinstance(value, (tuple, list)):
+        return _length(value[0], unit), _length(value[1], unit)
+    value = _length(value, unit)
+    return value, value
+
+
+def grid(count, columns=None, spacing=10, origin=(0, 0), unit='mm'):
+    """Positions of ``count`` shapes on a grid, row by row.
+
+    Parameters:
+    ----------
+    - count : int
+    - columns : int, optional
+        Shapes per row; a square-ish grid if omitted.
+    - spacing : number, str or pair
+        Distance between neighbours, ``(dx, dy)`` for different spacings.
+        Strings like ``'20 mm'`` may use any unit, numbers are in ``unit``.
+        A negative ``dy`` lays the rows out downwards.
+    - origin : pair
+        Position of the first shape.
+    - unit : str
+        Unit of the returned arrays.
+
+    Returns:
+    --------
+    - (x, y) numpy arrays
+    """
+    _require_numpy()
+    if columns is None:
+        columns = max(1, math.ceil(math.sqrt(count)))
+    dx, dy = _pair(spacing, unit)
+    x0, y0 = _pair(origin, unit)
+    index = np.arange(count)
+    return x0 + (index % columns) * dx, y0 + (index // columns) * dy
+
+
+def rows_cols(rows, columns, spacing=10, origin=(0, 0), unit='mm'):
+    """Positions of a full ``rows`` x ``columns`` grid, see :func:`grid`."""
+    return grid(rows * columns, columns, spacing, origin, unit)
+
+
+def wrap_grid(count, width, spacing=10, margin=0, unit='mm'):
+    """Grid that wraps into a new row before ``width`` is exceeded.
+
+    Starts at ``(margin, margin)`` and keeps ``margin`` to the right edge,
+    e.g. ``wrap_grid(200, page_width, '20 mm', '20 mm')``.
+    """
+    dx, _ = _pair(spacing, unit)
+    width, margin = _length(width, unit), _length(margin, unit)
+    columns = max(1, int((width - 2 * margin) // dx) + 1)
+    return grid(count, columns, spacing, (margin, margin), unit)
+
+
+def _ids(result):
+    # makepy-generated wrappers return the out parameter: (count, ids)
+    if isinstance(result, tuple) and len(result) == 2 \
+            and isinstance(result[1], (tuple, list)):
+        return result[1]
+    raise TypeError("DropMany did not return the shape IDs; use an early "
+                    "bound Application (win32com.client.gencache."
+                    "EnsureDispatch)")
+
+
+def drop_many(page, objects, x, y, unit='mm', universal=True,
+              chunk_size=CHUNK_SIZE):
+    """Drop ``objects`` at the positions ``x``/``y`` with ``DropMany``.
+
+    Parameters:
+    ----------
+    - page : Visio Page
+    - objects : object or sequence
+        A master, master name (document stencil) or shape, or one of those
+        per position.
+    - x, y : array-like
+        Pin positions in ``unit``.
+    - universal : bool
+        Use ``DropManyU`` (universal master names).
+
+    Returns:
+    --------
+    - numpy array of the new shape IDs, in input order.
+    """
+    _require_numpy()
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float),
+                               np.asarray(y, dtype=float))
+    xy = np.column_stack((x.ravel(), y.ravel())).ravel()
+    xy = xy * units.factor(unit)
+    count = len(xy) // 2
+    if not isinstance(objects, (list, tuple, np.ndarray)):
+        objects = [objects] * count
+    elif len(objects) != count:
+        raise ValueError(f"{len(objects)} objects for {count} positions")
+    drop = page.DropManyU if universal else page.DropMany
+    ids = []
+    for start in range(0, count, chunk_size):
+        stop = min(start + chunk_size, count)
+        ids.extend(_ids(drop(tuple(objects[start:stop]),
+                             tuple(xy[2 * start:2 * stop].tolist()))))
+    return np.array(ids, dtype=int)
+
+
+def _cell_edits(ids, cells, unit, angle_unit):
+    edits = []
+    for cell, values in cells.items():
+        if isinstance(values, (str, int, float)):
+            values = [values] * len(ids)
+        elif len(values) != len(ids):
+            raise ValueError(f"{len(values)} values of {cell} for "
+                             f"{len(ids)} shapes")
+        cell_u = cell_unit(cell, unit, angle_unit)
+        for shape_id, value in zip(ids.tolist(), values):
+            if isinstance(value, str):
+                edits.append(CellEdit(shape_id, cell, formula=value))
+            else:
+                edits.append(CellEdit(shape_id, cell, value=float(value),
+                                      unit=cell_u))
+    return edits
+
+
+def create_shapes(page, objects, x, y, cells=None, size=(10, 10), unit='mm',
+                  angle_unit='deg', universal=True, chunk_size=CHUNK_SIZE):
+    """Create shapes in bulk and set their initial cells.
+
+    Parameters:
+    ----------
+    - page : Visio Page
+    - objects : object or sequence
+        What to create, one for all or one per position: masters, master
+        names, shapes, or the primitives ``'rectangle'``/``'ellipse'``.  A
+        primitive is drawn once as template, dropped, and deleted again.
+    - x, y : array-like
+        Pin positions in ``unit``.
+    - cells : dict, optional
+        ``{cell: value or sequence}`` written after the drop in one batched
+        call.  Numbers are values in ``unit`` (``angle_unit`` for angles),
+        strings are formulas.
+    - size : pair
+        Width and height of primitives in ``unit``.
+
+    Returns:
+    --------
+    - Created(ids, cells)
+    """
+    _require_numpy()
+    single = not isinstance(objects, (list, tuple, np.ndarray))
+    kinds = {o for o in ([objects] if single else objects)
+             if isinstance(o, str)}
+    templates = {}
+    width, height = (v * units.factor(unit) for v in _pair(size, unit))
+    for kind in kinds:
+        if kind in PRIMITIVES:
+            draw = getattr(page, PRIMITIVES[kind])
+            templates[kind] = draw(0, 0, width, height)
+    try:
+        if single:
+            objects = templates.get(objects, objects) \
+                if isinstance(objects, str) else objects
+        elif templates:
+            objects = [templates.get(o, o) if isinstance(o, str) else o
+                       for o in objects]
+        ids = drop_many(page, objects, x, y, unit, universal, chunk_size)
+    finally:
+        for template in templates.values():
+            template.Delete()
+    result = None
+    if cells:
+        result = write_cells(page, _cell_edits(ids, cells, unit, angle_unit),
+                             chunk_size=chunk_size)
+    return Created(ids, result)
@@ -0,0 +1,492 @@
+"""What changed between two versions of a drawing.
+
+:func:`fingerprint` reduces a drawing to content hashes: one per shape
+(over its cells, Shape Data/User rows, text and master) and one per page
+(over the hashes of its shapes).  It reads a .vsdx file in one streaming
+pass (:mod:`visiopy.vsdx`, no Visio) or a live page with one batched
+``GetFormulasU``.  :func:`diff` compares two fingerprints: pages whose
+hashes match are skipped without looking at a single shape, and for the
+rest a :class:`ChangeSet` lists the added, removed and modified shapes
+down to the cells that differ.  ``ChangeSet.edits()`` turns the cell
+changes into the edit format of :mod:`visiopy.patch`, so
+:func:`apply_changes` replays them on a live document or a file.
+
+Both sides must be fingerprinted with the same options.  By default the
+transform cells (:data:`SHAPE_CELLS`), all Shape Data
+and User rows, the text and the master name of the top level shapes are
+covered, plus ``PageWidth``/``PageHeight`` as shape ``0``; these are the
+parts a live page and its saved file agree on.  ``cells='all'`` covers
+every cell and section of a .vsdx file (file against file only).  Values
+are compared by result where the formula is a constant (``'25.4 mm'``
+equals ``1 in``), otherwise by formula text.  Shape Data and User rows are
+addressed by their name (``(section, row name, cell)``), so inserting a
+row, or a row inherited from the master, does not shift the others, and
+:meth:`ChangeSet.edits` writes them as ``Prop.<Row>.<Cell>``.
+
+With ``previous=`` a new fingerprint of a file reuses the pages of an
+older one whose page part is byte-identical (zip CRC), without parsing
+them.
+
+Usage:
+------
+    from visiopy.diff import apply_changes, diff, fingerprint
+
+    old = fingerprint('plant_v1.vsdx')
+    new = fingerprint('plant_v2.vsdx', previous=old)
+    changes = diff(old, new)
+    changes.modified      # [ShapeChange(page, shape_id, 'modified', ...)]
+    apply_changes(vDoc, changes)     # bring the open v1 up to v2
+
+    diff(fingerprint('plant.vsdx'), fingerprint(vDoc))   # unsaved changes
+"""
+import hashlib
+import os
+from collections import namedtuple
+
+from . import units
+from .batch import CellEdit, PAGE_SHEET_ID, PROP_CELLS, USER_CELLS, \
+    read_cells, shape_ids, visSectionProp, visSectionUser
+
+# the transform cells without FlipX/FlipY, which a saved file leaves out
+# unless they are set
+SHAPE_CELLS = ('PinX', 'PinY', 'Width', 'Height', 'LocPinX', 'LocPinY',
+               'Angle')
+PAGE_CELLS = ('PageWidth', 'PageHeight')
+
+# row sections covered with rows=True: .vsdx name -> (section, columns)
+_ROW_SECTIONS = {
+    'Property': (visSectionProp, dict(PROP_CELLS, verify=PROP_CELLS['ask'])),
+    'User': (visSectionUser, USER_CELLS),
+}
+# row cells that Visio reports with a value even when the file leaves
+# them out; treated like missing cells
+_ROW_DEFAULTS = {
+    (visSectionProp, PROP_CELLS['type']): ('v', 0.0),
+    (visSectionProp, PROP_CELLS['invisible']): ('v', 0.0),
+    (visSectionProp, PROP_CELLS['ask']): ('v', 0.0),
+}
+# cell names for the edits: section -> (prefix, {column: name})
+_ROW_NAMES = {
+    visSectionProp: ('Prop', {c: n.title() for n, c in PROP_CELLS.items()}),
+    visSectionUser: ('User', {c: n.title() for n, c in USER_CELLS.items()}),
+}
+
+
+class ShapeFingerprint(namedtuple('ShapeFingerprint',
+                                  'id digest master text cells')):
+    """Hash and content of one shape; ``cells`` maps a cell name or a
+    ``(section, row name, cell)`` tuple to ``(comparable value, formula)``.
+    """
+    __slots__ = ()
+
+
+class PageFingerprint(namedtuple('PageFingerprint',
+                                 'name digest shapes part')):
+    """Hash of a page and its shapes by ID; ``part`` identifies the page
+    part of a file (``None`` for live pages)."""
+    __slots__ = ()
+
+
+class ShapeChange(namedtuple('ShapeChange',
+                             'page shape_id kind cells text master')):
+    """One added, removed or modified shape.
+
+    ``cells`` maps each differing cell to ``(old formula, new formula)``
+    (``None`` where the cell does not exist); ``text`` and ``master`` are
+    ``(old, new)`` or ``None`` if unchanged.
+    """
+    __slots__ = ()
+
+
+class Fingerprints:
+    """Fingerprints of the pages of a drawing, by page name."""
+
+    def __init__(self, pages, scope, masters=None):
+        self.pages = pages
+        self.scope = scope
+        self.masters = masters
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __getitem__(self, name):
+        return self.pages[name]
+
+    def __iter__(self):
+        return iter(self.pages.values())
+
+    def __repr__(self):
+        shapes = sum(len(p.shapes) for p in self.pages.values())
+        return f"<Fingerprints {len(self.pages)} pages, {shapes} shapes>"
+
+
+class ChangeSet:
+    """Result of :func:`diff`: shape changes and page level bookkeeping."""
+
+    def __init__(self):
+        self.shapes = []
+        self.pages_added = []
+        self.pages_removed = []
+        self.pages_skipped = []
+
+    def _kind(self, kind):
+        return [c for c in self.shapes if c.kind == kind]
+
+    @property
+    def added(self):
+        return self._kind('added')
+
+    @property
+    def removed(self):
+        return self._kind('removed')
+
+    @property
+    def modified(self):
+        return self._kind('modified')
+
+    def __len__(self):
+        return len(self.shapes) + len(self.pages_added) + \
+            len(self.pages_removed)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def edits(self):
+        """The cell changes of modified shapes as ``{page: [CellEdit]}``.
+
+        Added and removed shapes and pages, text and master changes, cells
+        that disappeared and cells outside the Shape Data/User sections
+        are not expressible as cell writes; see :meth:`unreplayable`.
+        """
+        edits = {}
+        for change in self.modified:
+            for key, (_, new) in change.cells.items():
+                if new is not None and _writable(key):
+                    edits.setdefault(change.page, []).append(
+                        CellEdit(change.shape_id, _cell_name(key),
+                                 formula=new))
+        return edits
+
+    def unreplayable(self):
+        """The changes that :meth:`edits` leaves out."""
+        left = []
+        for change in self.shapes:
+            if change.kind != 'modified':
+                left.append(change)
+                continue
+            cells = {k: v for k, v in change.cells.items()
+                     if v[1] is None or not _writable(k)}
+            if cells or change.text or change.master:
+                left.append(change._replace(cells=cells))
+        return left
+
+    def __repr__(self):
+        return (f"<ChangeSet {len(self.added)} added, {len(self.removed)} "
+                f"removed, {len(self.modified)} modified shapes; "
+                f"{len(self.pages_skipped)} pages unchanged>")
+
+
+def _writable(key):
+    return isinstance(key, str) or (
+        len(key) == 3 and key[0] in _ROW_NAMES)
+
+
+def _cell_name(key):
+    """``'Prop.<Row>.<Cell>'`` for a row key, other names unchanged."""
+    if isinstance(key, str):
+        return key
+    prefix, names = _ROW_NAMES[key[0]]
+    return f"{prefix}.{key[1]}.{names[key[2]]}"
+
+
+def _quote(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _canonical(formula):
+    """Comparable form of a formula: ``('v', result)`` for constants,
+    ``('f', text)`` for everything else, ``None`` for empty cells."""
+    if formula is None:
+        return None
+    text = str(formula).strip()
+    if text.startswith('='):
+        text = text[1:].strip()
+    if not text:
+        return None
+    constant = units.parse_constant(text)
+    if constant is None:
+        return 'f', text
+    value = constant[0]
+    if isinstance(value, str):
+        return ('v', value) if value else None
+    return 'v', round(value, 9)
+
+
+def _vsdx_entry(cell):
+    """``(comparable value, formula)`` of a .vsdx cell, or ``None``."""
+    if cell is None:
+        return None
+    if cell.formula_attr not in (None, 'Inh', ''):
+        canonical = _canonical(cell.formula_attr)
+        return (canonical, cell.formula_attr) if canonical else None
+    value = cell.value
+    if value is None or value == '':
+        return None
+    if cell.unit != 'STR':
+        try:
+            return ('v', round(float(value), 9)), cell.formula
+        except ValueError:
+            pass
+    return ('v', value), _quote(value)
+
+
+def _digest(master, text, cells):
+    h = hashlib.blake2b(digest_size=8)
+    h.update(repr((master, text)).encode())
+    for key in sorted(cells, key=repr):
+        h.update(repr((key, cells[key][0])).encode())
+    return h.hexdigest()
+
+
+def _shape_fp(shape_id, master, text, cells):
+    cells = {k: v for k, v in cells.items()
+             if v is not None and _ROW_DEFAULTS.get(k) != v[0]}
+    text = text or None
+    return ShapeFingerprint(shape_id, _digest(master, text, cells), master,
+                            text, cells)
+
+
+def _page_fp(name, shapes, part=None):
+    h = hashlib.blake2b(digest_size=8)
+    for shape_id in sorted(shapes):
+        h.update(f"{shape_id}:{shapes[shape_id].digest};".encode())
+    return PageFingerprint(name, h.hexdigest(), shapes, part)
+
+
+def _scope(cells, rows, text, master):
+    cells = cells if cells == 'all' else tuple(cells)
+    return cells, bool(rows), bool(text), bool(master)
+
+
+# -- .vsdx files -------------------------------------------------------------
+def _vsdx_shape(shape, scope, masters):
+    cells, rows, text, master = scope
+    entries = {}
+    if cells == 'all':
+        for name, cell in shape.cells.items():
+            entries[name] = _vsdx_entry(cell)
+    else:
+        for name in cells:
+            entries[name] = _vsdx_entry(shape.cell(name))
+    for section in shape.sections:
+        if section.name in _ROW_SECTIONS:
+            if not rows:
+                continue
+            sec, columns = _ROW_SECTIONS[section.name]
+            for row in section.rows:
+                for name, cell in row.cells.items():
+                    column = columns.get(name.lower())
+                    if column is not None:
+                        entries[(sec, row.name, column)] = _vsdx_entry(cell)
+        elif cells == 'all':
+            for row in section.rows:
+                key = row.name if row.name is not None else row.index
+                for name, cell in row.cells.items():
+                    entries[(section.name, section.index, key, name)] = \
+                        _vsdx_entry(cell)
+    name = None
+    if master and shape.master is not None:
+        m = masters.get(shape.master)
+        name = m.name_u if m is not None else str(shape.master)
+    return _shape_fp(shape.id, name, shape.text if text else None, entries)
+
+
+def _vsdx_sheet(page, scope):
+    cells = 'all' if scope[0] == 'all' else PAGE_CELLS
+    sheet = _vsdx_shape(page.sheet, (cells, False, False, False), {})
+    return sheet._replace(id=PAGE_SHEET_ID)
+
+
+def _fingerprint_vsdx(path, pages, scope, previous):
+    from .vsdx import VsdxFile
+    vsdx = path if isinstance(path, VsdxFile) else VsdxFile(path)
+    try:
+        masters = tuple(vsdx.part_crc(m.part) for m in vsdx.masters.values()
+                        if m.part is not None)
+        reuse = previous is not None and previous.scope == scope and \
+            previous.masters == masters
+        result = {}
+        for page in vsdx.pages:
+            name = page.name_u or page.name
+            if pages is not None and name not in pages:
+                continue
+            # the PageSheet lives in the page index, not in the page part
+            sheet = _vsdx_sheet(page, scope)
+            part = vsdx.part_crc(page.part) + (sheet.digest,)
+            old = previous.pages.get(name) if reuse else None
+            if old is not None and old.part == part:
+                result[name] = old
+                continue
+            shapes = {PAGE_SHEET_ID: sheet}
+            for shape in vsdx.iter_shapes(page.index):
+                if shape.parent is None:
+                    shapes[shape.id] = _vsdx_shape(shape, scope,
+                                                   vsdx.masters)
+            result[name] = _page_fp(name, shapes, part)
+        return Fingerprints(result, scope, masters)
+    finally:
+        if vsdx is not path:
+            vsdx.close()
+
+
+# -- live documents ----------------------------------------------------------
+def fingerprint_page(page, cells=SHAPE_CELLS, rows=True, text=True,
+                     master=True):
+    """Fingerprint a live page.
+
+    All cells go through one batched ``GetFormulasU``.  Rows, text and
+    master are not available in bulk: ``rows`` costs a ``RowCount`` per
+    shape and section and a ``RowNameU`` per row (rows are keyed by name),
+    ``text`` a ``Shape.Text`` and ``master`` a
+    ``Shape.Master`` (+ ``NameU``) per shape.
+    """
+    scope = _scope(cells, rows, text, master)
+    if scope[0] == 'all':
+        raise ValueError("cells='all' needs a .vsdx file")
+    ids = shape_ids(page)
+    refs = [(sid, name) for sid in ids for name in scope[0]]
+    refs += [(PAGE_SHEET_ID, name) for name in PAGE_CELLS]
+    keys = [name for _, name in refs]
+    extra = {}
+    if rows or text or master:
+        shapes = page.Shapes
+        for sid in ids:
+            shape = shapes.ItemFromID(sid)
+            if rows:
+                for sec, columns in _ROW_SECTIONS.values():
+                    cols = sorted(set(columns.values()))
+                    for r in range(shape.RowCount(sec)):
+                        row = shape.CellsSRC(sec, r, 0).RowNameU
+                        refs.extend((sid, (sec, r, c)) for c in cols)
+                        keys.extend((sec, row, c) for c in cols)
+            name = None
+            if master:
+                m = shape.Master
+                name = m.NameU if m is not None else None
+            extra[sid] = (name, shape.Text if text else None)
+    result = read_cells(page, refs, formulas=True)
+    entries = {sid: {} for sid in ids}
+    entries[PAGE_SHEET_ID] = {}
+    for i, ((sid, _), key) in enumerate(zip(refs, keys)):
+        if i in result.errors:
+            continue
+        formula = result.values[i]
+        canonical = _canonical(formula)
+        if canonical is not None:
+            entries[sid][key] = (canonical, formula)
+    shapes = {}
+    for sid, cells_ in entries.items():
+        name, txt = extra.get(sid, (None, None))
+        shapes[sid] = _shape_fp(sid, name, txt, cells_)
+    return _page_fp(page.NameU, shapes)
+
+
+def fingerprint(target, pages=None, previous=None, cells=SHAPE_CELLS,
+                rows=True, text=True, master=True):
+    """Fingerprint a drawing.
+
+    Parameters:
+    ----------
+    - target : str, VsdxFile, Visio Document or Page
+    - pages : collection of str, optional
+        Only these pages (by universal name).
+    - previous : Fingerprints, optional
+        Older fingerprint of the same file; unchanged page parts are
+        reused without parsing.
+    - cells : sequence of str or 'all'
+        Single-row cells to cover (``'all'``: every cell and section of a
+        .vsdx file).
+    - rows, text, master : bool
+        Cover Shape Data/User rows, shape text, master names.
+
+    Returns:
+    --------
+    - Fingerprints
+    """
+    scope = _scope(cells, rows, text, master)
+    if isinstance(target, (str, os.PathLike)) or hasattr(target,
+                                                         'iter_shapes'):
+        return _fingerprint_vsdx(target, pages, scope, previous)
+    targets = list(target.Pages) if hasattr(target, 'Pages') else [target]
+    result = {}
+    for page in targets:
+        if pages is None or page.NameU in pages:
+            fp = fingerprint_page(page, *scope)
+            result[fp.name] = fp
+    return Fingerprints(result, scope)
+
+
+# -- comparison --------------------------------------------------------------
+def _formula(entry):
+    return entry[1] if entry is not None else None
+
+
+def _changed(old, new):
+    return (old, new) if old != new else None
+
+
+def _diff_page(changes, name, old, new):
+    for sid in sorted(set(old.shapes) | set(new.shapes)):
+        a, b = old.shapes.get(sid), new.shapes.get(sid)
+        if a is not None and b is not None and a.digest == b.digest:
+            continue
+        if a is None:
+            changes.shapes.append(ShapeChange(
+                name, sid, 'added',
+                {k: (None, v[1]) for k, v in b.cells.items()},
+                _changed(None, b.text), _changed(None, b.master)))
+        elif b is None:
+            changes.shapes.append(ShapeChange(
+                name, sid, 'removed',
+                {k: (v[1], None) for k, v in a.cells.items()},
+                _changed(a.text, None), _changed(a.master, None)))
+        else:
+            cells = {}
+            for key in set(a.cells) | set(b.cells):
+                x, y = a.cells.get(key), b.cells.get(key)
+                if (x and x[0]) != (y and y[0]):
+                    cells[key] = (_formula(x), _formula(y))
+            changes.shapes.append(ShapeChange(
+                name, sid, 'modified', cells, _changed(a.text, b.text),
+                _changed(a.master, b.master)))
+
+
+def diff(old, new):
+    """Compare two :class:`Fingerprints`; returns a :class:`ChangeSet`.
+
+    The change set describes how to get from ``old`` to ``new``.
+    """
+    if old.scope != new.scope:
+        raise ValueError("The fingerprints cover different cells; create "
+                         "both with the same options")
+    changes = ChangeSet()
+    for name, page in new.pages.items():
+        before = old.pages.get(name)
+        if before is None:
+            changes.pages_added.append(name)
+        elif before.digest == page.digest:
+            changes.pages_skipped.append(name)
+        else:
+            _diff_page(changes, name, before, page)
+    changes.pages_removed = [n for n in old.pages if n not in new.pages]
+    return changes
+
+
+def apply_changes(target, changes, dst=None):
+    """Replay the cell changes of ``changes`` on a document or file.
+
+    Goes through :func:`visiopy.patch.apply_edits`; returns its
+    ``{page: BatchResult}``.
+    """
+    from .patch import apply_edits
+    return apply_edits(target, changes.edits(), dst)
@@ -0,0 +1,796 @@
+"""Render .vsdx pages to SVG or GeoJSON without Visio.
+
+``Page.Export`` needs a running Visio, is single threaded and Windows only.
+The functions here stream the shapes of a page out of the package (see
+:mod:`visiopy.vsdx`), turn their Geometry sections into paths, place them
+with the shape transforms (PinX/PinY, LocPinX/LocPinY, Angle, FlipX/FlipY)
+through all levels of group nesting and write each shape as soon as it is
+converted: no DOM, memory stays flat for very large pages.
+
+Supported rows: MoveTo, LineTo, ArcTo, EllipticalArcTo, Ellipse, RelMoveTo,
+RelLineTo, RelCubBezTo, RelQuadBezTo, RelEllipticalArcTo, PolylineTo and
+NURBSTo (sampled, with a clamped knot vector; Visio's own knot handling may
+bend slightly differently).  SplineStart/SplineKnot rows are drawn as
+straight lines.  Line and fill come from the shape's own cells
+(LineColor, LineWeight, LinePattern, FillForegnd, FillPattern); styles and
+themes are not resolved, shapes without those cells get a black line and a
+white fill.
+
+Large pages can be cut into tiles (:func:`export_tiles`); each worker
+process reads the page once and writes all tiles it was given, so tiles
+render in parallel.
+
+Usage:
+------
+    from visiopy.export import export_geojson, export_svg, export_tiles
+
+    export_svg('plant.vsdx', 'plant.svg', page='Plan', unit='mm')
+    export_geojson('plant.vsdx', 'plant.geojson')
+    export_tiles('plant.vsdx', 'tiles/', tile_size=500, workers=4)
+"""
+import io
+import json
+import math
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape, quoteattr
+
+from . import units
+from .vsdx import VsdxFile
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+ARC_STEP = math.radians(5)      # GeoJSON arcs: one point every 5 degrees
+CURVE_POINTS = 16               # GeoJSON Bezier/NURBS samples per segment
+
+# the first entries of Visio's color table (FillForegnd = 4 is blue)
+COLORS = ('#000000', '#FFFFFF', '#FF0000', '#00FF00', '#0000FF', '#FFFF00',
+          '#FF00FF', '#00FFFF', '#800000', '#008000', '#000080', '#808000',
+          '#800080', '#008080', '#C0C0C0', '#E6E6E6', '#CDCDCD', '#B3B3B3',
+          '#9A9A9A', '#808080', '#666666', '#4D4D4D', '#333333', '#1A1A1A')
+
+Path = namedtuple('Path', 'segments closed fill line')
+
+
+# -- transforms ----------------------------------------------------------------
+
+def multiply(m, n):
+    """Affine ``m`` after ``n``; matrices are ``(a, b, c, d, e, f)`` with
+    ``x' = a*x + c*y + e`` and ``y' = b*x + d*y + f`` like SVG."""
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (a * a2 + c * b2, b * a2 + d * b2, a * c2 + c * d2,
+            b * c2 + d * d2, a * e2 + c * f2 + e, b * e2 + d * f2 + f)
+
+
+def _point(m, x, y):
+    return m[0] * x + m[2] * y + m[4], m[1] * x + m[3] * y + m[5]
+
+
+def _number(cells, name, default=0.0):
+    cell = cells.get(name)
+    value = cell.result if cell is not None else None
+    return value if isinstance(value, float) else default
+
+
+def shape_transform(shape):
+    """Affine from the shape's local coordinates to its parent's."""
+    cells = shape.cells
+    width, height = _number(cells, 'Width'), _number(cells, 'Height')
+    loc_x = _number(cells, 'LocPinX', width / 2)
+    loc_y = _number(cells, 'LocPinY', height / 2)
+    angle = _number(cells, 'Angle')
+    flip_x = -1.0 if _number(cells, 'FlipX') else 1.0
+    flip_y = -1.0 if _number(cells, 'FlipY') else 1.0
+    cos, sin = math.cos(angle), math.sin(angle)
+    a, b, c, d = cos * flip_x, sin * flip_x, -sin * flip_y, cos * flip_y
+    return (a, b, c, d,
+            _number(cells, 'PinX') - (a * loc_x + c * loc_y),
+            _number(cells, 'PinY') - (b * loc_x + d * loc_y))
+
+
+# -- geometry rows -------------------------------------------------------------
+
+def _bow_arc(x0, y0, x1, y1, bow):
+    """ArcTo: circular arc whose midpoint is ``bow`` off the chord
+    (positive bows run counter-clockwise)."""
+    half = math.hypot(x1 - x0, y1 - y0) / 2
+    if abs(bow) < 1e-12 or half == 0:
+        return ('L', x1, y1)
+    sagitta = abs(bow)
+    radius = (half * half + sagitta * sagitta) / (2 * sagitta)
+    return ('A', radius, radius, 0.0, sagitta > half, bow > 0, x1, y1)
+
+
+def _elliptical_arc(x0, y0, cx, cy, x1, y1, angle, ratio):
+    """EllipticalArcTo: arc from (x0, y0) through (cx, cy) to (x1, y1) on an
+    ellipse whose major axis has ``angle`` and ``ratio`` major/minor."""
+    if ratio <= 0:
+        return ('L', x1, y1)
+    cos, sin = math.cos(-angle), math.sin(-angle)
+    ax, ay, bx, by, ex, ey = [
+        v for x, y in ((x0, y0), (cx, cy), (x1, y1))
+        for v in ((x * cos - y * sin) / ratio, x * sin + y * cos)]
+    det = 2 * (ax * (by - ey) + bx * (ey - ay) + ex * (ay - by))
+    if abs(det) < 1e-12:
+        return ('L', x1, y1)
+    a2, b2, e2 = ax * ax + ay * ay, bx * bx + by * by, ex * ex + ey * ey
+    ux = (a2 * (by - ey) + b2 * (ey - ay) + e2 * (ay - by)) / det
+    uy = (a2 * (ex - bx) + b2 * (ax - ex) + e2 * (bx - ax)) / det
+    radius = math.hypot(ax - ux, ay - uy)
+    # points on a circle are passed in the orientation of their triangle
+    ccw = (bx - ax) * (ey - ay) - (by - ay) * (ex - ax) > 0
+    start, end = math.atan2(ay - uy, ax - ux), math.atan2(ey - uy, ex - ux)
+    swept = (end - start) % (2 * math.pi) if ccw else \
+        (start - end) % (2 * math.pi)
+    return ('A', radius * ratio, radius, angle, swept > math.pi, ccw, x1, y1)
+
+
+def _ellipse(x, y, ax, ay, bx, by):
+    """Ellipse row: centre, one point on each axis; a closed sub-path."""
+    rx, ry = math.hypot(ax - x, ay - y), math.hypot(bx - x, by - y)
+    rotation = math.atan2(ay - y, ax - x)
+    ox, oy = 2 * x - ax, 2 * y - ay
+    return [('M', ax, ay), ('A', rx, ry, rotation, False, True, ox, oy),
+            ('A', rx, ry, rotation, False, True, ax, ay), ('Z',)]
+
+
+def _function_args(cell):
+    """Numbers inside ``POLYLINE(...)``/``NURBS(...)`` of a cell."""
+    if cell is None:
+        return []
+    text = cell.formula_attr if cell.formula_attr not in (None, 'Inh') \
+        else cell.value
+    if not text or '(' not in text:
+        return []
+    inner = text[text.index('(') + 1:text.rindex(')')]
+    try:
+        return [float(v) for v in inner.split(',') if v.strip()]
+    except ValueError:
+        return []
+
+
+def _nurbs(points, weights, knots, degree, samples):
+    """Sample a NURBS curve (de Boor); the knot vector is clamped to the
+    end points, interior knots are taken from ``knots`` where they fit."""
+    n = len(points)
+    degree = max(1, min(int(degree), n - 1))
+    first, last = knots[0], knots[-1]
+    inner = [k for k in knots[1:-1] if first < k < last]
+    if len(inner) != n - degree - 1:
+        inner = [first + (last - first) * i / (n - degree)
+                 for i in range(1, n - degree)]
+    vector = [first] * (degree + 1) + inner + [last] * (degree + 1)
+    if last <= first:
+        return [points[-1]]
+    out = []
+    for i in range(1, samples + 1):
+        t = first + (last - first) * i / samples
+        span = degree
+        while span < n - 1 and vector[span + 1] <= t:
+            span += 1
+        d = [(points[j][0] * weights[j], points[j][1] * weights[j],
+              weights[j]) for j in range(span - degree, span + 1)]
+        for r in range(1, degree + 1):
+            for j in range(degree, r - 1, -1):
+                k = j + span - degree
+                denom = vector[k + degree - r + 1] - vector[k]
+                alpha = (t - vector[k]) / denom if denom else 0.0
+                d[j] = tuple((1 - alpha) * p + alpha * q
+                             for p, q in zip(d[j - 1], d[j]))
+        x, y, w = d[degree]
+        out.append((x / w, y / w) if w else points[-1])
+    return out
+
+
+def geometry_paths(shape):
+    """The visible Geometry sections of a shape as :class:`Path` objects.
+
+    Segments are in shape-local coordinates (internal units):
+    ``('M', x, y)``, ``('L', x, y)``, ``('C', x1, y1, x2, y2, x, y)``,
+    ``('Q', x1, y1, x, y)``, ``('A', rx, ry, rotation, large, sweep, x, y)``
+    (rotation in radians, ``sweep`` counter-clockwise) and ``('Z',)``.
+    """
+    width = _number(shape.cells, 'Width')
+    height = _number(shape.cells, 'Height')
+    paths = []
+    for section in shape.sections:
+        if section.name != 'Geometry' or \
+                _number(section.cells, 'NoShow'):
+            continue
+        segments = []
+        x = y = None
+        start = None
+        for row in section.rows:
+            kind, c = row.type, row.cells
+            px, py = _number(c, 'X'), _number(c, 'Y')
+            if kind in ('RelMoveTo', 'RelLineTo', 'RelCubBezTo',
+                        'RelQuadBezTo', 'RelEllipticalArcTo'):
+                px, py = px * width, py * height
+            if kind in ('MoveTo', 'RelMoveTo') or (x is None and kind not in
+                                                   ('Ellipse',
+                                                    'InfiniteLine')):
+                segments.append(('M', px, py))
+                start = (px, py)
+            elif kind == 'ArcTo':
+                segments.append(_bow_arc(x, y, px, py, _number(c, 'A')))
+            elif kind in ('EllipticalArcTo', 'RelEllipticalArcTo'):
+                ax, ay = _number(c, 'A'), _number(c, 'B')
+                if kind == 'RelEllipticalArcTo':
+                    ax, ay = ax * width, ay * height
+                segments.append(_elliptical_arc(
+                    x, y, ax, ay, px, py, _number(c, 'C'),
+                    _number(c, 'D', 1.0)))
+            elif kind == 'RelCubBezTo':
+                segments.append(('C', _number(c, 'A') * width,
+                                 _number(c, 'B') * height,
+                                 _number(c, 'C') * width,
+                                 _number(c, 'D') * height, px, py))
+            elif kind == 'RelQuadBezTo':
+                segments.append(('Q', _number(c, 'A') * width,
+                                 _number(c, 'B') * height, px, py))
+            elif kind == 'Ellipse':
+                segments.extend(_ellipse(px, py, _number(c, 'A'),
+                                         _number(c, 'B'), _number(c, 'C'),
+                                         _number(c, 'D')))
+                x = y = None
+                continue
+            elif kind == 'PolylineTo':
+                args = _function_args(c.get('A'))
+                if len(args) >= 2:
+                    sx = width if not args[0] else 1.0
+                    sy = height if not args[1] else 1.0
+                    values = args[2:]
+                    segments.extend(('L', values[i] * sx, values[i + 1] * sy)
+                                    for i in range(0, len(values) - 1, 2))
+                segments.append(('L', px, py))
+            elif kind == 'NURBSTo':
+                segments.extend(('L', nx, ny) for nx, ny in
+                                _nurbs_row(c, x, y, px, py, width, height))
+            elif kind == 'InfiniteLine':
+                continue
+            else:               # LineTo, RelLineTo, SplineStart/Knot, ...
+                segments.append(('L', px, py))
+            x, y = px, py
+        if not segments:
+            continue
+        closed = segments[-1] == ('Z',) or (
+            start is not None and x is not None and
+            abs(x - start[0]) < 1e-9 and abs(y - start[1]) < 1e-9)
+        paths.append(Path(segments, closed,
+                          closed and not _number(section.cells, 'NoFill'),
+                          not _number(section.cells, 'NoLine')))
+    return paths
+
+
+def _nurbs_row(cells, x0, y0, x1, y1, width, height):
+    args = _function_args(cells.get('E'))
+    if len(args) < 4:
+        return [(x1, y1)]
+    knot_last, degree, x_type, y_type = args[:4]
+    sx = width if not x_type else 1.0
+    sy = height if not y_type else 1.0
+    points, weights = [(x0, y0)], [_number(cells, 'D', 1.0)]
+    knots = [_number(cells, 'C')]
+    values = args[4:]
+    for i in range(0, len(values) - 3, 4):
+        points.append((values[i] * sx, values[i + 1] * sy))
+        knots.append(values[i + 2])
+        weights.append(values[i + 3])
+    points.append((x1, y1))
+    weights.append(_number(cells, 'B', 1.0))
+    knots += [_number(cells, 'A'), knot_last]
+    return _nurbs(points, weights, knots, degree, CURVE_POINTS)
+
+
+def transform_segments(segments, m):
+    """Apply the affine ``m`` (rotation/reflection/uniform scale)."""
+    det = m[0] * m[3] - m[1] * m[2]
+    scale, mirror = math.sqrt(abs(det)), det < 0
+    out = []
+    for seg in segments:
+        kind = seg[0]
+        if kind == 'A':
+            _, rx, ry, rotation, large, sweep, x, y = seg
+            ux = m[0] * math.cos(rotation) + m[2] * math.sin(rotation)
+            uy = m[1] * math.cos(rotation) + m[3] * math.sin(rotation)
+            out.append(('A', rx * scale, ry * scale, math.atan2(uy, ux),
+                        large, sweep != mirror) + _point(m, x, y))
+        elif kind == 'Z':
+            out.append(seg)
+        else:
+            coords = seg[1:]
+            moved = []
+            for i in range(0, len(coords), 2):
+                moved.extend(_point(m, coords[i], coords[i + 1]))
+            out.append((kind,) + tuple(moved))
+    return out
+
+
+def _arc_points(x1, y1, seg, step):
+    """Points along an ``('A', ...)`` segment starting at (x1, y1)."""
+    _, rx, ry, phi, large, sweep, x2, y2 = seg
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0 or (x1, y1) == (x2, y2):
+        return [(x2, y2)]
+    cos, sin = math.cos(phi), math.sin(phi)
+    dx, dy = (x1 - x2) / 2, (y1 - y2) / 2
+    x1p, y1p = cos * dx + sin * dy, -sin * dx + cos * dy
+    scale = (x1p / rx) ** 2 + (y1p / ry) ** 2
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+    num = (rx * ry) ** 2 - (rx * y1p) ** 2 - (ry * x1p) ** 2
+    den = (rx * y1p) ** 2 + (ry * x1p) ** 2
+    coef = math.sqrt(max(num, 0.0) / den) if den else 0.0
+    if large == sweep:
+        coef = -coef
+    cxp, cyp = coef * rx * y1p / ry, -coef * ry * x1p / rx
+    cx = cos * cxp - sin * cyp + (x1 + x2) / 2
+    cy = sin * cxp + cos * cyp + (y1 + y2) / 2
+    theta = math.atan2((y1p - cyp) / ry, (x1p - cxp) / rx)
+    delta = math.atan2((-y1p - cyp) / ry, (-x1p - cxp) / rx) - theta
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+    n = max(2, int(math.ceil(abs(delta) / step)))
+    out = []
+    for i in range(1, n + 1):
+        t = theta + delta * i / n
+        out.append((cx + cos * rx * math.cos(t) - sin * ry * math.sin(t),
+                    cy + sin * rx * math.cos(t) + cos * ry * math.sin(t)))
+    out[-1] = (x2, y2)
+    return out
+
+
+def flatten(segments, step=ARC_STEP, samples=CURVE_POINTS):
+    """Polylines (lists of points) of a segment list, one per sub-path."""
+    lines, current = [], None
+    for seg in segments:
+        kind = seg[0]
+        if kind == 'M':
+            current = [seg[1:3]]
+            lines.append(current)
+            continue
+        if kind == 'Z':
+            if current and current[0] != current[-1]:
+                current.append(current[0])
+            continue
+        if current is None:
+            current = [(0.0, 0.0)]
+            lines.append(current)
+        x, y = current[-1]
+        if kind == 'L':
+            current.append(seg[1:3])
+        elif kind == 'A':
+            current.extend(_arc_points(x, y, seg, step))
+        else:
+            ctrl = [(x, y)] + [seg[i:i + 2] for i in range(1, len(seg), 2)]
+            for i in range(1, samples + 1):
+                t = i / samples
+                pts = ctrl
+                while len(pts) > 1:   # de Casteljau
+                    pts = [((1 - t) * a[0] + t * b[0],
+                            (1 - t) * a[1] + t * b[1])
+                           for a, b in zip(pts, pts[1:])]
+                current.append(pts[0])
+    return lines
+
+
+# -- shape records ---------------------------------------------------------------
+
+def _color(cells, name, default):
+    cell = cells.get(name)
+    if cell is None or cell.value is None:
+        return default
+    value = cell.value
+    if value.startswith('#') and len(value) == 7:
+        return value.upper()
+    try:
+        index = int(float(value))
+    except ValueError:
+        return default
+    return COLORS[index] if 0 <= index < len(COLORS) else default
+
+
+def _style(cells):
+    """``(stroke, stroke width in internal units, fill)``; ``None`` for
+    no line / no fill."""
+    stroke = None if _number(cells, 'LinePattern', 1.0) == 0 else \
+        _color(cells, 'LineColor', '#000000')
+    fill = None if _number(cells, 'FillPattern', 1.0) == 0 else \
+        _color(cells, 'FillForegnd', '#FFFFFF')
+    return stroke, _number(cells, 'LineWeight', 0.75 / 72), fill
+
+
+class _Record:
+    """One converted shape, shared by all writers of a render pass."""
+    __slots__ = ('shape', 'ancestors', 'paths', 'bbox', 'style', 'center',
+                 'font_size', 'cache')
+
+    def __init__(self, shape, ancestors, matrix):
+        self.shape = shape
+        self.ancestors = ancestors
+        self.paths = [Path(transform_segments(p.segments, matrix), p.closed,
+                           p.fill, p.line) for p in geometry_paths(shape)]
+        self.style = _style(shape.cells)
+        width = _number(shape.cells, 'Width')
+        height = _number(shape.cells, 'Height')
+        self.center = _point(matrix, width / 2, height / 2)
+        char = shape.section('Character')
+        size = char.rows[0].cells if char and char.rows else {}
+        self.font_size = _number(size, 'Size', 1 / 6.0)
+        points = [p for path in self.paths for line in
+                  flatten(path.segments, math.radians(30), 4) for p in line]
+        if not points:
+            points = [_point(matrix, x, y) for x in (0, width)
+                      for y in (0, height)]
+        xs, ys = [p[0] for p in points], [p[1] for p in points]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+        self.cache = {}
+
+    @property
+    def is_group(self):
+        return self.shape.type == 'Group'
+
+
+def _records(vsdx, page):
+    """Yield a :class:`_Record` per shape, in document order."""
+    matrices = {}       # group id -> (page matrix, ancestors)
+    for shape in vsdx.iter_shapes(page):
+        parent, ancestors = IDENTITY, ()
+        if shape.parent is not None and shape.parent in matrices:
+            parent, ancestors = matrices[shape.parent]
+            ancestors = ancestors + (shape.parent,)
+        matrix = multiply(parent, shape_transform(shape))
+        if shape.type == 'Group':
+            matrices[shape.id] = (matrix, ancestors)
+        yield _Record(shape, ancestors, matrix)
+
+
+def _fmt(value, precision):
+    text = f"{value:.{precision}f}".rstrip('0').rstrip('.')
+    return '0' if text in ('-0', '') else text
+
+
+# -- writers ---------------------------------------------------------------
+
+class SvgWriter:
+    """Writes shapes to an SVG stream as they come.
+
+    Coordinates are page coordinates in ``unit`` with the y axis pointing
+    down (``y = page height - PinY``); a ``viewport`` ``(x0, y0, x1, y1)``
+    in page coordinates of ``unit`` limits the picture (and the shapes
+    written) to that rectangle.
+    """
+
+    extension = 'svg'
+
+    def __init__(self, stream, page_width, page_height, unit='mm',
+                 viewport=None, text=True, precision=3):
+        self.stream = stream
+        self.scale = units.from_internal(1.0, unit)
+        self.unit = unit
+        self.page_height = page_height
+        self.viewport = viewport
+        self.text = text
+        self.precision = precision
+        if viewport is None:
+            viewport = (0.0, 0.0, page_width * self.scale,
+                        page_height * self.scale)
+        self._view = viewport
+        self._open = []
+        self.count = 0
+
+    def _matrix(self):
+        s = self.scale
+        return (s, 0.0, 0.0, -s, 0.0, self.page_height * s)
+
+    def begin(self):
+        x0, y0, x1, y1 = self._view
+        top = self.page_height * self.scale - y1
+        w, h = x1 - x0, y1 - y0
+        f = self._fmt
+        self.stream.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<svg xmlns="http://www.w3.org/2000/svg" '
+            f'width="{f(w)}{self.unit}" height="{f(h)}{self.unit}" '
+            f'viewBox="{f(x0)} {f(top)} {f(w)} {f(h)}">\n')
+
+    def _fmt(self, value):
+        return _fmt(value, self.precision)
+
+    def _visible(self, record):
+        if self.viewport is None:
+            return True
+        s = self.scale
+        x0, y0, x1, y1 = record.bbox
+        v = self.viewport
+        return not (x1 * s < v[0] or x0 * s > v[2] or
+                    y1 * s < v[1] or y0 * s > v[3])
+
+    def _path_data(self, segments):
+        f = self._fmt
+        m = self._matrix()
+        parts = []
+        for seg in transform_segments(segments, m):
+            kind = seg[0]
+            if kind == 'A':
+                _, rx, ry, rotation, large, sweep, x, y = seg
+                parts.append(f"A{f(rx)} {f(ry)} "
+                             f"{f(math.degrees(rotation))} {int(large)} "
+                             f"{int(sweep)} {f(x)} {f(y)}")
+            else:
+                parts.append(kind + ' '.join(f(v) for v in seg[1:]))
+        return ''.join(parts)
+
+    def _markup(self, record):
+        shape = record.shape
+        stroke, weight, fill = record.style
+        out = []
+        for path in record.paths:
+            attrs = [f'd="{self._path_data(path.segments)}"']
+            attrs.append(f'fill="{fill if path.fill and fill else "none"}"')
+            if path.line and stroke:
+                attrs.append(f'stroke="{stroke}" stroke-width='
+                             f'"{self._fmt(weight * self.scale)}"')
+            out.append(f'<path {" ".join(attrs)}/>')
+        if self.text and shape.text and shape.text.strip():
+            x, y = _point(self._matrix(), *record.center)
+            size = self._fmt(record.font_size * self.scale)
+            out.append(f'<text x="{self._fmt(x)}" y="{self._fmt(y)}" '
+                       f'font-size="{size}" text-anchor="middle" '
+                       'dominant-baseline="middle">'
+                       f'{escape(shape.text.strip())}</text>')
+        return out
+
+    def shape(self, record):
+        while self._open and self._open[-1] not in record.ancestors:
+            self.stream.write('</g>\n')
+            self._open.pop()
+        if not (record.is_group or self._visible(record)):
+            return
+        key = ('svg', self.scale, self.precision, self.text)
+        if key not in record.cache:
+            record.cache[key] = self._markup(record)
+        markup = record.cache[key]
+        shape = record.shape
+        name = shape.name_u or shape.name
+        attrs = f'id="shape-{shape.id}"'
+        if name:
+            attrs += f' data-name={quoteattr(name)}'
+        if record.is_group:
+            self.stream.write(f'<g {attrs}>\n')
+            self._open.append(shape.id)
+            self.stream.writelines(m + '\n' for m in markup)
+        elif markup:
+            self.stream.write(f'<g {attrs}>' + ''.join(markup) + '</g>\n')
+        self.count += 1
+
+    def end(self):
+        self.stream.write('</g>\n' * len(self._open) + '</svg>\n')
+        self._open = []
+
+
+class GeoJsonWriter(SvgWriter):
+    """Writes shapes as GeoJSON features (y axis up, like the page).
+
+    Each shape with geometry becomes one feature: closed sections are
+    polygons, open ones line strings, arcs and curves are sampled.  The
+    properties hold ``id``, ``name``, ``master``, ``parent``, ``text`` and
+    the Shape Data values.
+    """
+
+    extension = 'geojson'
+
+    def _matrix(self):
+        s = self.scale
+        return (s, 0.0, 0.0, s, 0.0, 0.0)
+
+    def begin(self):
+        self.stream.write('{"type": "FeatureCollection", "features": [\n')
+        self._first = True
+
+    def _feature(self, record):
+        m = self._matrix()
+        polygons, lines = [], []
+        r = self.precision
+        for path in record.paths:
+            for line in flatten(transform_segments(path.segments, m)):
+                coords = [[round(x, r), round(y, r)] for x, y in line]
+                if path.closed and len(coords) >= 4:
+                    polygons.append([coords])
+                elif len(coords) >= 2:
+                    lines.append(coords)
+        parts = []
+        if polygons:
+            parts.append({'type': 'MultiPolygon', 'coordinates': polygons})
+        if lines:
+            parts.append({'type': 'MultiLineString', 'coordinates': lines})
+        if not parts:
+            return None
+        geometry = parts[0] if len(parts) == 1 else \
+            {'type': 'GeometryCollection', 'geometries': parts}
+        shape = record.shape
+        props = {'id': shape.id, 'name': shape.name_u or shape.name,
+                 'master': shape.master, 'parent': shape.parent,
+                 'text': shape.text}
+        for name, row in shape.props.items():
+            props[f'Prop.{name}'] = row.value
+        return json.dumps({'type': 'Feature', 'id': shape.id,
+                           'geometry': geometry, 'properties': props},
+                          ensure_ascii=False)
+
+    def shape(self, record):
+        if not self._visible(record):
+            return
+        key = ('geojson', self.scale, self.precision)
+        if key not in record.cache:
+            record.cache[key] = self._feature(record)
+        feature = record.cache[key]
+        if feature is None:
+            return
+        self.stream.write(('' if self._first else ',\n') + feature)
+        self._first = False
+        self.count += 1
+
+    def end(self):
+        self.stream.write('\n]}\n')
+
+
+WRITERS = {'svg': SvgWriter, 'geojson': GeoJsonWriter}
+
+
+# -- entry points ------------------------------------------------------------
+
+def render(vsdx, page, writers):
+    """Stream the shapes of ``page`` once into all ``writers``."""
+    for writer in writers:
+        writer.begin()
+    for record in _records(vsdx, page):
+        for writer in writers:
+            writer.shape(record)
+    for writer in writers:
+        writer.end()
+    return writers
+
+
+def _export(fmt, src, dst, page, unit, viewport, **options):
+    vsdx = src if isinstance(src, VsdxFile) else VsdxFile(src)
+    try:
+        info = vsdx.page(page)
+        stream = io.StringIO() if dst is None else dst
+        close = False
+        if isinstance(dst, (str, os.PathLike)):
+            stream = open(dst, 'w', encoding='utf-8', newline='\n')
+            close = True
+        try:
+            writer = WRITERS[fmt](stream, info.width or 0.0,
+                                  info.height or 0.0, unit, viewport,
+                                  **options)
+            render(vsdx, info.index, [writer])
+        finally:
+            if close:
+                stream.close()
+    finally:
+        if vsdx is not src:
+            vsdx.close()
+    return stream.getvalue() if dst is None else dst
+
+
+def export_svg(src, dst=None, page=0, unit='mm', viewport=None, text=True,
+               precision=3):
+    """Write a page of a .vsdx file as SVG.
+
+    Parameters:
+    ----------
+    - src : str or VsdxFile
+    - dst : str or file object, optional
+        Output; the SVG is returned as a string if omitted.
+    - page : int or str
+        Page index or name.
+    - unit : str
+        Unit of the SVG coordinates (``width``/``height`` carry it).
+    - viewport : tuple, optional
+        ``(x0, y0, x1, y1)`` in ``unit``, page coordinates (y up); only
+        shapes touching it are written.
+    - text : bool
+        Write shape text (one line at the shape centre).
+    - precision : int
+        Decimals of the coordinates.
+    """
+    return _export('svg', src, dst, page, unit, viewport, text=text,
+                   precision=precision)
+
+
+def export_geojson(src, dst=None, page=0, unit='mm', viewport=None,
+                   precision=3):
+    """Write a page of a .vsdx file as a GeoJSON FeatureCollection.
+
+    Parameters as for :func:`export_svg`; coordinates keep the page's y axis
+    pointing up.
+    """
+    return _export('geojson', src, dst, page, unit, viewport,
+                   precision=precision)
+
+
+def tile_grid(width, height, size):
+    """``[(row, col, (x0, y0, x1, y1))]`` covering ``width`` x ``height``;
+    row 0 is the top of the page."""
+    cols = max(1, int(math.ceil(width / size)))
+    rows = max(1, int(math.ceil(height / size)))
+    out = []
+    for row in range(rows):
+        y1 = height - row * size
+        for col in range(cols):
+            out.append((row, col, (col * size, max(y1 - size, 0.0),
+                                   min((col + 1) * size, width), y1)))
+    return out
+
+
+def _render_tiles(src, page, jobs, fmt, unit, options):
+    """Worker: one pass over the page, writing every tile in ``jobs``."""
+    with VsdxFile(src) as vsdx:
+        info = vsdx.page(page)
+        streams, writers = [], []
+        try:
+            for path, viewport in jobs:
+                stream = open(path, 'w', encoding='utf-8', newline='\n')
+                streams.append(stream)
+                writers.append(WRITERS[fmt](stream, info.width or 0.0,
+                                            info.height or 0.0, unit,
+                                            viewport, **options))
+            render(vsdx, info.index, writers)
+        finally:
+            for stream in streams:
+                stream.close()
+    return [(path, w.count) for (path, _), w in zip(jobs, writers)]
+
+
+def export_tiles(src, folder, page=0, tile_size=500, fmt='svg', unit='mm',
+                 workers=None, **options):
+    """Cut a page into square tiles and render them in parallel.
+
+    Parameters:
+    ----------
+    - src : str
+        Path of the .vsdx file.
+    - folder : str
+        Output folder; files are named ``<page>_r<row>_c<col>.<ext>``.
+    - tile_size : float
+        Edge length of a tile in ``unit``.
+    - fmt : str
+        ``'svg'`` or ``'geojson'``.
+    - workers : int, optional
+        Processes (``os.cpu_count()`` by default, at most one per tile);
+        ``0`` renders in this process.
+    - options :
+        ``text``/``precision`` as for :func:`export_svg`.
+
+    Returns:
+    --------
+    - list of ``(path, shapes written)`` in row/column order.
+    """
+    with VsdxFile(src) as vsdx:
+        info = vsdx.page(page)
+        scale = units.from_internal(1.0, unit)
+        grid = tile_grid((info.width or 0.0) * scale,
+                         (info.height or 0.0) * scale, tile_size)
+        stem = info.name_u or info.name or f'page{info.index}'
+        index = info.index
+    os.makedirs(folder, exist_ok=True)
+    extension = WRITERS[fmt].extension
+    jobs = [(os.path.join(folder, f'{stem}_r{row}_c{col}.{extension}'),
+             viewport) for row, col, viewport in grid]
+    if workers == 0:
+        results = [_render_tiles(src, index, jobs, fmt, unit, options)]
+    else:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+        chunks = [jobs[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_render_tiles, [src] * workers,
+                                    [index] * workers, chunks,
+                                    [fmt] * workers, [unit] * workers,
+                                    [options] * workers))
+    done = dict(item for chunk in results for item in chunk)
+    return [(path, done[path]) for path, _ in jobs]
@@ -0,0 +1,1422 @@
+"""In-process stand-ins for the Visio object model.
+
+These objects implement the subset of the Visio COM API that visiopy uses,
+without Visio or pywin32.  Every member access that would be a COM round
+trip is counted in ``calls`` (a ``collections.Counter`` shared by all objects
+of one fake application), so tests can assert how many round trips an
+operation costs.
+
+Usage:
+------
+    from visiopy.fakes import FakePage
+
+    page = FakePage()
+    shp = page.add_shape(PinX=1.0, PinY=2.0)
+    shp.add_row('prop', 'Type', '"Pump"')
+    write_cells(page, edits)
+    page.calls['SetFormulas']   # -> 1
+
+:func:`write_vsdx` and :func:`synthetic_shapes` produce .vsdx packages for
+the offline code paths.
+"""
+import time
+import zipfile
+from collections import Counter
+
+from . import units
+from .batch import CELL_SRC, PAGE_SHEET_ID, PROP_CELLS, USER_CELLS, \
+    ROW_SECTIONS as _ROW_SECTIONS, visSectionObject, visSectionProp, \
+    visSectionUser, visGetStrings
+
+_SRC_NAMES = {src: name for name, src in CELL_SRC.items()}
+
+
+class SlowCalls(Counter):
+    """Call counter that also spends ``latency`` seconds per counted call.
+
+    Pass it as ``calls`` to any fake to make it behave like an
+    out-of-process COM server; ``latency`` may be a dict by member name
+    (``'default'`` for the rest).
+    """
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+
+    def __setitem__(self, member, count):
+        latency = self.latency
+        if isinstance(latency, dict):
+            latency = latency.get(member, latency.get('default', 0.0))
+        if latency:
+            time.sleep(latency)
+        super().__setitem__(member, count)
+
+
+class FakeComError(Exception):
+    """Raised where Visio would raise a ``com_error``."""
+
+
+def evaluate_constant(formula):
+    """Return the result (internal units) of a constant formula.
+
+    Understands numbers with optional units, quoted strings and TRUE/FALSE;
+    returns ``None`` for anything else.
+    """
+    constant = units.parse_constant(formula)
+    return constant[0] if constant is not None else None
+
+
+def _format_formula(value, unit):
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    if unit and units.factor(unit) != 1.0:
+        return f"{value:g} {unit}"
+    return f"{value:g}"
+
+
+class FakeCell:
+    def __init__(self, shape, src):
+        self._shape = shape
+        self.Section, self.Row, self.Column = src
+
+    @property
+    def _src(self):
+        return (self.Section, self.Row, self.Column)
+
+    @property
+    def _data(self):
+        return self._shape._cells[self._src]
+
+    @property
+    def Name(self):
+        self._shape._count('Cell.Name')
+        return self._shape._cell_name(self._src)
+
+    @property
+    def Shape(self):
+        self._shape._count('Cell.Shape')
+        return self._shape
+
+    @property
+    def RowNameU(self):
+        self._shape._count('Cell.RowNameU')
+        if self.Section not in self._shape._rows:
+            return ''
+        return self._shape._rows[self.Section][self.Row]
+
+    RowName = RowNameU
+
+    @property
+    def Formula(self):
+        self._shape._count('Cell.Formula')
+        return self._data[0]
+
+    @Formula.setter
+    def Formula(self, formula):
+        self._shape._count('Cell.Formula')
+        self._shape._set_formula(self._src, formula)
+
+    FormulaU = Formula
+
+    @property
+    def ResultIU(self):
+        self._shape._count('Cell.ResultIU')
+        return self._data[1]
+
+    @ResultIU.setter
+    def ResultIU(self, value):
+        self._shape._count('Cell.ResultIU')
+        self._shape._set_result(self._src, value, None)
+
+    def Result(self, unit):
+        self._shape._count('Cell.Result')
+        return self._shape._get_result(self._src, unit)
+
+    def ResultInt(self, unit, rounding=0):
+        self._shape._count('Cell.ResultInt')
+        return int(self._shape._get_result(self._src, unit))
+
+    def ResultStr(self, unit):
+        self._shape._count('Cell.ResultStr')
+        return str(self._shape._get_result(self._src, unit))
+
+
+class FakeShape:
+    def __init__(self, page, shape_id, name=None):
+        self._page = page
+        self._id = shape_id
+        self._name = name or f"Sheet.{shape_id}"
+        self._cells = {}
+        self._rows = {visSectionProp: [], visSectionUser: []}
+        self._text = ''
+        self._runs = []         # [[length, format], ...] of the text
+        self._master = None
+
+    def _count(self, member):
+        self._page.calls[member] += 1
+
+    # -- helpers for building fixtures (not part of the Visio API) --------
+    def set(self, **cells):
+        """Set cells by name, numbers in internal units."""
+        for name, value in cells.items():
+            src = CELL_SRC[name.lower()]
+            self._cells[src] = [_format_formula(value, None), value]
+        return self
+
+    def add_row(self, kind, name, value_formula='""', **cells):
+        """Add a Shape Data (``'prop'``) or User (``'user'``) row."""
+        section, names = _ROW_SECTIONS[kind.lower()]
+        row = len(self._rows[section])
+        self._rows[section].append(name)
+        for cell in set(names.values()):
+            self._cells[(section, row, cell)] = ['', '']
+        self._set_formula((section, row, 0), value_formula)
+        for cell, formula in cells.items():
+            self._set_formula((section, row, names[cell.lower()]), formula)
+        return row
+
+    # -- name resolution ---------------------------------------------------
+    def _src(self, name):
+        key = name.lower()
+        if key in CELL_SRC:
+            return CELL_SRC[key]
+        parts = key.split('.')
+        if parts[0] in _ROW_SECTIONS and len(parts) in (2, 3):
+            section, names = _ROW_SECTIONS[parts[0]]
+            lowered = [r.lower() for r in self._rows[section]]
+            cell = names.get(parts[2] if len(parts) == 3 else 'value')
+            if parts[1] in lowered and cell is not None:
+                return (section, lowered.index(parts[1]), cell)
+        raise FakeComError(f"Unexpected end of file. ({name})")
+
+    def _cell_name(self, src):
+        section, row, cell = src
+        if section == visSectionObject:
+            return _SRC_NAMES[src]
+        kind = 'Prop' if section == visSectionProp else 'User'
+        names = PROP_CELLS if section == visSectionProp else USER_CELLS
+        cell_name = [n for n, c in names.items() if c == cell][0]
+        return f"{kind}.{self._rows[section][row]}.{cell_name.title()}"
+
+    def _check(self, src):
+        if src[0] != visSectionObject and src not in self._cells:
+            raise FakeComError(f"Cell {src} does not exist on {self._name}")
+
+    def _set_formula(self, src, formula):
+        self._check(src)
+        formula = str(formula)
+        old = self._cells.get(src, ['', 0.0])[1]
+        value = evaluate_constant(formula)
+        self._cells[src] = [formula, old if value is None else value]
+
+    def _set_result(self, src, value, unit):
+        self._check(src)
+        if not isinstance(value, str):
+            value = units.to_internal(float(value), unit)
+        self._cells[src] = [_format_formula(
+            value if isinstance(value, str) else
+            units.from_internal(value, unit), unit), value]
+
+    def _get_result(self, src, unit):
+        self._check(src)
+        value = self._cells.get(src, ['', 0.0])[1]
+        if isinstance(value, str):
+            return value
+        return units.from_internal(value, unit)
+
+    # -- Visio API ---------------------------------------------------------
+    @property
+    def ID(self):
+        self._count('Shape.ID')
+        return self._id
+
+    @property
+    def Name(self):
+        self._count('Shape.Name')
+        return self._name
+
+    NameU = Name
+
+    @property
+    def Text(self):
+        self._count('Shape.Text')
+        return self._text
+
+    @Text.setter
+    def Text(self, text):
+        # like Visio: the whole text takes the format of the first run
+        self._count('Shape.Text')
+        fmt = self._runs[0][1] if self._runs else None
+        self._text = text
+        self._runs = [[len(text), fmt]] if text else []
+
+    @property
+    def Characters(self):
+        self._count('Shape.Characters')
+        return FakeCharacters(self)
+
+    @property
+    def ContainingPage(self):
+        self._count('Shape.ContainingPage')
+        return self._page
+
+    def set_text(self, *runs):
+        """Set the text as formatting runs (fixture helper): strings or
+        ``(text, format)`` pairs, ``format`` being any value."""
+        self._text, self._runs = '', []
+        for run in runs:
+            text, fmt = (run, None) if isinstance(run, str) else run
+            self._text += text
+            if text:
+                self._runs.append([len(text), fmt])
+        return self
+
+    def text_runs(self):
+        """``[(text, format), ...]`` (fixture helper)."""
+        out, start = [], 0
+        for length, fmt in self._runs:
+            out.append((self._text[start:start + length], fmt))
+            start += length
+        return out
+
+    @property
+    def Master(self):
+        self._count('Shape.Master')
+        return self._master
+
+    @property
+    def Connects(self):
+        self._count('Shape.Connects')
+        return FakeConnects(self._page, [c for c in self._page._connects
+                                         if c[0] == self._id])
+
+    def Delete(self):
+        self._count('Shape.Delete')
+        del self._page._shapes[self._id]
+        self._page._connects = [c for c in self._page._connects
+                                if c[0] != self._id]
+        for connector, part, _ in [c for c in self._page._connects
+                                   if c[2] == self._id]:
+            self._page.unglue(connector, 'BeginX' if part == 9 else 'EndX')
+
+    def Cells(self, name):
+        self._count('Shape.Cells')
+        return FakeCell(self, self._src(name))
+
+    CellsU = Cells
+
+    def CellsSRC(self, section, row, cell):
+        self._count('Shape.CellsSRC')
+        src = (section, row, cell)
+        self._check(src)
+        return FakeCell(self, src)
+
+    def CellExists(self, name, local):
+        self._count('Shape.CellExists')
+        try:
+            self._src(name)
+        except FakeComError:
+            return False
+        return True
+
+    CellExistsU = CellExists
+
+    def CellsRowIndex(self, row_name):
+        self._count('Shape.CellsRowIndex')
+        kind, _, name = row_name.lower().partition('.')
+        if kind in _ROW_SECTIONS:
+            section = _ROW_SECTIONS[kind][0]
+            lowered = [r.lower() for r in self._rows[section]]
+            if name in lowered:
+                return lowered.index(name)
+        raise FakeComError(f"Unexpected end of file. ({row_name})")
+
+    CellsRowIndexU = CellsRowIndex
+
+    def RowCount(self, section):
+        self._count('Shape.RowCount')
+        return len(self._rows.get(section, ()))
+
+
+class FakeCharacters:
+    """``Shape.Characters``: a ``Begin``/``End`` range of the text.
+
+    Assigning ``Text`` replaces the range; the new characters take the
+    format of the first replaced one, the other runs stay as they are.
+    """
+
+    def __init__(self, shape):
+        self._shape = shape
+        self._begin = 0
+        self._end = len(shape._text)
+
+    def _prop(name):
+        def get(self):
+            self._shape._count(f'Characters.{name}')
+            return getattr(self, '_' + name.lower())
+
+        def put(self, value):
+            self._shape._count(f'Characters.{name}')
+            if not 0 <= value <= len(self._shape._text):
+                raise FakeComError(f"Invalid {name} {value}")
+            setattr(self, '_' + name.lower(), value)
+        return property(get, put)
+
+    Begin = _prop('Begin')
+    End = _prop('End')
+    del _prop
+
+    @property
+    def Text(self):
+        self._shape._count('Characters.Text')
+        return self._shape._text[self._begin:self._end]
+
+    @Text.setter
+    def Text(self, text):
+        self._shape._count('Characters.Text')
+        shape, begin, end = self._shape, self._begin, self._end
+        # split the runs around the range; the new text takes the format
+        # of the first replaced character (of the last one when appending)
+        before, after, start = [], [], 0
+        fmt = shape._runs[-1][1] if shape._runs else None
+        for length, run_fmt in shape._runs:
+            stop = start + length
+            if start <= begin < stop:
+                fmt = run_fmt
+            if start < begin:
+                before.append([min(stop, begin) - start, run_fmt])
+            if stop > end:
+                after.append([stop - max(start, end), run_fmt])
+            start = stop
+        merged = []
+        for length, run_fmt in before + [[len(text), fmt]] + after:
+            if not length:
+                continue
+            if merged and merged[-1][1] == run_fmt:
+                merged[-1][0] += length
+            else:
+                merged.append([length, run_fmt])
+        shape._text = shape._text[:begin] + text + shape._text[end:]
+        shape._runs = merged
+        self._end = begin + len(text)
+
+
+class FakeShapes:
+    def __init__(self, page):
+        self._page = page
+
+    @property
+    def Count(self):
+        self._page.calls['Shapes.Count'] += 1
+        return len(self._page._shapes)
+
+    def Item(self, index):
+        self._page.calls['Shapes.Item'] += 1
+        return list(self._page._shapes.values())[index - 1]
+
+    def ItemFromID(self, shape_id):
+        self._page.calls['Shapes.ItemFromID'] += 1
+        try:
+            return self._page._shapes[shape_id]
+        except KeyError:
+            raise FakeComError(f"Invalid shape ID {shape_id}")
+
+    def ItemU(self, name):
+        self._page.calls['Shapes.ItemU'] += 1
+        for shape in self._page._shapes.values():
+            if shape._name.lower() == name.lower():
+                return shape
+        raise FakeComError(f"No shape named {name}")
+
+    def __iter__(self):
+        self._page.calls['Shapes.__iter__'] += 1
+        for shape in list(self._page._shapes.values()):
+            self._page.calls['Shapes.Item'] += 1
+            yield shape
+
+    def __len__(self):
+        return len(self._page._shapes)
+
+
+class FakeSelection:
+    def __init__(self, page, ids):
+        self._page = page
+        self._ids = list(ids)
+
+    @property
+    def Count(self):
+        self._page.calls['Selection.Count'] += 1
+        return len(self._ids)
+
+    @property
+    def ContainingPage(self):
+        self._page.calls['Selection.ContainingPage'] += 1
+        return self._page
+
+    def Item(self, index):
+        self._page.calls['Selection.Item'] += 1
+        return self._page._shapes[self._ids[index - 1]]
+
+    def GetIDs(self):
+        self._page.calls['Selection.GetIDs'] += 1
+        return tuple(self._ids)
+
+    def Select(self, shape, flags):
+        """Add (``visSelect`` = 2) or remove (``visDeselect`` = 1) a
+        shape."""
+        self._page.calls['Selection.Select'] += 1
+        if flags & 2 and shape._id not in self._ids:
+            self._ids.append(shape._id)
+        elif flags & 1 and shape._id in self._ids:
+            self._ids.remove(shape._id)
+
+    def __iter__(self):
+        self._page.calls['Selection.__iter__'] += 1
+        for shape_id in list(self._ids):
+            self._page.calls['Selection.Item'] += 1
+            yield self._page._shapes[shape_id]
+
+
+class FakeConnect:
+    """One glue record: end ``part`` (9 begin, 12 end) of the 1-D shape
+    ``from_id`` glued to ``to_id``."""
+
+    def __init__(self, page, from_id, part, to_id):
+        self._page = page
+        self._from, self._part, self._to = from_id, part, to_id
+
+    @property
+    def FromSheet(self):
+        self._page.calls['Connect.FromSheet'] += 1
+        return self._page._sheet(self._from)
+
+    @property
+    def FromPart(self):
+        self._page.calls['Connect.FromPart'] += 1
+        return self._part
+
+    @property
+    def ToSheet(self):
+        self._page.calls['Connect.ToSheet'] += 1
+        return self._page._sheet(self._to)
+
+
+class FakeConnects:
+    def __init__(self, page, records):
+        self._page = page
+        self._records = list(records)
+
+    @property
+    def Count(self):
+        self._page.calls['Connects.Count'] += 1
+        return len(self._records)
+
+    def Item(self, index):
+        self._page.calls['Connects.Item'] += 1
+        return FakeConnect(self._page, *self._records[index - 1])
+
+    def __iter__(self):
+        self._page.calls['Connects.__iter__'] += 1
+        for record in self._records:
+            self._page.calls['Connects.Item'] += 1
+            yield FakeConnect(self._page, *record)
+
+
+class FakeLayer:
+    def __init__(self, page, index, name):
+        self._page = page
+        self._index = index
+        self._name = name
+
+    @property
+    def Index(self):
+        self._page.calls['Layer.Index'] += 1
+        return self._index
+
+    @property
+    def Name(self):
+        self._page.calls['Layer.Name'] += 1
+        return self._name
+
+    NameU = Name
+
+    def Delete(self, delete_shapes):
+        self._page.calls['Layer.Delete'] += 1
+        self._page._remove_layer(self, delete_shapes)
+
+
+class FakeLayers:
+    def __init__(self, page):
+        self._page = page
+
+    @property
+    def Count(self):
+        self._page.calls['Layers.Count'] += 1
+        return len(self._page._layers)
+
+    def Item(self, index):
+        self._page.calls['Layers.Item'] += 1
+        return self._page._layers[index - 1]
+
+    def Add(self, name):
+        """Like Visio, an existing layer of that name is returned."""
+        self._page.calls['Layers.Add'] += 1
+        for layer in self._page._layers:
+            if layer._name.lower() == name.lower():
+                return layer
+        return self._page.add_layer(name)
+
+    def __iter__(self):
+        self._page.calls['Layers.__iter__'] += 1
+        for layer in list(self._page._layers):
+            self._page.calls['Layers.Item'] += 1
+            yield layer
+
+
+class FakePage:
+    """A page holding :class:`FakeShape` objects.
+
+    ``calls`` counts every emulated COM member access.
+    """
+
+    def __init__(self, name='Page-1', calls=None):
+        self.calls = Counter() if calls is None else calls
+        self._name = name
+        self._shapes = {}
+        self._next_id = 1
+        self._connects = []
+        self._layers = []
+        self.Document = None
+        self.PageSheet = FakeShape(self, PAGE_SHEET_ID, 'ThePage')
+        self.PageSheet.set(PageWidth=8.5, PageHeight=11.0)
+
+    def add_shape(self, name=None, **cells):
+        """Add a shape (fixture helper), cell values in internal units."""
+        shape = FakeShape(self, self._next_id, name)
+        shape.set(PinX=0.0, PinY=0.0, Width=1.0, Height=1.0, LocPinX=0.5,
+                  LocPinY=0.5, Angle=0.0, FlipX=0, FlipY=0, LayerMember='')
+        shape.set(**cells)
+        self._shapes[shape._id] = shape
+        self._next_id += 1
+        return shape
+
+    def add_layer(self, name, members=()):
+        """Add a layer (fixture helper) and put the shapes with the IDs
+        ``members`` on it; returns the layer."""
+        layer = FakeLayer(self, len(self._layers) + 1, name)
+        self._layers.append(layer)
+        for shape_id in members:
+            shape = self._shapes[shape_id]
+            old = shape._cells.get(CELL_SRC['layermember'], ['', ''])[1]
+            indices = [i for i in str(old).split(';') if i]
+            indices.append(str(layer._index - 1))
+            shape.set(LayerMember=';'.join(indices))
+        return layer
+
+    def _remove_layer(self, layer, delete_shapes):
+        """Drop a layer; like Visio, the shapes' LayerMember cells follow
+        the new layer indices."""
+        removed = layer._index - 1
+        self._layers.remove(layer)
+        for index, other in enumerate(self._layers, 1):
+            other._index = index
+        for shape_id, shape in list(self._shapes.items()):
+            member = shape._cells.get(CELL_SRC['layermember'], ['', ''])[1]
+            indices = [int(i) for i in str(member).split(';') if i]
+            if removed in indices and delete_shapes:
+                del self._shapes[shape_id]
+                continue
+            indices = [i - (i > removed) for i in indices if i != removed]
+            shape.set(LayerMember=';'.join(map(str, indices)))
+
+    def _on_layer(self, shape, layer):
+        member = shape._cells.get(CELL_SRC['layermember'], ['', ''])[1]
+        return str(layer._index - 1) in str(member).split(';')
+
+    @property
+    def Layers(self):
+        self.calls['Page.Layers'] += 1
+        return FakeLayers(self)
+
+    def glue(self, connector, cell, shape):
+        """Glue ``cell`` (``'BeginX'``/``'EndX'``) of ``connector`` to
+        ``shape`` (fixture helper), replacing the previous glue.
+
+        Like Visio this records a Connect and sets the connector's
+        ``BegTrigger``/``EndTrigger`` to ``_XFTRIGGER(<shape>!EventXFMod)``.
+        """
+        part = 9 if cell.lower().startswith('begin') else 12
+        self.unglue(connector, cell)
+        self._connects.append((connector, part, shape))
+        name = self._shapes[shape]._name
+        if not name.replace('.', '').replace('_', '').isalnum():
+            name = "'" + name.replace("'", "''") + "'"
+        trigger = 'begtrigger' if part == 9 else 'endtrigger'
+        self._shapes[connector]._cells[CELL_SRC[trigger]] = [
+            f"_XFTRIGGER({name}!EventXFMod)", 0.0]
+
+    def unglue(self, connector, cell=None):
+        """Remove the glue of one end (or both) of ``connector``."""
+        parts = (9, 12) if cell is None else \
+            (9 if cell.lower().startswith('begin') else 12,)
+        self._connects = [c for c in self._connects
+                          if not (c[0] == connector and c[1] in parts)]
+        shape = self._shapes.get(connector)
+        for part in parts if shape is not None else ():
+            trigger = 'begtrigger' if part == 9 else 'endtrigger'
+            shape._cells.pop(CELL_SRC[trigger], None)
+
+    @property
+    def Connects(self):
+        self.calls['Page.Connects'] += 1
+        return FakeConnects(self, self._connects)
+
+    def _sheet(self, shape_id):
+        if shape_id == PAGE_SHEET_ID:
+            return self.PageSheet
+        try:
+            return self._shapes[shape_id]
+        except KeyError:
+            raise FakeComError(f"Invalid shape ID {shape_id}")
+
+    def _items(self, stream):
+        if len(stream) % 4:
+            raise FakeComError("Malformed SID_SRC stream")
+        for i in range(0, len(stream), 4):
+            yield self._sheet(stream[i]), tuple(stream[i + 1:i + 4])
+
+    @property
+    def Name(self):
+        self.calls['Page.Name'] += 1
+        return self._name
+
+    NameU = Name
+
+    @property
+    def Shapes(self):
+        self.calls['Page.Shapes'] += 1
+        return FakeShapes(self)
+
+    def _draw(self, name, x1, y1, x2, y2):
+        return self.add_shape(name, PinX=(x1 + x2) / 2, PinY=(y1 + y2) / 2,
+                              Width=abs(x2 - x1), Height=abs(y2 - y1),
+                              LocPinX=abs(x2 - x1) / 2,
+                              LocPinY=abs(y2 - y1) / 2)
+
+    def DrawRectangle(self, x1, y1, x2, y2):
+        self.calls['Page.DrawRectangle'] += 1
+        return self._draw(None, x1, y1, x2, y2)
+
+    def DrawOval(self, x1, y1, x2, y2):
+        self.calls['Page.DrawOval'] += 1
+        return self._draw(None, x1, y1, x2, y2)
+
+    def DropMany(self, objects, xy):
+        """Instance ``objects`` at ``xy``; returns ``(count, ids)``.
+
+        Entries may be :class:`FakeMaster` objects, master names or shapes
+        (which are copied, like ``Page.Drop`` does).
+        """
+        self.calls['Page.DropMany'] += 1
+        if len(xy) != 2 * len(objects):
+            raise FakeComError("Invalid parameter (xyArray)")
+        ids = []
+        for i, obj in enumerate(objects):
+            if isinstance(obj, FakeShape):
+                template, name = obj, None
+            else:
+                template = getattr(obj, '_shape', None)
+                name = obj if isinstance(obj, str) else obj._name
+            shape = self.add_shape(name and f"{name}.{self._next_id}")
+            if template is not None:
+                for src, data in template._cells.items():
+                    shape._cells[src] = list(data)
+                shape._rows = {k: list(v) for k, v in template._rows.items()}
+            if isinstance(obj, FakeMaster):
+                shape._master = obj
+            shape.set(PinX=xy[2 * i], PinY=xy[2 * i + 1])
+            ids.append(shape._id)
+        return len(ids), tuple(ids)
+
+    DropManyU = DropMany
+
+    def CreateSelection(self, selection_type, mode=0, data=None):
+        """``visSelTypeEmpty`` (0), ``visSelTypeByLayer`` (3) and
+        ``visSelTypeByMaster`` (5) are honoured; anything else selects all
+        shapes."""
+        self.calls['Page.CreateSelection'] += 1
+        if selection_type == 0:
+            return FakeSelection(self, ())
+        if selection_type == 3:
+            return FakeSelection(self, [i for i, s in self._shapes.items()
+                                        if self._on_layer(s, data)])
+        if selection_type == 5:
+            return FakeSelection(self, [i for i, s in self._shapes.items()
+                                        if s._master is data])
+        return FakeSelection(self, self._shapes)
+
+    def SetFormulas(self, stream, formulas, flags):
+        self.calls['SetFormulas'] += 1
+        items = list(self._items(stream))
+        for (shape, src), formula in zip(items, formulas):
+            shape._set_formula(src, formula)
+        return len(items)
+
+    def SetResults(self, stream, unit_list, values, flags):
+        self.calls['SetResults'] += 1
+        items = list(self._items(stream))
+        for i, ((shape, src), value) in enumerate(zip(items, values)):
+            unit = unit_list[i] if unit_list else None
+            shape._set_result(src, value, unit)
+        return len(items)
+
+    def GetFormulasU(self, stream):
+        self.calls['GetFormulasU'] += 1
+        return tuple(shape._check(src) or shape._cells.get(src, ['0'])[0]
+                     for shape, src in self._items(stream))
+
+    GetFormulas = GetFormulasU
+
+    def GetResults(self, stream, flags, unit_list):
+        self.calls['GetResults'] += 1
+        values = []
+        for i, (shape, src) in enumerate(self._items(stream)):
+            unit = unit_list[i] if unit_list else None
+            value = shape._get_result(src, unit)
+            if flags == visGetStrings:
+                value = value if isinstance(value, str) else f"{value:g}"
+            elif isinstance(value, str):
+                value = 0.0
+            values.append(value)
+        return tuple(values)
+
+
+class FakeMaster:
+    """A master for :meth:`FakePage.DropMany`; cells like ``add_shape``.
+
+    Property reads are counted in the ``calls`` of the document whose
+    ``masters`` it is part of.
+    """
+
+    def __init__(self, name, unique_id=None, **cells):
+        self.calls = Counter()
+        self._name = name
+        self._unique_id = unique_id or \
+            '{%08X-0000-0000-0000-000000000000}' % (id(self) & 0xFFFFFFFF)
+        self._page = FakePage(name)
+        self._shape = FakeShape(self._page, 1, name)
+        self._shape.set(PinX=0.0, PinY=0.0, Width=1.0, Height=1.0,
+                        LocPinX=0.5, LocPinY=0.5, Angle=0.0, FlipX=0,
+                        FlipY=0)
+        self._shape.set(**cells)
+        self._page._shapes[1] = self._shape
+
+    def add_row(self, kind, name, value_formula='""', **cells):
+        """Add a row to the master shape (fixture helper), see
+        :meth:`FakeShape.add_row`; instances dropped later inherit it."""
+        return self._shape.add_row(kind, name, value_formula, **cells)
+
+    @property
+    def Shapes(self):
+        self.calls['Master.Shapes'] += 1
+        self._page.calls = self.calls
+        return FakeShapes(self._page)
+
+    @property
+    def Name(self):
+        self.calls['Master.Name'] += 1
+        return self._name
+
+    @property
+    def NameU(self):
+        self.calls['Master.NameU'] += 1
+        return self._name
+
+    @property
+    def UniqueID(self):
+        self.calls['Master.UniqueID'] += 1
+        return self._unique_id
+
+
+class FakeWindow:
+    def __init__(self, page, selected=(), app=None, document=None):
+        self._page = page
+        self._selected = list(selected)
+        self.Application = app
+        self.Document = document
+
+    @property
+    def Selection(self):
+        self._page.calls['Window.Selection'] += 1
+        return FakeSelection(self._page, self._selected)
+
+    @Selection.setter
+    def Selection(self, selection):
+        self._page.calls['Window.Selection'] += 1
+        self._selected = list(selection._ids)
+
+    @property
+    def PageActive(self):
+        self._page.calls['Window.PageActive'] += 1
+        return self._page
+
+    def select_ids(self, ids):
+        """Change the selection (fixture helper)."""
+        self._selected = list(ids)
+
+
+class FakePages:
+    def __init__(self, doc):
+        self._doc = doc
+
+    @property
+    def Count(self):
+        self._doc.calls['Pages.Count'] += 1
+        return len(self._doc._pages)
+
+    def Item(self, index):
+        self._doc.calls['Pages.Item'] += 1
+        if isinstance(index, str):
+            return self.ItemU(index)
+        return self._doc._pages[index - 1]
+
+    def ItemU(self, name):
+        self._doc.calls['Pages.ItemU'] += 1
+        for page in self._doc._pages:
+            if page._name == name:
+                return page
+        raise FakeComError(f"No page named {name}")
+
+    def __iter__(self):
+        self._doc.calls['Pages.__iter__'] += 1
+        for page in list(self._doc._pages):
+            self._doc.calls['Pages.Item'] += 1
+            yield page
+
+
+class FakeMasters:
+    def __init__(self, doc):
+        self._doc = doc
+
+    @property
+    def Count(self):
+        self._doc.calls['Masters.Count'] += 1
+        return len(self._doc._masters)
+
+    def Item(self, index):
+        self._doc.calls['Masters.Item'] += 1
+        return self._doc._masters[index - 1]
+
+    def ItemU(self, name):
+        self._doc.calls['Masters.ItemU'] += 1
+        for master in self._doc._masters:
+            if master._name.lower() == name.lower():
+                return master
+        raise FakeComError(f"No master named {name}")
+
+    def __iter__(self):
+        self._doc.calls['Masters.__iter__'] += 1
+        for master in list(self._doc._masters):
+            self._doc.calls['Masters.Item'] += 1
+            yield master
+
+
+class FakeDocument:
+    """A document with one or more :class:`FakePage` objects.
+
+    ``masters`` (:class:`FakeMaster` objects) make up ``Document.Masters``.
+    """
+
+    def __init__(self, full_name='C:\\Drawings\\Drawing1.vsdx', pages=1,
+                 calls=None, app=None, masters=()):
+        self.calls = Counter() if calls is None else calls
+        self._full_name = full_name
+        self._pages = [FakePage(f'Page-{i}', self.calls)
+                       for i in range(1, pages + 1)]
+        for page in self._pages:
+            page.Document = self
+        self._masters = list(masters)
+        for master in self._masters:
+            master.calls = self.calls
+        self.Application = app
+        self.open_flags = None
+        self.closed = False
+
+    @property
+    def FullName(self):
+        self.calls['Document.FullName'] += 1
+        if self.closed:
+            raise FakeComError("The object is no longer connected")
+        return self._full_name
+
+    @property
+    def Name(self):
+        self.calls['Document.Name'] += 1
+        return self._full_name.replace('/', '\\').rsplit('\\', 1)[-1]
+
+    @property
+    def Pages(self):
+        self.calls['Document.Pages'] += 1
+        return FakePages(self)
+
+    @property
+    def Masters(self):
+        self.calls['Document.Masters'] += 1
+        return FakeMasters(self)
+
+    def Close(self):
+        self.calls['Document.Close'] += 1
+        if self.Application is not None:
+            self.Application._detach(self)
+        self.closed = True
+
+
+class FakeDocuments:
+    """``Application.Documents``: ``Open``/``OpenEx`` take documents from
+    ``app.files`` and register them in the application's ROT."""
+
+    def __init__(self, app):
+        self._app = app
+
+    @property
+    def Count(self):
+        self._app.calls['Documents.Count'] += 1
+        return len(self._app._documents)
+
+    def Item(self, index):
+        self._app.calls['Documents.Item'] += 1
+        return self._app._documents[index - 1]
+
+    def Open(self, path):
+        self._app.calls['Documents.Open'] += 1
+        doc = self._app.files.get(path)
+        if doc is None:
+            raise FakeComError(f"File not found: {path}")
+        return self._app._attach(doc)
+
+    def OpenEx(self, path, flags):
+        self._app.calls['Documents.OpenEx'] += 1
+        doc = self._app.files.get(path)
+        if doc is None:
+            raise FakeComError(f"File not found: {path}")
+        doc.open_flags = flags
+        return self._app._attach(doc)
+
+    def Add(self, template):
+        self._app.calls['Documents.Add'] += 1
+        number = len(self._app._documents) + 1
+        return self._app._attach(FakeDocument(
+            f'Drawing{number}', calls=self._app.calls, app=self._app))
+
+    def __iter__(self):
+        self._app.calls['Documents.__iter__'] += 1
+        for doc in list(self._app._documents):
+            self._app.calls['Documents.Item'] += 1
+            yield doc
+
+
+class FakeApplication:
+    """Application-level switches, undo scopes and documents.
+
+    ``ScreenUpdating``, ``DeferRecalc`` and ``EventsEnabled`` behave like
+    plain properties (every get/set is counted); ``history`` records each
+    assignment and ``undo_scopes`` every closed scope as
+    ``(name, committed)``.  ``files`` maps paths to the
+    :class:`FakeDocument` that ``Documents.Open`` returns for them; open
+    documents are entered in ``rot`` (a :class:`FakeRunningObjectTable`),
+    so ``visio_connect.use_backend(app, app.rot)`` runs vDocs, vInit and
+    get_or_open_visio_file against the fakes.  ``Document.Close`` emits
+    ``('close', doc)`` on ``document_events`` (a :class:`FakeEventSource`),
+    like Visio's ``BeforeDocumentClose``.
+    """
+
+    def __init__(self, calls=None, rot=None):
+        self.calls = Counter() if calls is None else calls
+        self.history = []
+        self.undo_scopes = []
+        self._state = {'ScreenUpdating': 1, 'DeferRecalc': 0,
+                       'EventsEnabled': 1}
+        self._open_scopes = {}
+        self._next_scope = 1
+        self.files = {}
+        self.rot = FakeRunningObjectTable(calls=self.calls) \
+            if rot is None else rot
+        self._documents = []
+        self._windows = {}
+        self.document_events = FakeEventSource()
+
+    def _attach(self, doc):
+        doc.Application = self
+        doc.closed = False
+        if doc not in self._documents:
+            self._documents.append(doc)
+        self.rot.add(doc._full_name, doc)
+        return doc
+
+    def _detach(self, doc):
+        self.document_events.emit('close', doc)
+        if doc in self._documents:
+            self._documents.remove(doc)
+            self.rot.remove(doc._full_name)
+            self._windows.pop(id(doc), None)
+
+    @property
+    def Documents(self):
+        self.calls['Application.Documents'] += 1
+        return FakeDocuments(self)
+
+    @property
+    def ActiveDocument(self):
+        self.calls['Application.ActiveDocument'] += 1
+        return self._documents[-1] if self._documents else None
+
+    @property
+    def ActiveWindow(self):
+        self.calls['Application.ActiveWindow'] += 1
+        if not self._documents:
+            return None
+        doc = self._documents[-1]
+        if id(doc) not in self._windows:
+            self._windows[id(doc)] = FakeWindow(doc._pages[0], app=self,
+                                                document=doc)
+        return self._windows[id(doc)]
+
+    def _get(self, name):
+        self.calls[f'Application.{name}'] += 1
+        return self._state[name]
+
+    def _set(self, name, value):
+        self.calls[f'Application.{name}'] += 1
+        self.history.append((name, value))
+        self._state[name] = int(value)
+
+    ScreenUpdating = property(lambda self: self._get('ScreenUpdating'),
+                              lambda self, v: self._set('ScreenUpdating', v))
+    DeferRecalc = property(lambda self: self._get('DeferRecalc'),
+                           lambda self, v: self._set('DeferRecalc', v))
+    EventsEnabled = property(lambda self: self._get('EventsEnabled'),
+                             lambda self, v: self._set('EventsEnabled', v))
+
+    def BeginUndoScope(self, name):
+        self.calls['Application.BeginUndoScope'] += 1
+        scope = self._next_scope
+        self._next_scope += 1
+        self._open_scopes[scope] = name
+        return scope
+
+    def EndUndoScope(self, scope, commit):
+        self.calls['Application.EndUndoScope'] += 1
+        try:
+            name = self._open_scopes.pop(scope)
+        except KeyError:
+            raise FakeComError(f"No open undo scope {scope}")
+        self.undo_scopes.append((name, bool(commit)))
+
+
+class FakeRunningObjectTable:
+    """ROT for ``DocumentRegistry``: monikers are the display names.
+
+    ``bind_latency`` (seconds) is spent in every ``bind`` to mimic the cost
+    of a cross-process BindToObject.
+    """
+
+    def __init__(self, documents=(), calls=None, bind_latency=0.0):
+        self.calls = Counter() if calls is None else calls
+        self.bind_latency = bind_latency
+        self._entries = {}
+        for doc in documents:
+            self.add(doc._full_name, doc)
+
+    def add(self, name, doc=None):
+        """Register a document; ``doc=None`` behaves like an unsaved one."""
+        self._entries[name] = doc
+
+    def remove(self, name):
+        del self._entries[name]
+
+    def entries(self):
+        self.calls['ROT.entries'] += 1
+        self.calls['ROT.GetDisplayName'] += len(self._entries)
+        return [(name, name) for name in self._entries]
+
+    def bind(self, moniker):
+        self.calls['ROT.bind'] += 1
+        if self.bind_latency:
+            time.sleep(self.bind_latency)
+        doc = self._entries.get(moniker)
+        if doc is None:
+            raise FakeComError(f"Cannot bind {moniker}")
+        return doc
+
+
+class FakeEventSource:
+    """Event source for ``SelectedShapeUpdater`` driven by :meth:`emit`."""
+
+    def __init__(self):
+        self.callback = None
+
+    def subscribe(self, callback):
+        self.callback = callback
+
+    def unsubscribe(self):
+        self.callback = None
+
+    def emit(self, kind, payload=None):
+        if self.callback is not None:
+            self.callback(kind, payload)
+
+
+class FakeScheduler:
+    """Stand-in for Tk's ``after``/``after_cancel`` with a manual clock."""
+
+    def __init__(self):
+        self.now = 0
+        self._jobs = {}
+        self._next = 0
+
+    def after(self, ms, func):
+        self._next += 1
+        job = f"after#{self._next}"
+        self._jobs[job] = (self.now + ms, func)
+        return job
+
+    def after_cancel(self, job):
+        self._jobs.pop(job, None)
+
+    @property
+    def pending(self):
+        return len(self._jobs)
+
+    def advance(self, ms):
+        """Move the clock forward, running every job that becomes due."""
+        end = self.now + ms
+        while True:
+            due = [(t, job) for job, (t, _) in self._jobs.items() if t <= end]
+            if not due:
+                break
+            t, job = min(due)
+            self.now = t
+            self._jobs.pop(job)[1]()
+        self.now = end
+
+
+# -- synthetic .vsdx packages ----------------------------------------------
+
+_VSDX_FILES = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'content-types">'
+        '<Default Extension="rels" ContentType="application/'
+        'vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/visio/document.xml" ContentType="application/'
+        'vnd.ms-visio.drawing.main+xml"/>'
+        '<Override PartName="/visio/pages/pages.xml" ContentType='
+        '"application/vnd.ms-visio.pages+xml"/>'
+        '<Override PartName="/visio/masters/masters.xml" ContentType='
+        '"application/vnd.ms-visio.masters+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships"><Relationship Id="rId1" Type="http://schemas.'
+        'microsoft.com/visio/2010/relationships/document" Target="visio/'
+        'document.xml"/></Relationships>'),
+    'visio/document.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<VisioDocument xmlns="http://schemas.microsoft.com/office/visio/'
+        '2012/main" xmlns:r="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships" xml:space="preserve">'
+        '<DocumentSettings/></VisioDocument>'),
+    'visio/_rels/document.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships"><Relationship Id="rId1" Type="http://schemas.'
+        'microsoft.com/visio/2010/relationships/pages" Target="pages/'
+        'pages.xml"/><Relationship Id="rId2" Type="http://schemas.microsoft.'
+        'com/visio/2010/relationships/masters" Target="masters/masters.xml"'
+        '/></Relationships>'),
+}
+
+_XML_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_VISIO_NS = ('xmlns="http://schemas.microsoft.com/office/visio/2012/main" '
+             'xmlns:r="http://schemas.openxmlformats.org/officeDocument/'
+             '2006/relationships" xml:space="preserve"')
+
+
+def _esc(value):
+    return (str(value).replace('&', '&amp;').replace('<', '&lt;')
+            .replace('>', '&gt;').replace('"', '&quot;'))
+
+
+def _cell_xml(name, spec):
+    """``spec`` is a number/string or a ``(value, unit, formula)`` tuple."""
+    if isinstance(spec, tuple):
+        value, unit, formula = (tuple(spec) + (None, None))[:3]
+    else:
+        value, unit, formula = spec, None, None
+    if isinstance(value, str) and unit is None:
+        unit = 'STR'
+    attrs = f'N="{_esc(name)}" V="{_esc(value)}"'
+    if unit:
+        attrs += f' U="{_esc(unit)}"'
+    if formula is not None:
+        attrs += f' F="{_esc(formula)}"'
+    return f'<Cell {attrs}/>'
+
+
+def _rows_xml(section, rows):
+    out = [f'<Section N="{section}">']
+    for name, cells in rows.items():
+        if not isinstance(cells, dict):
+            cells = {'Value': cells}
+        out.append(f'<Row N="{_esc(name)}">')
+        out.extend(_cell_xml(n, v) for n, v in cells.items())
+        out.append('</Row>')
+    out.append('</Section>')
+    return ''.join(out)
+
+
+def _shape_xml(spec):
+    attrs = f'ID="{spec["id"]}"'
+    for key, attr in (('name', 'NameU'), ('name', 'Name'), ('type', 'Type'),
+                      ('master', 'Master'),
+                      ('master_shape', 'MasterShape')):
+        if spec.get(key) is not None:
+            attrs += f' {attr}="{_esc(spec[key])}"'
+    if 'type' not in spec:
+        attrs += ' Type="Group"' if spec.get('shapes') else ' Type="Shape"'
+    out = [f'<Shape {attrs}>']
+    out.extend(_cell_xml(n, v) for n, v in spec.get('cells', {}).items())
+    if spec.get('user'):
+        out.append(_rows_xml('User', spec['user']))
+    if spec.get('props'):
+        out.append(_rows_xml('Property', spec['props']))
+    for ix, rows in enumerate(spec.get('geometry', ())):
+        out.append(f'<Section N="Geometry" IX="{ix}">')
+        if isinstance(rows, dict):
+            out.extend(_cell_xml(n, v) for n, v in rows['cells'].items())
+            rows = rows['rows']
+        for i, (row_type, cells) in enumerate(rows, 1):
+            out.append(f'<Row T="{row_type}" IX="{i}">')
+            out.extend(_cell_xml(n, v) for n, v in cells.items())
+            out.append('</Row>')
+        out.append('</Section>')
+    if isinstance(spec.get('text'), (list, tuple)):
+        out.append('<Text>' + ''.join(
+            f'<cp IX="{i}"/>{_esc(run)}' for i, run in enumerate(spec['text']))
+            + '</Text>')
+    elif spec.get('text') is not None:
+        out.append(f'<Text>{_esc(spec["text"])}</Text>')
+    if spec.get('shapes'):
+        out.append('<Shapes>')
+        out.extend(_shape_xml(s) for s in spec['shapes'])
+        out.append('</Shapes>')
+    out.append('</Shape>')
+    return ''.join(out)
+
+
+def _rels_xml(kind, count):
+    rels = ''.join(
+        f'<Relationship Id="rId{i}" Type="http://schemas.microsoft.com/visio'
+        f'/2010/relationships/{kind}" Target="{kind}{i}.xml"/>'
+        for i in range(1, count + 1))
+    return (_XML_HEAD + '<Relationships xmlns="http://schemas.openxmlformats'
+            f'.org/package/2006/relationships">{rels}</Relationships>')
+
+
+def write_vsdx(path, pages, masters=()):
+    """Write a minimal but valid .vsdx package (test fixture helper).
+
+    ``pages`` is a list of dicts with the keys ``name``, ``width``,
+    ``height`` (inches), ``shapes`` (list or iterable of shape dicts) and
+    ``connects`` (list of ``(from_sheet, from_cell, to_sheet, to_cell)``).
+    A shape dict has ``id`` and optionally ``name``, ``master``,
+    ``master_shape``, ``cells`` (``{name: value or (value, unit,
+    formula)}``), ``props``, ``user`` (``{row: value or {cell: value}}``),
+    ``geometry`` (list of sections, each a list of ``(row_type, cells)``
+    or a dict with section ``cells`` such as ``NoFill`` and ``rows``),
+    ``text`` (a string, or a list of character runs that each get a
+    ``<cp>`` marker) and ``shapes``.  ``masters`` are dicts with ``id``,
+    ``name``, ``unique_id`` and ``shapes``.  Shapes are written as they are
+    produced, so generators can describe very large pages.
+    """
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in _VSDX_FILES.items():
+            zf.writestr(name, data)
+        index = [_XML_HEAD, f'<Pages {_VISIO_NS}>']
+        for i, page in enumerate(pages, 1):
+            name = _esc(page.get('name', f'Page-{i}'))
+            index.append(
+                f'<Page ID="{i - 1}" NameU="{name}" Name="{name}"><PageSheet>'
+                + _cell_xml('PageWidth', page.get('width', 8.5))
+                + _cell_xml('PageHeight', page.get('height', 11.0))
+                + f'</PageSheet><Rel r:id="rId{i}"/></Page>')
+            with zf.open(f'visio/pages/page{i}.xml', 'w') as f:
+                f.write((_XML_HEAD + f'<PageContents {_VISIO_NS}><Shapes>')
+                        .encode())
+                for spec in page.get('shapes', ()):
+                    f.write(_shape_xml(spec).encode())
+                f.write(b'</Shapes>')
+                if page.get('connects'):
+                    f.write(b'<Connects>')
+                    for fs, fc, ts, tc in page['connects']:
+                        f.write(f'<Connect FromSheet="{fs}" FromCell="{fc}" '
+                                f'ToSheet="{ts}" ToCell="{tc}"/>'.encode())
+                    f.write(b'</Connects>')
+                f.write(b'</PageContents>')
+        index.append('</Pages>')
+        zf.writestr('visio/pages/pages.xml', ''.join(index))
+        zf.writestr('visio/pages/_rels/pages.xml.rels',
+                    _rels_xml('page', len(pages)))
+        index = [_XML_HEAD, f'<Masters {_VISIO_NS}>']
+        for i, master in enumerate(masters, 1):
+            name = _esc(master['name'])
+            index.append(
+                f'<Master ID="{master["id"]}" NameU="{name}" Name="{name}" '
+                f'UniqueID="{_esc(master.get("unique_id", ""))}">'
+                f'<Rel r:id="rId{i}"/></Master>')
+            zf.writestr(f'visio/masters/master{i}.xml',
+                        _XML_HEAD + f'<MasterContents {_VISIO_NS}><Shapes>'
+                        + ''.join(_shape_xml(s) for s in master['shapes'])
+                        + '</Shapes></MasterContents>')
+        index.append('</Masters>')
+        zf.writestr('visio/masters/masters.xml', ''.join(index))
+        zf.writestr('visio/masters/_rels/masters.xml.rels',
+                    _rels_xml('master', len(masters)))
+    return path
+
+
+def rectangle_geometry(width, height):
+    """Geometry section of a plain rectangle, like ``Page.DrawRectangle``."""
+    corners = [('MoveTo', 0, 0), ('LineTo', 1, 0), ('LineTo', 1, 1),
+               ('LineTo', 0, 1), ('LineTo', 0, 0)]
+    return [[(row_type, {'X': (fx * width, None, f'Width*{fx}'),
+                         'Y': (fy * height, None, f'Height*{fy}')})
+             for row_type, fx, fy in corners]]
+
+
+def synthetic_shapes(n, columns=100, spacing=0.5, size=0.25, start_id=1):
+    """Yield ``n`` rectangle shape dicts laid out in a grid.
+
+    Every shape carries two Shape Data rows (``Type``, ``Tag``) and a text,
+    which is what the benchmarks read and edit.
+    """
+    for i in range(n):
+        sid = start_id + i
+        x = (i % columns) * spacing + spacing
+        y = (i // columns) * spacing + spacing
+        yield {
+            'id': sid,
+            'name': f'Rectangle.{sid}',
+            'cells': {'PinX': x, 'PinY': y, 'Width': size, 'Height': size,
+                      'LocPinX': (size / 2, None, 'Width*0.5'),
+                      'LocPinY': (size / 2, None, 'Height*0.5'),
+                      'Angle': 0},
+            'props': {'Type': {'Value': ('Pump' if i % 3 == 0 else 'Valve'),
+                               'Label': 'Type'},
+                      'Tag': {'Value': f'P-{sid:05d}', 'Label': 'Tag'}},
+            'geometry': rectangle_geometry(size, size),
+            'text': f'P-{sid:05d}',
+        }
@@ -0,0 +1,997 @@
+"""Evaluate ShapeSheet formulas offline and recalculate .vsdx files.
+
+:mod:`visiopy.patch` writes formulas into a package, but the cached result
+(the ``V`` attribute) of the edited cell and of every cell that depends on
+it stays as it was until Visio opens the file and recalculates.  Readers of
+the package (:mod:`visiopy.vsdx`, other tools) therefore see stale values.
+
+:class:`Recalc` loads the formula cells of all pages, resolves their
+references into a dependency graph and, after edits, re-evaluates only the
+cells downstream of them in dependency order.  :meth:`Recalc.save` writes
+the new results (and the edits) back; like :func:`~visiopy.patch.patch_vsdx`
+only the parts that changed are rewritten.
+
+Formulas are parsed once per distinct text and compiled to Python closures;
+the compiled forms live in a bounded LRU cache (:data:`CACHE_SIZE`), so a
+drawing with 100k cells built from a few hundred distinct formulas parses a
+few hundred times.
+
+Supported subset
+----------------
+- numbers with units (``20 mm``, ``2 in.``, ``30 deg``, ``50%``), strings,
+  ``TRUE``/``FALSE``;
+- ``+ - * / ^ &`` and ``= <> < > <= >=`` with Excel/Visio precedence;
+- references ``Width``, ``Prop.Row[.Label]``, ``User.Row[.Prompt]``,
+  ``Controls.Row[.Y]``, ``Geometry1.X2``, ``Connections.X1``,
+  ``Scratch.A1``, ``Char.Size``, ``Para.IndFirst`` on the own shape,
+  ``Sheet.5!``, ``'Shape name'!`` and ``ThePage!``;
+- the functions in :data:`FUNCTIONS` plus ``IF``.
+
+Values are computed in internal units (inches, radians) without tracking
+dimensions, so ``ROUND``/``INT``/``TRUNC`` of a length round the value in
+inches, and numbers joined with ``&`` are written in internal units.  Cells
+whose formula uses anything else (``THEMEVAL()``, ``TheDoc!``, ``NOW()``,
+...) keep their cached value and are listed in :attr:`Recalc.errors`
+together with the cells that depend on them.
+
+Usage:
+------
+    from visiopy.formula import Recalc, evaluate, recalc_vsdx
+
+    evaluate('ThePage!PageWidth-20 mm', {'ThePage!PageWidth': 8.5})
+
+    recalc_vsdx('in.vsdx', 'out.vsdx', {0: [(1, 'Width', '40 mm')]})
+
+    calc = Recalc('in.vsdx')
+    calc.set(0, 1, 'Width', '40 mm')
+    calc.recalc()                  # [(0, 1, 'Width'), (0, 1, 'Height'), ...]
+    calc.value(0, 1, 'Height')     # in internal units
+    calc.save('out.vsdx')
+"""
+import functools
+import math
+import os
+import re
+from collections import deque
+from xml.etree import ElementTree as ET
+
+from . import units
+from .batch import PAGE_SHEET_ID, as_edit
+from .patch import _address, _cell_elem, _serialize, _set, _write_package
+from .vsdx import CELL, NS, ROW, SECTION, SHAPE, Cell, VsdxFile
+
+# distinct formula texts kept compiled
+CACHE_SIZE = 8192
+
+_T = '{%s}' % NS
+
+
+class FormulaError(ValueError):
+    """A formula cannot be parsed or evaluated."""
+
+
+# -- parsing -----------------------------------------------------------------
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+  | (?P<str>"(?:[^"]|"")*")
+  | (?P<ref>(?:'(?:[^']|'')+'|[^\W\d][\w.]*)![^\W\d][\w.]*
+           | [^\W\d][\w.]*)
+  | (?P<op><>|<=|>=|[-+*/^&=<>(),;%])
+  )""", re.VERBOSE)
+
+_COMPARE = ('=', '<>', '<', '>', '<=', '>=')
+
+
+def _tokenize(text):
+    tokens = []
+    pos, end = 0, len(text.rstrip())
+    while pos < end:
+        match = _TOKEN.match(text, pos)
+        if match is None or match.end() == pos:
+            raise FormulaError(f"Cannot parse {text[pos:]!r} in {text!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser into nested tuples.
+
+    Nodes are ``('const', value)``, ``('ref', index)``, ``('neg', a)``,
+    ``('pct', a)``, ``('op', symbol, a, b)`` and ``('call', NAME, args)``;
+    ``refs`` lists the distinct reference texts in order of appearance.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.refs = []
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def take(self, value=None):
+        token = self.peek()
+        if token[0] is None or (value is not None and token[1] != value):
+            raise FormulaError(f"Expected {value or 'more'} in "
+                               f"{self.text!r}")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.compare()
+        if self.pos != len(self.tokens):
+            raise FormulaError(f"Unexpected {self.peek()[1]!r} in "
+                               f"{self.text!r}")
+        return node
+
+    def _binary(self, operators, operand):
+        node = operand()
+        while self.peek()[0] == 'op' and self.peek()[1] in operators:
+            symbol = self.take()[1]
+            node = ('op', symbol, node, operand())
+        return node
+
+    def compare(self):
+        return self._binary(_COMPARE, self.concat)
+
+    def concat(self):
+        return self._binary(('&',), self.additive)
+
+    def additive(self):
+        return self._binary(('+', '-'), self.multiplicative)
+
+    def multiplicative(self):
+        return self._binary(('*', '/'), self.power)
+
+    def power(self):
+        return self._binary(('^',), self.unary)
+
+    def unary(self):
+        kind, value = self.peek()
+        if kind == 'op' and value in ('-', '+'):
+            self.take()
+            node = self.unary()
+            return ('neg', node) if value == '-' else node
+        node = self.primary()
+        while self.peek() == ('op', '%'):
+            self.take()
+            node = ('pct', node)
+        return node
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == 'num':
+            number = float(value)
+            following = self.peek()
+            if following[0] == 'ref' and '!' not in following[1] \
+                    and units.is_unit(following[1].rstrip('.')):
+                self.take()
+                number = units.to_internal(number, following[1].rstrip('.'))
+            return ('const', number)
+        if kind == 'str':
+            return ('const', value[1:-1].replace('""', '"'))
+        if kind == 'op':
+            if value != '(':
+                raise FormulaError(f"Unexpected {value!r} in {self.text!r}")
+            node = self.compare()
+            self.take(')')
+            return node
+        if self.peek() == ('op', '(') and '!' not in value:
+            return self.call(value.upper())
+        if value.upper() in ('TRUE', 'FALSE'):
+            return ('const', value.upper() == 'TRUE')
+        if value not in self.refs:
+            self.refs.append(value)
+        return ('ref', self.refs.index(value))
+
+    def call(self, name):
+        if name not in FUNCTIONS and name != 'IF':
+            raise FormulaError(f"Unsupported function {name}()")
+        self.take('(')
+        args = []
+        if self.peek() != ('op', ')'):
+            args.append(self.compare())
+            while self.peek()[1] in (',', ';'):
+                self.take()
+                args.append(self.compare())
+        self.take(')')
+        low, high = (2, 3) if name == 'IF' else FUNCTIONS[name][1:]
+        if not low <= len(args) <= (high if high is not None else len(args)):
+            raise FormulaError(f"{name}() takes {low}"
+                               f"{'' if high == low else '+'} arguments")
+        return ('call', name, args)
+
+
+# -- values ------------------------------------------------------------------
+
+def _num(value):
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            raise FormulaError(f"#VALUE! {value!r} is not a number")
+    return float(value)
+
+
+def _text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    return f"{value:.15g}"
+
+
+def _order(a, b):
+    """-1, 0 or 1; strings compare case-insensitively."""
+    if isinstance(a, str) and isinstance(b, str):
+        a, b = a.lower(), b.lower()
+    elif isinstance(a, str) or isinstance(b, str):
+        a, b = _text(a).lower(), _text(b).lower()
+    else:
+        a, b = float(a), float(b)
+    return (a > b) - (a < b)
+
+
+def _divide(a, b):
+    b = _num(b)
+    if b == 0:
+        raise FormulaError("#DIV/0!")
+    return _num(a) / b
+
+
+def _power(a, b):
+    try:
+        return math.pow(_num(a), _num(b))
+    except (ValueError, OverflowError):
+        raise FormulaError(f"#NUM! {a}^{b}")
+
+
+_OPERATORS = {
+    '+': lambda a, b: _num(a) + _num(b),
+    '-': lambda a, b: _num(a) - _num(b),
+    '*': lambda a, b: _num(a) * _num(b),
+    '/': _divide,
+    '^': _power,
+    '&': lambda a, b: _text(a) + _text(b),
+    '=': lambda a, b: _order(a, b) == 0,
+    '<>': lambda a, b: _order(a, b) != 0,
+    '<': lambda a, b: _order(a, b) < 0,
+    '>': lambda a, b: _order(a, b) > 0,
+    '<=': lambda a, b: _order(a, b) <= 0,
+    '>=': lambda a, b: _order(a, b) >= 0,
+}
+
+
+def _math(func):
+    def wrapped(*args):
+        try:
+            return func(*[_num(a) for a in args])
+        except (ValueError, OverflowError):
+            raise FormulaError(f"#NUM! {func.__name__}{args}")
+    wrapped.__name__ = func.__name__
+    return wrapped
+
+
+def _round(x, digits=0):
+    x, scale = _num(x), 10.0 ** int(_num(digits))
+    # half away from zero, like Visio and Excel
+    return math.copysign(math.floor(abs(x) * scale + 0.5) / scale, x)
+
+
+def _trunc(x, digits=0):
+    scale = 10.0 ** int(_num(digits))
+    return math.trunc(_num(x) * scale) / scale
+
+
+def _sign(x, fuzz=0):
+    x = _num(x)
+    return 0.0 if abs(x) <= _num(fuzz) else math.copysign(1.0, x)
+
+
+def _index(i, text, delimiter=';', error=''):
+    items = _text(text).split(_text(delimiter))
+    i = int(_num(i))
+    return items[i] if 0 <= i < len(items) else error
+
+
+def _lookup(key, text, delimiter=';'):
+    items = _text(text).split(_text(delimiter))
+    key = _text(key).lower()
+    return float(next((i for i, item in enumerate(items)
+                       if item.lower() == key), -1))
+
+
+def _mid(text, start, count):
+    start = max(int(_num(start)) - 1, 0)
+    return _text(text)[start:start + max(int(_num(count)), 0)]
+
+
+def _strsame(a, b, ignore_case=False):
+    a, b = _text(a), _text(b)
+    if ignore_case:
+        a, b = a.lower(), b.lower()
+    return a == b
+
+
+# NAME: (function, min args, max args or None)
+FUNCTIONS = {
+    'ABS': (_math(abs), 1, 1),
+    'ACOS': (_math(math.acos), 1, 1),
+    'AND': (lambda *a: all(_num(x) for x in a), 1, None),
+    'ANG360': (_math(lambda a: a % (2 * math.pi)), 1, 1),
+    'ASIN': (_math(math.asin), 1, 1),
+    'ATAN': (_math(math.atan), 1, 1),
+    'ATAN2': (_math(math.atan2), 2, 2),
+    'COS': (_math(math.cos), 1, 1),
+    'COSH': (_math(math.cosh), 1, 1),
+    'DEPENDSON': (lambda *a: 0.0, 1, None),
+    'EXP': (_math(math.exp), 1, 1),
+    'GUARD': (lambda a: a, 1, 1),
+    'INDEX': (_index, 2, 4),
+    'INT': (_math(lambda a: float(math.floor(a))), 1, 1),
+    'INTUP': (_math(lambda a: float(math.ceil(a))), 1, 1),
+    'LEFT': (lambda s, n=1: _text(s)[:max(int(_num(n)), 0)], 1, 2),
+    'LEN': (lambda s: float(len(_text(s))), 1, 1),
+    'LN': (_math(math.log), 1, 1),
+    'LOG10': (_math(math.log10), 1, 1),
+    'LOOKUP': (_lookup, 2, 3),
+    'LOWER': (lambda s: _text(s).lower(), 1, 1),
+    'MAX': (lambda *a: max(_num(x) for x in a), 1, None),
+    'MID': (_mid, 3, 3),
+    'MIN': (lambda *a: min(_num(x) for x in a), 1, None),
+    'MODULUS': (_math(lambda a, b: a % b), 2, 2),
+    'NOT': (lambda a: not _num(a), 1, 1),
+    'OR': (lambda *a: any(_num(x) for x in a), 1, None),
+    'PI': (lambda: math.pi, 0, 0),
+    'POW': (_power, 2, 2),
+    'RIGHT': (lambda s, n=1: _text(s)[len(_text(s)) - max(int(_num(n)), 0):],
+              1, 2),
+    'ROUND': (_round, 2, 2),
+    'SIGN': (_sign, 1, 2),
+    'SIN': (_math(math.sin), 1, 1),
+    'SINH': (_math(math.sinh), 1, 1),
+    'SQRT': (_math(math.sqrt), 1, 1),
+    'STRSAME': (_strsame, 2, 3),
+    'SUM': (lambda *a: sum(_num(x) for x in a), 1, None),
+    'TAN': (_math(math.tan), 1, 1),
+    'TANH': (_math(math.tanh), 1, 1),
+    'THEMEGUARD': (lambda a: a, 1, 1),
+    'TRUNC': (_trunc, 1, 2),
+    'UPPER': (lambda s: _text(s).upper(), 1, 1),
+}
+
+
+def _compile(node):
+    """Turn a parse tree into a closure ``fn(get)``; ``get(i)`` returns the
+    value of reference ``i``."""
+    kind = node[0]
+    if kind == 'const':
+        value = node[1]
+        return lambda get: value
+    if kind == 'ref':
+        index = node[1]
+        return lambda get: get(index)
+    if kind == 'neg':
+        operand = _compile(node[1])
+        return lambda get: -_num(operand(get))
+    if kind == 'pct':
+        operand = _compile(node[1])
+        return lambda get: _num(operand(get)) / 100.0
+    if kind == 'op':
+        op, left, right = _OPERATORS[node[1]], _compile(node[2]), \
+            _compile(node[3])
+        return lambda get: op(left(get), right(get))
+    name, args = node[1], [_compile(a) for a in node[2]]
+    if name == 'IF':
+        test, then = args[0], args[1]
+        other = args[2] if len(args) > 2 else (lambda get: False)
+        return lambda get: then(get) if _num(test(get)) else other(get)
+    func = FUNCTIONS[name][0]
+    return lambda get: func(*[a(get) for a in args])
+
+
+class Formula:
+    """A parsed formula.
+
+    Attributes:
+    -----------
+    - text : str
+    - refs : tuple of str
+        Distinct cell references, as written (``'Width'``,
+        ``'ThePage!PageWidth'``).
+    """
+    __slots__ = ('text', 'refs', '_fn')
+
+    def __init__(self, text):
+        parser = _Parser(text)
+        tree = parser.parse()
+        self.text = text
+        self.refs = tuple(parser.refs)
+        self._fn = _compile(tree)
+
+    def evaluate(self, get):
+        """Result for ``get(i)`` returning the value of ``refs[i]``."""
+        return self._fn(get)
+
+    def __repr__(self):
+        return f"<Formula {self.text!r}>"
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse(text):
+    """Parse (and compile) a formula; repeated texts come from the cache.
+
+    Raises :class:`FormulaError` for syntax errors and unsupported
+    functions.
+    """
+    text = text.strip()
+    if text.startswith('='):
+        text = text[1:]
+    return Formula(text)
+
+
+def evaluate(formula, cells=None):
+    """Evaluate one formula.
+
+    Parameters:
+    ----------
+    - formula : str
+    - cells : dict, optional
+        Values of the referenced cells by reference text
+        (``{'Width': 1.5, 'ThePage!PageWidth': 8.5}``, case-insensitive),
+        numbers in internal units.
+
+    Returns:
+    --------
+    - float, str or bool in internal units.
+    """
+    parsed = parse(formula)
+    lowered = {k.lower(): v for k, v in (cells or {}).items()}
+
+    def get(i):
+        ref = parsed.refs[i]
+        try:
+            return lowered[ref.lower()]
+        except KeyError:
+            raise FormulaError(f"#REF! no value for {ref}")
+
+    return parsed.evaluate(get)
+
+
+# -- cell addresses ----------------------------------------------------------
+
+# prefix: (section, default cell) for named rows
+_NAMED = {'prop': ('Property', 'value'), 'user': ('User', 'value'),
+          'controls': ('Controls', 'x')}
+# prefix: section for rows addressed as Prefix.X1 (first row is 1)
+_NUMBERED = {'connections': 'Connection', 'scratch': 'Scratch'}
+# prefix: section with a single row 0
+_FIRST = {'char': 'Character', 'para': 'Paragraph'}
+_DEFAULTS = {(None, None, None, 'angle'): 0.0,
+             (None, None, None, 'flipx'): 0.0,
+             (None, None, None, 'flipy'): 0.0}
+_ROW_CELL = re.compile(r'([a-z]+)(\d+)$')
+_GEOMETRY = re.compile(r'geometry(\d+)$')
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _cell_address(name):
+    """``(section, section IX, row, cell)`` of a ShapeSheet cell name, all
+    names lower case; section and row are ``None`` for single cells."""
+    parts = name.lower().split('.')
+    if len(parts) == 1:
+        return (None, None, None, parts[0])
+    kind = parts[0]
+    if kind in _NAMED and len(parts) in (2, 3):
+        section, default = _NAMED[kind]
+        return (section, None, parts[1],
+                parts[2] if len(parts) == 3 else default)
+    if kind in _FIRST and len(parts) == 2:
+        return (_FIRST[kind], None, 0, parts[1])
+    match = _ROW_CELL.match(parts[-1]) if len(parts) == 2 else None
+    if match:
+        cell, row = match.group(1), int(match.group(2))
+        geometry = _GEOMETRY.match(kind)
+        if geometry:
+            return ('Geometry', int(geometry.group(1)) - 1, row, cell)
+        if kind in _NUMBERED:
+            return (_NUMBERED[kind], None, row - 1, cell)
+    raise FormulaError(f"Unsupported cell reference {name!r}")
+
+
+def _address_name(address, row_name=None, cell_name=None):
+    """Inverse of :func:`_cell_address` (in the cell's own spelling)."""
+    section, ix, row, default_cell = address
+    cell = cell_name or default_cell
+    if section is None:
+        return cell
+    for prefix, (name, default) in _NAMED.items():
+        if section == name:
+            text = f"{prefix.capitalize()}.{row_name or row}"
+            return text if default_cell == default else f"{text}.{cell}"
+    if section == 'Geometry':
+        return f"Geometry{ix + 1}.{cell}{row}"
+    for prefix, name in _NUMBERED.items():
+        if section == name:
+            return f"{prefix.capitalize()}.{cell}{row + 1}"
+    for prefix, name in _FIRST.items():
+        if section == name:
+            return f"{prefix.capitalize()}.{cell}"
+    return f"{section}.{row}.{cell}"
+
+
+def _sheet_cells(shape):
+    """Yield ``(address, Cell, Row)`` for all cells of a vsdx shape."""
+    for cell in shape.cells.values():
+        yield (None, None, None, cell.name.lower()), cell, None
+    for section in shape.sections:
+        for position, row in enumerate(section.rows):
+            if row.name is not None:
+                key = row.name.lower()
+            else:
+                key = row.index if row.index is not None else position
+            for cell in row.cells.values():
+                yield (section.name, section.index, key,
+                       cell.name.lower()), cell, row
+
+
+def _stored(cell):
+    value = cell.result
+    if value is None:
+        return '' if cell.unit == 'STR' else 0.0
+    return value
+
+
+def _format(value):
+    """``(V, STR or None)`` for writing a result into a cell."""
+    if isinstance(value, str):
+        return value, 'STR'
+    if isinstance(value, bool):
+        return ('1' if value else '0'), None
+    return repr(float(value)), None
+
+
+def _differs(old, new):
+    if isinstance(old, str) or isinstance(new, str):
+        return _text(old) != _text(new)
+    return abs(float(old) - float(new)) > 1e-12 * max(1.0, abs(float(old)))
+
+
+# -- recalculation -----------------------------------------------------------
+
+class Recalc:
+    """Formula cells of a .vsdx file with their dependency graph.
+
+    Parameters:
+    ----------
+    - path : str
+        The package to load; all pages are read once.
+
+    Attributes:
+    -----------
+    - evaluated : int
+        Number of formulas evaluated by the last :meth:`recalc`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._errors = {}
+        self.evaluated = 0
+        self._cells = {}        # key -> vsdx Cell
+        self._sheets = set()    # (page, shape id)
+        self._rows = {}         # key -> vsdx Row (section cells)
+        self._nodes = {}        # key -> (text, reference keys, Formula)
+        self._dependents = {}   # key -> set of formula keys reading it
+        self._values = {}       # key -> recalculated value
+        self._inherited = set()
+        self._names = []        # per page: {lower name: shape id}
+        self._pages = []
+        self._edits = {}        # key -> CellEdit
+        self._dirty = set()
+        self._changed = set()
+        self._load()
+
+    # -- loading -----------------------------------------------------------
+    def _load(self):
+        formulas = []
+        with VsdxFile(self.path) as vsdx:
+            bases = {}
+            self._pages = [(p.index, p.name, p.name_u) for p in vsdx.pages]
+            for page in vsdx.pages:
+                names = {}
+                self._names.append(names)
+                self._add_sheet(page.index, PAGE_SHEET_ID, page.sheet, None,
+                                formulas)
+                masters = {}
+                for shape in vsdx.iter_shapes(page):
+                    for name in (shape.name, shape.name_u):
+                        if name:
+                            names.setdefault(name.lower(), shape.id)
+                    master = shape.master if shape.master is not None \
+                        else masters.get(shape.parent)
+                    masters[shape.id] = master
+                    base = self._base(vsdx, shape, master)
+                    if base is not None and id(base) not in bases:
+                        bases[id(base)] = {a: c for a, c, _ in
+                                           _sheet_cells(base)}
+                    self._add_sheet(page.index, shape.id, shape,
+                                    bases.get(id(base)), formulas)
+        for key, text in formulas:
+            self._set_node(key, text)
+
+    @staticmethod
+    def _base(vsdx, shape, master):
+        """The master shape ``shape`` inherits from (as in VsdxFile)."""
+        if master is None or master not in vsdx.masters:
+            return None
+        shapes = vsdx.master_shapes(master)
+        if shape.master_shape is not None:
+            return shapes.get(shape.master_shape)
+        return next((s for s in shapes.values() if s.parent is None), None)
+
+    def _add_sheet(self, page, shape_id, shape, base, formulas):
+        self._sheets.add((page, shape_id))
+        for address, cell, row in _sheet_cells(shape):
+            key = (page, shape_id, address)
+            self._cells[key] = cell
+            if row is not None:
+                self._rows[key] = row
+            formula = cell.formula_attr
+            if base is not None:
+                master_cell = base.get(address)
+                if master_cell is cell:
+                    self._inherited.add(key)
+                if formula == 'Inh':
+                    self._inherited.add(key)
+                    formula = master_cell.formula_attr \
+                        if master_cell is not None else None
+            if formula not in (None, 'Inh', 'No Formula'):
+                formulas.append((key, formula))
+
+    def _resolve(self, key, ref):
+        page, shape_id, _ = key
+        sheet, _, cell = ref.rpartition('!')
+        if sheet:
+            if sheet.startswith("'"):
+                sheet = sheet[1:-1].replace("''", "'")
+            lowered = sheet.lower()
+            if lowered == 'thepage':
+                shape_id = PAGE_SHEET_ID
+            elif lowered.startswith('sheet.') and lowered[6:].isdigit():
+                shape_id = int(lowered[6:])
+            elif lowered in self._names[page]:
+                shape_id = self._names[page][lowered]
+            else:
+                raise FormulaError(f"Unsupported sheet reference {sheet!r}")
+        return (page, shape_id, _cell_address(cell))
+
+    def _set_node(self, key, text):
+        """Make ``key`` a formula cell (``text``) or a constant (``None``)
+        and update the edges of the graph.
+
+        Formulas that cannot be parsed are kept with ``None`` references
+        and an entry in :attr:`errors`.
+        """
+        old = self._nodes.pop(key, None)
+        if old is not None:
+            for ref in old[1] or ():
+                self._dependents.get(ref, set()).discard(key)
+        self._errors.pop(key, None)
+        if text is None:
+            return
+        try:
+            formula = parse(text)
+            refs = tuple(self._resolve(key, r) for r in formula.refs)
+        except FormulaError as e:
+            self._errors[key] = str(e)
+            formula = refs = None
+        self._nodes[key] = (text, refs, formula)
+        for ref in refs or ():
+            self._dependents.setdefault(ref, set()).add(key)
+
+    # -- access ------------------------------------------------------------
+    def _page_index(self, page):
+        if isinstance(page, int):
+            return page
+        for index, name, name_u in self._pages:
+            if page in (name, name_u):
+                return index
+        raise KeyError(f"No page named {page!r}")
+
+    def _key(self, page, shape_id, cell):
+        if isinstance(cell, tuple):
+            section, _, name = _address(cell)
+            if section is not None:
+                raise ValueError(f"Address {cell} by name, e.g. 'Prop.Row'")
+            address = (None, None, None, name.lower())
+        else:
+            address = _cell_address(cell)
+        return (self._page_index(page), shape_id, address)
+
+    def _name(self, key):
+        row, cell = self._rows.get(key), self._cells.get(key)
+        return (key[0], key[1],
+                _address_name(key[2], row.name if row is not None else None,
+                              cell.name if cell is not None else None))
+
+    @property
+    def errors(self):
+        """``{(page, shape_id, cell): message}`` of the cells that could
+        not be evaluated; they keep their cached value."""
+        return {self._name(k): message for k, message in
+                self._errors.items()}
+
+    def __len__(self):
+        """Number of formula cells."""
+        return len(self._nodes)
+
+    def _get(self, key):
+        if key in self._errors:
+            raise FormulaError(f"depends on {self._name(key)}: "
+                               f"{self._errors[key]}")
+        if key in self._values:
+            return self._values[key]
+        cell = self._cells.get(key)
+        if cell is None:
+            if key[2] in _DEFAULTS:
+                return _DEFAULTS[key[2]]
+            raise FormulaError(f"#REF! no cell {_address_name(key[2])} "
+                               f"in shape {key[1]}")
+        return _stored(cell)
+
+    def value(self, page, shape_id, cell):
+        """Current result of a cell in internal units."""
+        return self._get(self._key(page, shape_id, cell))
+
+    def formula(self, page, shape_id, cell):
+        """The formula a cell is evaluated with (``None`` for constants)."""
+        node = self._nodes.get(self._key(page, shape_id, cell))
+        return node[0] if node is not None else None
+
+    # -- edits -------------------------------------------------------------
+    def set(self, page, shape_id, cell, formula=None, value=None,
+            unit=None):
+        """Set a formula or a value like a :class:`~visiopy.batch.CellEdit`.
+
+        The cell and everything that depends on it is recalculated by the
+        next :meth:`recalc` or :meth:`save`.
+        """
+        edit = as_edit((shape_id, cell, formula) if value is None
+                       else (shape_id, cell, value, unit))
+        key = self._key(page, shape_id, cell)
+        if key[:2] not in self._sheets:
+            raise KeyError(f"No shape with ID {shape_id}")
+        old = self._cells.get(key)
+        if old is None and key[2][0] is not None:
+            raise KeyError(f"Shape {shape_id} has no cell {cell}")
+        elem = ET.Element(CELL)
+        if old is not None and old.value is not None:
+            elem.set('V', old.value)
+        _set(elem, edit)
+        name = old.name if old is not None else _address(cell)[2]
+        self._cells[key] = Cell(name, elem.get('V'), elem.get('U'),
+                                elem.get('F'))
+        self._inherited.discard(key)
+        self._values.pop(key, None)
+        self._set_node(key, elem.get('F'))
+        self._edits[key] = edit
+        self._dirty.add(key)
+        self._changed.add(key)
+
+    def apply(self, edits):
+        """Apply an edit set in the format of :func:`~visiopy.patch.
+        patch_vsdx` (``{page: [CellEdit or tuple, ...]}``).
+
+        Returns ``{page: {index: message}}`` for edits that failed.
+        """
+        failed = {}
+        for page, page_edits in edits.items():
+            for i, edit in enumerate(as_edit(e) for e in page_edits):
+                try:
+                    self.set(page, edit.shape_id, edit.cell, edit.formula,
+                             edit.value, edit.unit)
+                except (KeyError, ValueError) as e:
+                    failed.setdefault(page, {})[i] = str(e)
+        return failed
+
+    # -- evaluation --------------------------------------------------------
+    def _downstream(self, keys):
+        seen = {k for k in keys if k in self._nodes}
+        queue = deque(keys)
+        while queue:
+            for dependent in self._dependents.get(queue.popleft(), ()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    queue.append(dependent)
+        return seen
+
+    def _order(self, keys):
+        """``keys`` in dependency order (Kahn); the rest is circular."""
+        waiting = {key: sum(1 for r in set(self._nodes[key][1] or ())
+                            if r in keys) for key in keys}
+        ready = deque(k for k, n in waiting.items() if n == 0)
+        order = []
+        while ready:
+            key = ready.popleft()
+            order.append(key)
+            for dependent in self._dependents.get(key, ()):
+                if dependent in waiting:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0:
+                        ready.append(dependent)
+        return order, [k for k, n in waiting.items() if n > 0]
+
+    def _evaluate(self, key):
+        """Evaluate one formula cell; True if its result changed."""
+        _, refs, formula = self._nodes[key]
+        if formula is None:
+            return False        # not parsed, the error is kept
+        self._errors.pop(key, None)
+        try:
+            value = formula.evaluate(lambda i: self._get(refs[i]))
+        except FormulaError as e:
+            self._errors[key] = str(e)
+            return False
+        self.evaluated += 1
+        cell = self._cells[key]
+        self._values[key] = value
+        if not _differs(_stored(cell), value):
+            return key in self._dirty
+        v, str_unit = _format(value)
+        if key in self._inherited and cell.formula_attr != 'Inh':
+            # a master's cell object: give the instance its own copy
+            cell = self._cells[key] = Cell(cell.name, v, cell.unit, 'Inh')
+        cell.value = v
+        if str_unit or cell.unit == 'STR':
+            cell.unit = str_unit
+        self._changed.add(key)
+        return True
+
+    def recalc(self, full=False):
+        """Re-evaluate the cells affected by edits (all with ``full``).
+
+        Returns:
+        --------
+        - list of ``(page, shape_id, cell)`` whose result changed, in
+          evaluation order.
+        """
+        keys = set(self._nodes) if full else self._downstream(self._dirty)
+        order, circular = self._order(keys)
+        for key in circular:
+            self._errors[key] = "circular reference"
+        self.evaluated = 0
+        changed = [k for k in self._dirty if k not in self._nodes]
+        changed += [k for k in order if self._evaluate(k)]
+        self._dirty.clear()
+        return [self._name(k) for k in changed]
+
+    # -- writing -----------------------------------------------------------
+    def _row_elem(self, sheet, key):
+        section, ix, row, _ = key[2]
+        sec = next((s for s in sheet.findall(SECTION) if
+                    s.get('N') == section and
+                    (ix is None or s.get('IX') == str(ix))), None)
+        if sec is None:
+            sec = ET.Element(SECTION, {'N': section})
+            if ix is not None:
+                sec.set('IX', str(ix))
+            children = list(sheet)
+            position = next((i for i, c in enumerate(children) if c.tag
+                             not in (CELL, SECTION, _T + 'Trigger')),
+                            len(children))
+            sheet.insert(position, sec)
+        rows = [r for r in sec.findall(ROW) if r.get('Del') != '1']
+        if isinstance(row, int):
+            found = next((r for r in rows if r.get('IX') == str(row)), None)
+            if found is None and all(r.get('IX') is None for r in rows) \
+                    and row < len(rows):
+                found = rows[row]
+        else:
+            found = next((r for r in rows if
+                          (r.get('N') or '').lower() == row), None)
+        if found is None:
+            source = self._rows.get(key)
+            found = ET.SubElement(sec, ROW)
+            if isinstance(row, int):
+                found.set('IX', str(row))
+            else:
+                found.set('N', source.name if source is not None else row)
+        return found
+
+    def _write(self, sheet, key):
+        cell = self._cells[key]
+        parent = sheet if key[2][0] is None else self._row_elem(sheet, key)
+        elem = _cell_elem(parent, cell.name, create=True)
+        if key in self._edits:
+            _set(elem, self._edits[key])
+            if elem.get('F') is not None and cell.value is not None:
+                elem.set('V', cell.value)
+            return
+        elem.set('V', cell.value)
+        for attr, value in (('U', cell.unit),
+                            ('F', 'Inh' if key in self._inherited
+                             else cell.formula_attr)):
+            if value is None:
+                elem.attrib.pop(attr, None)
+            else:
+                elem.set(attr, value)
+
+    def save(self, dst=None):
+        """Recalculate pending edits and write the package.
+
+        Only the page parts (and ``pages.xml`` for PageSheet cells) holding
+        changed cells are rewritten; ``dst`` defaults to the loaded file.
+        """
+        if self._dirty:
+            self.recalc()
+        dst = dst or self.path
+        by_page = {}
+        for key in self._changed:
+            by_page.setdefault(key[0], []).append(key)
+        with VsdxFile(self.path) as vsdx:
+            index_part = vsdx._related(vsdx._document, '/pages')
+            index_root = None
+            replaced = {}
+            for index, keys in sorted(by_page.items()):
+                page = vsdx.pages[index]
+                shape_keys = [k for k in keys if k[1] != PAGE_SHEET_ID]
+                if shape_keys:
+                    root = ET.fromstring(vsdx._zip.read(page.part))
+                    sheets = {int(e.get('ID')): e
+                              for e in root.iter(SHAPE)}
+                    for key in shape_keys:
+                        self._write(sheets[key[1]], key)
+                    replaced[page.part] = _serialize(root)
+                if len(shape_keys) < len(keys):
+                    if index_root is None:
+                        index_root = ET.fromstring(
+                            vsdx._zip.read(index_part))
+                    elem = list(index_root.iter(_T + 'Page'))[index]
+                    sheet = elem.find(_T + 'PageSheet')
+                    if sheet is None:
+                        sheet = ET.Element(_T + 'PageSheet')
+                        elem.insert(0, sheet)
+                    for key in keys:
+                        if key[1] == PAGE_SHEET_ID:
+                            self._write(sheet, key)
+            if index_root is not None:
+                replaced[index_part] = _serialize(index_root)
+            tmp = _write_package(vsdx._zip, dst, replaced)
+        os.replace(tmp, dst)
+        self.path = dst
+        self._changed.clear()
+        self._edits.clear()
+        return dst
+
+
+def recalc_vsdx(src, dst=None, edits=None, full=False):
+    """Apply ``edits`` to a package, recalculate and save it.
+
+    Parameters:
+    ----------
+    - src, dst : str
+        Source and target package; ``src`` is updated if ``dst`` is
+        omitted.
+    - edits : dict, optional
+        ``{page: [CellEdit or tuple, ...]}`` as for
+        :func:`~visiopy.patch.patch_vsdx`.
+    - full : bool
+        Re-evaluate every formula instead of only the edited cells and their
+        dependents (refreshes files edited by other tools).
+
+    Returns:
+    --------
+    - Recalc with ``errors`` and ``failed`` (``{page: {index: message}}``
+      for edits that could not be applied).
+    """
+    calc = Recalc(src)
+    calc.failed = calc.apply(edits or {})
+    calc.recalc(full=full)
+    calc.save(dst or src)
+    return calc
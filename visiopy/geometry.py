@@ -0,0 +1,179 @@
+"""Columnar geometry snapshots of a page or selection (NumPy).
+
+:func:`page_geometry` reads a set of cells of many shapes with one batched
+``GetResults`` call and returns them as NumPy columns.  Edit the columns
+with vectorized expressions and push them back with :func:`apply_geometry`,
+which only writes the cells that actually changed (one ``SetResults`` call).
+
+Usage:
+------
+    import numpy as np
+    from visiopy.geometry import page_geometry, apply_geometry
+
+    geo = page_geometry(vPg, unit='mm')          # or vWin.Selection
+    geo['PinX'] = np.round(geo['PinX'], 1)       # snap to 0.1 mm
+    geo['PinY'] = np.round(geo['PinY'], 1)
+    apply_geometry(geo)
+
+NumPy is an optional dependency (``pip install visiopy[numpy]``).
+"""
+from .batch import CellEdit, read_cells, shape_ids, write_cells
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+DEFAULT_CELLS = ('PinX', 'PinY', 'Width', 'Height', 'LocPinX', 'LocPinY',
+                 'Angle')
+
+# cells that are not lengths
+ANGLE_CELLS = {'angle'}
+PLAIN_CELLS = {'flipx', 'flipy', 'resizemode', 'fillforegnd', 'fillbkgnd',
+               'fillpattern', 'linecolor', 'linepattern'}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("visiopy.geometry needs numpy "
+                          "(pip install visiopy[numpy])")
+
+
+def cell_unit(cell, unit, angle_unit):
+    """The unit a cell is read and written in."""
+    name = cell.lower()
+    if name in ANGLE_CELLS:
+        return angle_unit
+    if name in PLAIN_CELLS:
+        return None
+    return unit
+
+
+class Geometry:
+    """Cell results of many shapes as NumPy columns.
+
+    Behaves like a dict of float arrays (``geo['PinX']``) plus ``ids``.
+    Keeps a copy of the values as read, so :func:`apply_geometry` can write
+    only what changed.
+
+    Attributes:
+    -----------
+    - page : Visio Page the values came from
+    - ids : numpy array of shape IDs, one per row
+    - units : dict mapping each cell to its unit
+    - errors : dict of ``(shape_id, cell)`` that could not be read
+    """
+
+    def __init__(self, page, ids, columns, units, errors=None):
+        self.page = page
+        self.ids = ids
+        self.columns = columns
+        self.units = units
+        self.errors = errors or {}
+        self._read = {k: v.copy() for k, v in columns.items()}
+
+    def __getitem__(self, cell):
+        return self.columns[cell]
+
+    def __setitem__(self, cell, values):
+        if cell not in self.columns:
+            raise KeyError(f"{cell} is not part of this snapshot")
+        self.columns[cell][:] = values
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def keys(self):
+        return self.columns.keys()
+
+    def changed(self):
+        """Return ``{cell: boolean mask}`` of the rows that differ."""
+        masks = {}
+        for cell, values in self.columns.items():
+            old = self._read[cell]
+            masks[cell] = ~((values == old) | (np.isnan(values) &
+                                                np.isnan(old)))
+        return masks
+
+    def to_records(self):
+        """The snapshot as a structured array with an ``ID`` field."""
+        dtype = [('ID', 'i4')] + [(c, 'f8') for c in self.columns]
+        records = np.empty(len(self.ids), dtype=dtype)
+        records['ID'] = self.ids
+        for cell, values in self.columns.items():
+            records[cell] = values
+        return records
+
+    def __repr__(self):
+        return (f"<Geometry {len(self.ids)} shapes x "
+                f"{', '.join(self.columns)}>")
+
+
+def page_geometry(target, cells=DEFAULT_CELLS, unit='mm', angle_unit='deg'):
+    """Read ``cells`` of all shapes of a page or selection in one call.
+
+    Parameters:
+    ----------
+    - target : Visio Page or Selection
+    - cells : sequence of str
+        Cell names (see :data:`visiopy.batch.CELL_SRC` for the ones that
+        need no per-shape lookup).
+    - unit : str
+        Unit of length cells.
+    - angle_unit : str
+        Unit of angle cells.
+
+    Returns:
+    --------
+    - Geometry; cells that cannot be read come back as NaN.
+    """
+    _require_numpy()
+    ids = shape_ids(target)
+    page = target.ContainingPage if hasattr(target, 'GetIDs') else target
+    cells = list(cells)
+    units = {c: cell_unit(c, unit, angle_unit) for c in cells}
+    refs = [(sid, c) for sid in ids for c in cells]
+    result = read_cells(page, refs, unit=[units[c] for _, c in refs])
+    values = np.array([np.nan if v is None else v for v in result.values],
+                      dtype=float).reshape(len(ids), len(cells))
+    columns = {c: values[:, j].copy() for j, c in enumerate(cells)}
+    errors = {refs[i]: message for i, message in result.errors.items()}
+    return Geometry(page, np.array(ids, dtype=int), columns, units, errors)
+
+
+def apply_geometry(geometry, cells=None):
+    """Write the changed values of a :class:`Geometry` back to the page.
+
+    Only rows whose value differs from the snapshot are sent, all of them in
+    one ``SetResults`` call (per chunk).  Afterwards the snapshot counts as
+    written, so calling this twice writes nothing the second time.
+
+    Returns:
+    --------
+    - BatchResult of the write (``values`` unused), or ``None`` if nothing
+      changed.
+    """
+    _require_numpy()
+    masks = geometry.changed()
+    edits, rows = [], []
+    for cell, mask in masks.items():
+        if cells is not None and cell not in cells:
+            continue
+        values = geometry.columns[cell]
+        for row in np.flatnonzero(mask):
+            if np.isnan(values[row]):
+                continue
+            edits.append(CellEdit(int(geometry.ids[row]), cell,
+                                  value=float(values[row]),
+                                  unit=geometry.units[cell]))
+            rows.append(row)
+    if not edits:
+        return None
+    result = write_cells(geometry.page, edits)
+    for i, (edit, row) in enumerate(zip(edits, rows)):
+        if i not in result.errors:
+            geometry._read[edit.cell][row] = edit.value
+    return result
@@ -0,0 +1,407 @@
+"""Connectivity of a drawing as a graph.
+
+Following connectors with ``Shape.Connects``/``FromConnects`` costs COM
+calls for every hop of every query.  :class:`ConnectionGraph` reads the
+glue of a whole page once and answers neighbour, component, path and
+upstream/downstream queries from memory.
+
+Live pages are read from the connectors' ShapeSheets: a glued end has
+``BegTrigger``/``EndTrigger`` set to ``_XFTRIGGER(<shape>!EventXFMod)``,
+so the glue of every shape comes back in one batched ``GetFormulasU``
+(:func:`page_glue`).  Iterating ``Page.Connects`` (:func:`page_connects`)
+costs three to four calls per glue record and is kept for drawings whose
+trigger cells were overwritten.  Offline the ``<Connects>`` element of a
+.vsdx page is streamed.
+
+Shapes are the nodes.  A connector whose begin is glued to shape A and
+whose end is glued to shape B is a directed edge A -> B labelled with the
+connector's ID; connectors glued at one end only are remembered but form
+no edge.  For a whole document or file the nodes are ``(page, shape_id)``
+pairs.
+
+The graph is kept as adjacency dicts so glue changes update it in place
+(:meth:`~ConnectionGraph.glue`, :meth:`~ConnectionGraph.refresh`); it
+converts to CSR arrays (NumPy) or to a ``networkx.MultiDiGraph`` for
+heavier analysis.
+
+Usage:
+------
+    from visiopy.graph import ConnectionGraph
+
+    graph = ConnectionGraph.from_page(vPg)      # or .from_vsdx(path, 0)
+    graph.neighbours(12)
+    graph.downstream(12)                        # everything fed by shape 12
+    graph.shortest_path(12, 80)
+    graph.components()
+
+    graph.refresh([301, 302])                   # after connectors changed,
+                                                # one batched read
+    nx_graph = graph.to_networkx()
+"""
+import re
+from collections import defaultdict, deque, namedtuple
+
+from .batch import read_cells, shape_ids
+from .vsdx import Connect
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+# VisFromParts of Connect.FromPart
+visBegin = 9
+visEnd = 12
+_PART_CELLS = {visBegin: 'BeginX', visEnd: 'EndX'}
+_TRIGGER_CELLS = {'BegTrigger': 'BeginX', 'EndTrigger': 'EndX'}
+_TRIGGER = re.compile(r"_XFTRIGGER\((.+)!EventXFMod\)", re.IGNORECASE)
+_SHEET = re.compile(r"Sheet\.(\d+)", re.IGNORECASE)
+
+CSR = namedtuple('CSR', 'nodes indptr indices connectors')
+CSR.__doc__ = """Directed adjacency in compressed sparse row form.
+
+The out-edges of ``nodes[i]`` are ``indices[indptr[i]:indptr[i + 1]]``
+(positions in ``nodes``), made by ``connectors[...]`` of the same slice.
+"""
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("ConnectionGraph.to_csr needs NumPy "
+                          "(pip install visiopy[numpy])")
+
+
+def _sorted(items):
+    try:
+        return sorted(items)
+    except TypeError:           # mixed ID kinds
+        return sorted(items, key=repr)
+
+
+def _end(cell):
+    """0 for a begin cell, 1 for an end cell, ``None`` for other glue."""
+    cell = (cell or '').lower()
+    if cell.startswith('begin'):
+        return 0
+    if cell.startswith('end'):
+        return 1
+    return None
+
+
+def _sheet_id(page, name, names):
+    """Shape ID of a sheet reference; ``Sheet.<ID>`` needs no call."""
+    if name.startswith("'"):
+        name = name[1:-1].replace("''", "'")
+    match = _SHEET.fullmatch(name)
+    if match:
+        return int(match.group(1))
+    if name not in names:
+        try:
+            names[name] = page.Shapes.ItemU(name).ID
+        except Exception:
+            names[name] = None
+    return names[name]
+
+
+def page_glue(page, ids=None, names=None):
+    """Glue records of a live page from the trigger cells of its shapes.
+
+    Reads ``BegTrigger``/``EndTrigger`` of ``ids`` (default: all shapes) in
+    one batched ``GetFormulasU``.  Targets referenced as ``Sheet.<ID>``
+    cost nothing; renamed targets (``Pump.12``) are looked up once with
+    ``Shapes.ItemU`` and remembered in ``names``.
+    """
+    ids = shape_ids(page) if ids is None else list(ids)
+    names = {} if names is None else names
+    refs = [(sid, cell) for sid in ids for cell in _TRIGGER_CELLS]
+    formulas = read_cells(page, refs, formulas=True)
+    records = []
+    for i, (sid, cell) in enumerate(refs):
+        match = _TRIGGER.search(formulas.values[i] or '')
+        if i in formulas.errors or match is None:
+            continue
+        target = _sheet_id(page, match.group(1), names)
+        if target is not None:
+            records.append(Connect(sid, _TRIGGER_CELLS[cell], target, None))
+    return records
+
+
+def page_connects(target):
+    """Glue records of a live page (or shape) in one pass over
+    ``Connects``; only connector ends (begin/end) are returned."""
+    records = []
+    for connect in target.Connects:
+        cell = _PART_CELLS.get(connect.FromPart)
+        if cell is not None:
+            records.append(Connect(connect.FromSheet.ID, cell,
+                                   connect.ToSheet.ID, None))
+    return records
+
+
+class ConnectionGraph:
+    """Directed multigraph of shapes joined by glued connectors.
+
+    Parameters:
+    ----------
+    - records : iterable of Connect, optional
+        Glue records (``from_sheet`` the connector, ``from_cell``
+        ``'BeginX'``/``'EndX'``, ``to_sheet`` the glued shape).
+    - source : Visio Page, optional
+        Where :meth:`refresh` reads updated glue from.
+    """
+
+    def __init__(self, records=(), source=None):
+        self.source = source
+        self._names = {}                 # NameU -> ID of glue targets
+        self._ends = {}                  # connector -> [begin, end]
+        self._out = defaultdict(dict)    # node -> {connector: node}
+        self._in = defaultdict(dict)
+        self._glued = defaultdict(set)   # node -> connectors glued to it
+        self.add(records)
+
+    # -- construction --------------------------------------------------------
+    @classmethod
+    def from_page(cls, page, ids=None, connects=False):
+        """Read the glue of a live page.
+
+        By default from the trigger cells (:func:`page_glue`, of ``ids`` or
+        all shapes); ``connects=True`` iterates ``Page.Connects`` instead.
+        """
+        graph = cls(source=page)
+        graph.add(page_connects(page) if connects
+                  else page_glue(page, ids, graph._names))
+        return graph
+
+    @classmethod
+    def from_document(cls, doc, connects=False):
+        """All pages of a live document; nodes are ``(page, shape_id)``."""
+        graph = cls()
+        for page in doc.Pages:
+            graph.add(page_connects(page) if connects else page_glue(page),
+                      page.NameU)
+        return graph
+
+    @classmethod
+    def from_vsdx(cls, vsdx, page=0):
+        """Read the ``<Connects>`` of a .vsdx page (path or VsdxFile).
+
+        ``page=None`` reads every page; nodes are then
+        ``(page name, shape_id)``.
+        """
+        from .vsdx import VsdxFile
+        f = vsdx if isinstance(vsdx, VsdxFile) else VsdxFile(vsdx)
+        try:
+            if page is not None:
+                return cls(f.connects(page))
+            graph = cls()
+            for p in f.pages:
+                graph.add(f.connects(p), p.name_u or p.name)
+            return graph
+        finally:
+            if f is not vsdx:
+                f.close()
+
+    def add(self, records, page=None):
+        """Apply glue records; with ``page`` IDs become ``(page, id)``."""
+        for record in records:
+            end = _end(record.from_cell)
+            if end is None:
+                continue
+            connector, shape = record.from_sheet, record.to_sheet
+            if page is not None:
+                connector, shape = (page, connector), (page, shape)
+            self.glue(connector, end, shape)
+
+    # -- maintenance ---------------------------------------------------------
+    def _unlink(self, connector):
+        begin, end = self._ends[connector]
+        if begin is not None and end is not None:
+            del self._out[begin][connector]
+            del self._in[end][connector]
+            for node, edges in ((begin, self._out), (end, self._in)):
+                if not edges[node]:
+                    del edges[node]
+
+    def _link(self, connector):
+        begin, end = self._ends[connector]
+        if begin is not None and end is not None:
+            self._out[begin][connector] = end
+            self._in[end][connector] = begin
+
+    def glue(self, connector, end, shape):
+        """Glue the begin (``end=0`` or ``'BeginX'``) or end (``1``,
+        ``'EndX'``) of ``connector`` to ``shape`` (``None``: unglue)."""
+        if isinstance(end, str):
+            end = _end(end)
+        ends = self._ends.setdefault(connector, [None, None])
+        self._unlink(connector)
+        old = ends[end]
+        if old is not None and old not in ends[1 - end:2 - end]:
+            self._glued[old].discard(connector)
+            if not self._glued[old]:
+                del self._glued[old]
+        ends[end] = shape
+        if shape is not None:
+            self._glued[shape].add(connector)
+        self._link(connector)
+        if ends == [None, None]:
+            del self._ends[connector]
+
+    def remove_connector(self, connector):
+        """Forget a connector (deleted or no longer glued)."""
+        if connector in self._ends:
+            self.glue(connector, 0, None)
+        if connector in self._ends:
+            self.glue(connector, 1, None)
+
+    def remove_shape(self, shape):
+        """Forget a shape: connectors glued to it become loose and a
+        connector that is itself a node is dropped as well."""
+        for connector in list(self._glued.get(shape, ())):
+            ends = self._ends[connector]
+            for end in (0, 1):
+                if ends[end] == shape:
+                    self.glue(connector, end, None)
+        self.remove_connector(shape)
+
+    def refresh(self, connectors):
+        """Re-read the glue of ``connectors`` from the live ``source``.
+
+        One batched read of their trigger cells; connectors that no longer
+        exist are removed.
+        """
+        if self.source is None:
+            raise ValueError("This graph has no live page to refresh from")
+        connectors = list(connectors)
+        for connector in connectors:
+            self.remove_connector(connector)
+        self.add(page_glue(self.source, connectors, self._names))
+
+    # -- queries -------------------------------------------------------------
+    def __len__(self):
+        return len(self._glued)
+
+    def __contains__(self, node):
+        return node in self._glued
+
+    @property
+    def nodes(self):
+        """All shapes with at least one glued connector."""
+        return _sorted(self._glued)
+
+    @property
+    def edges(self):
+        """``[(begin, end, connector), ...]`` of fully glued connectors."""
+        return [(begin, end, connector)
+                for begin, out in self._out.items()
+                for connector, end in out.items()]
+
+    def ends(self, connector):
+        """``(begin, end)`` shapes of a connector (``None`` if loose)."""
+        return tuple(self._ends.get(connector, (None, None)))
+
+    def connectors(self, node):
+        """IDs of the connectors glued to ``node`` (sorted)."""
+        return _sorted(self._glued.get(node, ()))
+
+    def _adjacent(self, node, direction):
+        found = set()
+        if direction in ('out', 'both'):
+            found.update(self._out.get(node, {}).values())
+        if direction in ('in', 'both'):
+            found.update(self._in.get(node, {}).values())
+        return found
+
+    def neighbours(self, node, direction='both'):
+        """Shapes one connector away; ``direction`` is ``'out'``
+        (downstream), ``'in'`` (upstream) or ``'both'``."""
+        return _sorted(self._adjacent(node, direction))
+
+    def _walk(self, start, direction):
+        seen, queue, order = {start}, deque([start]), []
+        while queue:
+            node = queue.popleft()
+            for other in self._adjacent(node, direction):
+                if other not in seen:
+                    seen.add(other)
+                    order.append(other)
+                    queue.append(other)
+        return order
+
+    def downstream(self, node):
+        """Every shape reachable along connector direction, nearest
+        first."""
+        return self._walk(node, 'out')
+
+    def upstream(self, node):
+        """Every shape from which ``node`` is reachable, nearest first."""
+        return self._walk(node, 'in')
+
+    def components(self):
+        """Connected components (ignoring direction), largest first."""
+        seen, result = set(), []
+        for node in self._glued:
+            if node in seen:
+                continue
+            members = {node, *self._walk(node, 'both')}
+            seen |= members
+            result.append(members)
+        result.sort(key=len, reverse=True)
+        return result
+
+    def shortest_path(self, a, b, directed=False):
+        """Fewest-hops path from ``a`` to ``b`` as a list of shapes, or
+        ``None``; with ``directed`` only along connector direction."""
+        if a == b:
+            return [a]
+        direction = 'out' if directed else 'both'
+        parent, queue = {a: None}, deque([a])
+        while queue:
+            node = queue.popleft()
+            for other in self._adjacent(node, direction):
+                if other in parent:
+                    continue
+                parent[other] = node
+                if other == b:
+                    path = [b]
+                    while parent[path[-1]] is not None:
+                        path.append(parent[path[-1]])
+                    return path[::-1]
+                queue.append(other)
+        return None
+
+    # -- export --------------------------------------------------------------
+    def to_csr(self):
+        """The directed adjacency as :data:`CSR` NumPy arrays."""
+        _require_numpy()
+        nodes = self.nodes
+        position = {node: i for i, node in enumerate(nodes)}
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        indices, connectors = [], []
+        for i, node in enumerate(nodes):
+            out = self._out.get(node, {})
+            for connector in _sorted(out):
+                indices.append(position[out[connector]])
+                connectors.append(connector)
+            indptr[i + 1] = len(indices)
+        if nodes and isinstance(nodes[0], tuple):
+            nodes = np.array(nodes, dtype=object)
+            connectors = np.array(connectors + [None], dtype=object)[:-1]
+        else:
+            nodes = np.array(nodes, dtype=np.int64)
+            connectors = np.array(connectors, dtype=np.int64)
+        return CSR(nodes, indptr, np.array(indices, dtype=np.int64),
+                   connectors)
+
+    def to_networkx(self):
+        """A ``networkx.MultiDiGraph``; edge keys are connector IDs."""
+        import networkx as nx
+        graph = nx.MultiDiGraph()
+        graph.add_nodes_from(self._glued)
+        graph.add_edges_from((begin, end, connector)
+                             for begin, end, connector in self.edges)
+        return graph
+
+    def __repr__(self):
+        return (f"<ConnectionGraph {len(self._glued)} shapes, "
+                f"{sum(len(o) for o in self._out.values())} connections>")
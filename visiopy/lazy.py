@@ -0,0 +1,195 @@
+"""Lazy Shapes, Selection and Pages collections.
+
+``[shp for shp in vPg.Shapes]`` and ``list(doc.Pages)`` fetch one dispatch
+object per item before the script has looked at any of them.  The
+wrappers here fetch the shape IDs in one call (``Selection.GetIDs``),
+create a :class:`ShapeProxy` per shape only while iterating, reach the real
+COM shape only when a proxy is asked for something it does not know, and
+read the requested cells chunk by chunk (one batched ``GetResults`` per
+chunk) as the iteration goes on.  Stopping early stops the reads; memory
+holds the IDs plus the current chunk.
+
+Usage:
+------
+    from visiopy.lazy import pages, shapes
+
+    for shp in shapes(vPg, cells=['PinX', 'Width'], unit='mm'):
+        if shp['Width'] > 20:             # prefetched, no COM call
+            print(shp.ID, shp.Text)       # Text goes to the COM shape
+            break
+
+    sel = shapes(vWin.Selection)          # one GetIDs call
+    len(sel), sel.ids[:5]
+    first = pages(vDoc)[0]                # Pages.Item(1), nothing else
+"""
+from .batch import read_cells, shape_ids
+
+CHUNK = 500
+
+
+class ShapeProxy:
+    """Stand-in for one shape of a :class:`LazyShapes`.
+
+    ``ID`` and prefetched cells (``proxy['PinX']``) cost nothing; any
+    other attribute is looked up on the COM shape, which is fetched with
+    ``Shapes.ItemFromID`` on first use.
+    """
+
+    __slots__ = ('ID', '_page', '_values', '_unit', '_shape')
+
+    def __init__(self, page, shape_id, values=None, unit=None):
+        self.ID = shape_id
+        self._page = page
+        self._values = values if values is not None else {}
+        self._unit = unit
+        self._shape = None
+
+    @property
+    def shape(self):
+        """The COM shape (fetched once)."""
+        if self._shape is None:
+            self._shape = self._page.Shapes.ItemFromID(self.ID)
+        return self._shape
+
+    def __getitem__(self, cell):
+        """Result of ``cell`` (prefetched, else one batched read)."""
+        key = cell.lower()
+        if key not in self._values:
+            result = read_cells(self._page, [(self.ID, cell)],
+                                unit=self._unit)
+            if result.errors:
+                raise KeyError(f"Cannot read {cell} of shape {self.ID}: "
+                               f"{result.errors[0]}")
+            self._values[key] = result.values[0]
+        return self._values[key]
+
+    def get(self, cell, default=None):
+        try:
+            return self[cell]
+        except KeyError:
+            return default
+
+    def __getattr__(self, name):
+        return getattr(self.shape, name)
+
+    def __eq__(self, other):
+        return isinstance(other, ShapeProxy) and other.ID == self.ID \
+            and other._page is self._page
+
+    def __hash__(self):
+        return hash(self.ID)
+
+    def __repr__(self):
+        return f"<ShapeProxy {self.ID}>"
+
+
+class LazyShapes:
+    """The shapes of a page or selection, fetched as they are used.
+
+    Parameters:
+    ----------
+    - target : Visio Page or Selection
+    - cells : sequence of str, optional
+        Cells to read for every shape, one batched call per chunk.
+    - unit : str, optional
+        Unit of the prefetched cells (internal units if omitted).
+    - chunk_size : int
+        Shapes per prefetch chunk.
+    - ids : sequence of int, optional
+        Use these IDs instead of asking Visio (no call at all).
+    """
+
+    def __init__(self, target, cells=(), unit=None, chunk_size=CHUNK,
+                 ids=None):
+        self.page = target.ContainingPage if hasattr(target, 'GetIDs') \
+            else target
+        self._target = target
+        self.cells = list(cells)
+        self.unit = unit
+        self.chunk_size = max(1, int(chunk_size))
+        self._ids = None if ids is None else list(ids)
+
+    @property
+    def ids(self):
+        """Shape IDs, fetched with one ``GetIDs`` call on first use."""
+        if self._ids is None:
+            self._ids = shape_ids(self._target)
+        return self._ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _chunk(self, ids):
+        values = [{} for _ in ids]
+        if self.cells and ids:
+            refs = [(sid, cell) for sid in ids for cell in self.cells]
+            result = read_cells(self.page, refs, unit=self.unit,
+                                chunk_size=len(refs))
+            n = len(self.cells)
+            for i, value in enumerate(result.values):
+                if i not in result.errors:
+                    values[i // n][self.cells[i % n].lower()] = value
+        return [ShapeProxy(self.page, sid, v, self.unit)
+                for sid, v in zip(ids, values)]
+
+    def __iter__(self):
+        ids = self.ids
+        for start in range(0, len(ids), self.chunk_size):
+            yield from self._chunk(ids[start:start + self.chunk_size])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LazyShapes(self.page, self.cells, self.unit,
+                              self.chunk_size, ids=self.ids[index])
+        return self._chunk([self.ids[index]])[0]
+
+    def __contains__(self, shape):
+        return getattr(shape, 'ID', shape) in set(self.ids)
+
+    def __repr__(self):
+        count = '?' if self._ids is None else len(self._ids)
+        return f"<LazyShapes {count} shapes>"
+
+
+class LazyPages:
+    """``Document.Pages`` without enumerating it.
+
+    ``pages[0]`` is ``Pages.Item(1)``, ``pages['Plan']`` is
+    ``Pages.ItemU('Plan')``; iteration fetches one page at a time.
+    """
+
+    def __init__(self, doc):
+        self._pages = doc.Pages
+        self._count = None
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self._pages.Count
+        return self._count
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._pages.ItemU(key)
+        if key < 0:
+            key += len(self)
+        if key and not 0 <= key < len(self):
+            raise IndexError("page index out of range")
+        return self._pages.Item(key + 1)
+
+    def __iter__(self):
+        for index in range(1, len(self) + 1):
+            yield self._pages.Item(index)
+
+    def __repr__(self):
+        count = '?' if self._count is None else self._count
+        return f"<LazyPages {count} pages>"
+
+
+def shapes(target, cells=(), unit=None, chunk_size=CHUNK):
+    """:class:`LazyShapes` of a page or selection."""
+    return LazyShapes(target, cells, unit, chunk_size)
+
+
+def pages(doc):
+    """:class:`LazyPages` of a document."""
+    return LazyPages(doc)
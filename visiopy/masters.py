@@ -0,0 +1,272 @@
+"""Master lookup across stencils with cached dispatch objects.
+
+Dropping shapes by master name usually means ``Documents.OpenEx`` on the
+stencil and ``Masters.ItemU(name)`` for every drop, several round trips
+per shape.  :class:`MasterRegistry` opens each stencil once (docked, or
+hidden), reads Name, NameU and UniqueID of all its masters in one pass and
+answers later lookups from a dict.  Stencils that are already open in
+Visio are reused instead of being opened again; closed documents drop out
+of the index (``BeforeDocumentClose`` event, or :meth:`invalidate`).  A
+bare file name (``'Pumps.vssx'``) matches any stencil with that name, a
+path only that file.
+
+Usage:
+------
+    from visiopy.masters import MasterRegistry
+    from visiopy.create import create_shapes
+
+    masters = MasterRegistry(vApp)
+    masters.prewarm([r'C:\\Stencils\\Pumps.vssx', 'BASIC_M.vssx'])
+    pump = masters.get('Pump')                   # first stencil that has it
+    valve = masters.get('Valve', stencil='Pumps.vssx')
+    create_shapes(vPg, pump, x, y)
+    masters.stats      # hits, misses, opened, reused, invalidated
+"""
+import os
+from collections import Counter
+
+from .visio_connect import _normalize_path
+
+# Documents.OpenEx flags
+visOpenRO = 2
+visOpenDocked = 4
+visOpenDontList = 8
+visOpenHidden = 64
+visOpenMacrosDisabled = 128
+
+DOCKED_FLAGS = visOpenRO | visOpenDocked | visOpenMacrosDisabled
+HIDDEN_FLAGS = visOpenRO | visOpenHidden | visOpenDontList | \
+    visOpenMacrosDisabled
+
+
+class ComDocumentEvents:
+    """Event source fed by ``Application.BeforeDocumentClose``.
+
+    Callbacks receive ``('close', document)``.
+    """
+
+    def __init__(self, vApp):
+        self.vApp = vApp
+        self._sink = None
+
+    def subscribe(self, callback):
+        class AppHandler:
+            def OnBeforeDocumentClose(self, doc):
+                callback('close', doc)
+
+        import win32com.client
+        self._sink = win32com.client.WithEvents(self.vApp, AppHandler)
+
+    def unsubscribe(self):
+        if self._sink is not None:
+            try:
+                self._sink.close()
+            except Exception:
+                pass
+        self._sink = None
+
+
+def _is_file_name(path):
+    """True for a bare file name without any directory part."""
+    return not os.path.dirname(path)
+
+
+class _Stencil:
+    __slots__ = ('doc', 'path', 'names', 'unique')
+
+    def __init__(self, doc, path):
+        self.doc = doc
+        self.path = path
+        self.names = {}          # casefolded Name and NameU -> master
+        self.unique = {}         # UniqueID -> master
+
+    def index(self):
+        for master in self.doc.Masters:
+            self.add(master)
+
+    def add(self, master):
+        for name in (master.NameU, master.Name):
+            if name:
+                self.names.setdefault(name.casefold(), master)
+        unique_id = master.UniqueID
+        if unique_id:
+            self.unique[unique_id.upper()] = master
+
+    def find(self, name):
+        return self.names.get(name.casefold()) or \
+            self.unique.get(name.upper())
+
+
+class MasterRegistry:
+    """Stencils opened once, masters indexed by Name, NameU and UniqueID.
+
+    Parameters:
+    ----------
+    - vApp : Visio Application
+    - hidden : bool, optional
+        Open stencils hidden (and not in the recent files list) instead of
+        docked in the Shapes window.
+    - event_source : object, optional
+        Anything with ``subscribe(callback)``/``unsubscribe()`` emitting
+        ``('close', document)``, e.g. :class:`ComDocumentEvents` (used if
+        omitted and ``events=True``).
+    - events : bool, optional
+        Subscribe to ``BeforeDocumentClose`` so closed stencils are
+        forgotten automatically.
+
+    Attributes:
+    -----------
+    - stats : Counter
+        ``hits`` (answered from the index), ``misses`` (needed COM: a
+        stencil opened or indexed, a master looked up with ``ItemU``),
+        ``opened`` (``OpenEx`` calls), ``reused`` (stencils that were
+        already open) and ``invalidated``.
+    """
+
+    def __init__(self, vApp, hidden=False, event_source=None, events=False):
+        self.vApp = vApp
+        self.flags = HIDDEN_FLAGS if hidden else DOCKED_FLAGS
+        self.stats = Counter()
+        self._stencils = []      # in registration order (search order)
+        self._by_path = {}
+        self._by_name = {}
+        if event_source is None and events:
+            event_source = ComDocumentEvents(vApp)
+        self.event_source = event_source
+        if event_source is not None:
+            event_source.subscribe(self.on_event)
+
+    # -- stencils ------------------------------------------------------
+    def _lookup(self, key):
+        norm = _normalize_path(key)
+        if _is_file_name(norm):
+            return self._by_name.get(norm)
+        return self._by_path.get(norm)
+
+    def _open_document(self, path):
+        """An open document with this path (or file name), or ``None``."""
+        norm = _normalize_path(path)
+        by_name = _is_file_name(norm)
+        for doc in self.vApp.Documents:
+            full = _normalize_path(doc.FullName)
+            if full == norm or (by_name and os.path.basename(full) == norm):
+                return doc
+        return None
+
+    def _entry(self, stencil):
+        """Index entry of ``stencil``; ``(entry, opened or indexed now)``."""
+        if not isinstance(stencil, (str, os.PathLike)):
+            known = len(self._stencils)
+            entry = self._add(stencil)
+            return entry, len(self._stencils) != known
+        entry = self._lookup(stencil)
+        if entry is not None:
+            return entry, False
+        doc = self._open_document(stencil)
+        if doc is None:
+            doc = self.vApp.Documents.OpenEx(os.fspath(stencil), self.flags)
+            self.stats['opened'] += 1
+        else:
+            self.stats['reused'] += 1
+        return self._add(doc), True
+
+    def open(self, stencil):
+        """Return the document of ``stencil`` (path, file name or an open
+        document), opening and indexing it on first use."""
+        return self._entry(stencil)[0].doc
+
+    def add(self, doc):
+        """Index the masters of an open document (a stencil or the document
+        stencil of a drawing) and search it after the ones added before."""
+        return self._add(doc).doc
+
+    def _add(self, doc):
+        path = _normalize_path(doc.FullName)
+        entry = self._by_path.get(path)
+        if entry is not None:
+            return entry
+        entry = _Stencil(doc, path)
+        entry.index()
+        self._stencils.append(entry)
+        self._by_path[path] = entry
+        self._by_name.setdefault(os.path.basename(path), entry)
+        return entry
+
+    def prewarm(self, stencils):
+        """Open and index ``stencils`` up front; returns their documents."""
+        return [self.open(s) for s in stencils]
+
+    @property
+    def stencils(self):
+        """Paths of the indexed documents, in search order."""
+        return [entry.path for entry in self._stencils]
+
+    # -- masters ---------------------------------------------------------
+    def get(self, name, stencil=None):
+        """Return the master with this Name, NameU or UniqueID.
+
+        Searches ``stencil`` (opened if needed) or all indexed stencils in
+        the order they were added.  Names missing from the index (masters
+        added after indexing) are tried with ``Masters.ItemU``.
+        Raises ``KeyError`` if no stencil has the master.
+        """
+        if stencil is None:
+            entries, cold = self._stencils, False
+        else:
+            entry, cold = self._entry(stencil)
+            entries = [entry]
+        for entry in entries:
+            master = entry.find(name)
+            if master is not None:
+                self.stats['misses' if cold else 'hits'] += 1
+                return master
+        self.stats['misses'] += 1
+        for entry in entries:
+            try:
+                master = entry.doc.Masters.ItemU(name)
+            except Exception:
+                continue
+            entry.add(master)
+            return master
+        raise KeyError(f"No master {name!r} in "
+                       f"{', '.join(e.path for e in entries) or 'no stencil'}")
+
+    def get_many(self, names, stencil=None):
+        """Masters for a sequence of names (one entry per name, e.g. the
+        ``objects`` of :func:`visiopy.create.drop_many`)."""
+        found = {}
+        return [found[n] if n in found else
+                found.setdefault(n, self.get(n, stencil)) for n in names]
+
+    # -- invalidation ------------------------------------------------------
+    def invalidate(self, stencil=None):
+        """Forget one stencil (path, name or document) or all of them."""
+        if stencil is None:
+            dropped = list(self._stencils)
+        else:
+            if not isinstance(stencil, (str, os.PathLike)):
+                stencil = stencil.FullName
+            entry = self._lookup(stencil)
+            dropped = [entry] if entry is not None else []
+        for entry in dropped:
+            self._stencils.remove(entry)
+            del self._by_path[entry.path]
+            name = os.path.basename(entry.path)
+            if self._by_name.get(name) is entry:
+                del self._by_name[name]
+                other = next((e for e in self._stencils
+                              if os.path.basename(e.path) == name), None)
+                if other is not None:
+                    self._by_name[name] = other
+        self.stats['invalidated'] += len(dropped)
+        return len(dropped)
+
+    def on_event(self, kind, payload=None):
+        if kind == 'close' and payload is not None:
+            self.invalidate(payload)
+
+    def close(self):
+        """Stop listening for closed documents."""
+        if self.event_source is not None:
+            self.event_source.unsubscribe()
+            self.event_source = None
@@ -0,0 +1,466 @@
+"""Apply cell edits to .vsdx files without Visio.
+
+The edit format is the one of :mod:`visiopy.batch`: a list of
+:class:`~visiopy.batch.CellEdit` (or plain tuples) per page.  The same edit
+set can therefore be sent to a live document through COM or written into a
+file on disk, see :func:`apply_edits`.
+Shape text can be changed as well (``texts`` of :func:`patch_vsdx`)
+without losing the character and paragraph formatting markers.
+
+Only the XML parts of the pages that are actually edited are parsed and
+rewritten; every other zip member is copied over as a stream without being
+parsed, so the cost grows with the number of edited pages rather than with
+the size of the drawing.
+
+Shape Data and User rows that a shape inherits from its master can be
+edited too: like Visio, the patch writes a local override row holding the
+changed cells and leaves the master alone.
+
+Usage:
+------
+    from visiopy.patch import apply_edits
+
+    edits = {'Page-1': [(1, 'PinX', '25 mm'), (1, 'prop.Type', '"Pump"')],
+             0: [(0, 'PageWidth', 420, 'mm')]}
+    apply_edits('C:/path/to/drawing.vsdx', edits, 'C:/path/to/out.vsdx')
+    apply_edits(vDoc, edits)    # same edits through COM
+"""
+import copy
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+from xml.etree import ElementTree as ET
+
+from . import units
+from .batch import BatchResult, CELL_SRC, PAGE_SHEET_ID, PROP_CELLS, \
+    USER_CELLS, as_edit, visSectionObject, visSectionProp, visSectionUser, \
+    write_cells
+from .vsdx import NS, NS_R, CELL, ROW, SECTION, SHAPE, SHAPES, TEXT, \
+    VsdxFile
+
+ET.register_namespace('', NS)
+ET.register_namespace('r', NS_R)
+ET.register_namespace(
+    'mc', 'http://schemas.openxmlformats.org/markup-compatibility/2006')
+ET.register_namespace(
+    'v14', 'http://schemas.microsoft.com/office/visio/2010/main')
+
+_T = '{%s}' % NS
+
+# Spelling of the cell names as they appear in the N attribute
+_CELL_NAMES = {name.lower(): name for name in (
+    'PinX', 'PinY', 'Width', 'Height', 'LocPinX', 'LocPinY', 'Angle', 'FlipX',
+    'FlipY', 'ResizeMode', 'LineWeight', 'LineColor', 'LinePattern',
+    'Rounding', 'FillForegnd', 'FillBkgnd', 'FillPattern', 'BeginX', 'BeginY',
+    'EndX', 'EndY', 'LayerMember', 'BegTrigger', 'EndTrigger', 'PageWidth',
+    'PageHeight', 'ShdwOffsetX', 'ShdwOffsetY', 'PageScale', 'DrawingScale')}
+_SRC_NAMES = {src: _CELL_NAMES[name] for name, src in CELL_SRC.items()}
+_ROW_CELL_NAMES = {'value': 'Value', 'prompt': 'Prompt', 'label': 'Label',
+                   'format': 'Format', 'sortkey': 'SortKey', 'type': 'Type',
+                   'invisible': 'Invisible', 'ask': 'Verify'}
+_SECTIONS = {'prop': ('Property', PROP_CELLS),
+             'user': ('User', USER_CELLS)}
+_SECTION_IDS = {visSectionProp: ('Property', PROP_CELLS),
+                visSectionUser: ('User', USER_CELLS)}
+# shape children that come after <Text>
+_AFTER_TEXT = {_T + 'Data1', _T + 'Data2', _T + 'Data3', _T + 'ForeignData',
+               _T + 'Shapes'}
+
+
+def _address(cell):
+    """Return ``(section, row, cell)`` names for a cell name or SRC tuple.
+
+    ``section`` and ``row`` are ``None`` for single-row cells; ``row`` is an
+    ``int`` (position in the section) when the edit came as an SRC tuple.
+    """
+    if isinstance(cell, tuple):
+        if cell[0] == visSectionObject and cell in _SRC_NAMES:
+            return None, None, _SRC_NAMES[cell]
+        if cell[0] in _SECTION_IDS:
+            section, columns = _SECTION_IDS[cell[0]]
+            name = next(n for n, c in columns.items() if c == cell[2])
+            return section, cell[1], _ROW_CELL_NAMES[name]
+        raise ValueError(f"Unsupported cell address {cell}")
+    parts = cell.split('.')
+    if len(parts) == 1:
+        return None, None, _CELL_NAMES.get(cell.lower(), cell)
+    kind = parts[0].lower()
+    if kind in _SECTIONS and len(parts) in (2, 3):
+        column = parts[2].lower() if len(parts) == 3 else 'value'
+        if column in _ROW_CELL_NAMES:
+            return _SECTIONS[kind][0], parts[1], _ROW_CELL_NAMES[column]
+    raise ValueError(f"Unsupported cell name '{cell}'")
+
+
+def _find_row(shape_elem, section, row):
+    sec = next((s for s in shape_elem.findall(SECTION)
+                if s.get('N') == section), None)
+    if sec is None:
+        return None
+    rows = [r for r in sec.findall(ROW) if r.get('Del') != '1']
+    if isinstance(row, int):
+        return rows[row] if 0 <= row < len(rows) else None
+    lowered = row.lower()
+    return next((r for r in rows if (r.get('N') or '').lower() == lowered),
+                None)
+
+
+def _row(sheet, section, row, base):
+    """Return the ``<Row>`` of ``sheet`` an edit goes to, ``None`` if none.
+
+    Without a master shape ``base`` only the rows of the shape count.  With
+    one, rows are numbered like Visio lists them (the rows of the master
+    first, then those only the shape has), and a row that exists in the
+    master alone gets a local override ``<Row N=...>`` holding just the
+    edited cells, which is what Visio writes when such a cell changes.
+    """
+    inherited = base.section(section) if base is not None else None
+    if inherited is None or not inherited.rows:
+        return _find_row(sheet, section, row)
+    sec = next((s for s in sheet.findall(SECTION) if s.get('N') == section),
+               None)
+    local = [r for r in sec.findall(ROW) if r.get('N')] \
+        if sec is not None else []
+    deleted = {r.get('N').lower() for r in local if r.get('Del') == '1'}
+    names = [r.name for r in inherited.rows
+             if r.name and r.name.lower() not in deleted]
+    known = {r.name.lower() for r in inherited.rows if r.name}
+    names += [r.get('N') for r in local if r.get('Del') != '1' and
+              r.get('N').lower() not in known]
+    if isinstance(row, int):
+        if not 0 <= row < len(names):
+            return None
+        row = names[row]
+    lowered = row.lower()
+    name = next((n for n in names if n.lower() == lowered), None)
+    if name is None:
+        return None
+    elem = _find_row(sheet, section, name)
+    if elem is None:
+        if sec is None:
+            sec = ET.Element(SECTION, {'N': section})
+            position = next((i for i, child in enumerate(sheet)
+                             if child.tag == TEXT or child.tag in _AFTER_TEXT),
+                            len(sheet))
+            sheet.insert(position, sec)
+        elem = ET.SubElement(sec, ROW, {'N': name})
+    return elem
+
+
+def _master_bases(vsdx, root):
+    """Map the shape IDs of a page part to the master shapes they inherit
+    from (sub-shapes take the master of their group, like in VsdxFile)."""
+    bases = {}
+
+    def walk(container, master):
+        for elem in container.findall(SHAPE):
+            own = elem.get('Master')
+            own = int(own) if own is not None else master
+            if own is not None and own in vsdx.masters:
+                shapes = vsdx.master_shapes(own)
+                ref = elem.get('MasterShape')
+                base = shapes.get(int(ref)) if ref is not None else next(
+                    (s for s in shapes.values() if s.parent is None), None)
+                if base is not None:
+                    bases[int(elem.get('ID'))] = base
+            for sub in elem.findall(SHAPES):
+                walk(sub, own)
+
+    for container in root.findall(SHAPES):
+        walk(container, None)
+    return bases
+
+
+def _row_edit(edit):
+    try:
+        return _address(edit.cell)[0] is not None
+    except ValueError:
+        return False
+
+
+def _cell_elem(parent, name, create):
+    lowered = name.lower()
+    cells = parent.findall(CELL)
+    for elem in cells:
+        if elem.get('N', '').lower() == lowered:
+            return elem
+    if not create:
+        return None
+    elem = ET.Element(CELL, {'N': name})
+    # cells precede sections and sub-shapes in the schema
+    position = list(parent).index(cells[-1]) + 1 if cells else 0
+    parent.insert(position, elem)
+    return elem
+
+
+def _set(elem, edit):
+    """Write ``edit`` into the ``<Cell>`` element ``elem``."""
+    if edit.formula is not None:
+        formula = str(edit.formula)
+        constant = units.parse_constant(formula)
+        for attr in ('F', 'U'):
+            elem.attrib.pop(attr, None)
+        if constant is None:
+            # the cached V stays stale until Visio recalculates (or
+            # visiopy.formula.recalc_vsdx does)
+            elem.set('F', formula)
+            return
+        value, unit = constant
+    else:
+        value, unit = edit.value, edit.unit
+        elem.attrib.pop('F', None)
+        elem.attrib.pop('U', None)
+        if isinstance(value, str):
+            unit = 'STR'
+        else:
+            value = units.to_internal(float(value), unit)
+            unit = unit.upper() if unit else None
+    elem.set('V', value if isinstance(value, str) else repr(float(value)))
+    if unit:
+        elem.set('U', unit)
+
+
+def _apply(sheets, edits, result, bases=None):
+    """Apply ``edits`` (``[(index, CellEdit)]``) to ``sheets``.
+
+    ``sheets`` maps shape IDs to their ``<Shape>``/``<PageSheet>`` element,
+    ``bases`` shape IDs to the master :class:`~visiopy.vsdx.Shape` they
+    inherit rows from; failures are recorded in ``result.errors`` under
+    the edit's index.
+    """
+    bases = bases or {}
+    for i, edit in edits:
+        try:
+            sheet = sheets.get(edit.shape_id)
+            if sheet is None:
+                raise KeyError(f"No shape with ID {edit.shape_id}")
+            section, row, name = _address(edit.cell)
+            if section is None:
+                parent = sheet
+            else:
+                parent = _row(sheet, section, row,
+                              bases.get(edit.shape_id))
+                if parent is None:
+                    raise KeyError(f"Shape {edit.shape_id} has no row "
+                                   f"{section}.{row}")
+            _set(_cell_elem(parent, name, create=True), edit)
+        except Exception as e:
+            result.errors[i] = str(e)
+
+
+def _text_elem(sheet):
+    elem = sheet.find(TEXT)
+    if elem is None:
+        elem = ET.Element(TEXT)
+        position = next((i for i, child in enumerate(sheet)
+                         if child.tag in _AFTER_TEXT), len(sheet))
+        sheet.insert(position, elem)
+    return elem
+
+
+def _apply_texts(sheets, texts, result, offset):
+    """Apply ``texts`` (``[(shape_id, text or callable)]``) to ``sheets``.
+
+    The text of a ``<Text>`` element is split into runs at its child
+    elements (``<cp>``, ``<pp>``, ``<tp>``, ``<fld>``); only the pieces
+    between them change, so the formatting markers stay where they are.
+    Failures go to ``result.errors`` under ``offset`` plus the index.
+    """
+    for i, (shape_id, change) in enumerate(texts):
+        try:
+            sheet = sheets.get(shape_id)
+            if sheet is None:
+                raise KeyError(f"No shape with ID {shape_id}")
+            elem = _text_elem(sheet)
+            runs = [elem.text or ''] + [child.tail or '' for child in elem]
+            if callable(change):
+                new = list(change(runs))
+                if len(new) != len(runs):
+                    raise ValueError(f"Expected {len(runs)} text runs, got "
+                                     f"{len(new)}")
+            else:
+                # the whole text goes into the first run that has any
+                first = next((j for j, run in enumerate(runs) if run), 0)
+                new = [''] * len(runs)
+                new[first] = str(change)
+            elem.text = new[0] or None
+            for child, run in zip(elem, new[1:]):
+                child.tail = run or None
+        except Exception as e:
+            result.errors[offset + i] = str(e)
+
+
+def _serialize(root):
+    return ET.tostring(root, encoding='UTF-8', xml_declaration=True)
+
+
+def patch_vsdx(src, dst, edits, texts=None):
+    """Write a copy of ``src`` to ``dst`` with cell and text edits applied.
+
+    Parameters:
+    ----------
+    - src, dst : str
+        Source and target package; ``dst`` may equal ``src``.
+    - edits : dict
+        ``{page: [CellEdit or tuple, ...]}`` where ``page`` is a page index
+        (0-based) or name.  Edits of the PageSheet use
+        :data:`~visiopy.batch.PAGE_SHEET_ID` as shape ID.
+    - texts : dict, optional
+        ``{page: {shape_id: text}}``.  A string replaces the whole shape
+        text and takes the format of its first run; a callable gets the
+        text split at the formatting run markers (list of str) and returns
+        the new pieces, so the formatting stays as it is.
+
+    Returns:
+    --------
+    - dict mapping each page key to a BatchResult with per-item errors;
+      the text changes of a page follow its cell edits.
+    """
+    results = {}
+    texts = texts or {}
+    with VsdxFile(src) as vsdx:
+        index_part = vsdx._related(vsdx._document, '/pages')
+        index_root = None
+        replaced = {}
+        for key in list(edits) + [k for k in texts if k not in edits]:
+            page_edits = [as_edit(e) for e in edits.get(key, ())]
+            page_texts = list(texts.get(key, {}).items())
+            result = results[key] = BatchResult(len(page_edits) +
+                                                len(page_texts))
+            page = vsdx.page(key)
+            sheet_edits, shape_edits = [], []
+            for i, e in enumerate(page_edits):
+                (sheet_edits if e.shape_id == PAGE_SHEET_ID
+                 else shape_edits).append((i, e))
+            if shape_edits or page_texts:
+                root = ET.fromstring(
+                    replaced.get(page.part) or vsdx._zip.read(page.part))
+                sheets = {int(e.get('ID')): e for e in root.iter(SHAPE)}
+                bases = _master_bases(vsdx, root) if any(
+                    _row_edit(e) for _, e in shape_edits) else None
+                _apply(sheets, shape_edits, result, bases)
+                _apply_texts(sheets, page_texts, result, len(page_edits))
+                replaced[page.part] = _serialize(root)
+            if sheet_edits:
+                if index_root is None:
+                    index_root = ET.fromstring(vsdx._zip.read(index_part))
+                elem = list(index_root.iter(_T + 'Page'))[page.index]
+                sheet = elem.find(_T + 'PageSheet')
+                if sheet is None:
+                    sheet = ET.Element(_T + 'PageSheet')
+                    elem.insert(0, sheet)
+                _apply({PAGE_SHEET_ID: sheet}, sheet_edits, result)
+        if index_root is not None:
+            replaced[index_part] = _serialize(index_root)
+        tmp = _write_package(vsdx._zip, dst, replaced)
+    # replace only after the source is closed (it may be the target)
+    os.replace(tmp, dst)
+    return results
+
+
+# ZipFile internals that _copy_raw works with (CPython's zipfile); without
+# them every part is inflated and compressed again through ZipFile.open
+_RAW_ATTRS = ('fp', 'filelist', 'NameToInfo', 'start_dir', '_didModify')
+
+
+def _can_copy_raw(zin, zout):
+    return (hasattr(zin, 'fp') and hasattr(zipfile, 'sizeFileHeader')
+            and hasattr(zipfile.ZipInfo, 'FileHeader')
+            and all(hasattr(zout, name) for name in _RAW_ATTRS))
+
+
+def _copy_raw(zin, zout, info):
+    """Append the member ``info`` of ``zin`` to ``zout`` still compressed.
+
+    The local header is rewritten with the sizes and CRC of the central
+    directory, the data itself is streamed unchanged, so an untouched part
+    keeps its exact bytes and costs no inflate/deflate.  Only call it if
+    :func:`_can_copy_raw` holds.
+    """
+    zin.fp.seek(info.header_offset)
+    header = zin.fp.read(zipfile.sizeFileHeader)
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    zin.fp.seek(name_len + extra_len, os.SEEK_CUR)
+    out = copy.copy(info)
+    out.flag_bits &= ~0x08      # sizes go into the header, no descriptor
+    out.header_offset = zout.fp.tell()
+    zout.fp.write(out.FileHeader())
+    left = info.compress_size
+    while left:
+        chunk = zin.fp.read(min(left, 1 << 20))
+        if not chunk:
+            raise zipfile.BadZipFile(f"truncated member {info.filename!r}")
+        zout.fp.write(chunk)
+        left -= len(chunk)
+    zout.filelist.append(out)
+    zout.NameToInfo[out.filename] = out
+    zout.start_dir = zout.fp.tell()
+    zout._didModify = True
+
+
+def _write_package(zin, dst, replaced):
+    """Copy ``zin`` next to ``dst``, swapping in the ``replaced`` parts.
+
+    Unchanged parts are copied as compressed bytes; only members that
+    need Zip64 records, or all of them if this ``zipfile`` lacks the
+    internals :func:`_copy_raw` needs, are inflated and written again.
+
+    Returns the path of the temporary file that was written.
+    """
+    folder = os.path.dirname(os.path.abspath(dst))
+    fd, tmp = tempfile.mkstemp(suffix='.vsdx', dir=folder)
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(tmp, 'w') as zout:
+            raw = _can_copy_raw(zin, zout)
+            for info in zin.infolist():
+                out = zipfile.ZipInfo(info.filename, info.date_time)
+                out.compress_type = info.compress_type
+                out.external_attr = info.external_attr
+                if info.filename in replaced:
+                    zout.writestr(out, replaced[info.filename])
+                    continue
+                if raw and max(info.file_size, info.compress_size,
+                               info.header_offset, zout.fp.tell()) < \
+                        zipfile.ZIP64_LIMIT:
+                    _copy_raw(zin, zout, info)
+                    continue
+                with zin.open(info) as fin, zout.open(
+                        out, 'w', force_zip64=info.file_size > 2 ** 30) \
+                        as fout:
+                    shutil.copyfileobj(fin, fout, 1 << 20)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return tmp
+
+
+def apply_edits(target, edits, dst=None):
+    """Apply an edit set to a live document or to a file on disk.
+
+    Parameters:
+    ----------
+    - target : Visio Document or str
+        A document as returned by ``vInit``/``vDocs`` (edits go through
+        :func:`~visiopy.batch.write_cells`), or the path of a .vsdx file.
+    - edits : dict
+        ``{page: [CellEdit or tuple, ...]}``, pages by 0-based index or name.
+    - dst : str, optional
+        Output path for files; the file is patched in place if omitted.
+
+    Returns:
+    --------
+    - dict mapping each page key to a BatchResult.
+    """
+    if isinstance(target, (str, os.PathLike)):
+        return patch_vsdx(target, dst or target, edits)
+    results = {}
+    for key, page_edits in edits.items():
+        if isinstance(key, int):
+            page = target.Pages.Item(key + 1)
+        else:
+            page = target.Pages.ItemU(key)
+        results[key] = write_cells(page, page_edits)
+    return results
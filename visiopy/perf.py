@@ -0,0 +1,154 @@
+"""Suspend Visio's redraw, recalculation and undo recording for bulk work.
+
+By default Visio repaints and recalculates after every single cell write
+and records each write as its own undo step.  Inside a :func:`fast` block
+``ScreenUpdating`` is off, ``DeferRecalc`` is on, optionally
+``EventsEnabled`` is off, and all changes form one undo step.  The previous
+state is restored on exit, also after exceptions and in nested blocks.
+
+Usage:
+------
+    import visiopy
+
+    with visiopy.fast(vApp, undo='Colorize') as scope:
+        write_cells(vPg, edits)
+    scope.stats        # <FastStats 0.120 s, 2 COM calls>
+"""
+import time
+from collections import Counter
+
+from . import batch
+
+# undo scopes are opened by the outermost block of an Application only
+_depth = Counter()
+
+
+class FastStats:
+    """Wall time (seconds) and COM calls (Counter by kind) of a block."""
+
+    def __init__(self):
+        self.elapsed = 0.0
+        self.calls = Counter()
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def __repr__(self):
+        return (f"<FastStats {self.elapsed:.3f} s, "
+                f"{self.total_calls} COM calls>")
+
+
+class FastScope:
+    """Context manager behind :func:`fast`.
+
+    Parameters:
+    ----------
+    - app : Visio Application
+    - screen_updating : bool
+        Value of ``ScreenUpdating`` inside the block.
+    - defer_recalc : bool
+        Value of ``DeferRecalc`` inside the block.
+    - events : bool
+        Value of ``EventsEnabled`` inside the block.  Keep events on if an
+        add-in or a :class:`~visiopy.select_assign.SelectedShapeUpdater`
+        must see the changes.
+    - undo : str or None
+        Name of the undo scope wrapping the block; no scope if ``None``.
+    - rollback : bool
+        Undo the changes of the block if it raises (``EndUndoScope`` with
+        ``bCommit=False``); by default they are kept as one undo step.
+    - counter : Counter, optional
+        COM call counter to report in ``stats.calls``; its growth during
+        the block is reported.  By default the block gets a counter of its
+        own that sees the array calls (``SetFormulas``, ``GetResults``,
+        ...) issued by :mod:`visiopy.batch` from this thread, nested blocks
+        included.  Calls of other threads are not counted, and neither are
+        single COM accesses made outside :mod:`visiopy.batch` (``Cells``
+        lookups of :class:`~visiopy.batch.CellResolver`, the settings
+        switched by this scope, ...).
+    """
+
+    def __init__(self, app, screen_updating=False, defer_recalc=True,
+                 events=True, undo='visiopy', rollback=False, counter=None):
+        self.app = app
+        self.settings = {'ScreenUpdating': int(screen_updating),
+                         'DeferRecalc': int(defer_recalc),
+                         'EventsEnabled': int(events)}
+        self.undo = undo
+        self.rollback = rollback
+        self.counter = counter
+        self.stats = FastStats()
+        self._saved = []
+        self._scope = None
+        self._start = None
+        self._calls = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        if self.counter is None:
+            self._calls = Counter()
+            batch.track_calls(self._calls)
+        else:
+            self._calls = Counter(self.counter)
+        try:
+            for name, value in self.settings.items():
+                previous = getattr(self.app, name)
+                if previous != value:
+                    setattr(self.app, name, value)
+                    self._saved.append((name, previous))
+            if self.undo is not None and not _depth[id(self.app)]:
+                self._scope = self.app.BeginUndoScope(self.undo)
+        except BaseException:
+            if self.counter is None:
+                batch.untrack_calls(self._calls)
+            self._restore()
+            raise
+        _depth[id(self.app)] += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _depth[id(self.app)] -= 1
+        if not _depth[id(self.app)]:
+            del _depth[id(self.app)]
+        try:
+            if self._scope is not None:
+                commit = not (self.rollback and exc_type is not None)
+                self.app.EndUndoScope(self._scope, commit)
+                self._scope = None
+        finally:
+            self._restore()
+            self.stats.elapsed = time.perf_counter() - self._start
+            if self.counter is None:
+                batch.untrack_calls(self._calls)
+                self.stats.calls = +self._calls
+            else:
+                self.stats.calls = Counter(self.counter)
+                self.stats.calls.subtract(self._calls)
+                self.stats.calls = +self.stats.calls
+        return False
+
+    def _restore(self):
+        # reverse order, and keep going if one of them fails
+        error = None
+        while self._saved:
+            name, value = self._saved.pop()
+            try:
+                setattr(self.app, name, value)
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+
+def fast(app, screen_updating=False, defer_recalc=True, events=True,
+         undo='visiopy', rollback=False, counter=None):
+    """Speed up a block of bulk edits, see :class:`FastScope`.
+
+    Usage:
+    ------
+        with fast(vApp):
+            ...
+    """
+    return FastScope(app, screen_updating, defer_recalc, events, undo,
+                     rollback, counter)
@@ -0,0 +1,330 @@
+"""Count and time the COM round trips of a script.
+
+Every ``shp.Cells('PinX')``, ``vPg.Shapes`` or ``vWin.Selection`` is a
+cross-process call into Visio that does not show up in a normal Python
+profile.  :meth:`Profiler.wrap` puts a transparent proxy around a Visio
+object; the proxy (and every object reached through it) records each
+property get/set and method call by member name (``'Shape.Cells'``) and by
+call site (``'script.py:12 colorize'``).
+
+Profiling is opt-in: a disabled profiler hands out the original objects,
+so there is no overhead at all unless it is switched on.
+
+Usage:
+------
+    from visiopy import vInit
+    from visiopy.profiler import PROFILER
+
+    vInit(index=0, g=globals(), profile=True)   # vApp, vDoc, ... proxied
+    for shp in vWin.Selection:
+        shp.Cells('FillForegnd').Formula = 3
+    PROFILER.report(10)      # top 10 members and call sites
+"""
+import os
+import sys
+import types
+from collections import defaultdict, namedtuple
+from time import perf_counter
+
+# type of the object returned by a member, to label its members
+_CHILD_TYPES = {
+    'Application': 'Application', 'ActiveDocument': 'Document',
+    'ActivePage': 'Page', 'ActiveWindow': 'Window', 'Document': 'Document',
+    'Documents': 'Documents', 'Windows': 'Windows', 'Window': 'Window',
+    'Pages': 'Pages', 'PageActive': 'Page', 'ContainingPage': 'Page',
+    'Shapes': 'Shapes', 'Selection': 'Selection', 'PageSheet': 'Shape',
+    'DocumentSheet': 'Shape', 'Masters': 'Masters', 'Layers': 'Layers',
+    'Connects': 'Connects', 'ItemFromID': 'Shape', 'Cells': 'Cell',
+    'CellsU': 'Cell', 'CellsSRC': 'Cell', 'Drop': 'Shape',
+    'DrawRectangle': 'Shape', 'DrawOval': 'Shape', 'DrawLine': 'Shape',
+    'CreateSelection': 'Selection', 'Open': 'Document', 'OpenEx': 'Document',
+}
+_ITEM_TYPES = {
+    'Shapes': 'Shape', 'Selection': 'Shape', 'Pages': 'Page',
+    'Documents': 'Document', 'Windows': 'Window', 'Masters': 'Master',
+    'Layers': 'Layer', 'Connects': 'Connect',
+}
+_ITEM_MEMBERS = ('Item', 'ItemU', '__next__', 'Add')
+
+_PLAIN = (str, bytes, int, float, bool, complex, tuple, list, dict,
+          type(None))
+
+MemberStats = namedtuple('MemberStats', 'member count total mean p50 p99')
+SiteStats = namedtuple('SiteStats', 'site member count total')
+
+
+def _child_label(parent, member):
+    if member in _ITEM_MEMBERS:
+        return _ITEM_TYPES.get(parent, member)
+    return _CHILD_TYPES.get(member) or member
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _site():
+    """``file:line function`` of the first frame outside this module."""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    if frame is None:
+        return '?'
+    code = frame.f_code
+    return (f"{os.path.basename(code.co_filename)}:{frame.f_lineno} "
+            f"{code.co_name}")
+
+
+def unwrap(value):
+    """The original object behind a proxy (also inside tuples/lists)."""
+    if isinstance(value, ComProxy):
+        return object.__getattribute__(value, '_target')
+    if isinstance(value, (tuple, list)):
+        items = [unwrap(v) for v in value]
+        if hasattr(value, '_fields'):      # namedtuple
+            return type(value)(*items)
+        return type(value)(items)
+    return value
+
+
+class Profiler:
+    """Collects the timings recorded by :class:`ComProxy` objects.
+
+    Parameters:
+    ----------
+    - enabled : bool
+        A disabled profiler does not wrap and does not record.
+    - sites : bool
+        Also record the call site of each round trip (costs a frame walk
+        per call).
+    """
+
+    def __init__(self, enabled=False, sites=True):
+        self.enabled = enabled
+        self.sites = sites
+        self.reset()
+
+    def reset(self):
+        self._times = defaultdict(list)
+        self._sites = defaultdict(lambda: [0, 0.0])
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+        return False
+
+    def wrap(self, obj, label=None):
+        """Return ``obj`` behind a recording proxy (``obj`` if disabled).
+
+        ``label`` names the object type in the report; it is derived from
+        the Visio type name where possible.
+        """
+        if not self.enabled or obj is None or isinstance(obj, _PLAIN) \
+                or isinstance(obj, ComProxy):
+            return obj
+        return ComProxy(obj, self, label or _type_label(obj))
+
+    def record(self, member, elapsed):
+        self._times[member].append(elapsed)
+        if self.sites:
+            entry = self._sites[(_site(), member)]
+            entry[0] += 1
+            entry[1] += elapsed
+
+    # -- reporting -----------------------------------------------------------
+    @property
+    def total_calls(self):
+        return sum(len(t) for t in self._times.values())
+
+    @property
+    def total_time(self):
+        return sum(sum(t) for t in self._times.values())
+
+    def member_stats(self):
+        """MemberStats per member, most expensive first."""
+        stats = []
+        for member, times in self._times.items():
+            ordered = sorted(times)
+            total = sum(ordered)
+            stats.append(MemberStats(member, len(ordered), total,
+                                     total / len(ordered),
+                                     _percentile(ordered, 0.5),
+                                     _percentile(ordered, 0.99)))
+        return sorted(stats, key=lambda s: s.total, reverse=True)
+
+    def site_stats(self):
+        """SiteStats per (call site, member), most expensive first."""
+        stats = [SiteStats(site, member, count, total) for
+                 (site, member), (count, total) in self._sites.items()]
+        return sorted(stats, key=lambda s: s.total, reverse=True)
+
+    def report(self, n=10):
+        """The top ``n`` members and call sites as a :class:`ProfileReport`."""
+        return ProfileReport(self.member_stats()[:n], self.site_stats()[:n],
+                             self.total_calls, self.total_time)
+
+
+def _type_label(obj):
+    # pywin32 dispatch objects know their type name (IVShape -> Shape)
+    try:
+        name = obj._oleobj_.GetTypeInfo().GetDocumentation(-1)[0]
+    except Exception:
+        name = type(obj).__name__
+    for prefix in ('IV', 'Fake'):
+        if name.startswith(prefix) and len(name) > len(prefix):
+            return name[len(prefix):]
+    return name
+
+
+class ProfileReport:
+    """Result of :meth:`Profiler.report`; prints as a table in a terminal
+    and renders as HTML in a notebook."""
+
+    def __init__(self, members, sites, total_calls, total_time):
+        self.members = members
+        self.sites = sites
+        self.total_calls = total_calls
+        self.total_time = total_time
+
+    def _rows(self):
+        head = ('member', 'calls', 'total ms', 'mean us', 'p50 us', 'p99 us')
+        rows = [(s.member, s.count, f"{s.total * 1e3:.1f}",
+                 f"{s.mean * 1e6:.0f}", f"{s.p50 * 1e6:.0f}",
+                 f"{s.p99 * 1e6:.0f}") for s in self.members]
+        site_head = ('call site', 'member', 'calls', 'total ms')
+        site_rows = [(s.site, s.member, s.count, f"{s.total * 1e3:.1f}")
+                     for s in self.sites]
+        return (head, rows), (site_head, site_rows)
+
+    def __str__(self):
+        lines = [f"{self.total_calls} COM round trips, "
+                 f"{self.total_time * 1e3:.1f} ms"]
+        for head, rows in self._rows():
+            if not rows:
+                continue
+            widths = [max(len(str(r[i])) for r in [head] + rows)
+                      for i in range(len(head))]
+            lines.append('')
+            for row in [head] + rows:
+                lines.append('  '.join(
+                    str(v).ljust(w) if i == 0 else str(v).rjust(w)
+                    for i, (v, w) in enumerate(zip(row, widths))))
+        return '\n'.join(lines)
+
+    __repr__ = __str__
+
+    def _repr_html_(self):
+        from html import escape
+        parts = [f"<p>{self.total_calls} COM round trips, "
+                 f"{self.total_time * 1e3:.1f} ms</p>"]
+        for head, rows in self._rows():
+            parts.append('<table><tr>' + ''.join(
+                f'<th>{escape(h)}</th>' for h in head) + '</tr>')
+            for row in rows:
+                parts.append('<tr>' + ''.join(
+                    f'<td>{escape(str(v))}</td>' for v in row) + '</tr>')
+            parts.append('</table>')
+        return ''.join(parts)
+
+
+class ComProxy:
+    """Transparent stand-in for a COM object that records every access.
+
+    Results that are COM objects come back wrapped as well, arguments are
+    unwrapped before they are passed on, so proxies can be mixed freely
+    with plain objects.
+    """
+
+    __slots__ = ('_target', '_profiler', '_label')
+
+    def __init__(self, target, profiler, label):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_profiler', profiler)
+        object.__setattr__(self, '_label', label)
+
+    def __getattr__(self, name):
+        profiler = self._profiler
+        if not profiler.enabled:
+            return getattr(self._target, name)
+        start = perf_counter()
+        value = getattr(self._target, name)
+        elapsed = perf_counter() - start
+        member = f"{self._label}.{name}"
+        child = _child_label(self._label, name)
+        if isinstance(value, types.MethodType):
+            return _MethodProxy(value, profiler, member, child)
+        profiler.record(member, elapsed)
+        return profiler.wrap(value, child)
+
+    def __setattr__(self, name, value):
+        profiler = self._profiler
+        if not profiler.enabled:
+            setattr(self._target, name, unwrap(value))
+            return
+        start = perf_counter()
+        setattr(self._target, name, unwrap(value))
+        profiler.record(f"{self._label}.{name}=", perf_counter() - start)
+
+    def __iter__(self):
+        profiler = self._profiler
+        iterator = iter(self._target)
+        child = _child_label(self._label, '__next__')
+        member = f"{self._label}.__next__"
+        while True:
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            if profiler.enabled:
+                profiler.record(member, perf_counter() - start)
+            yield profiler.wrap(item, child)
+
+    def __len__(self):
+        start = perf_counter()
+        n = len(self._target)
+        if self._profiler.enabled:
+            self._profiler.record(f"{self._label}.__len__",
+                                  perf_counter() - start)
+        return n
+
+    def __eq__(self, other):
+        return self._target == unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return f"<ComProxy {self._label} of {self._target!r}>"
+
+
+class _MethodProxy:
+    __slots__ = ('_method', '_profiler', '_member', '_child')
+
+    def __init__(self, method, profiler, member, child):
+        self._method = method
+        self._profiler = profiler
+        self._member = member
+        self._child = child
+
+    def __call__(self, *args, **kwargs):
+        args = unwrap(args)
+        kwargs = {k: unwrap(v) for k, v in kwargs.items()}
+        start = perf_counter()
+        value = self._method(*args, **kwargs)
+        if self._profiler.enabled:
+            self._profiler.record(self._member, perf_counter() - start)
+        return self._profiler.wrap(value, self._child)
+
+
+# the profiler used by vInit(profile=True)
+PROFILER = Profiler()
@@ -0,0 +1,665 @@
+"""Select shapes by criteria, evaluated on a columnar snapshot (NumPy).
+
+"All shapes on layer Pumps whose Shape Data Type is Pump and whose Width
+is over 20 mm" used to mean iterating ``Page.Shapes`` and reading cells one
+by one.  A :class:`Snapshot` reads the columns a query needs for all shapes
+of a page with batched calls (cells, Shape Data, User cells, layer
+membership, masters), keeps them, and evaluates queries as vectorized
+NumPy filters.  Later queries reuse the loaded columns until they are
+invalidated.
+
+Queries are written with :data:`Q` or as text (:func:`parse`)::
+
+    (Q.layer == 'Pumps') & (Q.prop.Type == 'Pump') & (Q.Width > 20)
+    "layer == 'Pumps' and prop.Type == 'Pump' and Width > 20"
+
+Fields are ``id``, ``master`` (NameU of the master), ``layer`` (``==``
+tests membership), ``prop.<Row>[.<Cell>]``, ``user.<Row>[.<Cell>]`` (as
+strings; compared with a number they are converted) and any ShapeSheet
+cell name (in the snapshot's units; ``'20 mm'`` strings are converted).
+Names that are not identifiers are subscripts: ``prop['Asset ID']``.
+Conditions combine with ``&``, ``|``, ``~`` (``and``, ``or``, ``not`` in
+text); fields also offer ``isin``, ``between``, ``contains``,
+``startswith`` and ``matches`` (regular expression).
+
+Usage:
+------
+    from visiopy.query import Q, Snapshot
+
+    snap = Snapshot(vPg, unit='mm')
+    ids = snap.query((Q.master == 'Pump') & (Q.Width > 20))
+    snap.select(vWin, "layer == 'Valves' and prop.Status != 'done'")
+    snap.invalidate(['prop.Status'])          # after writing that column
+
+NumPy is an optional dependency ((``pip install visiopy[numpy]``).
+"""
+import abc
+import ast
+import operator
+import re
+
+from .batch import CellEdit, CellResolver, read_cells, shape_ids, \
+    write_cells
+from .geometry import cell_unit
+from . import units
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+# VisSelectionTypes / VisSelectMode
+visSelTypeEmpty = 0
+visSelTypeAll = 1
+visSelTypeByLayer = 3
+visSelTypeByMaster = 5
+visSelModeSkipSub = 0x400
+
+# temporary layer that selects the results of a query (see selection())
+SELECTION_LAYER = 'visiopy selection'
+
+_OPS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt,
+        '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+_ORDERING = ('<', '<=', '>', '>=')
+_FLIPPED = {'==': '==', '!=': '!=', '<': '>', '<=': '>=', '>': '<',
+            '>=': '<='}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("visiopy.query needs numpy "
+                          "(pip install visiopy[numpy])")
+
+
+def _float(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    quantity = units.parse_quantity(value) if value else None
+    return quantity[0] if quantity is not None else float('nan')
+
+
+# -- expressions -------------------------------------------------------------
+class Condition(abc.ABC):
+    """A boolean condition over the shapes of a :class:`Snapshot`."""
+
+    def __and__(self, other):
+        return _Combine('&', self, _condition(other))
+
+    def __or__(self, other):
+        return _Combine('|', self, _condition(other))
+
+    def __invert__(self):
+        return _Not(self)
+
+    @abc.abstractmethod
+    def fields(self):
+        """Names of the fields the condition reads."""
+
+    @abc.abstractmethod
+    def mask(self, snapshot):
+        """Boolean NumPy array, one entry per shape of ``snapshot``."""
+
+
+class _Combine(Condition):
+    def __init__(self, op, left, right):
+        self.op, self.left, self.right = op, left, right
+
+    def fields(self):
+        return self.left.fields() | self.right.fields()
+
+    def mask(self, snapshot):
+        left, right = self.left.mask(snapshot), self.right.mask(snapshot)
+        return left & right if self.op == '&' else left | right
+
+    def __repr__(self):
+        return f"({self.left!r} {self.op} {self.right!r})"
+
+
+class _Not(Condition):
+    def __init__(self, condition):
+        self.condition = condition
+
+    def fields(self):
+        return self.condition.fields()
+
+    def mask(self, snapshot):
+        return ~self.condition.mask(snapshot)
+
+    def __repr__(self):
+        return f"~{self.condition!r}"
+
+
+class _Compare(Condition):
+    def __init__(self, field, op, value):
+        self.field, self.op, self.value = field, op, value
+
+    def fields(self):
+        return {self.field.name}
+
+    def mask(self, snapshot):
+        field, op, value = self.field, self.op, self.value
+        if field.kind == 'layer':
+            if op not in ('==', '!='):
+                raise ValueError("Layers can only be compared with == / !=")
+            found = snapshot.layer_mask(value)
+            return found if op == '==' else ~found
+        column = snapshot.column(field.name)
+        if column.dtype == object:
+            if op in _ORDERING or (isinstance(value, (int, float)) and
+                                   not isinstance(value, bool)):
+                column, value = snapshot.numeric(field.name), _float(value)
+            elif field.kind == 'master':
+                column, value = snapshot.folded(field.name), value.lower()
+            else:
+                value = '' if value is None else str(value)
+                column = np.where(column == None, '', column)  # noqa: E711
+        elif isinstance(value, str):
+            value = snapshot.quantity(field.name, value)
+        return np.asarray(_OPS[op](column, value), dtype=bool)
+
+    def selector(self, snapshot):
+        """``(selection type, object)`` if Visio can select the matches
+        itself, else ``None``."""
+        if self.op != '==':
+            return None
+        if self.field.kind == 'layer':
+            return visSelTypeByLayer, snapshot.layer(self.value)
+        if self.field.kind == 'master':
+            return visSelTypeByMaster, snapshot.master(self.value)
+        return None
+
+    def __repr__(self):
+        return f"({self.field.name} {self.op} {self.value!r})"
+
+
+class _Test(Condition):
+    """Element-wise test that NumPy cannot vectorize (strings, sets)."""
+
+    def __init__(self, field, name, test):
+        self.field, self.name, self.test = field, name, test
+
+    def fields(self):
+        return {self.field.name}
+
+    def mask(self, snapshot):
+        if self.field.kind == 'layer':
+            raise ValueError(f"layer.{self.name} is not supported; "
+                             "use == or isin")
+        column = snapshot.column(self.field.name)
+        if self.field.kind == 'master':
+            column = snapshot.folded(self.field.name)
+        return np.fromiter((v is not None and self.test(str(v))
+                            for v in column), dtype=bool, count=len(column))
+
+    def __repr__(self):
+        return f"{self.field.name}.{self.name}"
+
+
+def _condition(value):
+    if not isinstance(value, Condition):
+        raise TypeError(f"Cannot combine a condition with {value!r}")
+    return value
+
+
+class Field:
+    """A column of a :class:`Snapshot`; comparisons make conditions.
+
+    Attribute access and subscripts extend the name: ``Q.prop.Type`` is the
+    field ``prop.Type``, ``Q.prop['Asset ID']`` the field ``prop.Asset ID``.
+    """
+
+    __hash__ = None
+
+    def __init__(self, name):
+        self.name = name
+        head = name.split('.')[0].lower()
+        if name.lower() in ('id', 'master', 'layer'):
+            self.kind = name.lower()
+        elif head in ('prop', 'user'):
+            self.kind = 'row'
+        else:
+            self.kind = 'cell'
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return Field(f"{self.name}.{name}")
+
+    def __getitem__(self, name):
+        return Field(f"{self.name}.{name}")
+
+    def _compare(self, op, value):
+        return _Compare(self, op, value)
+
+    def __eq__(self, value):
+        return self._compare('==', value)
+
+    def __ne__(self, value):
+        return self._compare('!=', value)
+
+    def __lt__(self, value):
+        return self._compare('<', value)
+
+    def __le__(self, value):
+        return self._compare('<=', value)
+
+    def __gt__(self, value):
+        return self._compare('>', value)
+
+    def __ge__(self, value):
+        return self._compare('>=', value)
+
+    def isin(self, values):
+        """Equal to any of ``values`` (on a layer: member of any)."""
+        values = list(values)
+        if not values:
+            raise ValueError(f"{self.name}.isin() needs at least one value")
+        condition = self == values[0]
+        for value in values[1:]:
+            condition = condition | (self == value)
+        return condition
+
+    def between(self, low, high):
+        """``low <= field <= high``."""
+        return (self >= low) & (self <= high)
+
+    def contains(self, text, case=False):
+        """The value contains ``text`` (case-insensitive by default)."""
+        if case:
+            return _Test(self, f"contains({text!r})", lambda v: text in v)
+        lowered = text.lower()
+        return _Test(self, f"contains({text!r})",
+                     lambda v: lowered in v.lower())
+
+    def startswith(self, text):
+        return _Test(self, f"startswith({text!r})",
+                     lambda v: v.startswith(text))
+
+    def matches(self, pattern):
+        """The value matches the regular expression ``pattern``
+        (``re.search``)."""
+        rx = re.compile(pattern)
+        return _Test(self, f"matches({pattern!r})",
+                     lambda v: rx.search(v) is not None)
+
+    def __repr__(self):
+        return f"<Field {self.name}>"
+
+
+class _Fields:
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return Field(name)
+
+    def __getitem__(self, name):
+        return Field(name)
+
+
+Q = _Fields()
+"""Field factory: ``Q.Width``, ``Q.prop.Type``, ``Q.layer``, ``Q.master``."""
+
+
+# -- text queries ------------------------------------------------------------
+_AST_OPS = {ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=',
+            ast.Gt: '>', ast.GtE: '>='}
+_METHODS = ('isin', 'between', 'contains', 'startswith', 'matches')
+
+
+def _source(node):
+    """Source text of ``node`` for messages (``ast.unparse`` is 3.9+)."""
+    return getattr(ast, 'unparse', ast.dump)(node)
+
+
+def _field(node):
+    if isinstance(node, ast.Name):
+        return Field(node.id)
+    if isinstance(node, ast.Attribute):
+        return Field(f"{_field(node.value).name}.{node.attr}")
+    if isinstance(node, ast.Subscript):
+        key = _constant(node.slice)
+        if isinstance(key, str):
+            return Field(f"{_field(node.value).name}.{key}")
+    raise ValueError(f"Not a field: {_source(node)}")
+
+
+def _constant(node):
+    if type(node).__name__ == 'Index':      # subscripts before Python 3.9
+        node = node.value
+    try:
+        value = ast.literal_eval(node)
+    except ValueError:
+        raise ValueError(f"Not a constant: {_source(node)}") from None
+    if isinstance(value, (tuple, set, frozenset)):
+        return list(value)
+    return value
+
+
+def _is_field(node):
+    return isinstance(node, (ast.Name, ast.Attribute, ast.Subscript))
+
+
+def _compare(left, op, right):
+    if isinstance(op, (ast.In, ast.NotIn)):
+        condition = _field(left).isin(_constant(right))
+        return ~condition if isinstance(op, ast.NotIn) else condition
+    symbol = _AST_OPS.get(type(op))
+    if symbol is None:
+        raise ValueError(f"Unsupported operator {type(op).__name__}")
+    if _is_field(left):
+        return _Compare(_field(left), symbol, _constant(right))
+    return _Compare(_field(right), _FLIPPED[symbol], _constant(left))
+
+
+def _build(node):
+    if isinstance(node, ast.BoolOp):
+        parts = [_build(v) for v in node.values]
+        result = parts[0]
+        for part in parts[1:]:
+            result = result & part if isinstance(node.op, ast.And) \
+                else result | part
+        return result
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return ~_build(node.operand)
+    if isinstance(node, ast.Compare):
+        operands = [node.left] + node.comparators
+        result = None
+        for left, op, right in zip(operands, node.ops, operands[1:]):
+            part = _compare(left, op, right)
+            result = part if result is None else result & part
+        return result
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+            and node.func.attr in _METHODS and not node.keywords:
+        method = getattr(_field(node.func.value), node.func.attr)
+        return method(*[_constant(a) for a in node.args])
+    raise ValueError(f"Unsupported query syntax: {_source(node)}")
+
+
+def parse(text):
+    """Compile a text query into a :class:`Condition`.
+
+    The syntax is a safe subset of Python expressions: comparisons
+    (chained ones too), ``in``/``not in`` lists, ``and``/``or``/``not``,
+    and the field methods ``isin``, ``between``, ``contains``,
+    ``startswith`` and ``matches``.  Nothing is evaluated.
+    """
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Cannot parse query {text!r}: {e.msg}") from None
+    return _build(tree.body)
+
+
+def compile_query(query):
+    """A :class:`Condition` from a condition or a text query."""
+    if isinstance(query, str):
+        return parse(query)
+    return _condition(query)
+
+
+# -- snapshots ---------------------------------------------------------------
+class Snapshot:
+    """Columns of all shapes of a page, loaded as queries need them.
+
+    Parameters:
+    ----------
+    - page : Visio Page
+    - ids : sequence of int, optional
+        Shapes to consider; all top level shapes by default.
+    - unit : str
+        Unit of length cells (queries compare in this unit).
+    - angle_unit : str
+        Unit of angle cells.
+    - masters : iterable of Visio Master, optional
+        Masters the ``master`` column knows; ``page.Document.Masters`` by
+        default.
+
+    Attributes:
+    -----------
+    - ids : numpy array of shape IDs, one per row
+    """
+
+    def __init__(self, page, ids=None, unit='mm', angle_unit='deg',
+                 masters=None):
+        _require_numpy()
+        self.page = page
+        self.unit = unit
+        self.angle_unit = angle_unit
+        self._master_source = masters
+        self._resolver = CellResolver(page)
+        self._init_ids(ids)
+
+    def _init_ids(self, ids):
+        self._complete = ids is None
+        if ids is None:
+            ids = shape_ids(self.page)
+        self.ids = np.array(list(ids), dtype=np.int64)
+        self._columns = {}      # field name (lower case) -> array
+        self._derived = {}      # ('numeric' | 'folded', name) -> array
+        self._layers = None     # (names, boolean matrix, {name: Layer})
+        self._masters = {}      # lower case NameU -> Master
+
+    def __len__(self):
+        return len(self.ids)
+
+    # -- loading -------------------------------------------------------------
+    def load(self, fields):
+        """Load the missing ``fields`` with one batched read per kind."""
+        fields = [f if isinstance(f, Field) else Field(f) for f in fields]
+        missing = {}
+        for field in fields:
+            key = field.name.lower()
+            if key == 'layer':
+                if self._layers is None:
+                    self._load_layers()
+            elif key not in self._columns and key not in missing:
+                missing[key] = field
+        if 'id' in missing:
+            del missing['id']
+            self._columns['id'] = self.ids
+        if 'master' in missing:
+            self._load_masters()
+            del missing['master']
+        cells = [f for f in missing.values() if f.kind == 'cell']
+        rows = [f for f in missing.values() if f.kind == 'row']
+        if cells:
+            self._read([f.name for f in cells], [
+                cell_unit(f.name, self.unit, self.angle_unit)
+                for f in cells], strings=False)
+        if rows:
+            self._read([f.name for f in rows], None, strings=True)
+
+    def _read(self, names, cell_units, strings):
+        ids = self.ids.tolist()
+        refs = [(sid, name) for sid in ids for name in names]
+        unit = None if cell_units is None else cell_units * len(ids)
+        result = read_cells(self.page, refs, unit=unit, strings=strings,
+                            resolver=self._resolver)
+        n = len(names)
+        for j, name in enumerate(names):
+            values = result.values[j::n] if n else []
+            if strings:
+                column = np.empty(len(ids), dtype=object)
+                column[:] = values
+            else:
+                column = np.array([np.nan if v is None else v
+                                   for v in values], dtype=float)
+            self._columns[name.lower()] = column
+
+    def _load_layers(self):
+        names, objects = [], {}
+        for layer in self.page.Layers:
+            name = layer.NameU
+            names.append(name)
+            objects[name.lower()] = layer
+        self._read(['LayerMember'], None, strings=True)
+        members = self._columns.pop('layermember')
+        matrix = np.zeros((len(self.ids), len(names)), dtype=bool)
+        for i, text in enumerate(members):
+            for index in str(text or '').split(';'):
+                if index.strip().isdigit() and int(index) < len(names):
+                    matrix[i, int(index)] = True
+        self._layers = (names, matrix, objects)
+
+    def _load_masters(self):
+        masters = self._master_source
+        if masters is None:
+            masters = self.page.Document.Masters
+        column = np.empty(len(self.ids), dtype=object)
+        column[:] = ''
+        position = {sid: i for i, sid in enumerate(self.ids.tolist())}
+        for master in masters:
+            name = master.NameU
+            selection = self.page.CreateSelection(
+                visSelTypeByMaster, visSelModeSkipSub, master)
+            self._masters[name.lower()] = master
+            for sid in selection.GetIDs() or ():
+                if sid in position:
+                    column[position[sid]] = name
+        self._columns['master'] = column
+
+    def column(self, field):
+        """The values of a field (loaded on first use)."""
+        key = (field.name if isinstance(field, Field) else field).lower()
+        if key == 'layer':
+            raise ValueError("Layers are not a column; use layer_mask()")
+        if key not in self._columns:
+            self.load([field])
+        return self._columns[key]
+
+    def numeric(self, field):
+        """A string column as floats (NaN where not a number)."""
+        key = ('numeric', field.lower())
+        if key not in self._derived:
+            self._derived[key] = np.array(
+                [_float(v) for v in self.column(field)], dtype=float)
+        return self._derived[key]
+
+    def folded(self, field):
+        """A string column in lower case (for case-insensitive names)."""
+        key = ('folded', field.lower())
+        if key not in self._derived:
+            column = np.empty(len(self.ids), dtype=object)
+            column[:] = [str(v or '').lower() for v in self.column(field)]
+            self._derived[key] = column
+        return self._derived[key]
+
+    def quantity(self, field, text):
+        """``'20 mm'`` in the unit of ``field``'s column."""
+        quantity = units.parse_quantity(text)
+        if quantity is None:
+            raise ValueError(f"{text!r} is not a quantity")
+        value, unit = quantity
+        target = cell_unit(field, self.unit, self.angle_unit)
+        if unit is None or target is None:
+            return value
+        return units.from_internal(units.to_internal(value, unit), target)
+
+    def layer_mask(self, name):
+        """Boolean array: which shapes are on the layer ``name``."""
+        if self._layers is None:
+            self._load_layers()
+        names, matrix, _ = self._layers
+        lowered = [n.lower() for n in names]
+        if str(name).lower() not in lowered:
+            return np.zeros(len(self.ids), dtype=bool)
+        return matrix[:, lowered.index(str(name).lower())].copy()
+
+    def layer(self, name):
+        """The Visio Layer called ``name`` (``None`` if there is none)."""
+        if self._layers is None:
+            self._load_layers()
+        return self._layers[2].get(str(name).lower())
+
+    def master(self, name):
+        """The Visio Master called ``name`` (``None`` if not known)."""
+        if 'master' not in self._columns:
+            self._load_masters()
+        return self._masters.get(str(name).lower())
+
+    def invalidate(self, fields=None):
+        """Forget loaded columns (all, or ``fields``) so the next query
+        reads them again."""
+        if fields is None:
+            self._columns.clear()
+            self._derived.clear()
+            self._layers = None
+            self._masters.clear()
+            return
+        for field in fields:
+            key = (field.name if isinstance(field, Field) else field).lower()
+            if key == 'layer':
+                self._layers = None
+            if key == 'master':
+                self._masters.clear()
+            self._columns.pop(key, None)
+            for kind in ('numeric', 'folded'):
+                self._derived.pop((kind, key), None)
+
+    def refresh(self, ids=None):
+        """Start over: re-read the shape IDs and forget every column."""
+        self._init_ids(ids)
+
+    # -- queries -------------------------------------------------------------
+    def mask(self, query):
+        """Boolean array of the shapes matching ``query``."""
+        condition = compile_query(query)
+        self.load(condition.fields())
+        return condition.mask(self)
+
+    def query(self, query):
+        """IDs of the shapes matching ``query`` (a list)."""
+        return self.ids[self.mask(query)].tolist()
+
+    def count(self, query):
+        return int(self.mask(query).sum())
+
+    def selection(self, query):
+        """A Visio Selection of the shapes matching ``query``.
+
+        A query that is just ``master == ...`` or ``layer == ...`` (or that
+        matches every shape) is a single ``CreateSelection`` call.  Visio
+        has no call to select a list of IDs, so other results are put on a
+        temporary layer (one batched read and write of ``LayerMember``),
+        selected by that layer and the layer is deleted again; Visio takes
+        it out of the shapes' ``LayerMember`` cells.
+        """
+        condition = compile_query(query)
+        ids = self.query(condition)
+        if len(ids) == len(self.ids) and len(ids):
+            return self.page.CreateSelection(visSelTypeAll)
+        selector = condition.selector(self) \
+            if isinstance(condition, _Compare) else None
+        if selector is not None and selector[1] is not None \
+                and self._complete:
+            return self.page.CreateSelection(selector[0], visSelModeSkipSub,
+                                             selector[1])
+        if not len(ids):
+            return self.page.CreateSelection(visSelTypeEmpty)
+        refs = [(int(sid), 'LayerMember') for sid in ids]
+        members = read_cells(self.page, refs, strings=True,
+                             resolver=self._resolver).values
+        layer = self.page.Layers.Add(SELECTION_LAYER)
+        try:
+            index = str(layer.Index - 1)
+            edits = []
+            for (sid, cell), member in zip(refs, members):
+                indices = [i for i in str(member or '').split(';') if i]
+                edits.append(CellEdit(sid, cell,
+                                      '"' + ';'.join(indices + [index]) + '"'))
+            write_cells(self.page, edits, resolver=self._resolver)
+            return self.page.CreateSelection(visSelTypeByLayer,
+                                             visSelModeSkipSub, layer)
+        finally:
+            layer.Delete(0)
+
+    def select(self, window, query):
+        """Make the shapes matching ``query`` the selection of ``window``;
+        returns their IDs."""
+        selection = self.selection(query)
+        window.Selection = selection
+        return list(selection.GetIDs() or ())
+
+    def __repr__(self):
+        return (f"<Snapshot {len(self.ids)} shapes, "
+                f"{len(self._columns)} columns>")
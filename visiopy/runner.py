@@ -0,0 +1,218 @@
+"""Run one script over many drawings in parallel.
+
+A batch script is a Python file with a function ``process(path)`` that
+works on one .vsdx file through the offline path (:mod:`visiopy.vsdx`,
+:mod:`visiopy.patch`) and returns something picklable.  :func:`run_batch`
+spreads the files over a ``ProcessPoolExecutor`` and yields one
+:class:`FileResult` per file as soon as it is done; a failing file is
+reported and the batch goes on.
+
+With ``visio=True`` every worker process starts its own invisible Visio
+instance (``DispatchEx``) and ``process(doc)`` receives the opened
+document instead of the path, so N workers drive N isolated instances.
+
+Command line:
+-------------
+    python -m visiopy batch snap.py "drawings/**/*.vsdx" -j 8
+    python -m visiopy batch fix.py "*.vsdx" --visio -j 2 --json report.json
+"""
+import atexit
+import glob
+import importlib.util
+import json
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Documents.OpenEx flags: visOpenDontList | visOpenMacrosDisabled |
+# visOpenNoWorkspace
+_OPEN_FLAGS = 8 | 128 | 256
+_IDNO = 7
+
+
+class FileResult(namedtuple('FileResult', 'path result error seconds pid')):
+    """Outcome of one file: ``result`` of the script or ``error`` (the
+    formatted traceback), wall time in ``seconds``, worker ``pid``."""
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+# state of a worker process, set up by _init_worker
+_worker = {}
+
+
+def load_script(path, function='process'):
+    """Import a batch script from its path and return ``function``."""
+    name = '_visiopy_batch_' + os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    try:
+        return getattr(module, function)
+    except AttributeError:
+        raise AttributeError(f"{path} has no function '{function}'")
+
+
+def _quit_visio():
+    app = _worker.pop('app', None)
+    if app is not None:
+        try:
+            app.Quit()
+        except Exception:
+            pass
+
+
+def _init_worker(script, function, visio):
+    _worker['function'] = load_script(script, function)
+    if visio:
+        import pythoncom
+        import win32com.client
+        pythoncom.CoInitialize()
+        app = win32com.client.DispatchEx('Visio.InvisibleApp')
+        app.AlertResponse = _IDNO     # never block on a dialog
+        _worker['app'] = app
+        atexit.register(_quit_visio)
+
+
+def _process(path):
+    start = time.perf_counter()
+    try:
+        app = _worker.get('app')
+        if app is None:
+            result = _worker['function'](path)
+        else:
+            doc = app.Documents.OpenEx(os.path.abspath(path), _OPEN_FLAGS)
+            try:
+                result = _worker['function'](doc)
+            finally:
+                doc.Close()
+        error = None
+    except Exception:
+        result, error = None, traceback.format_exc()
+    return FileResult(path, result, error, time.perf_counter() - start,
+                      os.getpid())
+
+
+def expand(patterns):
+    """Files matching any of the glob ``patterns`` (``**`` recurses)."""
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    files = set()
+    for pattern in patterns:
+        files.update(glob.glob(pattern, recursive=True))
+    return sorted(f for f in files if os.path.isfile(f))
+
+
+def run_batch(script, files, workers=None, function='process', visio=False):
+    """Run ``script`` over ``files``, yielding results as they complete.
+
+    Parameters:
+    ----------
+    - script : str
+        Path of the batch script.
+    - files : iterable of str or str
+        Paths, or glob patterns (see :func:`expand`).
+    - workers : int, optional
+        Number of processes; ``os.cpu_count()`` by default.  ``0`` runs
+        everything in this process (handy for debugging).
+    - function : str
+        Name of the function to call in the script.
+    - visio : bool
+        One Visio instance per worker; ``function`` gets the document.
+
+    Yields:
+    -------
+    - FileResult, in completion order.
+    """
+    if isinstance(files, str):
+        files = expand(files)
+    files = list(files)
+    if workers == 0:
+        _init_worker(script, function, visio)
+        try:
+            for path in files:
+                yield _process(path)
+        finally:
+            _quit_visio()
+            _worker.clear()
+        return
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             initializer=_init_worker,
+                             initargs=(script, function, visio)) as pool:
+        futures = {pool.submit(_process, path): path for path in files}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # the worker died or the result could not be pickled
+                yield FileResult(futures[future], None,
+                                 f"{type(e).__name__}: {e}", 0.0, None)
+
+
+def summarize(results, wall):
+    """Totals of a finished batch as a dict."""
+    failed = [r.path for r in results if not r.ok]
+    busy = sum(r.seconds for r in results)
+    return {'files': len(results), 'failed': len(failed),
+            'failed_files': failed, 'wall_seconds': wall,
+            'busy_seconds': busy,
+            'files_per_second': len(results) / wall if wall else 0.0}
+
+
+def batch_main(args):
+    """``python -m visiopy batch``; returns the exit code."""
+    files = expand(args.files)
+    if not files:
+        print(f"No files match {' '.join(args.files)}", file=sys.stderr)
+        return 2
+    results = []
+    start = time.perf_counter()
+    for r in run_batch(args.script, files, args.jobs, args.function,
+                       args.visio):
+        results.append(r)
+        status = 'ok' if r.ok else 'FAILED'
+        print(f"[{len(results)}/{len(files)}] {status:6} {r.seconds:7.2f} s "
+              f"{r.path}", flush=True)
+        if not r.ok and not args.quiet:
+            print(r.error.rstrip(), file=sys.stderr)
+    summary = summarize(results, time.perf_counter() - start)
+    print(f"{summary['files']} files in {summary['wall_seconds']:.2f} s "
+          f"({summary['files_per_second']:.1f} files/s), "
+          f"{summary['failed']} failed")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'files': [
+                {'path': r.path, 'ok': r.ok, 'seconds': r.seconds,
+                 'result': _jsonable(r.result), 'error': r.error}
+                for r in results]}, f, indent=2)
+    return 1 if summary['failed'] else 0
+
+
+def _jsonable(value):
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+def add_arguments(parser):
+    parser.add_argument('script', help="Python file with process(path)")
+    parser.add_argument('files', nargs='+', help="files or glob patterns")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes (default: CPU count, "
+                             "0: no pool)")
+    parser.add_argument('-f', '--function', default='process',
+                        help="function to call (default: process)")
+    parser.add_argument('--visio', action='store_true',
+                        help="one Visio instance per worker, the function "
+                             "gets the opened document")
+    parser.add_argument('--json', help="write a report to this file")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="do not print tracebacks")
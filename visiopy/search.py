@@ -0,0 +1,595 @@
+"""Full-text search and bulk replace over shape text and Shape Data.
+
+Finding every shape that mentions ``P-101`` through COM means reading the
+text and every Shape Data and User row of every shape, for every search.
+:class:`TextIndex` reads them once -- ``Shape.Text`` and the row counts per
+shape, the row names once per master (:class:`~visiopy.batch.RowNames`)
+plus one batched ``GetResults`` per page for the values of a live
+document, or one streaming pass over a .vsdx file -- and keeps an inverted
+index from words to fields.  Word searches are answered from the index;
+substring and regular expression searches scan the stored texts, never
+Visio.  Shapes are re-read as they change (:meth:`refresh`,
+:meth:`on_event`, optionally debounced); for files, pages whose part
+did not change (zip CRC) are skipped when the file is indexed again.
+
+Words are runs of letters and digits; ``P-101``, ``3.5`` or ``A/B`` are
+one word that is also indexed by its parts, so ``101`` finds it too.
+Searches ignore case.
+
+:meth:`TextIndex.replace` changes the matching fields of a document or
+file.  Shape Data and User values are written in one batched
+``SetFormulas`` per page (:func:`~visiopy.patch.patch_vsdx` for files).
+Shape text is replaced match by match through ``Shape.Characters``, so
+the character formatting before, after and around each match stays as it
+is; a replacement takes the format of the first character it replaces.
+In files only the text between the formatting markers of ``<Text>``
+changes, with the same rule.  Live, only top level shapes are indexed
+(like ``Page.Shapes``); files include the shapes inside groups.
+
+Usage:
+------
+    from visiopy.search import TextIndex
+    from visiopy.select_assign import ComWindowEvents
+
+    index = TextIndex.from_document(vDoc)  # or TextIndex.from_vsdx(path)
+    index.search('P-101')                  # [Hit(document, page, shape_id,
+                                           #      field, text), ...]
+    index.search('pump', fields=['Text', 'Prop.Type'])
+    index.search('P-1', substring=True)
+    index.search(r'P-\\d{3}\\b', regex=True)
+    index.replace(vDoc, 'P-101', 'P-201')  # batched, formatting kept
+
+    events = ComWindowEvents(vWin, kinds=('cell', 'text', 'delete'))
+    events.subscribe(index.on_event)       # keep the index up to date
+    index.debounce(root.after, root.after_cancel)   # batch event bursts
+"""
+import bisect
+import itertools
+import os
+import re
+from collections import defaultdict, namedtuple
+
+from .batch import CellEdit, RowNames, read_cells, shape_ids, \
+    visSectionProp, visSectionUser, write_cells
+from .select_assign import Debouncer
+from .shapedata import _quote, _vsdx_text
+
+TOKEN = re.compile(r'\w+(?:[-./]\w+)*')
+_PART = re.compile(r'\w+')
+
+TEXT_FIELD = 'Text'
+_ROW_SECTIONS = ((visSectionProp, 'Prop'), (visSectionUser, 'User'))
+
+
+class Hit(namedtuple('Hit', 'document page shape_id field text')):
+    """One matching field: ``field`` is ``'Text'``, ``'Prop.<row>'`` or
+    ``'User.<row>'``, ``text`` its whole current text."""
+    __slots__ = ()
+
+    @property
+    def key(self):
+        return (self.document, self.page, self.shape_id)
+
+
+def tokens(text):
+    """The casefolded words of ``text``; compound words (``P-101``) are
+    followed by their parts."""
+    found = []
+    for match in TOKEN.finditer(text):
+        word = match.group().casefold()
+        found.append(word)
+        if not word.isalnum():
+            found.extend(_PART.findall(word))
+    return found
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _cell_formula(old, new):
+    """Formula for a replaced value: numbers stay numbers."""
+    if _is_number(old) and _is_number(new):
+        return new
+    return _quote(new)
+
+
+def _pattern(old, regex, ignore_case):
+    flags = re.IGNORECASE if ignore_case else 0
+    return re.compile(old if regex else re.escape(old), flags)
+
+
+def _matches(pattern, text, new, regex):
+    """``[(start, end, replacement)]`` of all matches in ``text``."""
+    return [(m.start(), m.end(), m.expand(new) if regex else new)
+            for m in pattern.finditer(text)]
+
+
+def _substitute(text, matches):
+    out, pos = [], 0
+    for start, end, replacement in matches:
+        out.append(text[pos:start])
+        out.append(replacement)
+        pos = end
+    out.append(text[pos:])
+    return ''.join(out)
+
+
+def replace_runs(runs, matches):
+    """Apply ``matches`` to a text split into formatting runs.
+
+    ``matches`` are ``(start, end, replacement)`` in the joined text.  Each
+    replacement goes into the run of the first character it replaces, the
+    rest of a match that spans runs is removed from the following ones.
+    Returns the new runs (as many as were given).
+    """
+    text = ''.join(runs)
+    starts = [0] + list(itertools.accumulate(len(r) for r in runs[:-1]))
+    out = [[] for _ in runs]
+
+    def run_at(offset):
+        return max(bisect.bisect_right(starts, offset) - 1, 0)
+
+    def copy(a, b):
+        while a < b:
+            i = run_at(a)
+            stop = min(b, starts[i] + len(runs[i]))
+            out[i].append(text[a:stop])
+            a = stop
+
+    pos = 0
+    for start, end, replacement in matches:
+        copy(pos, start)
+        out[run_at(start)].append(replacement)
+        pos = end
+    copy(pos, len(text))
+    return [''.join(parts) for parts in out]
+
+
+def _read_shapes(page, ids, row_names):
+    """``{shape_id: {field: (text, src)}}`` of live shapes.
+
+    ``Shape.Text`` and ``RowCount`` cost calls per shape; ``row_names``
+    (a :class:`~visiopy.batch.RowNames`) reads the row names once per
+    master plus the rows a shape adds, and the values of all rows come in
+    one batched read.
+    """
+    shapes = page.Shapes
+    found, rows = {}, []
+    for sid in ids:
+        shape = shapes.ItemFromID(sid)
+        fields = found[sid] = {TEXT_FIELD: (shape.Text, None)}
+        for section, kind in _ROW_SECTIONS:
+            names = row_names.names(shape, sid, section)
+            for row, name in enumerate(names):
+                rows.append((sid, f"{kind}.{name}", (section, row, 0)))
+    values = read_cells(page, [(sid, src) for sid, _, src in rows],
+                        strings=True).values
+    for (sid, field, src), value in zip(rows, values):
+        found[sid][field] = ('' if value is None else str(value), src)
+    return found
+
+
+class TextIndex:
+    """Inverted index over the text, Shape Data and User values of shapes.
+
+    Shapes are keyed by ``(document, page, shape_id)``: the document's
+    ``FullName`` (or the .vsdx path) and the page's universal name.
+
+    Attributes:
+    -----------
+    - fields : dict
+        ``{(document, page, shape_id): {field: text}}``.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self._postings = defaultdict(set)   # word -> {(key, field)}
+        self._cells = {}        # live key -> {field: (section, row, cell)}
+        self._pages = defaultdict(set)      # (document, page) -> shape IDs
+        self._parts = {}        # (path, page) -> CRC of the page part
+        self._pending = {}      # (document, page) -> [page, {shape IDs}]
+        self._row_names = {}    # (document, page) -> RowNames
+        self._debouncer = None
+
+    @classmethod
+    def from_page(cls, page):
+        """Index the top level shapes of a live page."""
+        index = cls()
+        index.add_page(page)
+        return index
+
+    @classmethod
+    def from_document(cls, doc):
+        """Index the top level shapes of all pages of a live document."""
+        index = cls()
+        for page in doc.Pages:
+            index.add_page(page)
+        return index
+
+    @classmethod
+    def from_vsdx(cls, path):
+        """Index all shapes (groups included) of a .vsdx file."""
+        index = cls()
+        index.add_vsdx(path)
+        return index
+
+    def __len__(self):
+        return len(self.fields)
+
+    # -- maintenance -------------------------------------------------------
+    def _set(self, key, fields):
+        """Store ``{field: text}`` of a shape, replacing what it had."""
+        old = self.fields.get(key, {})
+        for field, text in old.items():
+            if fields.get(field) != text:
+                for word in set(tokens(text)):
+                    entries = self._postings[word]
+                    entries.discard((key, field))
+                    if not entries:
+                        del self._postings[word]
+        for field, text in fields.items():
+            if old.get(field) != text:
+                for word in tokens(text):
+                    self._postings[word].add((key, field))
+        self.fields[key] = fields
+        self._pages[key[:2]].add(key[2])
+
+    def remove(self, document, page, shape_id):
+        """Drop a shape (no error if it is not indexed)."""
+        key = (document, page, shape_id)
+        if key not in self.fields:
+            return
+        self._set(key, {})
+        del self.fields[key]
+        self._cells.pop(key, None)
+        self._pages[key[:2]].discard(shape_id)
+        if not self._pages[key[:2]]:
+            del self._pages[key[:2]]
+
+    def _drop_page(self, document, page):
+        for shape_id in list(self._pages.get((document, page), ())):
+            self.remove(document, page, shape_id)
+
+    def add_page(self, page, ids=None):
+        """Index (or re-read) shapes of a live page, all if ``ids`` is
+        omitted; indexed shapes that no longer exist are dropped.
+
+        Returns the number of shapes read.
+        """
+        document, name = page.Document.FullName, page.NameU
+        current = shape_ids(page)
+        if ids is None:
+            ids = current
+            gone = self._pages.get((document, name), set()) - set(current)
+        else:
+            existing = set(current)
+            gone = {i for i in ids if i not in existing}
+            ids = [i for i in ids if i in existing]
+        for shape_id in gone:
+            self.remove(document, name, shape_id)
+        self._read(page, document, name, ids, whole=ids is current)
+        return len(ids)
+
+    def _read(self, page, document, name, ids, whole=False):
+        """Read shapes of a live page.
+
+        Reading a ``whole`` page looks up the instances of its masters
+        once; the row names found are kept for later re-reads of the
+        page's shapes.  Other re-reads of a page not read whole read the
+        row names of their shapes row by row.
+        """
+        key = (document, name)
+        if whole or key not in self._row_names:
+            row_names = RowNames(page, None if whole else ())
+            if whole:
+                self._row_names[key] = row_names
+        else:
+            row_names = self._row_names[key]
+        for shape_id, fields in _read_shapes(page, ids, row_names).items():
+            key = (document, name, shape_id)
+            self._set(key, {f: text for f, (text, _) in fields.items()})
+            self._cells[key] = {f: src for f, (_, src) in fields.items()
+                                if src is not None}
+
+    refresh = add_page
+
+    def add_vsdx(self, path):
+        """Index a .vsdx file in one streaming pass.
+
+        Pages already indexed from the same file whose part is unchanged
+        (zip CRC) are not parsed again.  Returns the number of pages read.
+        """
+        from .vsdx import VsdxFile
+        document = os.fspath(path)
+        read = 0
+        with VsdxFile(path) as vsdx:
+            names = set()
+            for page in vsdx.pages:
+                name = page.name_u or page.name
+                names.add(name)
+                crc = vsdx.part_crc(page.part)
+                if self._parts.get((document, name)) == crc:
+                    continue
+                self._drop_page(document, name)
+                for shape in vsdx.iter_shapes(page):
+                    fields = {TEXT_FIELD: shape.text or ''}
+                    for section, kind in (('Property', 'Prop'),
+                                          ('User', 'User')):
+                        found = shape.section(section)
+                        for row in found.rows if found else ():
+                            fields[f"{kind}.{row.name}"] = _vsdx_text(
+                                row.cells.get('Value'))
+                    self._set((document, name, shape.id), fields)
+                self._parts[(document, name)] = crc
+                read += 1
+        for key in [k for k in self._parts
+                    if k[0] == document and k[1] not in names]:
+            self._drop_page(*key)
+            del self._parts[key]
+        return read
+
+    def debounce(self, schedule, cancel, delay=200):
+        """Collect the shapes changed by :meth:`on_event` and read them
+        ``delay`` ms after the last event, in one batch per page.
+
+        ``schedule``/``cancel`` have the signature of Tk's ``after`` and
+        ``after_cancel``.  Returns the index.
+        """
+        self._debouncer = Debouncer(schedule, cancel, delay, self.flush)
+        return self
+
+    def on_event(self, kind, payload=None):
+        """Update the index from ``('cell', cell)``, ``('text', shape)`` or
+        ``('delete', shape)`` events, e.g. of
+        :class:`~visiopy.select_assign.ComWindowEvents`.
+
+        Cell events outside the Shape Data and User sections are ignored.
+        Changed shapes are re-read right away, or by :meth:`flush` after
+        the quiet time set with :meth:`debounce`.
+        """
+        if payload is None or kind not in ('cell', 'text', 'delete'):
+            return
+        if kind == 'cell':
+            if payload.Section not in (visSectionProp, visSectionUser):
+                return
+            shape = payload.Shape
+        else:
+            shape = payload
+        page = shape.ContainingPage
+        key = (page.Document.FullName, page.NameU)
+        shape_id = shape.ID
+        if kind == 'delete':
+            if key in self._pending:
+                self._pending[key][1].discard(shape_id)
+            self.remove(*key, shape_id)
+            return
+        self._pending.setdefault(key, [page, set()])[1].add(shape_id)
+        if self._debouncer is None:
+            self.flush()
+        else:
+            self._debouncer.trigger()
+
+    def flush(self):
+        """Re-read the shapes collected by :meth:`on_event`.
+
+        The shapes are known to exist, so the page's shape list is not
+        read; if one went away meanwhile the page's IDs are checked after
+        all (see :meth:`add_page`).  Returns the number of shapes read.
+        """
+        pending, self._pending = self._pending, {}
+        read = 0
+        for (document, name), (page, ids) in pending.items():
+            ids = sorted(ids)
+            try:
+                self._read(page, document, name, ids)
+                read += len(ids)
+            except Exception:
+                read += self.add_page(page, ids)
+        return read
+
+    # -- search --------------------------------------------------------------
+    @staticmethod
+    def _field_filter(fields):
+        if fields is None:
+            return None
+        prefixes = tuple(fields)
+        return lambda field: any(field == f or field.startswith(f + '.')
+                                 for f in prefixes)
+
+    def _scan(self, document, page):
+        for key, fields in self.fields.items():
+            if (document is None or key[0] == document) and \
+                    (page is None or key[1] == page):
+                yield key, fields
+
+    def search(self, query, substring=False, regex=False, fields=None,
+               document=None, page=None):
+        """Find the fields that match ``query`` (case is ignored).
+
+        Parameters:
+        ----------
+        - query : str
+            Words that must all occur in the same field (from the index).
+        - substring : bool, optional
+            Match ``query`` anywhere in the text (scans all fields); also
+            used when ``query`` has no words.
+        - regex : bool, optional
+            ``query`` is a regular expression (``re.search``, scans).
+        - fields : iterable of str, optional
+            Only these fields: ``'Text'``, ``'Prop'``, ``'User'`` or single
+            rows such as ``'Prop.Tag'``.
+        - document, page : str, optional
+            Only this document (``FullName`` or path) and page (NameU).
+
+        Returns:
+        --------
+        - list of :class:`Hit`, sorted.
+        """
+        accept = self._field_filter(fields)
+        words = [] if substring or regex else tokens(query)
+        if words:
+            entries = sorted((self._postings.get(w, set()) for w in
+                              set(words)), key=len)
+            found = set.intersection(*entries)
+            hits = [Hit(*key, field, self.fields[key][field])
+                    for key, field in found
+                    if (document is None or key[0] == document) and
+                    (page is None or key[1] == page)]
+        else:
+            pattern = _pattern(query, regex, True)
+            hits = [Hit(*key, field, text)
+                    for key, shape_fields in self._scan(document, page)
+                    for field, text in shape_fields.items()
+                    if text and pattern.search(text)]
+        if accept is not None:
+            hits = [h for h in hits if accept(h.field)]
+        return sorted(hits)
+
+    # -- replace -------------------------------------------------------------
+    def _changes(self, document, page, pattern, new, regex, accept):
+        """``{key: {field: (old, new, matches)}}`` of the indexed fields."""
+        changes = {}
+        for key, fields in self._scan(document, page):
+            for field, text in fields.items():
+                if not text or (accept is not None and not accept(field)):
+                    continue
+                matches = _matches(pattern, text, new, regex)
+                if matches:
+                    changes.setdefault(key, {})[field] = (
+                        text, _substitute(text, matches), matches)
+        return changes
+
+    def replace(self, target, old, new, regex=False, ignore_case=False,
+                fields=None, dst=None):
+        """Replace ``old`` by ``new`` in the indexed fields of ``target``.
+
+        Parameters:
+        ----------
+        - target : Visio Document, Page or str
+            A live document/page, or the path of an indexed .vsdx file.
+        - old, new : str
+            Text to find and its replacement; with ``regex=True`` a regular
+            expression and a template (``\\1``, ``\\g<name>``).
+        - ignore_case : bool, optional
+        - fields : iterable of str, optional
+            Only these fields, as in :meth:`search`.
+        - dst : str, optional
+            Output path for files; the file is patched in place (and the
+            index updated) if omitted.
+
+        Returns:
+        --------
+        - list of :class:`Hit` with the new text of every changed field.
+        """
+        pattern = _pattern(old, regex, ignore_case)
+        accept = self._field_filter(fields)
+        if isinstance(target, (str, os.PathLike)):
+            return self._replace_vsdx(target, pattern, new, regex, accept,
+                                      dst)
+        if hasattr(target, 'Pages'):
+            document, only = target.FullName, None
+        else:
+            document, only = target.Document.FullName, target.NameU
+        changes = self._changes(document, only, pattern, new, regex, accept)
+        by_page = defaultdict(dict)
+        for key, fields_ in changes.items():
+            by_page[key[1]][key] = fields_
+        changed = []
+        for name, shapes in sorted(by_page.items()):
+            page = target if only is not None else target.Pages.ItemU(name)
+            changed.extend(self._replace_page(page, shapes, pattern, new,
+                                              regex))
+        return sorted(changed)
+
+    def _replace_page(self, page, shapes, pattern, new, regex):
+        edits, written, texts = [], [], []
+        for key, fields in shapes.items():
+            cells = self._cells.get(key, {})
+            for field, (text, replaced, _) in fields.items():
+                if field == TEXT_FIELD:
+                    texts.append(key)
+                elif field in cells:
+                    edits.append(CellEdit(key[2], cells[field],
+                                          formula=_cell_formula(text,
+                                                                replaced)))
+                    written.append((key, field, replaced))
+        changed = []
+        if edits:
+            result = write_cells(page, edits)
+            changed.extend(w for i, w in enumerate(written)
+                           if i not in result.errors)
+        page_shapes = page.Shapes if texts else None
+        for key in texts:
+            shape = page_shapes.ItemFromID(key[2])
+            # the index may be behind the drawing: match the live text
+            text = shape.Text
+            matches = _matches(pattern, text, new, regex)
+            for start, end, replacement in reversed(matches):
+                chars = shape.Characters
+                chars.Begin = start
+                chars.End = end
+                chars.Text = replacement
+            changed.append((key, TEXT_FIELD, _substitute(text, matches)))
+        for key, field, replaced in changed:
+            fields = dict(self.fields[key])
+            fields[field] = replaced
+            self._set(key, fields)
+        return [Hit(*key, field, replaced) for key, field, replaced in changed
+                if shapes[key][field][0] != replaced]
+
+    def _replace_vsdx(self, path, pattern, new, regex, accept, dst):
+        from .patch import patch_vsdx
+        document = os.fspath(path)
+        changes = self._changes(document, None, pattern, new, regex, accept)
+        if not changes:
+            return []
+        edits, texts, changed = {}, {}, []
+        for key, fields in changes.items():
+            _, page, shape_id = key
+            for field, (text, replaced, _) in fields.items():
+                if field == TEXT_FIELD:
+                    texts.setdefault(page, {})[shape_id] = _TextChange(
+                        pattern, new, regex, replaced)
+                else:
+                    edits.setdefault(page, []).append(CellEdit(
+                        shape_id, field, formula=_cell_formula(text,
+                                                               replaced)))
+                changed.append(Hit(*key, field, replaced))
+        results = patch_vsdx(path, dst or path, edits, texts)
+        failed = set()
+        for page, result in results.items():
+            items = [(e.shape_id, e.cell) for e in edits.get(page, ())] + \
+                [(sid, TEXT_FIELD) for sid in texts.get(page, {})]
+            failed.update((page,) + items[i] for i in result.errors)
+        if dst is None or os.path.abspath(dst) == os.path.abspath(path):
+            self.add_vsdx(path)
+        return sorted(h for h in changed
+                      if (h.page, h.shape_id, h.field) not in failed)
+
+    def __repr__(self):
+        return (f"<TextIndex {len(self.fields)} shapes, "
+                f"{len(self._postings)} words>")
+
+
+class _TextChange:
+    """Text edit for :func:`~visiopy.patch.patch_vsdx`: replaces within the
+    formatting runs of the shape's own text, or sets the whole new text if
+    the shape inherits its text from the master."""
+
+    def __init__(self, pattern, new, regex, text):
+        self.pattern = pattern
+        self.new = new
+        self.regex = regex
+        self.text = text
+
+    def __call__(self, runs):
+        text = ''.join(runs)
+        if not text:
+            return [self.text] + [''] * (len(runs) - 1)
+        return replace_runs(runs, _matches(self.pattern, text, self.new,
+                                           self.regex))
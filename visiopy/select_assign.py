@@ -1,27 +1,198 @@
-import tkinter as tk
-from tkinter import ttk
-import win32com.client
-import pythoncom
-import time
+from .batch import CellEdit, shape_ids, write_cells
+from .perf import fast
+
+
+class ComWindowEvents:
+    """Event source fed by Visio's ``SelectionChanged`` and page events.
+
+    ``SelectionChanged`` is a Window event, ``CellChanged``, ``TextChanged``
+    and ``BeforeShapeDelete`` are raised by the page shown in the window.
+    Callbacks receive ``(kind, payload)`` with kind ``'selection'``
+    (payload: the window), ``'cell'`` (payload: the Cell), ``'text'`` or
+    ``'delete'`` (payload: the Shape).  The page events fire once per
+    changed cell or shape, so they are only subscribed to when asked for.
+    """
+
+    def __init__(self, vWin, kinds=('selection',)):
+        self.vWin = vWin
+        self.kinds = kinds
+        self._sinks = []
+
+    def subscribe(self, callback):
+        class WindowHandler:
+            def OnSelectionChanged(self, window):
+                callback('selection', window)
+
+        kinds = self.kinds
+
+        class PageHandler:
+            def OnCellChanged(self, cell):
+                if 'cell' in kinds:
+                    callback('cell', cell)
+
+            def OnTextChanged(self, shape):
+                if 'text' in kinds:
+                    callback('text', shape)
+
+            def OnBeforeShapeDelete(self, shape):
+                if 'delete' in kinds:
+                    callback('delete', shape)
+
+        import win32com.client
+        if 'selection' in self.kinds:
+            self._sinks.append(
+                win32com.client.WithEvents(self.vWin, WindowHandler))
+        if {'cell', 'text', 'delete'} & set(self.kinds):
+            self._sinks.append(win32com.client.WithEvents(
+                self.vWin.PageActive, PageHandler))
+
+    def unsubscribe(self):
+        for sink in self._sinks:
+            try:
+                sink.close()
+            except Exception:
+                pass
+        self._sinks = []
+
+
+class PollingSelectionSource:
+    """Fallback event source that polls ``Selection.GetIDs``.
+
+    Used when COM events are not available.  Emits ``'selection'`` only
+    when the IDs actually changed; each tick costs one COM call.
+    """
+
+    def __init__(self, vWin, schedule, cancel, interval=1000):
+        self.vWin = vWin
+        self.schedule = schedule
+        self.cancel = cancel
+        self.interval = interval
+        self._after_id = None
+        self._callback = None
+        self._previous = None
+
+    def subscribe(self, callback):
+        self._callback = callback
+        self._previous = shape_ids(self.vWin.Selection)
+        self._after_id = self.schedule(self.interval, self._tick)
+
+    def _tick(self):
+        self._after_id = None
+        try:
+            current = shape_ids(self.vWin.Selection)
+            if current != self._previous:
+                self._previous = current
+                self._callback('selection', self.vWin)
+        except Exception as e:
+            print(f"Error in PollingSelectionSource: {e}")
+        if self._callback is not None:
+            self._after_id = self.schedule(self.interval, self._tick)
+
+    def unsubscribe(self):
+        self._callback = None
+        if self._after_id is not None:
+            self.cancel(self._after_id)
+            self._after_id = None
+
+
+class Debouncer:
+    """Collapse bursts of triggers into a single call after ``delay`` ms.
+
+    ``schedule``/``cancel`` have the signature of Tk's ``after`` and
+    ``after_cancel``.
+    """
+
+    def __init__(self, schedule, cancel, delay, callback):
+        self.schedule = schedule
+        self.cancel = cancel
+        self.delay = delay
+        self.callback = callback
+        self._after_id = None
+
+    def trigger(self, *args):
+        if self._after_id is not None:
+            self.cancel(self._after_id)
+        self._after_id = self.schedule(self.delay, self._fire)
+
+    def _fire(self):
+        self._after_id = None
+        self.callback()
+
+    def cancel_pending(self):
+        if self._after_id is not None:
+            self.cancel(self._after_id)
+            self._after_id = None
+
 
 class SelectedShapeUpdater:
-    def __init__(self, vWin):
+    """Tk dialog that writes a Shape Data value to every selected shape.
+
+    Parameters:
+    ----------
+    - vWin : Visio Window, optional
+        The window to follow; the active window of Visio if omitted.
+    - event_source : object, optional
+        Anything with ``subscribe(callback)`` and ``unsubscribe()``.
+        Defaults to :class:`ComWindowEvents`, falling back to
+        :class:`PollingSelectionSource` if events cannot be connected.
+    - debounce_ms : int, optional
+        Quiet time after the last selection event before the update runs.
+    - root : object, optional
+        A Tk root (or anything with ``after``/``after_cancel``).  If given,
+        no window is built and no mainloop is started unless ``gui=True``.
+    - use_fast : bool, optional
+        Write inside :func:`visiopy.perf.fast` (no redraw, deferred
+        recalculation, one undo step per update); ``last_stats`` holds the
+        timing of the last update.
+    - worker : ComWorker, optional
+        Run the selection reads and writes on this
+        :class:`visiopy.worker.ComWorker` instead of the Tk thread, so a
+        slow Visio does not freeze the dialog.  An update that is still
+        queued when the next one settles is cancelled; ``pending`` is the
+        Future of the latest one.
+
+    :meth:`modify_query` writes the same value to the shapes matching a
+    :mod:`visiopy.query` query instead of the selection.
+    """
+
+    def __init__(self, vWin=None, event_source=None, debounce_ms=150,
+                 root=None, gui=None, use_fast=True, worker=None):
         print("Initializing SelectedShapeUpdater...")
         self.vWin = vWin
         self.selected_field = ""
         self.selected_value = ""
         self.check_active = False
+        self.event_source = event_source
+        self.debounce_ms = debounce_ms
+        self.root = root
+        self.use_fast = use_fast
+        self.last_stats = None
+        self.worker = worker
+        self.pending = None
+        self.snapshot = None
 
         self.init_visio()
-        self.previous_selection = [shape.ID for shape in self.vWin.Selection]  # Set initial selection
-        self.create_gui()
+        self.previous_selection = shape_ids(self.vWin.Selection)  # Set initial selection
+        if self.worker is not None:
+            self._shared_win = self.worker.share(self.vWin)
+        if gui is None:
+            gui = root is None
+        if self.root is None:
+            import tkinter as tk
+            self.root = tk.Tk()
+        self.debouncer = Debouncer(self.root.after, self.root.after_cancel,
+                                   self.debounce_ms, self.on_selection_settled)
+        if gui:
+            self.create_gui()
 
     def init_visio(self):
         print("Initializing Visio variables...")
-        self.vApp = win32com.client.Dispatch("Visio.Application")
-        self.vDoc = self.vApp.ActiveDocument
-        self.vPg = self.vApp.ActivePage
-        self.vWin = self.vApp.ActiveWindow
+        if self.vWin is None:
+            from .visio_connect import visio_application
+            self.vWin = visio_application().ActiveWindow
+        self.vApp = self.vWin.Application
+        self.vDoc = self.vWin.Document
+        self.vPg = self.vWin.PageActive
 
     def set_value(self, shape, field, value):
         try:
@@ -30,38 +201,121 @@ class SelectedShapeUpdater:
         except Exception as e:
             print(f"Error setting value: {e}")
 
-    def batch_modify_shapes(self):
+    def batch_modify_shapes(self, ids=None):
+        return self._modify(self.vWin, self.vApp, ids)
+
+    def _modify(self, vWin, vApp, ids=None):
+        # One SetFormulas call for the whole selection instead of
+        # CellExists + Cells(...).FormulaU per shape.  Shapes without the
+        # property only show up in result.errors and are skipped, as before.
         try:
-            selection = self.vWin.Selection
-            if selection.Count > 0 and self.check_active:
-                for i in range(1, selection.Count + 1):
-                    shape = selection.Item(i)
-                    self.set_value(shape, self.selected_field, self.selected_value)
+            if not self.check_active:
+                return
+            selection = vWin.Selection
+            if ids is None:
+                ids = shape_ids(selection)
+            if ids:
+                return self._write(selection.ContainingPage, vApp, ids)
         except Exception as e:
             print(f"Error in batch_modify_shapes: {e}")
 
-    def poll_selection_changes(self):
+    def _write(self, page, vApp, ids):
+        formula = '"{}"'.format(self.selected_value.replace('"', '""'))
+        edits = [CellEdit(shape_id, f"prop.{self.selected_field}.Value",
+                          formula=formula) for shape_id in ids]
+        if not self.use_fast or vApp is None:
+            return write_cells(page, edits)
+        with fast(vApp, undo="SelectedShapeUpdater") as scope:
+            result = write_cells(page, edits)
+        self.last_stats = scope.stats
+        return result
+
+    def modify_query(self, query, snapshot=None):
+        """Write the value to the shapes of the active page that match
+        ``query`` (see :mod:`visiopy.query`) instead of the selection.
+
+        The page snapshot is kept in ``snapshot`` and reused by the next
+        query; the written column is invalidated.  Returns the BatchResult
+        of the write, or ``None`` if nothing matched.
+        """
+        from .query import Snapshot
+        if snapshot is None:
+            if self.snapshot is None or self.snapshot.page is not self.vPg:
+                self.snapshot = Snapshot(self.vPg)
+            snapshot = self.snapshot
+        ids = snapshot.query(query)
+        if not ids:
+            return None
+        result = self._write(snapshot.page, self.vApp, ids)
+        snapshot.invalidate([f"prop.{self.selected_field}"])
+        return result
+
+    def on_event(self, kind, payload=None):
+        if kind == 'selection' and self.check_active:
+            self.debouncer.trigger()
+
+    def on_selection_settled(self):
         if not self.check_active:
             return
-        
+        if self.worker is None:
+            self._settle(self.vWin, self.vApp)
+            return
+        if self.pending is not None:
+            self.pending.cancel()
+        self.pending = self.worker.submit(self._settle_on_worker)
+
+    def _settle_on_worker(self):
+        vWin = self._shared_win.get()
+        return self._settle(vWin, vWin.Application)
+
+    def _settle(self, vWin, vApp):
         try:
-            current_selection = [shape.ID for shape in self.vWin.Selection]
+            current_selection = shape_ids(vWin.Selection)
             if current_selection != self.previous_selection:
-                self.batch_modify_shapes()
+                result = self._modify(vWin, vApp, current_selection)
                 self.previous_selection = current_selection
+                return result
         except Exception as e:
-            print(f"Error in poll_selection_changes: {e}")
-        
-        self.root.after(1000, self.poll_selection_changes)  # Poll every second
+            print(f"Error in on_selection_settled: {e}")
+
+    def start(self):
+        """Start following the selection."""
+        if self.check_active:
+            return
+        if self.event_source is None:
+            self.event_source = ComWindowEvents(self.vWin)
+            try:
+                self.event_source.subscribe(self.on_event)
+            except Exception as e:
+                print(f"Selection events not available ({e}), polling instead.")
+                self.event_source = PollingSelectionSource(
+                    self.vWin, self.root.after, self.root.after_cancel)
+                self.event_source.subscribe(self.on_event)
+        else:
+            self.event_source.subscribe(self.on_event)
+        self.check_active = True
+
+    def stop(self):
+        """Stop following the selection; pending updates are dropped."""
+        if not self.check_active:
+            return
+        self.check_active = False
+        self.debouncer.cancel_pending()
+        if self.pending is not None:
+            self.pending.cancel()
+        self.event_source.unsubscribe()
 
     def toggle_active(self):
-        self.check_active = not self.check_active
-        print(f"Active state toggled: {self.check_active}")
         if self.check_active:
-            self.poll_selection_changes()
+            self.stop()
+        else:
+            self.start()
+        print(f"Active state toggled: {self.check_active}")
 
     def create_gui(self):
-        self.root = tk.Tk()
+        import tkinter as tk
+        from tkinter import ttk
+
         self.root.title("SelectedShapeUpdater")
 
         explanation = ttk.Label(self.root, text="This dialog updates the selected shape properties in Visio.")
@@ -94,7 +348,6 @@ class SelectedShapeUpdater:
 
     def on_closing(self):
         print("Closing application...")
-        self.check_active = False
-        self.root.after_cancel(self.poll_selection_changes)
+        self.stop()
         self.root.destroy()
-        print("Application closed.")
\ No newline at end of file
+        print("Application closed.")
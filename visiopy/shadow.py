@@ -0,0 +1,282 @@
+"""Shadow ShapeSheet: cached reads and coalesced writes for one page.
+
+Read a cell, compute, write it back, read it again: through COM every one
+of these steps is a round trip, and writing the same cell five times sends
+five writes.  :class:`ShadowSheet` keeps a cache of cell results (filled by
+batched :meth:`~ShadowSheet.prefetch` reads) and records writes instead of
+sending them; the last write per cell wins and all of them go out in one
+batched ``SetFormulas`` on :meth:`~ShadowSheet.commit` or when the
+``with`` block ends.
+
+Invalidation rules:
+
+- A written cell whose formula is a constant (``'25 mm'``, ``'"text"'``)
+  keeps its new value in the cache; other formulas are sent to Visio
+  first when the cell is read again.
+- After a commit, cached cells whose formula is not a constant (they may
+  depend on what was written) are dropped, as are all cached cells of the
+  written shapes when ``invalidate='shape'`` (default) or everything with
+  ``invalidate='page'``.
+- Changes made outside the shadow (by the user, by other code) are not
+  seen; call :meth:`~ShadowSheet.invalidate` for them.
+
+Usage:
+------
+    from visiopy.shadow import ShadowSheet
+
+    with ShadowSheet(vPg) as sheet:
+        sheet.prefetch(ids, ['PinX', 'PinY'])     # one batched read
+        for sid in ids:
+            x = sheet.get(sid, 'PinX', 'mm')      # from the cache
+            sheet.set(sid, 'PinX', round(x), 'mm')
+    # one SetFormulas for all writes
+    sheet.stats     # <ShadowStats hits=... misses=...>
+"""
+from collections import OrderedDict
+
+from . import units
+from .batch import BatchResult, CellEdit, CellResolver, read_cells, \
+    write_cells
+
+
+class ShadowStats:
+    """Counters of a :class:`ShadowSheet`."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.reads = 0          # batched read calls sent
+        self.writes = 0         # set() calls
+        self.coalesced = 0      # writes that replaced a pending write
+        self.flushed = 0        # cells sent to Visio
+        self.commits = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __repr__(self):
+        return (f"<ShadowStats hits={self.hits} misses={self.misses} "
+                f"writes={self.writes} coalesced={self.coalesced} "
+                f"flushed={self.flushed} evictions={self.evictions}>")
+
+
+def _formula(value, unit):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    text = repr(float(value))
+    return f"{text} {unit}" if unit else text
+
+
+class ShadowSheet:
+    """Cached, write-coalescing view of the cells of one page.
+
+    Parameters:
+    ----------
+    - page : Visio Page
+    - max_cells : int
+        LRU bound of the read cache (pending writes are never evicted).
+    - invalidate : str
+        What a commit drops from the cache besides derived cells:
+        ``'shape'`` (cells of written shapes), ``'page'`` (everything) or
+        ``'none'``.
+    - chunk_size : int, optional
+        Passed on to the batched reads and writes.
+    """
+
+    def __init__(self, page, max_cells=100000, invalidate='shape',
+                 chunk_size=None):
+        if invalidate not in ('shape', 'page', 'none'):
+            raise ValueError(f"Unknown invalidation rule '{invalidate}'")
+        self.page = page
+        self.max_cells = max_cells
+        self.invalidate_rule = invalidate
+        self.stats = ShadowStats()
+        self._kw = {} if chunk_size is None else {'chunk_size': chunk_size}
+        self._resolver = CellResolver(page)
+        # (shape_id, src) -> [result IU, formula or None]
+        self._cache = OrderedDict()
+        # (shape_id, src) -> formula, in write order
+        self._pending = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def __len__(self):
+        return len(self._cache)
+
+    def _key(self, shape_id, cell):
+        return shape_id, self._resolver.resolve(shape_id, cell)
+
+    def _store(self, key, value, formula):
+        self._cache[key] = [value, formula]
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cells:
+            self._cache.popitem(last=False)
+            self.stats.evictions += 1
+
+    # -- reading -------------------------------------------------------------
+    def prefetch(self, ids, cells, formulas=True):
+        """Load ``cells`` of all ``ids`` with batched reads.
+
+        With ``formulas=True`` the formulas are read as well (one more
+        batched call), so the shadow knows which cells Visio derives from
+        others and drops them after a commit.
+        """
+        keys = [self._key(sid, cell) for sid in ids for cell in cells]
+        keys = [k for k in keys if k not in self._pending]
+        self._load(keys, formulas)
+
+    def _load(self, keys, formulas=True):
+        """Read ``keys`` into the cache; returns ``{key: result}``."""
+        if not keys:
+            return {}
+        results = read_cells(self.page, keys, resolver=self._resolver,
+                             **self._kw)
+        self.stats.reads += results.calls
+        found = None
+        if formulas:
+            found = read_cells(self.page, keys, formulas=True,
+                               resolver=self._resolver, **self._kw)
+            self.stats.reads += found.calls
+        loaded = {}
+        for i, key in enumerate(keys):
+            if i in results.errors:
+                continue
+            formula = found.values[i] if found is not None else None
+            self._store(key, results.values[i], formula)
+            loaded[key] = results.values[i]
+        return loaded
+
+    @staticmethod
+    def _convert(value, unit):
+        if unit and isinstance(value, float):
+            return units.from_internal(value, unit)
+        return value
+
+    def get(self, shape_id, cell, unit=None):
+        """The result of a cell, from the cache if possible.
+
+        ``unit`` converts numeric results (internal units otherwise).  A
+        cell with a pending non-constant formula commits first, since only
+        Visio can evaluate it.
+        """
+        return self.get_many([(shape_id, cell)], unit)[0]
+
+    def get_many(self, refs, unit=None):
+        """Results of several ``(shape_id, cell)``; misses in one read."""
+        keys = [self._key(sid, cell) for sid, cell in refs]
+        if any(k in self._pending and k not in self._cache for k in keys):
+            self.commit()
+        missing = [k for k in dict.fromkeys(keys) if k not in self._cache]
+        self.stats.misses += len(missing)
+        self.stats.hits += len(keys) - len(missing)
+        loaded = self._load(missing, formulas=False)
+        values = []
+        for (sid, cell), key in zip(refs, keys):
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                value = entry[0]
+            elif key in loaded:
+                value = loaded[key]
+            else:
+                raise KeyError(f"Cannot read {cell} of shape {sid}")
+            values.append(self._convert(value, unit))
+        return values
+
+    # -- writing -------------------------------------------------------------
+    def set(self, shape_id, cell, value, unit=None):
+        """Record a write; nothing is sent before :meth:`commit`.
+
+        ``value`` is a formula (str) or a number in ``unit``.
+        """
+        key = self._key(shape_id, cell)
+        formula = _formula(value, unit)
+        self.stats.writes += 1
+        if key in self._pending:
+            self.stats.coalesced += 1
+            del self._pending[key]
+        self._pending[key] = formula
+        constant = units.parse_constant(formula)
+        if constant is None:
+            self._cache.pop(key, None)
+        else:
+            self._store(key, constant[0], formula)
+
+    @property
+    def pending(self):
+        """Number of cells waiting to be written."""
+        return len(self._pending)
+
+    def commit(self):
+        """Send all pending writes in one batched ``SetFormulas``.
+
+        Returns the BatchResult (``values`` unused); cells that failed are
+        dropped from the cache.
+        """
+        if not self._pending:
+            return BatchResult(0)
+        keys = list(self._pending)
+        edits = [CellEdit(sid, src, formula=formula)
+                 for (sid, src), formula in self._pending.items()]
+        self._pending.clear()
+        result = write_cells(self.page, edits, resolver=self._resolver,
+                             **self._kw)
+        self.stats.commits += 1
+        self.stats.flushed += len(edits)
+        written = set(keys)
+        for i in result.errors:
+            self._cache.pop(keys[i], None)
+            written.discard(keys[i])
+        self._after_commit(written)
+        return result
+
+    flush = commit
+
+    def rollback(self):
+        """Forget all pending writes (and their cached values)."""
+        for key in self._pending:
+            self._cache.pop(key, None)
+        self._pending.clear()
+
+    def _after_commit(self, written):
+        if self.invalidate_rule == 'page':
+            kept = {k: self._cache[k] for k in written if k in self._cache}
+            self._cache.clear()
+            self._cache.update(kept)
+            return
+        shapes = {sid for sid, _ in written} \
+            if self.invalidate_rule == 'shape' else set()
+        for key, (value, formula) in list(self._cache.items()):
+            if key in written:
+                continue
+            derived = formula is None or \
+                units.parse_constant(formula) is None
+            if key[0] in shapes or derived:
+                del self._cache[key]
+
+    def invalidate(self, shape_id=None, cell=None):
+        """Drop cached results: one cell, one shape, or everything."""
+        if shape_id is None:
+            self._cache.clear()
+        elif cell is not None:
+            self._cache.pop(self._key(shape_id, cell), None)
+        else:
+            for key in [k for k in self._cache if k[0] == shape_id]:
+                del self._cache[key]
+
+    def __repr__(self):
+        return (f"<ShadowSheet {len(self._cache)} cached, "
+                f"{len(self._pending)} pending>")
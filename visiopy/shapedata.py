@@ -0,0 +1,326 @@
+"""Export and import the Shape Data (``Prop.*``) of whole documents.
+
+:func:`export_shape_data` collects every Shape Data row of every top level
+shape into a columnar :class:`ShapeData` table (one entry per row, see
+:data:`COLUMNS`), which converts to pandas or CSV.  Edit it there and hand
+it to :func:`import_shape_data`: the table is compared with the current
+values and only the cells that differ are written, in batches.
+
+Both work on a live document (batched ``GetResults``/``SetFormulas``) and
+on a .vsdx file on disk (:mod:`visiopy.vsdx` / :mod:`visiopy.patch`, no
+Visio needed).
+
+Over COM, Visio has no batched way to list row names.  The export costs
+a ``RowCount`` per shape on top of the batched value read; row names are
+read once per master (:class:`~visiopy.batch.RowNames`), and row by row
+only for shapes without a master or with rows of their own.
+``names=False`` skips the row names altogether.  The import addresses rows by their index (column
+``row``) and needs no lookups at all; re-export after adding or deleting
+rows.
+
+Usage:
+------
+    from visiopy.shapedata import ShapeData, export_shape_data, \
+        import_shape_data
+
+    data = export_shape_data(vDoc)            # or a .vsdx path
+    df = data.to_pandas()
+    df.loc[df.name == 'Status', 'value'] = 'checked'
+    import_shape_data(vDoc, ShapeData.from_pandas(df))
+"""
+import csv
+import os
+
+from .batch import BatchResult, CellEdit, PROP_CELLS, RowNames, \
+    read_cells, shape_ids, visSectionProp, write_cells
+
+COLUMNS = ('page', 'shape_id', 'row', 'name', 'label', 'type', 'value',
+           'format')
+# columns that import_shape_data writes back
+EDITABLE = ('label', 'type', 'value', 'format')
+_INT_COLUMNS = ('shape_id', 'row', 'type')
+
+# Shape Data types (visPropType...)
+TYPE_STRING, TYPE_LIST, TYPE_NUMBER, TYPE_BOOL, TYPE_VARLIST, TYPE_DATE, \
+    TYPE_DURATION, TYPE_CURRENCY = range(8)
+
+
+class ShapeData:
+    """Shape Data rows as columns: ``data['value']`` is a list.
+
+    Parameters:
+    ----------
+    - columns : dict, optional
+        ``{column: list}`` for all of :data:`COLUMNS`.
+    """
+
+    def __init__(self, columns=None):
+        self.columns = {c: [] for c in COLUMNS}
+        if columns is not None:
+            for c in COLUMNS:
+                self.columns[c] = list(columns[c])
+
+    def __len__(self):
+        return len(self.columns['shape_id'])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def append(self, page, shape_id, row, name, label, type, value,
+               format):
+        for column, v in zip(COLUMNS, (page, shape_id, row, name, label,
+                                       type, value, format)):
+            self.columns[column].append(v)
+
+    def rows(self):
+        """Iterate over the entries as tuples in :data:`COLUMNS` order."""
+        return zip(*(self.columns[c] for c in COLUMNS))
+
+    def to_pandas(self):
+        import pandas as pd
+        return pd.DataFrame(self.columns, columns=list(COLUMNS))
+
+    @classmethod
+    def from_pandas(cls, df):
+        return cls({c: df[c].tolist() for c in COLUMNS})
+
+    def to_csv(self, path):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(self.rows())
+
+    @classmethod
+    def from_csv(cls, path):
+        data = cls()
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            index = [header.index(c) for c in COLUMNS]
+            for record in reader:
+                data.append(*[record[i] for i in index])
+        for column in _INT_COLUMNS:
+            data.columns[column] = [_int(v) for v in data.columns[column]]
+        return data
+
+    def __repr__(self):
+        return f"<ShapeData {len(self)} rows>"
+
+
+def _int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _text(value):
+    """Normalize a table value for comparison (pandas NaN -> '')."""
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return f"{value:g}"
+    return str(value)
+
+
+def _quote(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def value_formula(text, prop_type):
+    """The formula that stores ``text`` in a row of type ``prop_type``."""
+    if prop_type in (TYPE_NUMBER, TYPE_CURRENCY):
+        try:
+            float(text)
+            return text
+        except ValueError:
+            pass
+    elif prop_type == TYPE_BOOL and text.upper() in ('TRUE', 'FALSE', '1',
+                                                     '0'):
+        return 'TRUE' if text.upper() in ('TRUE', '1') else 'FALSE'
+    elif prop_type == TYPE_DATE and text:
+        return f'DATETIME({_quote(text)})'
+    return _quote(text)
+
+
+def _formula(column, text, prop_type):
+    if column == 'type':
+        return str(_int(text))
+    if column == 'value':
+        return value_formula(text, prop_type)
+    return _quote(text)
+
+
+# -- live documents ----------------------------------------------------------
+def _pages(target):
+    if hasattr(target, 'Pages'):
+        return list(target.Pages)
+    return [target]
+
+
+def _export_page(page, data, names):
+    key = page.NameU
+    ids = shape_ids(page)
+    shapes = page.Shapes
+    row_names = RowNames(page) if names else None
+    rows = []
+    for sid in ids:
+        shape = shapes.ItemFromID(sid)
+        if row_names is None:
+            found = [''] * shape.RowCount(visSectionProp)
+        else:
+            found = row_names.names(shape, sid, visSectionProp)
+        rows.extend((sid, row, name) for row, name in enumerate(found))
+    refs = [(sid, (visSectionProp, row, PROP_CELLS[c]))
+            for sid, row, _ in rows for c in EDITABLE]
+    values = read_cells(page, refs, strings=True).values
+    n = len(EDITABLE)
+    for i, (sid, row, name) in enumerate(rows):
+        label, prop_type, value, fmt = (
+            '' if v is None else v for v in values[i * n:(i + 1) * n])
+        data.append(key, sid, row, name, label, _int(prop_type), value, fmt)
+
+
+def _import_page(page, entries):
+    """Write the changed cells of ``entries`` (rows of one page)."""
+    refs = [(e[1], (visSectionProp, e[2], PROP_CELLS[c]))
+            for e in entries for c in EDITABLE]
+    current = read_cells(page, refs, strings=True)
+    edits = []
+    n = len(EDITABLE)
+    for i, entry in enumerate(entries):
+        prop_type = _int(entry[5])
+        for j, column in enumerate(EDITABLE):
+            k = i * n + j
+            if k in current.errors:
+                continue
+            text = _text(entry[COLUMNS.index(column)])
+            old = current.values[k]
+            if column == 'type':
+                changed = _int(text) != _int(old)
+            else:
+                changed = text != _text(old)
+            if changed:
+                edits.append(CellEdit(entry[1], refs[k][1],
+                                      formula=_formula(column, text,
+                                                       prop_type)))
+    if not edits:
+        return BatchResult(0)
+    return write_cells(page, edits)
+
+
+# -- .vsdx files -------------------------------------------------------------
+def _vsdx_text(cell):
+    if cell is None or cell.value is None:
+        return ''
+    if cell.unit == 'BOOL':
+        return 'TRUE' if cell.result else 'FALSE'
+    return _text(cell.result)
+
+
+def _export_vsdx(path, pages, data):
+    from .vsdx import VsdxFile
+    with VsdxFile(path) as vsdx:
+        for page in vsdx.pages:
+            key = page.name_u or page.name
+            if pages is not None and key not in pages:
+                continue
+            for shape in vsdx.shapes(page.index):
+                section = shape.section('Property')
+                if section is None:
+                    continue
+                for row, r in enumerate(section.rows):
+                    cells = r.cells
+                    data.append(key, shape.id, row, r.name,
+                                _vsdx_text(cells.get('Label')),
+                                _int(_vsdx_text(cells.get('Type'))),
+                                _vsdx_text(cells.get('Value')),
+                                _vsdx_text(cells.get('Format')))
+
+
+def _import_vsdx(path, data, dst):
+    from .patch import patch_vsdx
+    pages = set(data['page'])
+    current = {}
+    for entry in export_shape_data(path, pages).rows():
+        current[(entry[0], entry[1], entry[2])] = entry
+    edits = {}
+    for entry in data.rows():
+        old = current.get((entry[0], entry[1], entry[2]))
+        if old is None:
+            continue
+        for column in EDITABLE:
+            i = COLUMNS.index(column)
+            text = _text(entry[i])
+            if column == 'type':
+                changed = _int(text) != _int(old[i])
+            else:
+                changed = text != _text(old[i])
+            if changed:
+                cell = f"Prop.{old[3]}.{column.title()}"
+                edits.setdefault(entry[0], []).append(CellEdit(
+                    entry[1], cell,
+                    formula=_formula(column, text, _int(entry[5]))))
+    if not edits:
+        return {page: BatchResult(0) for page in pages}
+    results = patch_vsdx(path, dst or path, edits)
+    return {page: results.get(page, BatchResult(0)) for page in pages}
+
+
+# -- public API --------------------------------------------------------------
+def export_shape_data(target, pages=None, names=True):
+    """Read all Shape Data rows into a :class:`ShapeData` table.
+
+    Parameters:
+    ----------
+    - target : Visio Document, Page or str
+        A live document/page, or the path of a .vsdx file.
+    - pages : collection of str, optional
+        Only these pages (by universal name).
+    - names : bool, optional
+        Fill the ``name`` column.  Costs one COM call per row for live
+        documents; not needed for :func:`import_shape_data`.
+
+    Returns:
+    --------
+    - ShapeData with one entry per Shape Data row of every top level shape.
+    """
+    data = ShapeData()
+    if isinstance(target, (str, os.PathLike)):
+        _export_vsdx(target, pages, data)
+        return data
+    for page in _pages(target):
+        if pages is None or page.NameU in pages:
+            _export_page(page, data, names)
+    return data
+
+
+def import_shape_data(target, data, dst=None):
+    """Write the entries of ``data`` that differ from the current values.
+
+    Parameters:
+    ----------
+    - target : Visio Document, Page or str
+        Where ``data`` came from: a live document/page or a .vsdx path.
+    - data : ShapeData
+        Typically an edited result of :func:`export_shape_data`; only the
+        :data:`EDITABLE` columns are written.
+    - dst : str, optional
+        Output path for files; the file is patched in place if omitted.
+
+    Returns:
+    --------
+    - dict mapping each page name to the BatchResult of its write
+      (``len(result.values)`` cells written).
+    """
+    if isinstance(target, (str, os.PathLike)):
+        return _import_vsdx(target, data, dst)
+    by_page = {}
+    for entry in data.rows():
+        by_page.setdefault(entry[0], []).append(entry)
+    results = {}
+    for page in _pages(target):
+        key = page.NameU
+        if key in by_page:
+            results[key] = _import_page(page, by_page[key])
+    return results
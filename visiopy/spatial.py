@@ -0,0 +1,337 @@
+"""Spatial index over the shapes of a page.
+
+Finding the shapes in an area, the shapes that overlap, or the shape
+closest to a point through COM means one ``SpatialRelation`` or a few cell
+reads per shape (pair).  :class:`SpatialIndex` reads the bounding boxes of
+all shapes once (one batched ``GetResults`` call for a live page, no Visio
+at all for a .vsdx file) and answers those questions from a uniform grid.
+
+Bounding boxes are axis aligned and take ``Angle``, ``FlipX`` and
+``FlipY`` into account; they come from the shape transform (PinX, PinY,
+Width, Height, LocPinX, LocPinY), so the line width and text outside the shape are not part of them.  Only top
+level shapes are indexed, like ``Page.Shapes``.
+
+Usage:
+------
+    from visiopy.spatial import SpatialIndex
+
+    index = SpatialIndex.from_page(vPg, unit='mm')
+    index.query(0, 0, 100, 50)        # IDs of shapes touching the rectangle
+    index.hit(42.0, 17.5)             # IDs of shapes under the point
+    index.nearest(42.0, 17.5, k=3)    # [(distance, id), ...]
+    index.overlaps()                  # [(id_a, id_b), ...]
+
+    index.refresh([12, 13])           # after shapes 12 and 13 moved
+"""
+import math
+from collections import defaultdict
+from statistics import median
+
+from . import units
+from .batch import read_cells, shape_ids
+
+TRANSFORM_CELLS = ('PinX', 'PinY', 'Width', 'Height', 'LocPinX', 'LocPinY',
+                   'Angle', 'FlipX', 'FlipY')
+# cells of TRANSFORM_CELLS that are read without a unit
+_UNITLESS = ('Angle', 'FlipX', 'FlipY')
+
+
+def bounding_box(pin_x, pin_y, width, height, loc_pin_x, loc_pin_y,
+                 angle=0.0, flip_x=0, flip_y=0):
+    """Axis aligned ``(xmin, ymin, xmax, ymax)`` of a shape transform.
+
+    Lengths in any (common) unit, ``angle`` in radians.  A flip mirrors
+    the shape about its pin before it is rotated (as in
+    :func:`~visiopy.export.shape_transform`).
+    """
+    left, right = -loc_pin_x, width - loc_pin_x
+    bottom, top = -loc_pin_y, height - loc_pin_y
+    if flip_x:
+        left, right = -right, -left
+    if flip_y:
+        bottom, top = -top, -bottom
+    if not angle:
+        return (pin_x + min(left, right), pin_y + min(bottom, top),
+                pin_x + max(left, right), pin_y + max(bottom, top))
+    cos, sin = math.cos(angle), math.sin(angle)
+    xs = [x * cos - y * sin for x in (left, right) for y in (bottom, top)]
+    ys = [x * sin + y * cos for x in (left, right) for y in (bottom, top)]
+    return (pin_x + min(xs), pin_y + min(ys),
+            pin_x + max(xs), pin_y + max(ys))
+
+
+def _intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _distance(box, x, y):
+    dx = max(box[0] - x, 0.0, x - box[2])
+    dy = max(box[1] - y, 0.0, y - box[3])
+    return math.hypot(dx, dy)
+
+
+def read_boxes(target, ids=None, unit='mm'):
+    """Bounding boxes of a live page or selection with one batched read.
+
+    Returns ``({shape_id: box}, missing)`` where ``missing`` lists the IDs
+    whose cells could not be read (e.g. deleted shapes).
+    """
+    page = target.ContainingPage if hasattr(target, 'GetIDs') else target
+    if ids is None:
+        ids = shape_ids(target)
+    refs = [(sid, cell) for sid in ids for cell in TRANSFORM_CELLS]
+    result = read_cells(page, refs, unit=[None if c in _UNITLESS else unit
+                                          for _, c in refs])
+    n = len(TRANSFORM_CELLS)
+    failed = {refs[i][0] for i in result.errors}
+    boxes = {}
+    for j, sid in enumerate(ids):
+        if sid not in failed:
+            boxes[sid] = bounding_box(*result.values[j * n:(j + 1) * n])
+    return boxes, [sid for sid in ids if sid in failed]
+
+
+def vsdx_boxes(vsdx, page=0, unit='mm'):
+    """Bounding boxes of the top level shapes of a .vsdx page."""
+    boxes = {}
+    for shape in vsdx.shapes(page):
+        values = []
+        for name in TRANSFORM_CELLS:
+            cell = shape.cell(name)
+            value = cell.result if cell is not None else None
+            if not isinstance(value, float):
+                value = 0.0
+            values.append(value if name in _UNITLESS else
+                          units.from_internal(value, unit))
+        boxes[shape.id] = bounding_box(*values)
+    return boxes
+
+
+def _ring(ci, cj, ring):
+    """Grid cells at Chebyshev distance ``ring`` from ``(ci, cj)``."""
+    if ring == 0:
+        return [(ci, cj)]
+    cells = []
+    for i in range(ci - ring, ci + ring + 1):
+        cells.append((i, cj - ring))
+        cells.append((i, cj + ring))
+    for j in range(cj - ring + 1, cj + ring):
+        cells.append((ci - ring, j))
+        cells.append((ci + ring, j))
+    return cells
+
+
+class SpatialIndex:
+    """Uniform grid over shape bounding boxes.
+
+    Every box is registered in all grid cells it touches, so a query only
+    looks at the shapes in the grid cells it covers.  Adding, moving and
+    removing a shape only touches the grid cells of that shape.
+
+    Parameters:
+    ----------
+    - boxes : dict
+        ``{shape_id: (xmin, ymin, xmax, ymax)}``
+    - cell_size : float, optional
+        Edge length of a grid cell; defaults to twice the median shape
+        size.
+    - source : Visio Page or Selection, optional
+        Where :meth:`refresh` reads updated boxes from.
+    - unit : str
+        Unit of the boxes (and of all query coordinates).
+    """
+
+    def __init__(self, boxes, cell_size=None, source=None, unit='mm'):
+        if cell_size is None:
+            sizes = [max(b[2] - b[0], b[3] - b[1]) for b in boxes.values()]
+            sizes = [s for s in sizes if s > 0]
+            cell_size = 2 * median(sizes) if sizes else 1.0
+        self.cell_size = float(cell_size)
+        self.source = source
+        self.unit = unit
+        self.boxes = {}
+        self._grid = defaultdict(set)
+        for shape_id, box in boxes.items():
+            self.update(shape_id, box)
+
+    @classmethod
+    def from_page(cls, target, cell_size=None, unit='mm'):
+        """Index a live page or selection (one batched cell read)."""
+        boxes, _ = read_boxes(target, unit=unit)
+        return cls(boxes, cell_size, source=target, unit=unit)
+
+    @classmethod
+    def from_vsdx(cls, vsdx, page=0, cell_size=None, unit='mm'):
+        """Index a page of a :class:`~visiopy.vsdx.VsdxFile`."""
+        return cls(vsdx_boxes(vsdx, page, unit), cell_size, unit=unit)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __contains__(self, shape_id):
+        return shape_id in self.boxes
+
+    def _cells(self, box):
+        size = self.cell_size
+        x0, x1 = math.floor(box[0] / size), math.floor(box[2] / size)
+        y0, y1 = math.floor(box[1] / size), math.floor(box[3] / size)
+        return [(i, j) for i in range(x0, x1 + 1) for j in range(y0, y1 + 1)]
+
+    # -- maintenance ---------------------------------------------------------
+    def update(self, shape_id, box):
+        """Add a shape or move it to ``box``."""
+        box = tuple(float(v) for v in box)
+        old = self.boxes.get(shape_id)
+        if old == box:
+            return
+        old_cells = set(self._cells(old)) if old is not None else set()
+        new_cells = set(self._cells(box))
+        for cell in old_cells - new_cells:
+            self._grid[cell].discard(shape_id)
+            if not self._grid[cell]:
+                del self._grid[cell]
+        for cell in new_cells - old_cells:
+            self._grid[cell].add(shape_id)
+        self.boxes[shape_id] = box
+
+    def remove(self, shape_id):
+        """Drop a shape (no error if it is not indexed)."""
+        box = self.boxes.pop(shape_id, None)
+        if box is None:
+            return
+        for cell in self._cells(box):
+            self._grid[cell].discard(shape_id)
+            if not self._grid[cell]:
+                del self._grid[cell]
+
+    def refresh(self, ids=None):
+        """Re-read boxes from the live ``source`` and update the index.
+
+        With ``ids`` only those shapes are read (one batched call); shapes
+        that no longer exist are removed.  Without ``ids`` the whole page
+        is read again, new shapes are added and deleted ones dropped, but
+        only the shapes that actually changed touch the grid.
+
+        Returns the number of shapes that were added, moved or removed.
+        """
+        if self.source is None:
+            raise ValueError("This index has no live source to refresh from")
+        # one GetIDs call tells which shapes still exist, so deleted shapes
+        # do not make the batched read fail
+        current = shape_ids(self.source)
+        existing = set(current)
+        if ids is None:
+            ids, gone = current, set(self.boxes) - existing
+        else:
+            gone = {i for i in ids if i not in existing}
+            ids = [i for i in ids if i in existing]
+        boxes, missing = read_boxes(self.source, ids, self.unit)
+        gone.update(missing)
+        changed = 0
+        for shape_id, box in boxes.items():
+            if self.boxes.get(shape_id) != box:
+                self.update(shape_id, box)
+                changed += 1
+        for shape_id in gone:
+            if shape_id in self.boxes:
+                self.remove(shape_id)
+                changed += 1
+        return changed
+
+    # -- queries -------------------------------------------------------------
+    def _candidates(self, box):
+        size = self.cell_size
+        x0, x1 = math.floor(box[0] / size), math.floor(box[2] / size)
+        y0, y1 = math.floor(box[1] / size), math.floor(box[3] / size)
+        found = set()
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._grid):
+            # large area: walk the occupied grid cells instead
+            for (i, j), members in self._grid.items():
+                if x0 <= i <= x1 and y0 <= j <= y1:
+                    found |= members
+            return found
+        for cell in self._cells(box):
+            found |= self._grid.get(cell, set())
+        return found
+
+    def query(self, xmin, ymin, xmax, ymax, contained=False):
+        """IDs of the shapes touching the rectangle (sorted).
+
+        With ``contained=True`` only shapes that lie completely inside.
+        """
+        rect = (xmin, ymin, xmax, ymax)
+        found = []
+        for shape_id in self._candidates(rect):
+            box = self.boxes[shape_id]
+            if contained:
+                ok = xmin <= box[0] and box[2] <= xmax and \
+                    ymin <= box[1] and box[3] <= ymax
+            else:
+                ok = _intersects(box, rect)
+            if ok:
+                found.append(shape_id)
+        return sorted(found)
+
+    def hit(self, x, y, tolerance=0.0):
+        """IDs of the shapes whose box contains the point (sorted)."""
+        return self.query(x - tolerance, y - tolerance, x + tolerance,
+                          y + tolerance)
+
+    def nearest(self, x, y, k=1):
+        """The ``k`` shapes closest to the point as ``[(distance, id)]``.
+
+        The distance is 0 for shapes whose box contains the point.  Grid
+        rings around the point are searched outwards until no unvisited
+        shape can be closer than the ``k``-th one found.  Once the rings
+        would cover more grid cells than there are shapes (a point far
+        away from the drawing, a sparse page), the remaining boxes are
+        scanned instead.
+        """
+        if not self.boxes:
+            return []
+        size = self.cell_size
+        ci, cj = math.floor(x / size), math.floor(y / size)
+        seen, found = set(), []
+        ring = walked = 0
+        while len(seen) < len(self.boxes):
+            walked += 8 * ring or 1
+            if walked > len(self.boxes):
+                found.extend((_distance(box, x, y), shape_id)
+                             for shape_id, box in self.boxes.items()
+                             if shape_id not in seen)
+                break
+            for cell in _ring(ci, cj, ring):
+                for shape_id in self._grid.get(cell, ()):
+                    if shape_id not in seen:
+                        seen.add(shape_id)
+                        found.append((_distance(self.boxes[shape_id], x, y),
+                                      shape_id))
+            # anything not seen yet is at least `ring` cells away
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= ring * size:
+                    break
+            ring += 1
+        found.sort()
+        return found[:k]
+
+    def overlaps(self):
+        """All pairs ``(id_a, id_b)`` with ``id_a < id_b`` whose boxes
+        intersect (sorted)."""
+        pairs = set()
+        for members in self._grid.values():
+            if len(members) < 2:
+                continue
+            members = sorted(members)
+            for n, a in enumerate(members):
+                box_a = self.boxes[a]
+                for b in members[n + 1:]:
+                    if (a, b) not in pairs and \
+                            _intersects(box_a, self.boxes[b]):
+                        pairs.add((a, b))
+        return sorted(pairs)
+
+    def __repr__(self):
+        return (f"<SpatialIndex {len(self.boxes)} shapes, "
+                f"{len(self._grid)} grid cells of {self.cell_size:g} "
+                f"{self.unit}>")
@@ -0,0 +1,121 @@
+"""Unit conversion between Visio internal units and common display units.
+
+Visio stores lengths in inches and angles in radians internally ("IU").
+The names accepted here are the ones used in formulas (``'mm'``) as well as
+the upper-case codes of the ``U`` attribute in .vsdx files (``'MM'``).
+"""
+import math
+
+# how many of each unit make up one internal unit (inch / radian); dividing
+# by these keeps round trips like 25.4 mm -> 1 in exact
+_PER_INTERNAL = {
+    'in': 1.0,
+    'inch': 1.0,
+    'iu': 1.0,
+    'mm': 25.4,
+    'cm': 2.54,
+    'm': 0.0254,
+    'ft': 1 / 12.0,
+    'pt': 72.0,
+    'deg': 180.0 / math.pi,
+    'rad': 1.0,
+}
+
+# Visio unit code (visNoCast) that asks for internal units
+NO_CAST = 252
+
+# .vsdx unit codes that are plain aliases of the names above
+_ALIASES = {
+    'dl': 'in',   # drawing length, internal units
+    'da': 'rad',  # drawing angle
+    'pt': 'pt',
+    'inches': 'in',
+    'millimeters': 'mm',
+    'centimeters': 'cm',
+    'meters': 'm',
+    'degrees': 'deg',
+    'radians': 'rad',
+}
+
+
+def _per_internal(unit):
+    if not unit or unit == NO_CAST:
+        return 1.0
+    name = str(unit).strip().lower()
+    name = _ALIASES.get(name, name)
+    try:
+        return _PER_INTERNAL[name]
+    except KeyError:
+        raise ValueError(f"Unknown unit: {unit!r}")
+
+
+def factor(unit):
+    """Return the factor that converts ``unit`` into internal units.
+
+    ``None`` and ``''`` mean internal units already.
+    """
+    return 1.0 / _per_internal(unit)
+
+
+def is_unit(unit):
+    try:
+        _per_internal(unit)
+    except ValueError:
+        return False
+    return True
+
+
+def to_internal(value, unit):
+    """Convert ``value`` given in ``unit`` into internal units."""
+    return value / _per_internal(unit)
+
+
+def from_internal(value, unit):
+    """Convert ``value`` from internal units into ``unit``."""
+    return value * _per_internal(unit)
+
+
+def parse_quantity(text):
+    """Parse a constant like ``'150 mm'``, ``'2.5mm'`` or ``'3'``.
+
+    Returns ``(value, unit)`` with ``unit`` being ``None`` for bare numbers,
+    or ``None`` if ``text`` is not such a constant.
+    """
+    text = str(text).strip()
+    if text.startswith('='):
+        text = text[1:].strip()
+    i = len(text)
+    while i and not (text[i - 1].isdigit() or text[i - 1] == '.'):
+        i -= 1
+    number, unit = text[:i].strip(), text[i:].strip()
+    try:
+        value = float(number)
+    except ValueError:
+        return None
+    if not unit:
+        return value, None
+    if not is_unit(unit):
+        return None
+    return value, unit.lower()
+
+
+def parse_constant(formula):
+    """Evaluate a constant formula the way Visio stores its result.
+
+    Returns ``(value, unit)`` where ``value`` is in internal units and
+    ``unit`` is the .vsdx unit code (``'MM'``, ``'STR'``, ``'BOOL'`` or
+    ``None`` for plain numbers), or ``None`` if ``formula`` is not a
+    constant (references, functions, arithmetic).
+    """
+    text = str(formula).strip()
+    if text.startswith('='):
+        text = text[1:].strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        return text[1:-1].replace('""', '"'), 'STR'
+    if text.upper() in ('TRUE', 'FALSE'):
+        return (1.0 if text.upper() == 'TRUE' else 0.0), 'BOOL'
+    quantity = parse_quantity(text)
+    if quantity is None:
+        return None
+    value, unit = quantity
+    return to_internal(value, unit), unit.upper() if unit else None
@@ -1,18 +1,34 @@
-import win32com.client
-import pythoncom
 import os
-import tkinter as tk
-from tkinter import filedialog, messagebox
-from pathlib import Path
+import time
+
+# win32com/pythoncom (COM backend) and tkinter (dialogs) are imported inside
+# the functions that need them, so that `import visiopy` stays fast and works
+# on machines without pywin32 or Tk (e.g. for the offline .vsdx tools).
 
 c = []  # to hold Visio constants
 
 
+_visio_clsids = None
+_registry = None
+_application = None   # replaces Visio.Application, see use_backend()
+
+# Common CLSID for unsaved documents
+CLSID_UNSAVED = "{00021A20-0000-0000-C000-000000000046}"
+VISIO_EXTENSIONS = ('.vsdx', '.vsdm', '.vstx', '.vstm')
+
+
 def get_visio_clsids():
     """
     Retrieve the CLSIDs for the installed Visio application.
+
+    The type library is only inspected on the first call; the result is
+    cached for the lifetime of the process.
     """
+    global _visio_clsids
+    if _visio_clsids is not None:
+        return _visio_clsids
     try:
+        import win32com.client
         visio_app = win32com.client.Dispatch("Visio.Application")
         lib_attr = (
             visio_app._oleobj_.GetTypeInfo()
@@ -21,15 +37,215 @@ def get_visio_clsids():
         )
         # lib_attr[0] enthält die GUID ohne geschweifte Klammern
         clsid_main = f"{{{lib_attr[0]}}}"
-        # Common CLSID for unsaved documents
-        clsid_unsaved = "{00021A20-0000-0000-C000-000000000046}"
-        clsids = [clsid_main, clsid_unsaved]
+        clsids = [clsid_main, CLSID_UNSAVED]
+        _visio_clsids = clsids
         return clsids
     except Exception as e:
         raise Exception(f"Error retrieving Visio CLSIDs: {e}")
 
 
-def vDocs(index=None, silent=False):
+class ComRunningObjectTable:
+    """Access to the Windows Running Object Table through pythoncom.
+
+    Any object with the same two methods can be passed to
+    :class:`DocumentRegistry`, e.g. ``visiopy.fakes.FakeRunningObjectTable``.
+    """
+
+    def __init__(self):
+        self._context = None
+
+    def entries(self):
+        """Return ``[(display_name, moniker), ...]`` without binding."""
+        import pythoncom
+        if self._context is None:
+            self._context = pythoncom.CreateBindCtx(0)
+        entries = []
+        for moniker in pythoncom.GetRunningObjectTable():
+            try:
+                entries.append(
+                    (moniker.GetDisplayName(self._context, None), moniker))
+            except Exception as e:
+                print(f"Error retrieving display name for document: {e}")
+        return entries
+
+    def bind(self, moniker):
+        """Bind a moniker and return the document's dispatch object."""
+        import pythoncom
+        import win32com.client
+        obj = moniker.BindToObject(self._context, None,
+                                   pythoncom.IID_IDispatch)
+        return win32com.client.Dispatch(
+            obj.QueryInterface(pythoncom.IID_IDispatch))
+
+
+class DocumentRegistry:
+    """Cache of the open Visio documents, indexed by path and file name.
+
+    A refresh reads the display names of the Running Object Table and
+    checks each cached document with one ``FullName`` call; monikers are
+    bound (the expensive part) only for names that were not seen before,
+    that failed to bind, or whose document went away.  Within ``ttl``
+    seconds of the last refresh the cached state is used without touching
+    the ROT at all.
+
+    Parameters:
+    ----------
+    - rot : object, optional
+        ROT access with ``entries()`` and ``bind(moniker)``; defaults to
+        :class:`ComRunningObjectTable`.
+    - clsids : list of str, optional
+        Visio CLSIDs to recognize documents by; defaults to
+        :func:`get_visio_clsids` (evaluated once).
+    - ttl : float, optional
+        Seconds during which the cached state is trusted.
+    """
+
+    def __init__(self, rot=None, clsids=None, ttl=2.0):
+        self.rot = rot if rot is not None else ComRunningObjectTable()
+        self.clsids = clsids
+        self.ttl = ttl
+        self.binds = 0
+        self._checked = None
+        self._names = []         # ROT order of the Visio entries
+        self._docs = {}          # display name -> document (None: unbound)
+        self._by_path = {}
+        self._by_name = {}
+        self.unsaved = []
+
+    def _is_visio(self, name):
+        if name.lower().endswith(VISIO_EXTENSIONS):
+            return True
+        if self.clsids is None:
+            self.clsids = get_visio_clsids()
+        return any(clsid in name for clsid in self.clsids)
+
+    def invalidate(self):
+        """Make the next lookup re-read the ROT."""
+        self._checked = None
+
+    def refresh(self, force=False):
+        """Revalidate against the ROT.
+
+        Documents already bound are checked with one ``FullName`` call;
+        new entries, entries that failed to bind before and documents that
+        no longer answer (closed and reopened under the same display name)
+        are bound again.  ``force`` re-binds every entry.
+        """
+        now = time.monotonic()
+        if (not force and self._checked is not None and
+                now - self._checked < self.ttl):
+            return
+        entries = [(name, moniker) for name, moniker in self.rot.entries()
+                   if self._is_visio(name)]
+        docs, full_names, unsaved = {}, {}, []
+        for name, moniker in entries:
+            doc = None if force else self._docs.get(name)
+            full_name = _full_name(doc) if doc is not None else None
+            if full_name is None:
+                try:
+                    self.binds += 1
+                    doc = self.rot.bind(moniker)
+                except Exception as e:
+                    doc = None
+                    if CLSID_UNSAVED in name:
+                        unsaved.append(name)
+                    elif self._docs.get(name, False) is not None:
+                        print(f"Error processing document '{name}': {e}")
+                else:
+                    full_name = _full_name(doc)
+            docs[name], full_names[name] = doc, full_name
+        self._names = [name for name, _ in entries]
+        self._docs, self.unsaved = docs, unsaved
+        self._reindex(full_names)
+        self._checked = now
+
+    def _reindex(self, full_names):
+        self._by_path, self._by_name = {}, {}
+        for name in self._names:
+            if self._docs[name] is None:
+                continue
+            paths = {_normalize_path(name)}
+            if full_names[name] is not None:
+                paths.add(_normalize_path(full_names[name]))
+            for path in paths:
+                self._by_path.setdefault(path, self._docs[name])
+                self._by_name.setdefault(
+                    os.path.basename(path).lower(), self._docs[name])
+
+    def documents(self):
+        """Return the open documents in ROT order."""
+        self.refresh()
+        return [self._docs[n] for n in self._names
+                if self._docs[n] is not None]
+
+    def find(self, path, by_name=True):
+        """Return the open document for ``path`` or ``None``.
+
+        Matches the normalized full path first and, with ``by_name``, falls
+        back to the file name (documents opened via another drive mapping).
+        """
+        self.refresh()
+        norm = _normalize_path(path)
+        doc = self._by_path.get(norm)
+        if doc is None and by_name:
+            doc = self._by_name.get(os.path.basename(norm).lower())
+        return doc
+
+
+def _full_name(doc):
+    """Return ``doc.FullName`` or ``None`` once the document is gone."""
+    try:
+        return doc.FullName
+    except Exception:
+        return None
+
+
+def document_registry():
+    """Return the process wide :class:`DocumentRegistry`."""
+    global _registry
+    if _registry is None:
+        _registry = DocumentRegistry()
+    return _registry
+
+
+def use_backend(app=None, rot=None, ttl=2.0):
+    """Point vDocs, vInit and get_or_open_visio_file at another object model.
+
+    Tests and benchmarks pass a ``visiopy.fakes.FakeApplication`` and its
+    ``FakeRunningObjectTable`` so the functions run without Visio;
+    ``use_backend()`` without arguments goes back to COM.
+
+    Parameters:
+    ----------
+    - app : object, optional
+        Used instead of ``Dispatch("Visio.Application")``.
+    - rot : object, optional
+        ROT for a fresh process wide :class:`DocumentRegistry`.
+    - ttl : float, optional
+        ``ttl`` of that registry.
+    """
+    global _application, _registry
+    _application = app
+    _registry = None if rot is None else \
+        DocumentRegistry(rot, clsids=[], ttl=ttl)
+
+
+def visio_application():
+    """``Visio.Application`` (or the application set with use_backend)."""
+    if _application is not None:
+        return _application
+    import win32com.client
+    return win32com.client.Dispatch("Visio.Application")
+
+
+def _constants():
+    if _application is not None:
+        return c
+    import win32com.client
+    return win32com.client.constants
+
+
+def vDocs(index=None, silent=False, refresh=False):
     """
         Prints the list of all open Visio drawings in all Visio instances and
         returns the list of the document objects.
@@ -37,37 +253,20 @@ def vDocs(index=None, silent=False):
         Parameter:
     - index: integer, optional makes the function return the document
             with this index.
+    - refresh: bool, optional re-reads the Running Object Table even if
+            the cached list is still fresh (see DocumentRegistry).
     """
     global c
 
-    visio_clsids = get_visio_clsids()
-    context = pythoncom.CreateBindCtx(0)
-    rot = pythoncom.GetRunningObjectTable()
-    docs = []
-
-    for moniker in rot:
-        try:
-            name = moniker.GetDisplayName(context, None)
-            # print(f"Processing moniker: {name}")  # Debugging statement
-            if (any(clsid in name for clsid in visio_clsids) or
-                    name.endswith(('.vsdx', '.vsdm', '.vstx', '.vstm'))):
-                try:
-                    visio_doc = moniker.BindToObject(
-                        context, None, pythoncom.IID_IDispatch)
-                    visio_doc = win32com.client.Dispatch(
-                        visio_doc.QueryInterface(pythoncom.IID_IDispatch))
-                    docs.append(visio_doc)
-                    c = win32com.client.constants
-                except Exception as e:
-                    if "{00021A20-0000-0000-C000-000000000046}" in name:
-                        if not silent:
-                            print(
-                                f"Unsaved document encountered: {name}. "
-                                "Please save the document.")
-                    else:
-                        print(f"Error processing document '{name}': {e}")
-        except Exception as e:
-            print(f"Error retrieving display name for document: {e}")
+    registry = document_registry()
+    registry.refresh(force=refresh)
+    docs = registry.documents()
+    if docs:
+        c = _constants()
+    if not silent:
+        for name in registry.unsaved:
+            print(f"Unsaved document encountered: {name}. "
+                  "Please save the document.")
 
     if index is not None:
         if 0 <= index < len(docs):
@@ -85,7 +284,7 @@ def vDocs(index=None, silent=False):
 
 
 def vInit(index=None, filename=None, new=False, template=None,
-          g=None, suffix=None):
+          g=None, suffix=None, profile=False):
     """
     Initializes the Visio application and sets global variables for vApp,
     vDoc, vPg, and vWin.
@@ -113,6 +312,9 @@ def vInit(index=None, filename=None, new=False, template=None,
     - g : dict, optional
     Pass `globals()` to automatically instantiate the global variables
     (vApp, vDoc, vPg, vWin, and Visio constants).
+    - profile : bool, optional
+    Hand out vApp, vDoc, vPg and vWin behind recording proxies that count
+    and time every COM call; see `visiopy.profiler.PROFILER.report()`.
 
     Returns:
     --------
@@ -182,9 +384,15 @@ def vInit(index=None, filename=None, new=False, template=None,
         return
 
     app = doc.Application
-    page = list(doc.Pages)[0]
+    page = doc.Pages.Item(1)
     window = app.ActiveWindow
 
+    if profile:
+        from .profiler import PROFILER
+        PROFILER.enable()
+        app, doc, page, window = (PROFILER.wrap(o)
+                                  for o in (app, doc, page, window))
+
     if not suffix:
         suffix = ''
 
@@ -193,7 +401,7 @@ def vInit(index=None, filename=None, new=False, template=None,
         g[f'vDoc{suffix}'] = doc
         g[f'vPg{suffix}'] = page
         g[f'vWin{suffix}'] = window
-        g['c'] = win32com.client.constants
+        g['c'] = _constants()
         msg = (
             f"Instantiated the variables vApp{suffix}, vDoc{suffix}, "
             f"vPg{suffix} and vWin{suffix} for the document {doc.Name},\n"
@@ -211,6 +419,9 @@ def ask_for_visio_file(
     """
     Opens a file dialog and returns the selected Visio file.
     """
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()  # Hide the main tkinter window
     file_path = filedialog.askopenfilename(title=title, filetypes=filetypes)
@@ -236,8 +447,8 @@ def _normalize_path(p):
     if not p:
         return ''
     try:
-        # Normcase + normpath for Windows; Path to collapse redundant parts
-        return os.path.normcase(os.path.normpath(str(Path(p))))
+        # Normcase + normpath for Windows (normpath collapses redundant parts)
+        return os.path.normcase(os.path.normpath(os.fspath(p)))
     except Exception:
         return str(p).lower()
 
@@ -253,28 +464,21 @@ def get_or_open_visio_file(filename):
     - Spezielle Behandlung von Template-Dateien (*.vstx, *.vstm): Wenn exakt
       geöffnet -> wiederverwenden; sonst normales Öffnen (kein Add, weil der
       Nutzer offenbar die Template-Datei selbst bearbeiten möchte)
+    - Nachschlagen über den Index des DocumentRegistry (dict) statt eines
+      vollständigen ROT-Scans mit BindToObject bei jedem Aufruf; ein Treffer
+      wird mit einem FullName-Aufruf geprüft, ein inzwischen geschlossenes
+      Dokument erzwingt einen neuen Scan
     """
     if not filename:
         return None
 
-    requested_norm = _normalize_path(filename)
-    requested_name = os.path.basename(requested_norm)
-
-    docs = vDocs(silent=True)
-    candidate_by_name = None
-    for doc in docs:
-        try:
-            full_norm = _normalize_path(doc.FullName)
-            if full_norm == requested_norm:
-                return doc  # exakter Pfad-Treffer
-            if os.path.basename(full_norm).lower() == requested_name.lower():
-                # Potentieller Kandidat (Pfad evtl. nur anders gemappt)
-                candidate_by_name = candidate_by_name or doc
-        except Exception:
-            continue
-
-    if candidate_by_name:
-        return candidate_by_name
+    doc = document_registry().find(filename)
+    if doc is None or _full_name(doc) is None:
+        # opened or closed since the last refresh
+        document_registry().refresh(force=True)
+        doc = document_registry().find(filename)
+    if doc is not None:
+        return doc
 
     # Nicht gefunden -> öffnen
     return open_visio_file(filename)
@@ -295,26 +499,24 @@ def open_visio_file(file_path=None):
     if not file_path:
         raise ValueError("No file selected.")
 
-    visio = win32com.client.Dispatch("Visio.Application")
+    visio = visio_application()
     try:
-        return visio.Documents.Open(file_path)
+        doc = visio.Documents.Open(file_path)
+        document_registry().invalidate()
+        return doc
     except Exception as e:
         msg = str(e)
         # Falls Datei schon offen oder Pfad leicht anders -> Matching versuchen
-        docs = vDocs(silent=True)
-        target_name = os.path.basename(_normalize_path(file_path)).lower()
-        for doc in docs:
-            try:
-                if (os.path.basename(_normalize_path(doc.FullName))
-                        .lower() == target_name):
-                    # Bestehende Instanz wird wiederverwendet
-                    print(
-                        "Hinweis: Verwende bereits geöffnetes Dokument "
-                        f"'{doc.FullName}' (Öffnen schlug fehl: {msg})"
-                    )
-                    return doc
-            except Exception:
-                continue
+        registry = document_registry()
+        registry.refresh(force=True)
+        doc = registry.find(file_path)
+        if doc is not None:
+            # Bestehende Instanz wird wiederverwendet
+            print(
+                "Hinweis: Verwende bereits geöffnetes Dokument "
+                f"'{doc.FullName}' (Öffnen schlug fehl: {msg})"
+            )
+            return doc
         raise Exception(f"Error opening file '{file_path}': {msg}")
 
 
@@ -322,19 +524,39 @@ def create_new_document(template=None):
     """
     Create a new Visio document.
     """
-    visio = win32com.client.Dispatch("Visio.Application")
+    visio = visio_application()
     if template:
         print('create_new_document', template)
         doc = visio.Documents.Add(template)
     else:
         doc = visio.Documents.Add("")
+    document_registry().invalidate()
     return doc
 
 
-def document_manager():
-    '''Function to open a tkinter form and return a result'''
+def list_documents(registry=None):
+    """Return ``[(Name, FullName), ...]`` of the open Visio documents.
+
+    Plain strings, so the list can be built on a
+    :class:`visiopy.worker.ComWorker` and used on any thread.
+    """
+    registry = registry if registry is not None else document_registry()
+    return [(doc.Name, doc.FullName) for doc in registry.documents()]
+
+
+def document_manager(worker=None):
+    '''Function to open a tkinter form and return a result
+
+    The list of open documents is read on a ComWorker thread (``worker``,
+    or a private one) and filled in when it arrives, so the form shows up
+    at once even if binding the documents takes a while.
+    '''
+    import tkinter as tk
+    from tkinter import messagebox
+    from .worker import ComWorker
+
     result = {}  # A dictionary to hold return values
-    docs = []
+    docs = []  # (Name, FullName) once loaded
     root = tk.Tk()
     root.title("Document Manager")
     root.geometry("400x400")
@@ -343,9 +565,12 @@ def document_manager():
     def open_selected_doc():
         selected_doc_name = doc_listbox.get(tk.ACTIVE)
         selected_doc = None
-        for doc in docs:
-            if selected_doc_name == doc.Name:
-                selected_doc = doc
+        for name, full_name in docs:
+            if selected_doc_name == name:
+                # bind again on this thread, the worker's objects belong to
+                # its apartment
+                selected_doc = document_registry().find(full_name,
+                                                        by_name=False)
                 break
         if selected_doc:
             result['doc'] = selected_doc
@@ -393,10 +618,29 @@ def document_manager():
     scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
     doc_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-    # Populate the listbox with documents
-    docs = vDocs(silent=True)
-    for doc in docs:
-        doc_listbox.insert(tk.END, doc.Name)
+    # Populate the listbox with documents as soon as the worker has them;
+    # the worker gets its own registry so no object bound there ends up in
+    # the one used on this thread
+    own_worker = worker is None
+    if own_worker:
+        worker = ComWorker()
+    loading = worker.submit(list_documents, DocumentRegistry())
+    doc_listbox.insert(tk.END, "Loading ...")
+
+    def fill_list():
+        if not loading.done():
+            root.after(50, fill_list)
+            return
+        doc_listbox.delete(0, tk.END)
+        try:
+            docs.extend(loading.result())
+        except Exception as e:
+            doc_listbox.insert(tk.END, f"Error listing documents: {e}")
+            return
+        for name, _ in docs:
+            doc_listbox.insert(tk.END, name)
+
+    root.after(50, fill_list)
 
     # Create a frame for buttons to organize them in a grid
     button_frame = tk.Frame(root)
@@ -420,5 +664,8 @@ def document_manager():
     tk.Button(root, text="Close", command=close_form).pack(pady=10)
 
     root.mainloop()
+    loading.cancel()
+    if own_worker:
+        worker.shutdown(wait=False)
     root.destroy()
     return result
@@ -0,0 +1,550 @@
+"""Read .vsdx/.vsdm/.vstx/.vstm packages without Visio.
+
+A .vsdx file is an OPC (zip) package; each page lives in its own XML part.
+:class:`VsdxFile` reads the small index parts (pages, masters) up front and
+parses page parts lazily with ``iterparse``, yielding one shape at a time and
+discarding the XML behind it, so memory stays flat for very large pages.
+Nothing here needs Windows, Visio or pywin32.
+
+Cells inherited from a master are merged into the shapes like Visio does, so
+``shape.cells['Width'].result`` is what ``Cells('Width').ResultIU`` returns
+over COM.  Inheritance from styles (line/fill/text defaults) is not resolved.
+
+Usage:
+------
+    from visiopy.vsdx import VsdxFile
+
+    with VsdxFile(r'C:/path/to/drawing.vsdx') as vsdx:
+        for page in vsdx.pages:
+            for shp in vsdx.iter_shapes(page):
+                print(shp.id, shp.name, shp.cell('PinX').result,
+                      {k: r.value for k, r in shp.props.items()})
+"""
+import posixpath
+import zipfile
+from collections import namedtuple
+from xml.etree import ElementTree as ET
+
+from . import units
+
+NS = 'http://schemas.microsoft.com/office/visio/2012/main'
+NS_R = ('http://schemas.openxmlformats.org/officeDocument/2006/'
+        'relationships')
+NS_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+_T = '{%s}' % NS
+SHAPE, SHAPES, CELL, ROW, SECTION, TEXT = (
+    _T + 'Shape', _T + 'Shapes', _T + 'Cell', _T + 'Row', _T + 'Section',
+    _T + 'Text')
+CONNECT = _T + 'Connect'
+_RID = '{%s}id' % NS_R
+
+Connect = namedtuple('Connect', 'from_sheet from_cell to_sheet to_cell')
+
+
+class Cell:
+    """A ShapeSheet cell as stored in the package.
+
+    ``value`` is the raw ``V`` attribute (internal units for numbers),
+    ``unit`` the ``U`` attribute and ``formula_attr`` the ``F`` attribute.
+    """
+    __slots__ = ('name', 'value', 'unit', 'formula_attr')
+
+    def __init__(self, name, value=None, unit=None, formula_attr=None):
+        self.name = name
+        self.value = value
+        self.unit = unit
+        self.formula_attr = formula_attr
+
+    @property
+    def result(self):
+        """The result in internal units, like ``Cell.ResultIU``.
+
+        Strings (Shape Data text, ``U="STR"``) are returned unchanged.
+        """
+        if self.value is None:
+            return None
+        if self.unit == 'STR':
+            return self.value
+        try:
+            return float(self.value)
+        except ValueError:
+            return self.value
+
+    def result_in(self, unit):
+        """The result converted into ``unit``, like ``Cell.Result(unit)``."""
+        value = self.result
+        if isinstance(value, float):
+            return units.from_internal(value, unit)
+        return value
+
+    @property
+    def formula(self):
+        """The formula, rebuilt from value and unit if none is stored."""
+        if self.formula_attr not in (None, 'Inh'):
+            return self.formula_attr
+        if self.value is None:
+            return None
+        if self.unit == 'STR':
+            return '"' + self.value.replace('"', '""') + '"'
+        if self.unit and units.is_unit(self.unit) and \
+                units.factor(self.unit) != 1.0:
+            value = units.from_internal(float(self.value), self.unit)
+            return f"{value:g} {self.unit.lower()}"
+        return self.value
+
+    def __repr__(self):
+        return f"<Cell {self.name}={self.value!r}>"
+
+
+class Row:
+    """A section row; ``name`` is ``None`` for indexed rows (Geometry)."""
+    __slots__ = ('name', 'index', 'type', 'cells')
+
+    def __init__(self, name=None, index=None, type=None, cells=None):
+        self.name = name
+        self.index = index
+        self.type = type
+        self.cells = cells if cells is not None else {}
+
+    @property
+    def value(self):
+        """Result of the ``Value`` cell (Shape Data and User rows)."""
+        cell = self.cells.get('Value')
+        return cell.result if cell is not None else None
+
+    def __repr__(self):
+        return f"<Row {self.name or self.index} {self.type or ''}>".strip()
+
+
+class Section:
+    """A section; ``cells`` holds section-level cells such as the
+    ``NoFill``/``NoLine``/``NoShow`` cells of a Geometry section."""
+    __slots__ = ('name', 'index', 'rows', 'cells')
+
+    def __init__(self, name, index=None, rows=None, cells=None):
+        self.name = name
+        self.index = index
+        self.rows = rows if rows is not None else []
+        self.cells = cells if cells is not None else {}
+
+    def row(self, name):
+        for r in self.rows:
+            if r.name == name:
+                return r
+        return None
+
+    def __repr__(self):
+        return f"<Section {self.name} rows={len(self.rows)}>"
+
+
+class Shape:
+    """A lightweight shape: cells, sections and text, no COM behind it."""
+    __slots__ = ('id', 'name', 'name_u', 'type', 'master', 'master_shape',
+                 'parent', 'cells', 'sections', 'text')
+
+    def __init__(self, id, name=None, name_u=None, type=None, master=None,
+                 master_shape=None, parent=None):
+        self.id = id
+        self.name = name
+        self.name_u = name_u
+        self.type = type
+        self.master = master
+        self.master_shape = master_shape
+        self.parent = parent
+        self.cells = {}
+        self.sections = []
+        self.text = None
+
+    def section(self, name, index=None):
+        for s in self.sections:
+            if s.name == name and (index is None or s.index == index):
+                return s
+        return None
+
+    def _named_rows(self, name):
+        section = self.section(name)
+        return {r.name: r for r in section.rows} if section else {}
+
+    def _named_row(self, section, name):
+        rows = self._named_rows(section)
+        if name in rows:
+            return rows[name]
+        lowered = name.lower()
+        for key, row in rows.items():
+            if key and key.lower() == lowered:
+                return row
+        return None
+
+    @property
+    def props(self):
+        """Shape Data rows by row name."""
+        return self._named_rows('Property')
+
+    @property
+    def user(self):
+        """User-defined cells by row name."""
+        return self._named_rows('User')
+
+    @property
+    def geometry(self):
+        return [s for s in self.sections if s.name == 'Geometry']
+
+    def cell(self, name):
+        """Look up a cell by ShapeSheet name.
+
+        Accepts ``'PinX'``, ``'Prop.Type'``, ``'Prop.Type.Label'`` and
+        ``'User.Foo'``; returns ``None`` if the cell does not exist.
+        """
+        if name in self.cells:
+            return self.cells[name]
+        parts = name.split('.')
+        if len(parts) in (2, 3):
+            kind = parts[0].lower()
+            section = {'prop': 'Property', 'user': 'User'}.get(kind)
+            if section:
+                row = self._named_row(section, parts[1])
+                if row is not None:
+                    cell = parts[2] if len(parts) == 3 else 'Value'
+                    return next((c for k, c in row.cells.items()
+                                 if k.lower() == cell.lower()), None)
+            return None
+        lowered = name.lower()
+        for key, cell in self.cells.items():
+            if key.lower() == lowered:
+                return cell
+        return None
+
+    def __repr__(self):
+        return f"<Shape {self.id} {self.name_u or self.name or ''}>".strip()
+
+
+class Page:
+    """Index entry of a page; shapes are read through :class:`VsdxFile`."""
+    __slots__ = ('id', 'name', 'name_u', 'index', 'part', 'background',
+                 'sheet')
+
+    def __init__(self, id, name, name_u, index, part, background, sheet):
+        self.id = id
+        self.name = name
+        self.name_u = name_u
+        self.index = index
+        self.part = part
+        self.background = background
+        self.sheet = sheet
+
+    @property
+    def width(self):
+        cell = self.sheet.cells.get('PageWidth')
+        return cell.result if cell is not None else None
+
+    @property
+    def height(self):
+        cell = self.sheet.cells.get('PageHeight')
+        return cell.result if cell is not None else None
+
+    def __repr__(self):
+        return f"<Page {self.index}: {self.name}>"
+
+
+class Master:
+    __slots__ = ('id', 'name', 'name_u', 'unique_id', 'part', '_shapes')
+
+    def __init__(self, id, name, name_u, unique_id, part):
+        self.id = id
+        self.name = name
+        self.name_u = name_u
+        self.unique_id = unique_id
+        self.part = part
+        self._shapes = None
+
+    def __repr__(self):
+        return f"<Master {self.id}: {self.name_u}>"
+
+
+def _int(value):
+    return int(value) if value is not None else None
+
+
+def _parse_cell(elem):
+    return Cell(elem.get('N'), elem.get('V'), elem.get('U'), elem.get('F'))
+
+
+def _parse_row(elem):
+    row = Row(elem.get('N'), _int(elem.get('IX')), elem.get('T'))
+    for child in elem:
+        if child.tag == CELL:
+            cell = _parse_cell(child)
+            row.cells[cell.name] = cell
+    return row
+
+
+def _parse_section(elem):
+    section = Section(elem.get('N'), _int(elem.get('IX')))
+    for child in elem:
+        if child.tag == ROW and child.get('Del') != '1':
+            section.rows.append(_parse_row(child))
+        elif child.tag == CELL:
+            cell = _parse_cell(child)
+            section.cells[cell.name] = cell
+    return section
+
+
+def _shape_from(elem, parent=None):
+    """Build a :class:`Shape` from the direct children of ``elem``."""
+    shape = Shape(_int(elem.get('ID')), elem.get('Name'), elem.get('NameU'),
+                  elem.get('Type'), _int(elem.get('Master')),
+                  _int(elem.get('MasterShape')), parent)
+    deleted = []
+    for child in elem:
+        if child.tag == CELL:
+            cell = _parse_cell(child)
+            shape.cells[cell.name] = cell
+        elif child.tag == SECTION:
+            shape.sections.append(_parse_section(child))
+            deleted.extend((child.get('N'), _int(child.get('IX')),
+                            r.get('N'), _int(r.get('IX')))
+                           for r in child if r.tag == ROW and
+                           r.get('Del') == '1')
+        elif child.tag == TEXT:
+            shape.text = ''.join(child.itertext())
+    return shape, deleted
+
+
+def _row_key(row):
+    return row.name if row.name is not None else row.index
+
+
+def _inherit(shape, base, deleted=()):
+    """Merge the cells of master shape ``base`` under ``shape``."""
+    cells = dict(base.cells)
+    cells.update(shape.cells)
+    shape.cells = cells
+    if shape.text is None:
+        shape.text = base.text
+    gone = {(d[0], d[1], d[2] if d[2] is not None else d[3])
+            for d in deleted}
+    local = {(s.name, s.index): s for s in shape.sections}
+    merged = []
+    for bsec in base.sections:
+        lsec = local.pop((bsec.name, bsec.index), None)
+        rows = []
+        lrows = {_row_key(r): r for r in lsec.rows} if lsec else {}
+        for brow in bsec.rows:
+            key = _row_key(brow)
+            if (bsec.name, bsec.index, key) in gone:
+                continue
+            lrow = lrows.pop(key, None)
+            if lrow is None:
+                rows.append(brow)
+            else:
+                rcells = dict(brow.cells)
+                rcells.update(lrow.cells)
+                rows.append(Row(lrow.name, lrow.index,
+                                lrow.type or brow.type, rcells))
+        rows.extend(lrows.values())
+        cells = dict(bsec.cells)
+        if lsec is not None:
+            cells.update(lsec.cells)
+        merged.append(Section(bsec.name, bsec.index, rows, cells))
+    merged.extend(local.values())
+    shape.sections = merged
+
+
+class VsdxFile:
+    """A Visio package opened for reading.
+
+    Parameters:
+    ----------
+    - path : str or file object
+        Path of a .vsdx/.vsdm/.vstx/.vstm file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        self._document = self._find_document()
+        self.pages = self._read_pages()
+        self.masters = self._read_masters()
+
+    # -- context manager ---------------------------------------------------
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -- package structure -------------------------------------------------
+    def _rels(self, part):
+        """Return ``{rId: (type, target_part)}`` for ``part``."""
+        folder, name = posixpath.split(part)
+        rels_part = posixpath.join(folder, '_rels', name + '.rels')
+        if rels_part not in self._zip.NameToInfo:
+            return {}
+        root = ET.fromstring(self._zip.read(rels_part))
+        rels = {}
+        for rel in root.iter('{%s}Relationship' % NS_REL):
+            target = posixpath.normpath(
+                posixpath.join(folder, rel.get('Target'))).lstrip('/')
+            rels[rel.get('Id')] = (rel.get('Type'), target)
+        return rels
+
+    def _find_document(self):
+        for rel_type, target in self._rels('').values():
+            if rel_type.endswith('/document'):
+                return target
+        return 'visio/document.xml'
+
+    def _related(self, part, suffix):
+        for rel_type, target in self._rels(part).values():
+            if rel_type.endswith(suffix):
+                return target
+        return None
+
+    def _read_pages(self):
+        index_part = self._related(self._document, '/pages')
+        if index_part is None:
+            return []
+        rels = self._rels(index_part)
+        root = ET.fromstring(self._zip.read(index_part))
+        pages = []
+        for i, elem in enumerate(root.iter(_T + 'Page')):
+            rel = elem.find(_T + 'Rel')
+            part = rels[rel.get(_RID)][1] if rel is not None else None
+            sheet_elem = elem.find(_T + 'PageSheet')
+            sheet = (_shape_from(sheet_elem)[0] if sheet_elem is not None
+                     else Shape(None))
+            pages.append(Page(_int(elem.get('ID')), elem.get('Name'),
+                              elem.get('NameU'), i, part,
+                              elem.get('Background') == '1', sheet))
+        return pages
+
+    def _read_masters(self):
+        index_part = self._related(self._document, '/masters')
+        if index_part is None:
+            return {}
+        rels = self._rels(index_part)
+        root = ET.fromstring(self._zip.read(index_part))
+        masters = {}
+        for elem in root.iter(_T + 'Master'):
+            rel = elem.find(_T + 'Rel')
+            part = rels[rel.get(_RID)][1] if rel is not None else None
+            master = Master(_int(elem.get('ID')), elem.get('Name'),
+                            elem.get('NameU'), elem.get('UniqueID'), part)
+            masters[master.id] = master
+        return masters
+
+    def part_crc(self, part):
+        """``(CRC-32, size)`` of a package part, read from the zip index.
+
+        Equal values mean equal content, without reading the part.
+        """
+        info = self._zip.getinfo(part)
+        return info.CRC, info.file_size
+
+    def page(self, key):
+        """Return a page by index, ``Name`` or ``NameU``."""
+        if isinstance(key, Page):
+            return key
+        if isinstance(key, int):
+            return self.pages[key]
+        for page in self.pages:
+            if key in (page.name, page.name_u):
+                return page
+        raise KeyError(f"No page named {key!r}")
+
+    def master(self, key):
+        """Return a master by ID, ``Name``, ``NameU`` or ``UniqueID``."""
+        if key in self.masters:
+            return self.masters[key]
+        for master in self.masters.values():
+            if key in (master.name, master.name_u, master.unique_id):
+                return master
+        raise KeyError(f"No master {key!r}")
+
+    def master_shapes(self, master):
+        """Return ``{shape_id: Shape}`` of all shapes of a master."""
+        master = self.master(master)
+        if master._shapes is None:
+            master._shapes = {s.id: s for s in
+                              self._iter_part(master.part, inherit=False)}
+        return master._shapes
+
+    # -- shapes ------------------------------------------------------------
+    def iter_shapes(self, page=0, inherit=True):
+        """Yield all shapes of a page in document order.
+
+        Sub-shapes of groups follow their group (``shape.parent`` holds the
+        group's ID).  With ``inherit=True`` cells, rows and text of the
+        master shapes are merged in.
+        """
+        return self._iter_part(self.page(page).part, inherit)
+
+    def shapes(self, page=0, inherit=True):
+        """The top level shapes of a page, like ``Page.Shapes``."""
+        return [s for s in self.iter_shapes(page, inherit)
+                if s.parent is None]
+
+    def _iter_part(self, part, inherit):
+        stack = []       # [element, shape or None, master id]
+        containers = []  # open <Shapes> elements
+        with self._zip.open(part) as stream:
+            for event, elem in ET.iterparse(stream, ('start', 'end')):
+                tag = elem.tag
+                if event == 'start':
+                    if tag == SHAPE:
+                        stack.append([elem, None, None])
+                    elif tag == SHAPES:
+                        containers.append(elem)
+                        if stack and stack[-1][1] is None:
+                            # all own cells of the group are parsed by now
+                            yield self._emit(stack, inherit)
+                    continue
+                if tag == SHAPE:
+                    if stack[-1][1] is None:
+                        yield self._emit(stack, inherit)
+                    stack.pop()
+                    # forget the finished shape so memory stays flat
+                    elem.clear()
+                    containers[-1].remove(elem)
+                elif tag == SHAPES:
+                    containers.pop()
+
+    def _emit(self, stack, inherit):
+        entry = stack[-1]
+        elem = entry[0]
+        parent = stack[-2][1].id if len(stack) > 1 else None
+        shape, deleted = _shape_from(elem, parent)
+        master = shape.master
+        if master is None and len(stack) > 1:
+            master = stack[-2][2]
+        entry[1], entry[2] = shape, master
+        for child in list(elem):
+            if child.tag != SHAPES:
+                elem.remove(child)
+        if inherit and master is not None and master in self.masters:
+            shapes = self.master_shapes(master)
+            if shape.master_shape is not None:
+                base = shapes.get(shape.master_shape)
+            else:
+                base = next((s for s in shapes.values() if s.parent is None),
+                            None)
+            if base is not None:
+                _inherit(shape, base, deleted)
+        return shape
+
+    def connects(self, page=0):
+        """Yield the glue records (``<Connect>``) of a page."""
+        with self._zip.open(self.page(page).part) as stream:
+            for event, elem in ET.iterparse(stream, ('end',)):
+                if elem.tag == CONNECT:
+                    yield Connect(_int(elem.get('FromSheet')),
+                                  elem.get('FromCell'),
+                                  _int(elem.get('ToSheet')),
+                                  elem.get('ToCell'))
+                    elem.clear()
+                elif elem.tag == SHAPE:
+                    elem.clear()
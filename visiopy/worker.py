@@ -0,0 +1,226 @@
+"""Run COM work on a dedicated thread, off the GUI thread.
+
+Visio objects live in a single-threaded apartment (STA): they may only be
+used from the thread that created (or unmarshaled) them, and that thread
+has to pump messages.  :class:`ComWorker` owns such a thread.  Other
+threads submit functions to it and get a ``concurrent.futures.Future``
+back (or an awaitable with :meth:`~ComWorker.run`), so a Tk dialog or a
+notebook never waits for Visio.
+
+Objects that were obtained on another thread are handed over with
+:meth:`~ComWorker.share`, which marshals them into the worker's apartment.
+Without pywin32 (or with ``com=False``) the worker is a plain thread, which
+is how the tests drive it with the fakes in :mod:`visiopy.fakes`.
+
+Usage:
+------
+    from visiopy.worker import ComWorker
+
+    worker = ComWorker(lambda: win32com.client.Dispatch('Visio.Application'))
+    future = worker.submit(lambda: worker.app.ActiveDocument.Name)
+    future.result()
+
+    names = await worker.run(list_names)      # in a notebook / asyncio
+    worker.cancel_pending()                   # drop everything queued
+    worker.shutdown()
+"""
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+def _has_pythoncom():
+    try:
+        import pythoncom  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class Shared:
+    """An object handed over to a :class:`ComWorker` thread.
+
+    With COM the interface is marshaled in the creating thread and
+    unmarshaled on the first :meth:`get`, which must run on the worker.
+    """
+
+    def __init__(self, obj, com):
+        self._obj = obj
+        self._stream = None
+        if com:
+            import pythoncom
+            self._stream = pythoncom.CoMarshalInterThreadInterfaceInStream(
+                pythoncom.IID_IDispatch, obj._oleobj_)
+            self._obj = None
+
+    def get(self):
+        if self._stream is not None:
+            import pythoncom
+            import win32com.client
+            unknown = pythoncom.CoGetInterfaceAndReleaseStream(
+                self._stream, pythoncom.IID_IDispatch)
+            self._obj = win32com.client.Dispatch(unknown)
+            self._stream = None
+        return self._obj
+
+
+class ComWorker:
+    """A thread that owns Visio objects and runs submitted functions.
+
+    Functions run one after the other in submission order.  While the
+    queue is empty the thread pumps Windows messages, so COM events and
+    calls from other apartments are served.
+
+    Parameters:
+    ----------
+    - factory : callable, optional
+        Called on the worker thread at start; the result is available as
+        ``worker.app`` (e.g. ``Dispatch('Visio.Application')``).
+    - com : bool, optional
+        Initialize COM on the thread; by default whenever pywin32 is
+        installed.
+    - pump_interval : float
+        Seconds between message pumps of an idle worker.
+    - name : str
+        Thread name.
+    """
+
+    def __init__(self, factory=None, com=None, pump_interval=0.05,
+                 name='visiopy-com'):
+        self.factory = factory
+        self.com = _has_pythoncom() if com is None else com
+        self.pump_interval = pump_interval
+        self.app = None
+        self.completed = 0
+        self._queue = queue.Queue()
+        self._error = None
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._loop, args=(ready,),
+                                        name=name, daemon=True)
+        self._thread.start()
+        ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(cancel=exc_type is not None)
+        return False
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    def _loop(self, ready):
+        pythoncom = None
+        if self.com:
+            import pythoncom
+            pythoncom.CoInitialize()
+        try:
+            try:
+                self.app = self.factory() if self.factory else None
+            except BaseException as e:
+                self._error = e
+                return
+            finally:
+                ready.set()
+            timeout = self.pump_interval if pythoncom else None
+            while True:
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    pythoncom.PumpWaitingMessages()
+                    continue
+                if item is _STOP:
+                    break
+                self._execute(*item)
+                if pythoncom:
+                    pythoncom.PumpWaitingMessages()
+        finally:
+            self.app = None
+            if pythoncom:
+                pythoncom.CoUninitialize()
+
+    def _execute(self, future, fn, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        self.completed += 1
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)``; returns a Future.
+
+        Called from the worker thread itself (a task submitting more work)
+        the function runs right away, since waiting for it would deadlock.
+        """
+        future = Future()
+        if threading.current_thread() is self._thread:
+            self._execute(future, fn, args, kwargs)
+            return future
+        if not self.alive:
+            raise RuntimeError("ComWorker has been shut down")
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def batch(self, calls):
+        """Run ``[(fn, args), ...]`` back to back as one task.
+
+        Returns a Future of the list of results; the first exception
+        fails the whole batch.
+        """
+        calls = [(c[0], tuple(c[1]) if len(c) > 1 else ()) for c in calls]
+        return self.submit(lambda: [fn(*args) for fn, args in calls])
+
+    def run(self, fn, *args, **kwargs):
+        """Like :meth:`submit`, but returns an ``asyncio`` awaitable."""
+        return asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def share(self, obj):
+        """Prepare ``obj`` (from the calling thread) for use on the worker.
+
+        Returns a :class:`Shared`; call its ``get()`` inside submitted
+        functions.
+        """
+        return Shared(obj, self.com)
+
+    def cancel_pending(self):
+        """Cancel every queued task that has not started; returns the count.
+        """
+        cancelled, stop = 0, False
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+            elif item[0].cancel():
+                cancelled += 1
+        if stop:
+            self._queue.put(_STOP)
+        return cancelled
+
+    def shutdown(self, wait=True, cancel=False):
+        """Stop the thread after the queued tasks (or cancel them)."""
+        if cancel:
+            self.cancel_pending()
+        if self.alive:
+            self._queue.put(_STOP)
+            if wait:
+                self._thread.join()
+
+    def __repr__(self):
+        state = 'running' if self.alive else 'stopped'
+        return (f"<ComWorker {state}, {self._queue.qsize()} queued, "
+                f"{self.completed} done>")